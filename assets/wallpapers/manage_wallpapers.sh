@@ -7,6 +7,11 @@ set -e
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 ARCHIVE_PATH="${SCRIPT_DIR}/wallpapers.tar.gz"
 
+# Hidden member appended by `config assets wallpapers remove` and `rename`,
+# listing (NUL-separated) names whose earlier members are no longer in the
+# archive. Their data stays until `config assets wallpapers compact`.
+REMOVALS_NAME=".wallpapers-removed"
+
 # Colors for output
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -50,6 +55,69 @@ Examples:
 EOF
 }
 
+# Print the names of the wallpapers the archive holds, one per line, in the
+# same order as `config assets wallpapers list`. Tombstones hide earlier
+# members of the names they list; a member added after the tombstone is
+# visible again.
+live_wallpapers() {
+    # live maps each visible name to its index in order
+    local -A live=()
+    local -a order=()
+    local name removed i tombstones=0
+
+    while IFS= read -r name; do
+        if [[ "$name" == "$REMOVALS_NAME" ]]; then
+            tombstones=$((tombstones + 1))
+            while IFS= read -r -d '' removed || [[ -n "$removed" ]]; do
+                unset 'live[$removed]'
+            done < <(tar -xOf "$ARCHIVE_PATH" --occurrence="$tombstones" -- "$REMOVALS_NAME")
+        elif [[ "$name" != */ && -z "${live[$name]+x}" ]]; then
+            live[$name]=${#order[@]}
+            order+=("$name")
+        fi
+    done < <(tar -tf "$ARCHIVE_PATH")
+
+    for i in "${!order[@]}"; do
+        name="${order[$i]}"
+        if [[ "${live[$name]-}" == "$i" ]]; then
+            echo "$name"
+        fi
+    done
+}
+
+# Print the tar option for the archive's compression, which
+# `config assets wallpapers convert` may have changed from gzip; plain tars
+# need none. Reading (tar -t/-x) detects it by itself.
+compression_option() {
+    local magic
+    magic=$(head -c 6 "$ARCHIVE_PATH" | od -An -tx1 | tr -d ' \n')
+    case "$magic" in
+        1f8b*) echo "--gzip" ;;
+        fd377a585a00) echo "--xz" ;;
+        28b52ffd*) echo "--zstd" ;;
+    esac
+}
+
+# Extract the given wallpapers (names from live_wallpapers) into a directory.
+# The whole archive is unpacked into a staging directory first, so hard links
+# to removed wallpapers still resolve.
+extract_live() {
+    local dest="$1"
+    shift
+    local staging name
+    staging=$(mktemp -d)
+
+    if ! tar -xf "$ARCHIVE_PATH" -C "$staging"; then
+        rm -rf "$staging"
+        return 1
+    fi
+    for name in "$@"; do
+        mkdir -p "$(dirname "$dest/$name")"
+        mv -f "$staging/$name" "$dest/$name"
+    done
+    rm -rf "$staging"
+}
+
 # List wallpapers in the archive
 list_wallpapers() {
     if [[ ! -f "$ARCHIVE_PATH" ]]; then
@@ -57,17 +125,20 @@ list_wallpapers() {
         return 1
     fi
 
+    local -a names
+    mapfile -t names < <(live_wallpapers)
+
     print_info "Wallpapers in $ARCHIVE_PATH:"
     echo ""
 
     # List contents with details
-    tar -tzf "$ARCHIVE_PATH" | while read -r file; do
+    local file
+    for file in "${names[@]}"; do
         echo "  • $file"
     done
 
     echo ""
-    local count=$(tar -tzf "$ARCHIVE_PATH" | wc -l)
-    print_success "Total: $count wallpaper(s)"
+    print_success "Total: ${#names[@]} wallpaper(s)"
 }
 
 # Add a wallpaper to the archive
@@ -110,7 +181,11 @@ add_wallpaper() {
 
     # Check if file already exists in archive
     if [[ -f "$ARCHIVE_PATH" ]]; then
-        if tar -tzf "$ARCHIVE_PATH" | grep -q "^${filename}$"; then
+        local -a names
+        mapfile -t names < <(live_wallpapers)
+        local compression=$(compression_option)
+
+        if printf '%s\n' "${names[@]}" | grep -qxF -- "$filename"; then
             print_warning "'$filename' already exists in the archive."
             read -p "Overwrite? (y/N): " -n 1 -r
             echo
@@ -125,7 +200,7 @@ add_wallpaper() {
 
             # Extract all files except the one we're replacing
             print_info "Extracting existing wallpapers..."
-            tar -xzf "$ARCHIVE_PATH" -C "$temp_dir"
+            extract_live "$temp_dir" "${names[@]}"
 
             # Remove the old file
             rm -f "$temp_dir/$filename"
@@ -135,7 +210,7 @@ add_wallpaper() {
 
             # Create new archive
             print_info "Creating updated archive..."
-            tar -czf "$ARCHIVE_PATH" -C "$temp_dir" .
+            tar -c $compression -f "$ARCHIVE_PATH" -C "$temp_dir" .
 
             print_success "Successfully updated '$filename' in $ARCHIVE_PATH"
         else
@@ -147,13 +222,13 @@ add_wallpaper() {
             trap "rm -rf '$temp_dir'" EXIT
 
             # Extract existing files
-            tar -xzf "$ARCHIVE_PATH" -C "$temp_dir"
+            extract_live "$temp_dir" "${names[@]}"
 
             # Copy the new file
             cp "$wallpaper_path" "$temp_dir/$filename"
 
             # Create new archive
-            tar -czf "$ARCHIVE_PATH" -C "$temp_dir" .
+            tar -c $compression -f "$ARCHIVE_PATH" -C "$temp_dir" .
 
             print_success "Successfully added '$filename' to $ARCHIVE_PATH"
         fi
@@ -188,7 +263,9 @@ extract_wallpapers() {
     fi
 
     # Count files
-    local count=$(tar -tzf "$ARCHIVE_PATH" | wc -l)
+    local -a names
+    mapfile -t names < <(live_wallpapers)
+    local count=${#names[@]}
 
     if [[ $count -eq 0 ]]; then
         print_warning "Archive is empty"
@@ -197,11 +274,12 @@ extract_wallpapers() {
 
     print_info "Extracting $count wallpaper(s) to $output_path..."
 
-    # Extract files
-    tar -xzf "$ARCHIVE_PATH" -C "$output_path"
+    # Extract files, leaving out removed wallpapers and tombstones
+    extract_live "$output_path" "${names[@]}"
 
     print_success "Successfully extracted wallpapers:"
-    tar -tzf "$ARCHIVE_PATH" | while read -r file; do
+    local file
+    for file in "${names[@]}"; do
         echo "  • $file -> $output_path/$file"
     done
 }
@@ -9,6 +9,6 @@ Usage:
     cfg.packages.list()
 """
 
-from src.api import Assets, Config, Packages, Wallpapers
+from src.api import Assets, AsyncWallpapers, Config, Packages, Wallpapers
 
-__all__ = ["Config", "Assets", "Packages", "Wallpapers"]
+__all__ = ["Config", "Assets", "Packages", "Wallpapers", "AsyncWallpapers"]
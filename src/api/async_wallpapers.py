@@ -0,0 +1,552 @@
+# src/api/async_wallpapers.py
+"""Asyncio API for wallpaper management.
+
+Every call runs the blocking archive and file I/O of ``Wallpapers`` in a
+thread pool, so an event loop keeps running while archives are scanned,
+extracted or rewritten. At most ``max_concurrency`` calls run at once;
+the rest wait without holding a thread.
+
+Calls on the same archive are coordinated by a readers-writer lock shared
+by every ``AsyncWallpapers`` of the event loop: reads (listing, searching,
+reading, extracting, previews) run side by side, while calls that change
+the archive run alone, in the order they were made. Other processes are
+kept out by the archive's file lock, as with the synchronous API.
+
+Cancelling a call that hasn't started means it never runs. A call already
+running in a thread can't be interrupted; the awaiting task is cancelled
+straight away, the result is discarded, and the archive stays locked
+until the thread finishes, so the next call never sees a half-done change.
+"""
+import asyncio
+import collections
+import functools
+import itertools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from src.api.wallpapers import Wallpapers
+from src.services.wallpaper_catalog import DEFAULT_ASPECT_TOLERANCE
+from src.services.wallpaper_search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from src.services.wallpaper_similarity import (
+    DEFAULT_THRESHOLD as DEFAULT_SIMILARITY_THRESHOLD,
+)
+from src.services.wallpaper_thumbnails import DEFAULT_SIZE as DEFAULT_THUMBNAIL_SIZE
+from src.services.wallpapers_service import (
+    AddResult,
+    CompactResult,
+    ConvertResult,
+    PaletteResult,
+    SyncResult,
+    ThumbnailResult,
+    VerifyResult,
+    WallpaperError,
+    WallpaperInfo,
+)
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Records fetched per pool call by ``AsyncWallpapers.iter``
+ITER_BATCH = 256
+
+T = TypeVar("T")
+
+
+class _ArchiveLock:
+    """First-come first-served readers-writer lock for one event loop.
+
+    A waiting writer holds back readers that arrive after it, so a stream
+    of reads can't starve changes to the archive.
+    """
+
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writing = False
+        self._waiters: Deque[Tuple[bool, asyncio.Future]] = collections.deque()
+
+    async def acquire(self, write: bool) -> None:
+        """Wait until the lock is held for writing or reading."""
+        if not self._waiters and self._can_enter(write):
+            self._enter(write)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((write, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled
+                self.release(write)
+            else:
+                self._wake()
+            raise
+
+    def release(self, write: bool) -> None:
+        """Release the lock and let the next waiters in."""
+        if write:
+            self._writing = False
+        else:
+            self._readers -= 1
+        self._wake()
+
+    def _can_enter(self, write: bool) -> bool:
+        if write:
+            return not self._writing and not self._readers
+        return not self._writing
+
+    def _enter(self, write: bool) -> None:
+        if write:
+            self._writing = True
+        else:
+            self._readers += 1
+
+    def _wake(self) -> None:
+        while self._waiters:
+            write, future = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                self._waiters.popleft()
+                continue
+            if not self._can_enter(write):
+                break
+            self._waiters.popleft()
+            self._enter(write)
+            future.set_result(None)
+
+
+# One lock per (event loop, archive); dropped while nobody holds or awaits it
+_locks: "weakref.WeakValueDictionary[Tuple[Any, Path], _ArchiveLock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _archive_lock(loop: asyncio.AbstractEventLoop, archive_path: Path) -> _ArchiveLock:
+    """Return the lock shared by all calls on an archive in ``loop``."""
+    key = (loop, archive_path.resolve())
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = _ArchiveLock()
+    return lock
+
+
+class AsyncWallpapers:
+    """Asyncio API for wallpaper management.
+
+    Methods mirror ``Wallpapers`` and take the same arguments.
+
+    Example:
+        async with AsyncWallpapers() as wallpapers:
+            names = await wallpapers.list()
+            await asyncio.gather(
+                wallpapers.extract(Path("/tmp/a"), names=names[:10]),
+                wallpapers.read(names[0]),
+            )
+    """
+
+    def __init__(
+        self,
+        archive_path: Optional[Path] = None,
+        codec: Optional[str] = None,
+        workers: Optional[int] = None,
+        cache_dir: Optional[Path] = None,
+        thumbnail_dir: Optional[Path] = None,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        """Initialize the API.
+
+        Args:
+            archive_path: Path to wallpapers archive. If None, uses default location.
+            codec: Compression codec for a new archive (gzip, xz, zstd, store)
+            workers: Compression/decompression threads per call (default:
+                CPU count)
+            cache_dir: Blob cache for linked extraction
+            thumbnail_dir: Thumbnail cache
+            max_concurrency: Calls that may run at the same time
+            executor: Thread pool to run calls in (default: a private pool
+                of ``max_concurrency`` threads, shut down by ``aclose``)
+
+        Raises:
+            WallpaperError: If the codec is unknown, or workers or
+                max_concurrency is less than 1
+        """
+        if max_concurrency < 1:
+            raise WallpaperError(
+                f"Concurrency limit must be at least 1, got {max_concurrency}"
+            )
+        if archive_path is None:
+            archive_path = Wallpapers._default_archive_path()
+        self.archive_path = archive_path
+        self._wallpapers = Wallpapers(
+            archive_path,
+            codec=codec,
+            workers=workers,
+            cache_dir=cache_dir,
+            thumbnail_dir=thumbnail_dir,
+        )
+        self.max_concurrency = max_concurrency
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="wallpapers"
+        )
+        # Created on first use so it belongs to the running loop
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncWallpapers":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Wait for running calls and shut down the private thread pool."""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self._executor.shutdown, wait=True)
+            )
+
+    async def _run(
+        self, write: bool, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run a blocking call in the pool under the archive lock.
+
+        Args:
+            write: Whether the call changes the archive
+            func: Blocking callable
+        """
+        lock = _archive_lock(asyncio.get_running_loop(), self.archive_path)
+        await lock.acquire(write)
+        return await self._in_pool(
+            functools.partial(lock.release, write), func, *args, **kwargs
+        )
+
+    async def _in_pool(
+        self, release: Callable[[], None], func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run a blocking call in the pool once a slot is free.
+
+        Args:
+            release: Called once the call is done or won't run
+            func: Blocking callable
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        slots = self._slots
+        try:
+            await slots.acquire()
+        except BaseException:
+            release()
+            raise
+        try:
+            job = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            release()
+            raise
+        future = asyncio.wrap_future(job, loop=loop)
+
+        def finished(future: asyncio.Future) -> None:
+            # Runs when the thread is done, even if the caller was cancelled
+            if not future.cancelled():
+                future.exception()
+            slots.release()
+            release()
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Only stops calls still queued in the pool; a running call
+            # keeps the lock until ``finished``
+            job.cancel()
+            raise
+
+    async def list(
+        self, *, details: bool = False
+    ) -> Union[List[str], List[WallpaperInfo]]:
+        """List all wallpapers in the archive (see ``Wallpapers.list``)."""
+        return await self._run(False, self._wallpapers.list, details=details)
+
+    async def iter(
+        self,
+        *,
+        details: bool = False,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[Union[str, WallpaperInfo]]:
+        """Stream wallpapers in archive order (see ``Wallpapers.iter``).
+
+        Records are fetched in the pool, ``ITER_BATCH`` at a time, as the
+        iterator advances, so a stale index is rebuilt while the first
+        batches are already handed out. The archive stays locked for
+        reading until the iterator is exhausted or closed.
+        """
+        lock = _archive_lock(asyncio.get_running_loop(), self.archive_path)
+        await lock.acquire(False)
+        # The iterator itself plus each pool call using the sync iterator;
+        # the last one to finish drops it and releases the lock
+        holds = [1]
+        stream: List[Iterator[Union[str, WallpaperInfo]]] = []
+
+        def release() -> None:
+            holds[0] -= 1
+            if not holds[0]:
+                # Dropping the iterator closes a scan the caller didn't finish
+                stream.clear()
+                lock.release(False)
+
+        try:
+            holds[0] += 1
+            stream.append(
+                await self._in_pool(
+                    release,
+                    self._wallpapers.iter,
+                    details=details,
+                    min_width=min_width,
+                    min_height=min_height,
+                    aspect=aspect,
+                    aspect_tolerance=aspect_tolerance,
+                    min_size=min_size,
+                    max_size=max_size,
+                    name_glob=name_glob,
+                    limit=limit,
+                )
+            )
+            while True:
+                holds[0] += 1
+                batch = await self._in_pool(
+                    release, list, itertools.islice(stream[0], ITER_BATCH)
+                )
+                for member in batch:
+                    yield member
+                if len(batch) < ITER_BATCH:
+                    return
+        finally:
+            release()
+
+    async def query(
+        self,
+        *,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> List[WallpaperInfo]:
+        """Find wallpapers by resolution, aspect ratio, size and name."""
+        return await self._run(
+            False,
+            self._wallpapers.query,
+            min_width=min_width,
+            min_height=min_height,
+            aspect=aspect,
+            aspect_tolerance=aspect_tolerance,
+            min_size=min_size,
+            max_size=max_size,
+            name_glob=name_glob,
+            sort=sort,
+            limit=limit,
+        )
+
+    async def search(self, text: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[str]:
+        """Find wallpapers by name, best match first."""
+        return await self._run(False, self._wallpapers.search, text, limit=limit)
+
+    async def read(self, name: str) -> bytes:
+        """Read one wallpaper's data.
+
+        Args:
+            name: Wallpaper name
+
+        Returns:
+            The wallpaper's bytes
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+        """
+        return await self._run(False, self._read, name)
+
+    def _read(self, name: str) -> bytes:
+        with self._wallpapers.open(name) as f:
+            return f.read()
+
+    async def add(
+        self,
+        path: Path,
+        *,
+        force: bool = False,
+        validate: bool = True,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> Optional[str]:
+        """Add a wallpaper to the archive (see ``Wallpapers.add``)."""
+        return await self._run(
+            True,
+            self._wallpapers.add,
+            path,
+            force=force,
+            validate=validate,
+            near_duplicates=near_duplicates,
+            threshold=threshold,
+            palette=palette,
+        )
+
+    async def add_many(
+        self,
+        paths: Iterable[Path],
+        *,
+        force: bool = False,
+        validate: bool = True,
+        recursive: bool = False,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> List[AddResult]:
+        """Add many wallpapers in a single archive update."""
+        return await self._run(
+            True,
+            self._wallpapers.add_many,
+            list(paths),
+            force=force,
+            validate=validate,
+            recursive=recursive,
+            near_duplicates=near_duplicates,
+            threshold=threshold,
+            palette=palette,
+        )
+
+    async def find_duplicates(
+        self, threshold: int = DEFAULT_SIMILARITY_THRESHOLD
+    ) -> List[List[str]]:
+        """Group wallpapers that show the same picture."""
+        return await self._run(False, self._wallpapers.find_duplicates, threshold)
+
+    async def remove(
+        self,
+        names: Optional[Iterable[str]] = None,
+        *,
+        pattern: Optional[str] = None,
+    ) -> List[str]:
+        """Remove wallpapers from the archive."""
+        names = None if names is None else list(names)
+        return await self._run(
+            True, self._wallpapers.remove, names, pattern=pattern
+        )
+
+    async def rename(self, old: str, new: str, *, overwrite: bool = False) -> None:
+        """Rename a wallpaper without rewriting its data."""
+        await self._run(True, self._wallpapers.rename, old, new, overwrite=overwrite)
+
+    async def extract(
+        self,
+        output_path: Path,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        link: Optional[str] = None,
+    ) -> Path:
+        """Extract wallpapers to directory (see ``Wallpapers.extract``)."""
+        names = None if names is None else list(names)
+        return await self._run(
+            False,
+            self._wallpapers.extract,
+            output_path,
+            names=names,
+            pattern=pattern,
+            link=link,
+        )
+
+    async def sync(
+        self,
+        output_path: Path,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        delete: bool = False,
+        checksum: bool = False,
+        link: Optional[str] = None,
+    ) -> SyncResult:
+        """Extract only wallpapers that are new or changed on disk."""
+        names = None if names is None else list(names)
+        return await self._run(
+            False,
+            self._wallpapers.sync,
+            output_path,
+            names=names,
+            pattern=pattern,
+            delete=delete,
+            checksum=checksum,
+            link=link,
+        )
+
+    async def verify(self) -> VerifyResult:
+        """Check the archive's data against its stored index."""
+        return await self._run(False, self._wallpapers.verify)
+
+    async def thumbnail(self, name: str, size: int = DEFAULT_THUMBNAIL_SIZE) -> Path:
+        """Get a downscaled preview of one wallpaper."""
+        return await self._run(False, self._wallpapers.thumbnail, name, size)
+
+    async def thumbnails(
+        self,
+        size: int = DEFAULT_THUMBNAIL_SIZE,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> ThumbnailResult:
+        """Build or reuse previews for many wallpapers."""
+        names = None if names is None else list(names)
+        return await self._run(
+            False, self._wallpapers.thumbnails, size, names=names, pattern=pattern
+        )
+
+    async def palette(self, name: str) -> List[str]:
+        """Get the dominant colours of one wallpaper."""
+        return await self._run(False, self._wallpapers.palette, name)
+
+    async def palettes(
+        self,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> PaletteResult:
+        """Compute missing palettes and return them for many wallpapers."""
+        names = None if names is None else list(names)
+        return await self._run(
+            False, self._wallpapers.palettes, names=names, pattern=pattern
+        )
+
+    async def convert(self, codec: str) -> ConvertResult:
+        """Rewrite the archive with another compression codec."""
+        return await self._run(True, self._wallpapers.convert, codec)
+
+    async def compact(self, *, dry_run: bool = False) -> CompactResult:
+        """Rewrite the archive without removed or replaced wallpapers."""
+        return await self._run(not dry_run, self._wallpapers.compact, dry_run=dry_run)
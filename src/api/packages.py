@@ -2,9 +2,14 @@
 """Python API for package management."""
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
-from src.services.packages_service import PackagesService, PackageRole
+from src.services.packages_catalog import RoleInfo
+from src.services.packages_service import (
+    PackageRole,
+    PackagesService,
+    ParallelInstallResult,
+)
 
 
 class Packages:
@@ -20,14 +25,22 @@ class Packages:
         self,
         playbook_path: Optional[Path] = None,
         ansible_dir: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        state_dir: Optional[Path] = None,
     ) -> None:
         """Initialize Packages API.
 
         Args:
             playbook_path: Path to Ansible playbook
             ansible_dir: Path to ansible directory
+            cache_dir: Directory for parse caches (default: under XDG
+                cache home)
+            state_dir: Directory for the record of past runs (default:
+                under XDG state home)
         """
-        self._service = PackagesService(playbook_path, ansible_dir)
+        self._service = PackagesService(
+            playbook_path, ansible_dir, cache_dir, state_dir
+        )
 
     def list(self) -> List[PackageRole]:
         """List available packages and their tags.
@@ -37,18 +50,77 @@ class Packages:
         """
         return self._service.list_packages()
 
+    def catalog(self) -> Dict[str, RoleInfo]:
+        """Describe every role on the roles path.
+
+        Example:
+            packages.catalog()["zsh"].packages["Archlinux"]
+
+        Returns:
+            RoleInfo records (packages per distribution, defaults, vars,
+            tasks, templates and files) by role name
+        """
+        return self._service.role_catalog()
+
+    def info(self, name: str) -> RoleInfo:
+        """Describe one role.
+
+        Args:
+            name: Role name
+
+        Returns:
+            The role's RoleInfo record
+
+        Raises:
+            RoleNotFoundError: If the role isn't on the roles path
+        """
+        return self._service.role_info(name)
+
     def install(
         self,
         tags: Optional[List[str]] = None,
         extra_args: Optional[List[str]] = None,
+        native: bool = False,
+        force: bool = False,
     ) -> subprocess.CompletedProcess:
         """Install packages using Ansible.
 
         Args:
             tags: List of tags to filter roles
             extra_args: Additional ansible-playbook arguments
+            native: Run simple roles in-process when possible (needs the
+                ``native`` extra)
+            force: Also run roles whose inputs and written files are
+                unchanged since their last successful run
 
         Returns:
             CompletedProcess with execution result
         """
-        return self._service.install(tags, extra_args)
+        return self._service.install(tags, extra_args, native=native, force=force)
+
+    def install_parallel(
+        self,
+        tags: List[str],
+        extra_args: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        output: Optional[Callable[[str], None]] = None,
+        force: bool = False,
+    ) -> ParallelInstallResult:
+        """Install the selected roles as concurrent ansible-playbook runs.
+
+        Example:
+            result = packages.install_parallel(["zsh", "nvim"], jobs=2)
+            result.returncode
+
+        Args:
+            tags: Tags selecting the roles
+            extra_args: Additional ansible-playbook arguments
+            jobs: Maximum concurrent runs (default: CPU count)
+            output: Called with each role-prefixed output line (default:
+                print)
+            force: Also run roles that are unchanged since their last run
+
+        Returns:
+            ParallelInstallResult with one result per run
+        """
+        return self._service.install_parallel(tags, extra_args, jobs, output, force)
@@ -1,9 +1,25 @@
 # src/api/wallpapers.py
 """Python API for wallpaper management."""
 from pathlib import Path
-from typing import List, Optional
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
 
-from src.services.wallpapers_service import WallpapersService
+from src.services.wallpaper_catalog import DEFAULT_ASPECT_TOLERANCE
+from src.services.wallpaper_search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from src.services.wallpaper_similarity import (
+    DEFAULT_THRESHOLD as DEFAULT_SIMILARITY_THRESHOLD,
+)
+from src.services.wallpaper_thumbnails import DEFAULT_SIZE as DEFAULT_THUMBNAIL_SIZE
+from src.services.wallpapers_service import (
+    AddResult,
+    CompactResult,
+    ConvertResult,
+    PaletteResult,
+    SyncResult,
+    ThumbnailResult,
+    VerifyResult,
+    WallpaperInfo,
+    WallpapersService,
+)
 
 
 class Wallpapers:
@@ -15,15 +31,33 @@ class Wallpapers:
         wallpapers.add(Path("~/Pictures/bg.png"))
     """
 
-    def __init__(self, archive_path: Optional[Path] = None) -> None:
+    def __init__(
+        self,
+        archive_path: Optional[Path] = None,
+        codec: Optional[str] = None,
+        workers: Optional[int] = None,
+        cache_dir: Optional[Path] = None,
+        thumbnail_dir: Optional[Path] = None,
+    ) -> None:
         """Initialize Wallpapers API.
 
         Args:
             archive_path: Path to wallpapers archive. If None, uses default location.
+            codec: Compression codec for a new archive (gzip, xz, zstd, store)
+            workers: Compression/decompression threads (default: CPU count)
+            cache_dir: Blob cache for linked extraction (default: under
+                XDG data home)
+            thumbnail_dir: Thumbnail cache (default: under XDG cache home)
         """
         if archive_path is None:
             archive_path = self._default_archive_path()
-        self._service = WallpapersService(archive_path)
+        self._service = WallpapersService(
+            archive_path,
+            codec=codec,
+            workers=workers,
+            cache_dir=cache_dir,
+            thumbnail_dir=thumbnail_dir,
+        )
 
     @staticmethod
     def _default_archive_path() -> Path:
@@ -35,44 +69,468 @@ class Wallpapers:
         package_dir = Path(__file__).parent.parent
         return package_dir.parent / "assets" / "wallpapers" / "wallpapers.tar.gz"
 
-    def list(self) -> List[str]:
+    def list(
+        self, *, details: bool = False
+    ) -> Union[List[str], List[WallpaperInfo]]:
         """List all wallpapers in the archive.
 
+        Args:
+            details: Return WallpaperInfo records (size, content hash,
+                format, width, height) instead of names
+
         Returns:
-            List of wallpaper filenames
+            List of wallpaper filenames, or records when ``details`` is set
 
         Raises:
             ArchiveNotFoundError: If archive doesn't exist
         """
+        if details:
+            return self._service.list_wallpaper_details()
         return self._service.list_wallpapers()
 
+    def iter(
+        self,
+        *,
+        details: bool = False,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Union[str, WallpaperInfo]]:
+        """Stream wallpapers in archive order without building a list.
+
+        Example:
+            for name in wallpapers.iter(name_glob="*.png"):
+                print(name)
+
+        Takes the filters of ``query``; results are not sorted.
+
+        Args:
+            details: Yield WallpaperInfo records instead of names
+
+        Returns:
+            Iterator over names, or records when ``details`` is set
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the aspect ratio is invalid
+        """
+        return self._service.iter_wallpapers(
+            details=details,
+            min_width=min_width,
+            min_height=min_height,
+            aspect=aspect,
+            aspect_tolerance=aspect_tolerance,
+            min_size=min_size,
+            max_size=max_size,
+            name_glob=name_glob,
+            limit=limit,
+        )
+
+    def query(
+        self,
+        *,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> List[WallpaperInfo]:
+        """Find wallpapers by resolution, aspect ratio, size and name.
+
+        Args:
+            min_width: Minimum width in pixels
+            min_height: Minimum height in pixels
+            aspect: Aspect ratio, e.g. ``"21:9"``, ``"3440x1440"`` or ``2.39``
+            aspect_tolerance: Allowed relative deviation from ``aspect``
+            min_size: Minimum file size in bytes
+            max_size: Maximum file size in bytes
+            name_glob: Glob pattern the name must match
+            sort: ``name``, ``width``, ``height``, ``size``, ``mtime`` or
+                ``aspect``; prefix with ``-`` for descending
+            limit: Maximum number of results
+
+        Returns:
+            Matching WallpaperInfo records
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the aspect ratio or sort key is invalid
+        """
+        return self._service.query_wallpapers(
+            min_width=min_width,
+            min_height=min_height,
+            aspect=aspect,
+            aspect_tolerance=aspect_tolerance,
+            min_size=min_size,
+            max_size=max_size,
+            name_glob=name_glob,
+            sort=sort,
+            limit=limit,
+        )
+
+    def search(self, text: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[str]:
+        """Find wallpapers by name, best match first.
+
+        Example:
+            wallpapers.search("sunst")  # ["sunset.png", "sunset_2.jpg", ...]
+
+        Args:
+            text: Name, part of a name or words; typos are tolerated
+            limit: Maximum number of results
+
+        Returns:
+            Matching wallpaper names
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the text is empty or the limit less than 1
+        """
+        return self._service.search_wallpapers(text, limit=limit)
+
     def add(
         self,
         path: Path,
         *,
         force: bool = False,
-        validate: bool = True
-    ) -> None:
+        validate: bool = True,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> Optional[str]:
         """Add a wallpaper to the archive.
 
         Args:
             path: Path to wallpaper image
             force: Overwrite if exists
-            validate: Validate image extension
+            validate: Validate image extension and header
+            near_duplicates: "warn" or "reject" to check the image against
+                similar-looking wallpapers (requires Pillow and numpy)
+            threshold: Maximum perceptual hash distance in bits
+            palette: Also precompute the colour palette (see ``palette``)
+
+        Returns:
+            Name of a similar wallpaper when near-duplicates are checked,
+            otherwise None
 
         Raises:
             WallpaperNotFoundError: If path doesn't exist
             InvalidImageError: If not a valid image (when validate=True)
+            WallpaperError: If it is a near-duplicate (when rejecting)
         """
-        self._service.add_wallpaper(path, overwrite=force, validate_extension=validate)
+        return self._service.add_wallpaper(
+            path,
+            overwrite=force,
+            validate_extension=validate,
+            near_duplicates=near_duplicates,
+            threshold=threshold,
+            palette=palette,
+        )
 
-    def extract(self, output_path: Path) -> Path:
-        """Extract all wallpapers to directory.
+    def add_many(
+        self,
+        paths: Iterable[Path],
+        *,
+        force: bool = False,
+        validate: bool = True,
+        recursive: bool = False,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> List[AddResult]:
+        """Add many wallpapers in a single archive update.
+
+        Args:
+            paths: Files, directories or glob patterns
+            force: Overwrite wallpapers with the same name (otherwise skip them)
+            validate: Validate image extensions and headers
+            recursive: Descend into subdirectories of directories
+            near_duplicates: "warn" to report similar-looking images in
+                ``similar_to``, "reject" to also leave them out
+            threshold: Maximum perceptual hash distance in bits
+            palette: Also precompute colour palettes of the added wallpapers
+
+        Returns:
+            Per-file results with status "added", "overwritten", "skipped",
+            "unchanged" or "rejected"
+
+        Raises:
+            WallpaperNotFoundError: If a path doesn't exist or a pattern
+                matches nothing
+            InvalidImageError: If an explicit file is not a valid image
+                (when validate=True)
+        """
+        return self._service.add_wallpapers(
+            paths,
+            overwrite=force,
+            validate_extension=validate,
+            recursive=recursive,
+            near_duplicates=near_duplicates,
+            threshold=threshold,
+            palette=palette,
+        )
+
+    def find_duplicates(
+        self, threshold: int = DEFAULT_SIMILARITY_THRESHOLD
+    ) -> List[List[str]]:
+        """Group wallpapers that show the same picture.
+
+        Compares perceptual hashes, so copies at other resolutions or
+        re-encoded ones are grouped with the original. Requires Pillow and
+        numpy; hashes are computed once and kept in the index.
+
+        Args:
+            threshold: Maximum perceptual hash distance in bits
+
+        Returns:
+            Groups of two or more wallpaper names
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If Pillow or numpy is missing
+        """
+        return self._service.find_duplicates(threshold)
+
+    def remove(
+        self,
+        names: Optional[Iterable[str]] = None,
+        *,
+        pattern: Optional[str] = None,
+    ) -> List[str]:
+        """Remove wallpapers from the archive.
+
+        The data is reclaimed by ``compact``.
+
+        Args:
+            names: Exact wallpaper names to remove
+            pattern: Remove wallpapers matching this glob pattern
+
+        Returns:
+            Removed names
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+        """
+        return self._service.remove_wallpapers(names=names, pattern=pattern)
+
+    def rename(self, old: str, new: str, *, overwrite: bool = False) -> None:
+        """Rename a wallpaper without rewriting its data.
+
+        Args:
+            old: Current name
+            new: New name
+            overwrite: Replace a wallpaper already named ``new``
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If ``old`` isn't in the archive
+            WallpaperError: If ``new`` is invalid or already taken
+        """
+        self._service.rename_wallpaper(old, new, overwrite=overwrite)
+
+    def extract(
+        self,
+        output_path: Path,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        link: Optional[str] = None,
+    ) -> Path:
+        """Extract wallpapers to directory.
 
         Args:
             output_path: Target directory
+            names: Only extract these wallpapers
+            pattern: Only extract wallpapers matching this glob pattern
+            link: Materialize files from the blob cache as hardlink,
+                reflink, symlink or copy
 
         Returns:
             Path to extracted wallpapers directory
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+        """
+        return self._service.extract_wallpapers(
+            output_path, names=names, pattern=pattern, link_mode=link
+        )
+
+    def sync(
+        self,
+        output_path: Path,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        delete: bool = False,
+        checksum: bool = False,
+        link: Optional[str] = None,
+    ) -> SyncResult:
+        """Extract only wallpapers that are new or changed on disk.
+
+        Args:
+            output_path: Target directory
+            names: Only sync these wallpapers
+            pattern: Only sync wallpapers matching this glob pattern
+            delete: Remove extracted files no longer in the archive
+            checksum: Compare content hashes instead of size and mtime
+            link: Materialize files from the blob cache (see ``extract``)
+
+        Returns:
+            SyncResult with copied, skipped and removed names
+        """
+        return self._service.sync_wallpapers(
+            output_path,
+            names=names,
+            pattern=pattern,
+            delete=delete,
+            checksum=checksum,
+            link_mode=link,
+        )
+
+    def verify(self) -> VerifyResult:
+        """Check the archive's data against its stored index.
+
+        Returns:
+            VerifyResult; ``ok`` is False if any problem was found
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+        """
+        return self._service.verify_archive()
+
+    def thumbnail(self, name: str, size: int = DEFAULT_THUMBNAIL_SIZE) -> Path:
+        """Get a downscaled preview of one wallpaper.
+
+        Thumbnails are cached by content hash and size; after the first
+        call this is a cache lookup. Requires Pillow.
+
+        Args:
+            name: Wallpaper name
+            size: Longest edge in pixels
+
+        Returns:
+            Path to the cached PNG thumbnail
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+            WallpaperError: If it can't be decoded or Pillow is missing
+        """
+        return self._service.thumbnail(name, size)
+
+    def thumbnails(
+        self,
+        size: int = DEFAULT_THUMBNAIL_SIZE,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> ThumbnailResult:
+        """Build or reuse previews for many wallpapers in parallel.
+
+        Args:
+            size: Longest edge in pixels
+            names: Only these wallpapers (default: all)
+            pattern: Only wallpapers whose names match this glob pattern
+
+        Returns:
+            ThumbnailResult mapping names to thumbnail paths
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a named wallpaper isn't in the archive
+            WallpaperError: If Pillow is missing
+        """
+        return self._service.make_thumbnails(size, names=names, pattern=pattern)
+
+    def palette(self, name: str) -> List[str]:
+        """Get the dominant colours of one wallpaper, e.g. for theming.
+
+        Palettes are stored in the index; once computed (on add with
+        ``palette=True``, by ``palettes()`` or by a previous call) this
+        only reads the index. Requires Pillow and numpy.
+
+        Args:
+            name: Wallpaper name
+
+        Returns:
+            Up to 8 ``#rrggbb`` colours, most common first
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+            WallpaperError: If it can't be decoded or Pillow/numpy is missing
+        """
+        return self._service.palette(name)
+
+    def palettes(
+        self,
+        *,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> PaletteResult:
+        """Compute missing palettes and return them for many wallpapers.
+
+        Args:
+            names: Only these wallpapers (default: all)
+            pattern: Only wallpapers whose names match this glob pattern
+
+        Returns:
+            PaletteResult mapping names to palettes
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a named wallpaper isn't in the archive
+            WallpaperError: If Pillow or numpy is missing
+        """
+        return self._service.make_palettes(names=names, pattern=pattern)
+
+    def open(self, name: str) -> BinaryIO:
+        """Open a single wallpaper as a binary stream.
+
+        Example:
+            with wallpapers.open("sunset.png") as f:
+                data = f.read()
+
+        Args:
+            name: Wallpaper name
+
+        Returns:
+            Readable binary stream (use as a context manager)
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+        """
+        return self._service.open_wallpaper(name)
+
+    def convert(self, codec: str) -> ConvertResult:
+        """Rewrite the archive with another compression codec.
+
+        Args:
+            codec: Target codec (gzip, xz, zstd or store)
+
+        Returns:
+            ConvertResult with old/new codec and archive sizes
+        """
+        return self._service.convert_archive(codec)
+
+    def compact(self, *, dry_run: bool = False) -> CompactResult:
+        """Rewrite the archive without removed or replaced wallpapers.
+
+        Args:
+            dry_run: Only report how much space would be freed
+
+        Returns:
+            CompactResult with the archive size before and after
         """
-        return self._service.extract_wallpapers(output_path)
+        return self._service.compact_archive(dry_run=dry_run)
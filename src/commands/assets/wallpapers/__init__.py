@@ -1,15 +1,28 @@
 # src/commands/assets/wallpapers/__init__.py
 """Wallpapers subcommand group."""
+from collections import Counter
 from pathlib import Path
+from typing import List, Optional
 
 import typer
 
+from src.services.wallpaper_cache import LINK_MODES
+from src.services.wallpaper_catalog import SORT_KEYS
+from src.services.wallpaper_codecs import codec_names
+from src.services.wallpaper_search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from src.services.wallpaper_similarity import (
+    DEFAULT_THRESHOLD as DEFAULT_SIMILARITY_THRESHOLD,
+    HASH_BITS,
+)
+from src.services.wallpaper_thumbnails import DEFAULT_SIZE as DEFAULT_THUMBNAIL_SIZE
 from src.services.wallpapers_service import (
+    NEAR_DUPLICATE_MODES,
     WallpapersService,
     WallpaperError,
     ArchiveNotFoundError,
     WallpaperNotFoundError,
     InvalidImageError,
+    WallpaperInfo,
 )
 
 wallpapers_app = typer.Typer(help="Manage wallpaper assets")
@@ -23,18 +36,41 @@ def get_default_archive_path() -> Path:
     return config_root / "assets" / "wallpapers" / "wallpapers.tar.gz"
 
 
-def get_service() -> WallpapersService:
+def get_service(
+    codec: Optional[str] = None, workers: Optional[int] = None
+) -> WallpapersService:
     """Create a WallpapersService with the default archive path."""
-    return WallpapersService(get_default_archive_path())
+    return WallpapersService(get_default_archive_path(), codec=codec, workers=workers)
+
+
+def workers_option() -> Optional[int]:
+    """Shared --workers option for commands that (de)compress segments."""
+    return typer.Option(
+        None,
+        "--workers",
+        "-j",
+        min=1,
+        help="Compression threads (default: number of CPUs)",
+    )
+
+
+def threshold_option() -> int:
+    """Shared --threshold option for near-duplicate detection."""
+    return typer.Option(
+        DEFAULT_SIMILARITY_THRESHOLD,
+        "--threshold",
+        "-t",
+        min=0,
+        max=HASH_BITS,
+        help="Maximum perceptual hash distance (bits) for near-duplicates",
+    )
 
 
 @wallpapers_app.command("add")
 def add_wallpaper(
-    path: Path = typer.Argument(
+    paths: List[Path] = typer.Argument(
         ...,
-        help="Path to the wallpaper image to add",
-        exists=True,
-        readable=True,
+        help="Wallpaper images, directories or glob patterns to add",
     ),
     force: bool = typer.Option(
         False,
@@ -45,22 +81,94 @@ def add_wallpaper(
     no_validate: bool = typer.Option(
         False,
         "--no-validate",
-        help="Skip image extension validation",
+        help="Skip image extension and header validation",
+    ),
+    recursive: bool = typer.Option(
+        False,
+        "--recursive",
+        "-r",
+        help="Descend into subdirectories of directory arguments",
+    ),
+    codec: Optional[str] = typer.Option(
+        None,
+        "--codec",
+        help=f"Compression for a new archive ({', '.join(codec_names())})",
+    ),
+    near_duplicates: Optional[str] = typer.Option(
+        None,
+        "--near-duplicates",
+        help=(
+            "Check images against similar-looking wallpapers: "
+            f"{' or '.join(NEAR_DUPLICATE_MODES)} (needs Pillow and numpy)"
+        ),
     ),
+    threshold: int = threshold_option(),
+    palette: bool = typer.Option(
+        False,
+        "--palette",
+        help="Precompute colour palettes of the added wallpapers",
+    ),
+    workers: Optional[int] = workers_option(),
 ) -> None:
-    """Add a wallpaper to the archive."""
-    service = get_service()
+    """Add wallpapers to the archive.
+
+    A single image is added as before. Directories, glob patterns and
+    multiple paths are added together in one archive update.
+    """
     try:
-        service.add_wallpaper(
-            path,
+        service = get_service(codec, workers)
+        if len(paths) == 1 and paths[0].is_file():
+            path = paths[0]
+            similar = service.add_wallpaper(
+                path,
+                overwrite=force,
+                validate_extension=not no_validate,
+                near_duplicates=near_duplicates,
+                threshold=threshold,
+                palette=palette,
+            )
+            typer.echo(f"Successfully added '{path.name}' to wallpapers archive")
+            if similar is not None:
+                typer.echo(f"Warning: '{path.name}' looks like '{similar}'", err=True)
+            return
+
+        results = service.add_wallpapers(
+            paths,
             overwrite=force,
             validate_extension=not no_validate,
+            recursive=recursive,
+            near_duplicates=near_duplicates,
+            threshold=threshold,
+            palette=palette,
         )
-        typer.echo(f"Successfully added '{path.name}' to wallpapers archive")
     except WallpaperError as e:
         typer.echo(f"Error: {e}", err=True)
         raise typer.Exit(1)
 
+    if not results:
+        typer.echo("No wallpapers found to add")
+        return
+
+    counts = Counter(result.status for result in results)
+    for result in results:
+        line = f"  {result.status:<11} {result.name}"
+        if result.duplicate_of:
+            line += f" (same content as {result.duplicate_of})"
+        elif result.similar_to:
+            line += f" (looks like {result.similar_to})"
+        typer.echo(line)
+    summary = (
+        f"Added {counts['added']}, overwrote {counts['overwritten']}, "
+        f"skipped {counts['skipped']} wallpaper(s)"
+    )
+    if counts["unchanged"]:
+        summary += f", {counts['unchanged']} unchanged"
+    if counts["rejected"]:
+        summary += f", rejected {counts['rejected']} near-duplicate(s)"
+    typer.echo(summary)
+    if counts["skipped"]:
+        typer.echo("Use --force to overwrite skipped wallpapers.")
+
 
 @wallpapers_app.command("extract")
 def extract_wallpapers(
@@ -68,30 +176,466 @@ def extract_wallpapers(
         ...,
         help="Directory where wallpapers will be extracted (creates 'wallpapers' subdirectory)",
     ),
+    only: Optional[List[str]] = typer.Option(
+        None,
+        "--only",
+        help="Extract only this wallpaper (repeatable)",
+    ),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Extract only wallpapers whose names match this glob pattern",
+    ),
+    sync: bool = typer.Option(
+        False,
+        "--sync",
+        help="Only write wallpapers that are missing or changed on disk",
+    ),
+    delete: bool = typer.Option(
+        False,
+        "--delete",
+        help="With --sync, remove files that are no longer in the archive",
+    ),
+    checksum: bool = typer.Option(
+        False,
+        "--checksum",
+        help="With --sync, compare content hashes instead of size and mtime",
+    ),
+    link: Optional[str] = typer.Option(
+        None,
+        "--link",
+        help=(
+            "Materialize files from the local blob cache "
+            f"({', '.join(LINK_MODES)})"
+        ),
+    ),
+    workers: Optional[int] = workers_option(),
 ) -> None:
-    """Extract all wallpapers to the specified directory."""
-    service = get_service()
+    """Extract wallpapers to the specified directory."""
+    if (delete or checksum) and not sync:
+        typer.echo("Error: --delete and --checksum require --sync", err=True)
+        raise typer.Exit(1)
+
+    service = get_service(workers=workers)
     try:
-        result_path = service.extract_wallpapers(path)
-        wallpapers = list(result_path.iterdir())
-        typer.echo(f"Extracted {len(wallpapers)} wallpaper(s) to {result_path}")
-    except ArchiveNotFoundError as e:
+        if sync:
+            result = service.sync_wallpapers(
+                path,
+                names=only or None,
+                pattern=pattern,
+                delete=delete,
+                checksum=checksum,
+                link_mode=link,
+            )
+            typer.echo(
+                f"Synced wallpapers to {result.path}: {len(result.copied)} copied, "
+                f"{len(result.skipped)} skipped, {len(result.removed)} removed"
+            )
+            return
+        if only or pattern:
+            selected = service.match_wallpapers(names=only, pattern=pattern)
+            result_path = service.extract_wallpapers(
+                path, names=selected, link_mode=link
+            )
+            count = len(selected)
+        else:
+            count = len(service.list_wallpapers())
+            result_path = service.extract_wallpapers(path, link_mode=link)
+        typer.echo(f"Extracted {count} wallpaper(s) to {result_path}")
+    except WallpaperError as e:
         typer.echo(f"Error: {e}", err=True)
         raise typer.Exit(1)
 
 
 @wallpapers_app.command("list")
-def list_wallpapers() -> None:
-    """List all wallpapers in the archive."""
+def list_wallpapers(
+    long: bool = typer.Option(
+        False,
+        "--long",
+        "-l",
+        help="Show format, dimensions and size of each wallpaper",
+    ),
+    min_width: Optional[int] = typer.Option(
+        None, "--min-width", min=1, help="Only wallpapers at least this wide"
+    ),
+    min_height: Optional[int] = typer.Option(
+        None, "--min-height", min=1, help="Only wallpapers at least this tall"
+    ),
+    aspect: Optional[str] = typer.Option(
+        None,
+        "--aspect",
+        help="Only wallpapers with this aspect ratio (e.g. 21:9, 3440x1440)",
+    ),
+    min_size: Optional[int] = typer.Option(
+        None, "--min-size", min=0, help="Only files of at least this many bytes"
+    ),
+    max_size: Optional[int] = typer.Option(
+        None, "--max-size", min=0, help="Only files of at most this many bytes"
+    ),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Only wallpapers whose names match this glob pattern",
+    ),
+    sort: Optional[str] = typer.Option(
+        None,
+        "--sort",
+        help=(
+            f"Sort by {', '.join(SORT_KEYS)}; prefix with - for descending "
+            "(default: stream in archive order)"
+        ),
+    ),
+    limit: Optional[int] = typer.Option(
+        None, "--limit", "-n", min=1, help="Show at most this many wallpapers"
+    ),
+) -> None:
+    """List wallpapers in the archive, optionally filtered and sorted.
+
+    Without --sort, wallpapers are printed in archive order as they are
+    read, so output starts at once even for very large archives.
+    """
+    filters = (min_width, min_height, aspect, min_size, max_size, pattern, limit)
+    filtered = any(value is not None for value in filters)
+    heading = "Matching wallpapers" if filtered else "Wallpapers in archive"
     service = get_service()
     try:
-        wallpapers = service.list_wallpapers()
-        if not wallpapers:
+        if sort is None:
+            count = 0
+            for info in service.iter_wallpapers(
+                details=True,
+                min_width=min_width,
+                min_height=min_height,
+                aspect=aspect,
+                min_size=min_size,
+                max_size=max_size,
+                name_glob=pattern,
+                limit=limit,
+            ):
+                if not count:
+                    typer.echo(f"{heading}:")
+                _echo_wallpaper(info, long)
+                count += 1
+            if count:
+                typer.echo(f"{count} wallpaper(s)")
+        else:
+            wallpapers = service.query_wallpapers(
+                min_width=min_width,
+                min_height=min_height,
+                aspect=aspect,
+                min_size=min_size,
+                max_size=max_size,
+                name_glob=pattern,
+                sort=sort,
+                limit=limit,
+            )
+            count = len(wallpapers)
+            if count:
+                typer.echo(f"{heading} ({count}):")
+            for info in wallpapers:
+                _echo_wallpaper(info, long)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if not count:
+        if filtered:
+            typer.echo("No matching wallpapers")
+        else:
             typer.echo("No wallpapers in archive")
-            return
-        typer.echo(f"Wallpapers in archive ({len(wallpapers)}):")
-        for name in sorted(wallpapers):
-            typer.echo(f"  - {name}")
-    except ArchiveNotFoundError as e:
+
+
+def _echo_wallpaper(info: WallpaperInfo, long: bool) -> None:
+    """Print one line of ``list`` output."""
+    if long:
+        typer.echo(f"  - {info.name}  {_describe(info)}")
+    else:
+        typer.echo(f"  - {info.name}")
+
+
+def _describe(info: WallpaperInfo) -> str:
+    """Format the metadata shown by ``list --long``."""
+    if info.format is None:
+        return f"unknown format, {info.size} bytes"
+    return f"{info.format} {info.width}x{info.height}, {info.size} bytes"
+
+
+@wallpapers_app.command("search")
+def search_wallpapers(
+    text: str = typer.Argument(
+        ..., help="Name, part of a name or words to look for"
+    ),
+    limit: int = typer.Option(
+        DEFAULT_SEARCH_LIMIT,
+        "--limit",
+        "-n",
+        min=1,
+        help="Show at most this many wallpapers",
+    ),
+) -> None:
+    """Find wallpapers by name, best match first.
+
+    Exact names, prefixes and words are matched before fuzzy matches that
+    tolerate typos. Prints one name per line, so the output can be piped
+    into a selector such as rofi or fzf.
+    """
+    service = get_service()
+    try:
+        names = service.search_wallpapers(text, limit=limit)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if not names:
+        typer.echo("No matching wallpapers", err=True)
+    for name in names:
+        typer.echo(name)
+
+
+@wallpapers_app.command("thumbnails")
+def make_thumbnails(
+    size: int = typer.Option(
+        DEFAULT_THUMBNAIL_SIZE,
+        "--size",
+        "-s",
+        min=1,
+        help="Longest edge of the thumbnails in pixels",
+    ),
+    only: Optional[List[str]] = typer.Option(
+        None,
+        "--only",
+        help="Only this wallpaper (repeatable)",
+    ),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Only wallpapers whose names match this glob pattern",
+    ),
+    cache_size: Optional[int] = typer.Option(
+        None,
+        "--cache-size",
+        min=0,
+        help="Thumbnail cache budget in MiB (default: 256)",
+    ),
+    print_paths: bool = typer.Option(
+        False,
+        "--print-paths",
+        help="Print 'name<TAB>thumbnail path' lines instead of a summary",
+    ),
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """Build cached previews of wallpapers for selector UIs."""
+    service = get_service(workers=workers)
+    try:
+        result = service.make_thumbnails(
+            size,
+            names=only,
+            pattern=pattern,
+            max_cache_bytes=None if cache_size is None else cache_size * 1024 * 1024,
+        )
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if print_paths:
+        for name, path in result.paths.items():
+            typer.echo(f"{name}\t{path}")
+    else:
+        typer.echo(
+            f"Thumbnails for {len(result.paths)} wallpaper(s): "
+            f"{result.generated} generated, {result.cached} cached"
+        )
+    if result.failed:
+        for name in result.failed:
+            typer.echo(f"  cannot decode {name}", err=True)
+        raise typer.Exit(1)
+
+
+@wallpapers_app.command("find-duplicates")
+def find_duplicates(
+    threshold: int = threshold_option(),
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """List groups of wallpapers that show the same picture.
+
+    Finds identical files and copies at other resolutions or re-encoded
+    ones, by comparing perceptual hashes stored in the index.
+    """
+    service = get_service(workers=workers)
+    try:
+        groups = service.find_duplicates(threshold)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if not groups:
+        typer.echo("No near-duplicates found")
+        return
+    typer.echo(f"Near-duplicate groups ({len(groups)}):")
+    for group in groups:
+        typer.echo(f"  - {', '.join(group)}")
+
+
+@wallpapers_app.command("palettes")
+def make_palettes(
+    only: Optional[List[str]] = typer.Option(
+        None,
+        "--only",
+        help="Only this wallpaper (repeatable)",
+    ),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Only wallpapers whose names match this glob pattern",
+    ),
+    print_colors: bool = typer.Option(
+        False,
+        "--print-colors",
+        help="Print 'name<TAB>colours' lines instead of a summary",
+    ),
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """Precompute dominant colour palettes and store them in the index."""
+    service = get_service(workers=workers)
+    try:
+        result = service.make_palettes(names=only, pattern=pattern)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if print_colors:
+        for name, colors in result.palettes.items():
+            typer.echo(f"{name}\t{' '.join(colors)}")
+    else:
+        typer.echo(
+            f"Palettes for {len(result.palettes)} wallpaper(s): "
+            f"{result.computed} computed, {result.stored} stored"
+        )
+    if result.failed:
+        for name in result.failed:
+            typer.echo(f"  cannot decode {name}", err=True)
+        raise typer.Exit(1)
+
+
+@wallpapers_app.command("remove")
+def remove_wallpapers(
+    names: Optional[List[str]] = typer.Argument(
+        None, help="Names of the wallpapers to remove"
+    ),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Remove wallpapers whose names match this glob pattern",
+    ),
+) -> None:
+    """Remove wallpapers from the archive.
+
+    The data stays in the archive until 'compact' is run.
+    """
+    if not names and pattern is None:
+        typer.echo("Error: Specify wallpaper names or --glob", err=True)
+        raise typer.Exit(1)
+    service = get_service()
+    try:
+        removed = service.remove_wallpapers(names=names or None, pattern=pattern)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    for name in removed:
+        typer.echo(f"  - {name}")
+    typer.echo(f"Removed {len(removed)} wallpaper(s)")
+
+
+@wallpapers_app.command("rename")
+def rename_wallpaper(
+    old: str = typer.Argument(..., help="Current wallpaper name"),
+    new: str = typer.Argument(..., help="New wallpaper name"),
+    force: bool = typer.Option(
+        False, "--force", "-f", help="Overwrite a wallpaper with the new name"
+    ),
+) -> None:
+    """Rename a wallpaper without rewriting its data."""
+    service = get_service()
+    try:
+        service.rename_wallpaper(old, new, overwrite=force)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"Renamed {old} to {new}")
+
+
+@wallpapers_app.command("compact")
+def compact_archive(
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Only report how much space compaction would free",
+    ),
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """Rewrite the archive without removed or replaced wallpapers."""
+    service = get_service(workers=workers)
+    try:
+        result = service.compact_archive(dry_run=dry_run)
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    if result.dry_run:
+        typer.echo(
+            f"Compaction would free {result.freed} bytes "
+            f"({result.old_size} -> {result.new_size} bytes)"
+        )
+    else:
+        typer.echo(
+            f"Compacted archive, freed {result.freed} bytes "
+            f"({result.old_size} -> {result.new_size} bytes)"
+        )
+
+
+@wallpapers_app.command("verify")
+def verify_archive(
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """Check every wallpaper in the archive against the stored index."""
+    service = get_service(workers=workers)
+    try:
+        result = service.verify_archive()
+    except WallpaperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
+    if result.ok:
+        typer.echo(f"Verified {result.checked} wallpaper(s): OK")
+        return
+    typer.echo(
+        f"Verified {result.checked} wallpaper(s): "
+        f"{len(result.problems)} problem(s)",
+        err=True,
+    )
+    for problem in result.problems:
+        typer.echo(f"  {problem}", err=True)
+    raise typer.Exit(1)
+
+
+@wallpapers_app.command("convert")
+def convert_archive(
+    codec: str = typer.Argument(
+        ...,
+        help=f"Target compression codec ({', '.join(codec_names())})",
+    ),
+    workers: Optional[int] = workers_option(),
+) -> None:
+    """Rewrite the archive with another compression codec.
+
+    'store' keeps images uncompressed, which is fastest for formats that
+    are already compressed (JPEG, PNG, WebP).
+    """
+    service = get_service(workers=workers)
+    try:
+        result = service.convert_archive(codec)
+    except WallpaperError as e:
         typer.echo(f"Error: {e}", err=True)
         raise typer.Exit(1)
+    typer.echo(
+        f"Converted archive from {result.old_codec} to {result.new_codec} "
+        f"({result.old_size} -> {result.new_size} bytes)"
+    )
@@ -1,5 +1,6 @@
 # src/commands/packages/__init__.py
 """Packages command group."""
+import json
 import sys
 from typing import List, Optional
 
@@ -11,6 +12,7 @@ from src.services.packages_service import (
     PlaybookNotFoundError,
     AnsibleNotFoundError,
     AnsibleError,
+    RoleNotFoundError,
 )
 
 packages_app = typer.Typer(help="Manage system packages")
@@ -25,6 +27,17 @@ def get_service() -> PackagesService:
 def install(
     ctx: typer.Context,
     tags: Optional[List[str]] = typer.Option(None, "--tags", help="Ansible tags to run"),
+    jobs: int = typer.Option(
+        1, "--jobs", "-j", help="Run up to this many roles at once, one ansible-playbook each"
+    ),
+    native: bool = typer.Option(
+        False,
+        "--native",
+        help="Run simple roles in-process, without ansible-playbook (can't be combined with --jobs)",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Also run roles whose inputs are unchanged since their last run"
+    ),
 ):
     """
     Install packages using Ansible playbook.
@@ -33,10 +46,31 @@ def install(
     """
     service = get_service()
 
+    if native and jobs != 1:
+        typer.echo("Error: --native can't be combined with --jobs", err=True)
+        sys.exit(1)
+    if jobs != 1:
+        _install_parallel(service, tags or [], ctx.args or [], jobs, force)
+        return
+
     try:
+        if native:
+            result = service.install(
+                tags=tags,
+                extra_args=ctx.args if ctx.args else None,
+                native=True,
+                output=typer.echo,
+                force=force,
+            )
+            sys.exit(result.returncode)
         typer.echo(f"Running: ansible-playbook {' '.join([f'--tags {t}' for t in (tags or [])])} {' '.join(ctx.args or [])}")
         typer.echo(f"Working directory: {service.ansible_dir}")
-        result = service.install(tags=tags, extra_args=ctx.args if ctx.args else None)
+        result = service.install(
+            tags=tags,
+            extra_args=ctx.args if ctx.args else None,
+            output=typer.echo,
+            force=force,
+        )
         sys.exit(result.returncode)
     except AnsibleNotFoundError as e:
         typer.echo(f"Error: {e}", err=True)
@@ -49,6 +83,38 @@ def install(
         sys.exit(1)
 
 
+def _install_parallel(
+    service: PackagesService,
+    tags: List[str],
+    extra_args: List[str],
+    jobs: int,
+    force: bool,
+) -> None:
+    """Run an install as parallel per-role runs and print a summary."""
+    try:
+        typer.echo(f"Working directory: {service.ansible_dir}")
+        result = service.install_parallel(
+            tags, extra_args, jobs, output=typer.echo, force=force
+        )
+    except AnsibleNotFoundError as e:
+        typer.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    except PackagesError as e:
+        typer.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+    typer.echo("\nSummary:")
+    width = max((len(job.name) for job in result.jobs), default=0)
+    for job in result.jobs:
+        line = f"  {job.status:<8} {job.name:<{width}}"
+        if job.status != "skipped":
+            line += f"  {job.duration:.1f}s"
+        if job.reason:
+            line += f"  ({job.reason})"
+        typer.echo(line)
+    sys.exit(result.returncode)
+
+
 @packages_app.command("list")
 def list_packages():
     """
@@ -77,3 +143,61 @@ def list_packages():
     except PackagesError as e:
         typer.echo(f"Error: {e}", err=True)
         sys.exit(1)
+
+
+@packages_app.command("info")
+def info(
+    role: str = typer.Argument(..., help="Role name"),
+    distro: Optional[str] = typer.Option(
+        None, "--distro", "-d", help="Only show packages for this distribution (e.g. Archlinux)"
+    ),
+):
+    """
+    Show what a role installs and configures, read from the roles tree.
+    """
+    service = get_service()
+
+    try:
+        role_info = service.role_info(role)
+    except RoleNotFoundError as e:
+        typer.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    except PackagesError as e:
+        typer.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+    typer.echo(f"\n{role_info.name}  ({role_info.path})\n")
+
+    packages = role_info.packages
+    if distro is not None:
+        packages = {
+            key: names for key, names in packages.items() if key in (distro, "*")
+        }
+    typer.echo("Packages:")
+    if not packages:
+        suffix = f" for {distro}" if distro is not None else ""
+        typer.echo(f"  (none{suffix})")
+    for key, names in packages.items():
+        label = "all" if key == "*" else key
+        typer.echo(f"  {label + ':':<12} {', '.join(names)}")
+
+    sections = [
+        ("Tasks", [f"{task.name or '(unnamed)'} [{task.module}]" for task in role_info.tasks]),
+        ("Templates", role_info.templates),
+        ("Sources", role_info.sources),
+        ("Defaults", [f"{key} = {_format_value(value)}" for key, value in role_info.defaults.items()]),
+        ("Vars", list(role_info.variables)),
+        ("Files", role_info.files),
+    ]
+    for title, lines in sections:
+        if lines:
+            typer.echo(f"\n{title}:")
+            for line in lines:
+                typer.echo(f"  • {line}")
+
+
+def _format_value(value) -> str:
+    """Render a role variable on one line."""
+    if isinstance(value, str) and value:
+        return value
+    return json.dumps(value)
@@ -0,0 +1,183 @@
+# src/services/image_probe.py
+"""Header-only image prober.
+
+Identifies PNG, JPEG, GIF, BMP, WebP and TIFF images and reads their
+dimensions from the first few hundred bytes, without decoding any pixels.
+JPEG and TIFF store their dimensions after variable-length data, which is
+skipped with ``seek`` rather than read.
+"""
+import io
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional
+
+# Enough for every fixed-layout header below
+HEADER_SIZE = 32
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...)
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# JPEG markers without a length field
+_JPEG_STANDALONE = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    """Format and pixel dimensions of an image."""
+
+    format: str
+    width: int
+    height: int
+
+
+def probe_image(stream: BinaryIO) -> Optional[ImageInfo]:
+    """Identify an image and read its dimensions from its header.
+
+    Args:
+        stream: Seekable binary stream positioned at the start of the image
+
+    Returns:
+        ImageInfo, or None if the data isn't a recognised image
+    """
+    start = stream.tell()
+    head = stream.read(HEADER_SIZE)
+    for magic, parser in _PARSERS.items():
+        if head.startswith(magic):
+            stream.seek(start)
+            try:
+                return parser(stream, head)
+            except (struct.error, ValueError, OSError):
+                return None
+    return None
+
+
+def probe_bytes(data: bytes) -> Optional[ImageInfo]:
+    """Probe an image from the leading bytes of its content."""
+    return probe_image(io.BytesIO(data))
+
+
+def probe_file(path: Path) -> Optional[ImageInfo]:
+    """Probe an image file on disk.
+
+    Returns:
+        ImageInfo, or None if the file isn't a recognised image
+    """
+    with open(path, "rb") as f:
+        return probe_image(f)
+
+
+def _checked(format: str, width: int, height: int) -> Optional[ImageInfo]:
+    """Return ImageInfo unless the dimensions are implausible."""
+    if width <= 0 or height <= 0:
+        return None
+    return ImageInfo(format, width, height)
+
+
+def _png(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    if head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return _checked("png", width, height)
+
+
+def _gif(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    width, height = struct.unpack("<HH", head[6:10])
+    return _checked("gif", width, height)
+
+
+def _bmp(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    (header_size,) = struct.unpack("<I", head[14:18])
+    if header_size == 12:
+        # OS/2 BITMAPCOREHEADER
+        width, height = struct.unpack("<HH", head[18:22])
+    else:
+        # Negative height marks a top-down bitmap
+        width, height = struct.unpack("<ii", head[18:26])
+    return _checked("bmp", width, abs(height))
+
+
+def _webp(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    if head[8:12] != b"WEBP":
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        # Lossy: 3-byte frame tag, start code, then 14-bit dimensions
+        if head[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", head[26:30])
+        return _checked("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        # Lossless: signature byte, then 14-bit width-1 and height-1
+        if head[20] != 0x2F:
+            return None
+        (bits,) = struct.unpack("<I", head[21:25])
+        return _checked("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        # Extended: 24-bit canvas width-1 and height-1
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return _checked("webp", width, height)
+    return None
+
+
+def _jpeg(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    stream.seek(2, io.SEEK_CUR)
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        # Skip fill bytes
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _JPEG_STANDALONE or code == 0x00:
+            continue
+        if code == 0xDA:
+            # Start of scan: no frame header before the image data
+            return None
+        (length,) = struct.unpack(">H", stream.read(2))
+        if code in _JPEG_SOF:
+            _precision, height, width = struct.unpack(">BHH", stream.read(5))
+            return _checked("jpeg", width, height)
+        stream.seek(length - 2, io.SEEK_CUR)
+
+
+def _tiff(stream: BinaryIO, head: bytes) -> Optional[ImageInfo]:
+    start = stream.tell()
+    order = "<" if head[:2] == b"II" else ">"
+    (ifd_offset,) = struct.unpack(order + "I", head[4:8])
+    stream.seek(start + ifd_offset)
+    (count,) = struct.unpack(order + "H", stream.read(2))
+    dimensions: Dict[int, int] = {}
+    for _ in range(count):
+        entry = stream.read(12)
+        tag, field_type = struct.unpack(order + "HH", entry[:4])
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:
+            (value,) = struct.unpack(order + "H", entry[8:10])
+        elif field_type == 4:
+            (value,) = struct.unpack(order + "I", entry[8:12])
+        else:
+            return None
+        dimensions[tag] = value
+        if len(dimensions) == 2:
+            return _checked("tiff", dimensions[256], dimensions[257])
+    return None
+
+
+_PARSERS: Dict[bytes, Callable[[BinaryIO, bytes], Optional[ImageInfo]]] = {
+    b"\x89PNG\r\n\x1a\n": _png,
+    b"\xff\xd8": _jpeg,
+    b"GIF87a": _gif,
+    b"GIF89a": _gif,
+    b"BM": _bmp,
+    b"RIFF": _webp,
+    b"II*\x00": _tiff,
+    b"MM\x00*": _tiff,
+}
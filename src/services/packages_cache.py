@@ -0,0 +1,139 @@
+# src/services/packages_cache.py
+"""Persistent cache of values parsed from Ansible YAML files.
+
+Parsing a playbook with PyYAML costs far more than the rest of a
+``packages list``, and shell completion runs that constantly. Parsed
+results are therefore stored as JSON under the XDG cache directory, each
+with the path, size and mtime of every file it was parsed from (a
+playbook and the playbooks it imports). An entry is used as long as all
+of those files are unchanged, so a warm lookup is a few ``stat`` calls
+and one JSON read.
+
+YAML is parsed with libyaml's ``CSafeLoader`` when PyYAML was built with
+it, and the pure-Python ``SafeLoader`` otherwise.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, List, Optional, TextIO, Tuple
+
+import yaml
+
+CACHE_VERSION = 2
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def default_cache_dir() -> Path:
+    """Return the packages cache directory below the XDG cache home."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "dotfiles-config" / "packages"
+
+
+def load_yaml(stream: TextIO) -> Any:
+    """Parse a YAML document with the fastest safe loader available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def file_stamp(path: Path) -> Optional[Tuple[str, int, int]]:
+    """Return ``(path, size, mtime_ns)`` of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class ParseCache:
+    """JSON file mapping keys to parsed values and the files behind them."""
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the cache.
+
+        Args:
+            path: Cache file (created on the first ``put``)
+        """
+        self.path = path
+
+    def _read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        entries = data.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored under ``key`` if its files are unchanged."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the values of those ``keys`` whose files are unchanged."""
+        entries = self._read()
+        values = {}
+        for key in keys:
+            entry = entries.get(key)
+            if isinstance(entry, dict) and self._is_fresh(entry):
+                values[key] = entry["value"]
+        return values
+
+    @staticmethod
+    def _is_fresh(entry: dict) -> bool:
+        try:
+            for path, size, mtime_ns in entry["files"]:
+                if file_stamp(Path(path)) != (path, size, mtime_ns):
+                    return False
+            return "value" in entry
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def put(self, key: str, files: Iterable[Path], value: Any) -> None:
+        """Store a value with the current stamps of the files it came from.
+
+        Other entries are kept. Failures to write are ignored: the cache
+        can always be rebuilt.
+
+        Args:
+            key: Entry key
+            files: Files the value was parsed from
+            value: JSON-serializable value
+        """
+        self.put_many([(key, files, value)])
+
+    def put_many(
+        self,
+        items: Iterable[Tuple[str, Iterable[Path], Any]],
+        keep: Optional[Collection[str]] = None,
+    ) -> None:
+        """Store several ``(key, files, value)`` entries in one write.
+
+        Args:
+            items: Entries to store (see ``put``)
+            keep: Keys of existing entries to keep (default: all); other
+                entries are dropped
+        """
+        entries = self._read()
+        if keep is not None:
+            entries = {key: entries[key] for key in keep if key in entries}
+        for key, files, value in items:
+            stamps: List[Tuple[str, int, int]] = []
+            for path in files:
+                stamp = file_stamp(path)
+                if stamp is None:
+                    break
+                stamps.append(stamp)
+            else:
+                entries[key] = {"files": stamps, "value": value}
+        data = {"version": CACHE_VERSION, "entries": entries}
+        tmp_path = self.path.with_name(
+            f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
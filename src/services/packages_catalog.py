@@ -0,0 +1,287 @@
+# src/services/packages_catalog.py
+"""Catalog of the Ansible roles found on the roles path.
+
+Each role directory is read into a ``RoleInfo``: the packages it installs
+per distribution, its defaults and vars, its tasks and the templates and
+files those tasks use, and the roles it depends on (``meta/main.yml``).
+Package lists are found by following the ``name`` of ``package`` tasks to
+the variable it looks up, e.g.
+``{{ zsh_packages_map.get(ansible_facts['distribution'], []) }}``.
+
+Scanning is incremental: a role is only parsed again when one of its
+files or directories changed (directory mtimes catch added and removed
+files). Parsing is CPU-bound and holds the GIL, and a role takes a few
+milliseconds, so changed roles are parsed one after another.
+"""
+import configparser
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from src.services.packages_cache import ParseCache, load_yaml
+
+# Task keywords that are not the module being called
+TASK_KEYWORDS = frozenset(
+    [
+        "name", "action", "args", "async", "become", "become_user",
+        "become_method", "become_flags", "changed_when", "check_mode",
+        "collections", "connection", "debugger", "delay", "delegate_facts",
+        "delegate_to", "diff", "environment", "failed_when", "ignore_errors",
+        "ignore_unreachable", "listen", "local_action", "loop",
+        "loop_control", "module_defaults", "no_log", "notify", "poll",
+        "register", "retries", "run_once", "tags", "throttle", "timeout",
+        "until", "vars", "when", "any_errors_fatal",
+    ]
+)
+
+MODULE_PREFIXES = ("ansible.builtin.", "ansible.legacy.")
+
+# "{{ some_map.get(...) }}" or "{{ some_map[...] }}": the variable looked up
+_LOOKUP = re.compile(r"^\{\{\s*([A-Za-z_]\w*)\s*(?:\.get\s*\(|\[)")
+
+
+@dataclass
+class RoleTask:
+    """One task of a role."""
+
+    name: str
+    module: str
+
+
+@dataclass
+class RoleInfo:
+    """What a role does, as read from its directory."""
+
+    name: str
+    path: str
+    packages: Dict[str, List[str]] = field(default_factory=dict)
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    variables: Dict[str, Any] = field(default_factory=dict)
+    tasks: List[RoleTask] = field(default_factory=list)
+    templates: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    dependencies: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RoleInfo":
+        """Rebuild a record from ``asdict`` output."""
+        data = dict(data)
+        data["tasks"] = [RoleTask(**task) for task in data.get("tasks", [])]
+        return cls(**data)
+
+
+def roles_paths(ansible_dir: Path, playbook_dir: Path) -> List[Path]:
+    """Return the directories Ansible searches for roles, in order.
+
+    ``ANSIBLE_ROLES_PATH`` wins over ``roles_path`` in ``ansible.cfg``;
+    relative entries are relative to ``ansible_dir``. Without either,
+    the ``roles`` directory next to the playbook is used.
+    """
+    value = os.environ.get("ANSIBLE_ROLES_PATH")
+    if not value:
+        parser = configparser.ConfigParser(interpolation=None)
+        try:
+            parser.read(ansible_dir / "ansible.cfg")
+        except configparser.Error:
+            pass
+        value = parser.get("defaults", "roles_path", fallback="")
+    paths = [
+        ansible_dir / Path(entry).expanduser()
+        for entry in value.split(os.pathsep)
+        if entry.strip()
+    ]
+    return paths or [playbook_dir / "roles"]
+
+
+def find_roles(paths: List[Path]) -> Dict[str, Path]:
+    """Map role names to directories; the first path holding a name wins."""
+    roles: Dict[str, Path] = {}
+    for root in paths:
+        try:
+            entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir() and not entry.name.startswith("."):
+                roles.setdefault(entry.name, Path(os.path.normpath(entry.path)))
+    return roles
+
+
+def role_files(role_dir: Path) -> Tuple[List[Path], List[Path]]:
+    """List a role's directories and files (hidden ones are skipped)."""
+    dirs: List[Path] = []
+    files: List[Path] = []
+    for root, dirnames, filenames in os.walk(role_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        dirs.append(Path(root))
+        files.extend(
+            Path(root) / name for name in sorted(filenames) if not name.startswith(".")
+        )
+    return dirs, files
+
+
+def scan_role(name: str, role_dir: Path) -> Tuple[RoleInfo, List[Path]]:
+    """Read one role directory.
+
+    Returns:
+        The role record and every path it depends on (files and
+        directories)
+    """
+    dirs, files = role_files(role_dir)
+    defaults = _load_vars(role_dir / "defaults")
+    variables = _load_vars(role_dir / "vars")
+    info = RoleInfo(
+        name=name,
+        path=str(role_dir),
+        defaults=defaults,
+        variables=variables,
+        files=[str(path.relative_to(role_dir)) for path in files],
+    )
+    known = {**defaults, **variables}
+    meta = _load_vars(role_dir / "meta")
+    for dependency in meta.get("dependencies") or []:
+        if isinstance(dependency, dict):
+            dependency = dependency.get("role", dependency.get("name"))
+        if isinstance(dependency, str) and "{{" not in dependency:
+            info.dependencies.append(dependency)
+    for task in iter_tasks(role_dir / "tasks", "main.yml"):
+        module, args = task_module(task)
+        info.tasks.append(RoleTask(name=str(task.get("name", "")), module=module))
+        if not isinstance(args, dict):
+            continue
+        if module == "package":
+            _add_packages(info.packages, args.get("name"), known)
+        elif module == "template" and "src" in args:
+            info.templates.append(str(args["src"]))
+        elif module == "copy" and "src" in args:
+            info.sources.append(str(args["src"]))
+    return info, dirs + files
+
+
+def iter_tasks(tasks_dir: Path, filename: str) -> Iterator[Dict[str, Any]]:
+    """Yield the tasks of a task file, inlining blocks and static includes."""
+    data = _load_yaml_file(tasks_dir / filename)
+    yield from _flatten(tasks_dir, data if isinstance(data, list) else [], set())
+
+
+def _flatten(
+    tasks_dir: Path, tasks: List[Any], seen: set
+) -> Iterator[Dict[str, Any]]:
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        if "block" in task:
+            for section in ("block", "rescue", "always"):
+                yield from _flatten(tasks_dir, task.get(section) or [], seen)
+            continue
+        module, args = task_module(task)
+        target = args if isinstance(args, str) else None
+        if isinstance(args, dict):
+            target = args.get("file")
+        if module in ("include_tasks", "import_tasks") and isinstance(target, str):
+            if "{{" not in target and target not in seen:
+                seen.add(target)
+                data = _load_yaml_file(tasks_dir / target)
+                yield from _flatten(tasks_dir, data if isinstance(data, list) else [], seen)
+                continue
+        yield task
+
+
+def task_module(task: Dict[str, Any]) -> Tuple[str, Any]:
+    """Return a task's module (without ``ansible.builtin.``) and arguments."""
+    for key, value in task.items():
+        if key in TASK_KEYWORDS or key.startswith("with_"):
+            continue
+        for prefix in MODULE_PREFIXES:
+            if key.startswith(prefix):
+                key = key[len(prefix) :]
+                break
+        return key, value
+    return "", None
+
+
+def _add_packages(
+    packages: Dict[str, List[str]], spec: Any, known: Dict[str, Any]
+) -> None:
+    """Add a package task's names, per distribution, to ``packages``.
+
+    Literal names apply to every distribution (key ``"*"``); a lookup in
+    a per-distribution map contributes the map's entries.
+    """
+    if isinstance(spec, str):
+        match = _LOOKUP.match(spec)
+        if match:
+            table = known.get(match.group(1))
+            if isinstance(table, dict):
+                for distro, names in table.items():
+                    _extend(packages.setdefault(str(distro), []), names)
+            return
+        if "{{" in spec:
+            return
+        spec = [spec]
+    if isinstance(spec, list):
+        _extend(packages.setdefault("*", []), [n for n in spec if "{{" not in str(n)])
+
+
+def _extend(target: List[str], names: Any) -> None:
+    if isinstance(names, str):
+        names = [names]
+    for name in names or []:
+        if str(name) not in target:
+            target.append(str(name))
+
+
+def _load_vars(directory: Path) -> Dict[str, Any]:
+    data = _load_yaml_file(directory / "main.yml")
+    if data is None:
+        data = _load_yaml_file(directory / "main.yaml")
+    return data if isinstance(data, dict) else {}
+
+
+def _load_yaml_file(path: Path) -> Any:
+    try:
+        with open(path, "r") as f:
+            return load_yaml(f)
+    except OSError:
+        return None
+
+
+def build_catalog(
+    roles: Dict[str, Path],
+    cache: ParseCache,
+    prune: bool = True,
+) -> Dict[str, RoleInfo]:
+    """Return records for ``roles``, reusing cached ones that are still fresh.
+
+    Args:
+        roles: Role names and directories (see ``find_roles``)
+        cache: Cache of role records keyed by directory
+        prune: Drop cached roles other than ``roles`` (when ``roles`` is
+            the whole roles path)
+    """
+    keys = {name: os.path.abspath(path) for name, path in roles.items()}
+    cached = cache.get_many(keys.values())
+    catalog: Dict[str, RoleInfo] = {}
+    stale = []
+    for name, path in roles.items():
+        value = cached.get(keys[name])
+        if value is not None and value.get("name") == name:
+            catalog[name] = RoleInfo.from_dict(value)
+        else:
+            stale.append(name)
+
+    if stale:
+        scanned = [scan_role(name, roles[name]) for name in stale]
+        for name, (info, _) in zip(stale, scanned):
+            catalog[name] = info
+        cache.put_many(
+            [
+                (keys[info.name], paths, asdict(info))
+                for info, paths in scanned
+            ],
+            keep=keys.values() if prune else None,
+        )
+    return {name: catalog[name] for name in roles}
@@ -0,0 +1,150 @@
+# src/services/packages_inputs.py
+"""Content hashes of what a role's run depends on.
+
+A role's inputs are the files of its directory, the playbook, the
+group_vars files, the config files its ``copy`` and ``template`` tasks
+read, the extra vars, and its templated task arguments (which also
+capture facts such as the distribution and home directory). After a
+successful run their hash is stored with a digest of every file the role
+writes; a later run can skip the role while the inputs hash the same,
+the written files still match and (if asked to check) its packages are
+still installed.
+
+The native executor's planner resolves the templated paths, so only
+roles it can plan are tracked; the others always run.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.services.packages_catalog import role_files
+from src.services.packages_native import (
+    NativePlan,
+    NativeStep,
+    TaskFailed,
+    missing_packages,
+    step_targets,
+)
+
+
+@dataclass
+class RoleInputs:
+    """Hashed inputs of one role, and what it writes."""
+
+    role: str
+    files: Dict[str, str] = field(default_factory=dict)
+    values: str = ""
+    targets: List[str] = field(default_factory=list)
+    packages: List[NativeStep] = field(default_factory=list)
+
+    @property
+    def digest(self) -> str:
+        """Hash over the input files and values."""
+        digest = hashlib.sha256()
+        for path in sorted(self.files):
+            digest.update(f"{path}\0{self.files[path]}\n".encode())
+        digest.update(self.values.encode())
+        return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's content, or ``missing``."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return "missing"
+    return digest.hexdigest()
+
+
+def target_digest(path: Path) -> str:
+    """Digest of a written path: content and mode, ``dir`` or ``missing``."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    mode = f"{stat.st_mode & 0o7777:o}"
+    if os.path.isdir(path):
+        return f"dir:{mode}"
+    return f"{file_digest(path)}:{mode}"
+
+
+def role_inputs(plan: NativePlan, playbook_path: Path) -> Dict[str, RoleInputs]:
+    """Hash the inputs of every role in a (partial) native plan."""
+    shared = [Path(os.path.normpath(playbook_path))] + [Path(p) for p in plan.vars_files]
+    inputs: Dict[str, RoleInputs] = {}
+    for role in plan.roles:
+        steps = [step for step in plan.steps if step.role == role]
+        paths = list(shared) + role_files(Path(plan.role_paths[role]))[1]
+        for step in steps:
+            if step.module in ("copy", "template") and "src" in step.args:
+                source = Path(str(step.args["src"]).rstrip("/") or "/")
+                if source.is_dir():
+                    paths.extend(role_files(source)[1])
+                else:
+                    paths.append(source)
+        values = json.dumps(
+            {
+                "extra_vars": plan.extra_vars,
+                "steps": [[s.module, s.args, s.become] for s in steps],
+            },
+            sort_keys=True,
+            default=str,
+        )
+        inputs[role] = RoleInputs(
+            role=role,
+            files={str(path): file_digest(path) for path in paths},
+            values=hashlib.sha256(values.encode()).hexdigest(),
+            targets=sorted({str(t) for step in steps for t in step_targets(step)}),
+            packages=[step for step in steps if step.module == "package"],
+        )
+    return inputs
+
+
+def input_record(inputs: RoleInputs) -> Dict[str, Any]:
+    """State entry for a role that just ran successfully."""
+    return {
+        "digest": inputs.digest,
+        "files": inputs.files,
+        "values": inputs.values,
+        "targets": {path: target_digest(Path(path)) for path in inputs.targets},
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def change_reason(
+    inputs: RoleInputs, record: Any, check_packages: bool = True
+) -> Optional[str]:
+    """Why a role has to run again, or None if nothing it depends on changed.
+
+    With ``check_packages``, packages the role installs that were removed
+    since count as a change; checking runs the package manager's query.
+    """
+    if not isinstance(record, dict):
+        return "no successful run recorded"
+    if record.get("digest") != inputs.digest:
+        previous = record.get("files") or {}
+        for path in sorted(set(previous) | set(inputs.files)):
+            if previous.get(path) != inputs.files.get(path):
+                return f"{path} changed"
+        return "variables changed"
+    targets = record.get("targets") or {}
+    for path in inputs.targets:
+        if targets.get(path) != target_digest(Path(path)):
+            return f"{path} changed since the last run"
+    if not check_packages:
+        return None
+    for step in inputs.packages:
+        try:
+            missing = missing_packages(step)
+        except TaskFailed as e:
+            return str(e)
+        if missing:
+            return f"{', '.join(missing)} not installed"
+    return None
@@ -0,0 +1,1023 @@
+# src/services/packages_native.py
+"""Run simple roles in-process instead of through ansible-playbook.
+
+Most roles only install distribution packages, create a directory and
+copy or render config files, but ansible-playbook spends seconds on
+interpreter startup, fact gathering and module shipping before the first
+task runs. ``NativeRunner`` understands that subset of Ansible
+(``package``, ``file``, ``copy``, ``template`` and ``set_fact``, with
+``when``, ``become``, ``tags``, ``vars`` and blocks) and applies it
+directly, with the distribution read from ``/etc/os-release``.
+
+A run is planned completely before anything changes: every task of the
+selected roles is templated (Jinja2, from the optional ``native`` extra)
+with Ansible's variable precedence, and anything outside the subset
+raises ``NotSupported`` so the caller can fall back to ansible-playbook
+with nothing half-applied.
+"""
+import functools
+import getpass
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.services.packages_cache import load_yaml
+from src.services.packages_catalog import (
+    TASK_KEYWORDS,
+    find_roles,
+    roles_paths,
+    task_module,
+)
+
+NATIVE_MODULES = frozenset(["package", "file", "copy", "template", "set_fact"])
+
+# Task and block keywords the runner understands
+NATIVE_KEYWORDS = frozenset(["name", "become", "when", "tags", "vars", "no_log"])
+
+# Arguments accepted per module (set_fact takes any variable names)
+MODULE_ARGS = {
+    "package": frozenset(["name", "state"]),
+    "file": frozenset(["path", "dest", "name", "state", "mode"]),
+    "copy": frozenset(["src", "content", "dest", "mode", "force", "backup", "follow"]),
+    "template": frozenset(["src", "dest", "mode", "force", "backup", "follow"]),
+}
+
+PLAY_KEYS = frozenset(
+    ["name", "hosts", "gather_facts", "become", "vars", "roles", "tags",
+     "pre_tasks", "tasks", "post_tasks", "connection"]
+)
+LOCAL_HOSTS = frozenset(["localhost", "127.0.0.1"])
+
+# Ansible's distribution names by os-release ID
+DISTRIBUTIONS = {
+    "arch": "Archlinux",
+    "archarm": "Archlinux",
+    "endeavouros": "EndeavourOS",
+    "manjaro": "ManjaroLinux",
+    "debian": "Debian",
+    "ubuntu": "Ubuntu",
+    "linuxmint": "Linux Mint",
+    "pop": "Pop!_OS",
+    "fedora": "Fedora",
+    "centos": "CentOS",
+    "rhel": "RedHat",
+    "rocky": "Rocky",
+    "almalinux": "AlmaLinux",
+    "opensuse-leap": "openSUSE Leap",
+    "opensuse-tumbleweed": "openSUSE Tumbleweed",
+    "alpine": "Alpine",
+}
+
+# os-release IDs (and ID_LIKE entries) to Ansible's os_family
+OS_FAMILIES = {
+    "arch": "Archlinux",
+    "debian": "Debian",
+    "ubuntu": "Debian",
+    "fedora": "RedHat",
+    "rhel": "RedHat",
+    "centos": "RedHat",
+    "suse": "Suse",
+    "opensuse": "Suse",
+    "alpine": "Alpine",
+}
+
+# Per os_family: command that succeeds if a package is installed, and
+# the install command
+PACKAGE_MANAGERS = {
+    "Archlinux": (["pacman", "-Q"], ["pacman", "-S", "--needed", "--noconfirm"]),
+    "Debian": (["dpkg-query", "-W", "-f=${db:Status-Abbrev}"], ["apt-get", "install", "-y"]),
+    "RedHat": (["rpm", "-q"], ["dnf", "install", "-y"]),
+    "Suse": (["rpm", "-q"], ["zypper", "--non-interactive", "install"]),
+    "Alpine": (["apk", "info", "-e"], ["apk", "add"]),
+}
+
+
+class NotSupported(Exception):
+    """Raised when a run needs something only ansible-playbook can do."""
+
+
+class TaskFailed(Exception):
+    """Raised when a natively run task fails."""
+
+
+@dataclass
+class NativeStep:
+    """One task of a role, with its arguments templated."""
+
+    role: str
+    name: str
+    module: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    become: bool = False
+
+
+@dataclass
+class NativeStepResult:
+    """Outcome of one step."""
+
+    role: str
+    name: str
+    module: str
+    changed: bool
+
+
+@dataclass
+class NativePlan:
+    """Steps of the selected roles, ready to apply."""
+
+    roles: List[str]
+    steps: List[NativeStep]
+    check: bool = False
+    extra_vars: Dict[str, Any] = field(default_factory=dict)
+    # Role directories, and the group_vars files the variables came from
+    role_paths: Dict[str, str] = field(default_factory=dict)
+    vars_files: List[str] = field(default_factory=list)
+    # Selected roles that can't run natively, with the reason (partial plans)
+    unsupported: Dict[str, str] = field(default_factory=dict)
+
+
+def jinja2_available() -> bool:
+    """Check whether Jinja2 is installed."""
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def detect_facts(os_release: Path = Path("/etc/os-release")) -> Dict[str, Any]:
+    """Gather the facts roles commonly use, without Ansible's setup module."""
+    release: Dict[str, str] = {}
+    try:
+        lines = os_release.read_text().splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep and not key.startswith("#"):
+            words = shlex.split(value, posix=True) if value.strip() else [""]
+            release[key.strip()] = words[0] if words else ""
+    distro_id = release.get("ID", "").lower()
+    distribution = DISTRIBUTIONS.get(
+        distro_id, release.get("NAME", platform.system())
+    )
+    family = distribution
+    for candidate in [distro_id] + release.get("ID_LIKE", "").lower().split():
+        if candidate in OS_FAMILIES:
+            family = OS_FAMILIES[candidate]
+            break
+    return {
+        "distribution": distribution,
+        "distribution_version": release.get("VERSION_ID", ""),
+        "distribution_release": release.get("VERSION_CODENAME", ""),
+        "os_family": family,
+        "system": platform.system(),
+        "architecture": platform.machine(),
+        "hostname": platform.node().split(".")[0],
+        "user_id": getpass.getuser(),
+        "user_dir": str(Path.home()),
+        "env": dict(os.environ),
+    }
+
+
+def parse_extra_args(args: List[str]) -> Tuple[Dict[str, Any], bool]:
+    """Read the ansible-playbook arguments a native run can honour.
+
+    Returns:
+        Extra vars (``-e``) and whether ``--check`` was given
+
+    Raises:
+        NotSupported: For any other argument
+    """
+    extra_vars: Dict[str, Any] = {}
+    check = False
+    items = iter(args)
+    for arg in items:
+        value = None
+        if arg in ("-e", "--extra-vars"):
+            value = next(items, None)
+            if value is None:
+                raise NotSupported(f"{arg} needs a value")
+        elif arg.startswith("--extra-vars="):
+            value = arg.split("=", 1)[1]
+        elif arg.startswith("-e") and len(arg) > 2:
+            value = arg[2:]
+        elif arg in ("-C", "--check"):
+            check = True
+            continue
+        elif arg == "--become-password-file":
+            # sudo asks for the password itself
+            next(items, None)
+            continue
+        elif arg.startswith("--become-password-file="):
+            continue
+        elif arg in ("-D", "--diff", "-K", "--ask-become-pass") or (
+            arg.startswith("-v") and set(arg[1:]) == {"v"}
+        ):
+            # Diffs and verbosity only change output; sudo asks for the
+            # password itself
+            continue
+        else:
+            raise NotSupported(f"argument {arg} isn't supported natively")
+        extra_vars.update(_extra_vars(value))
+    return extra_vars, check
+
+
+def _extra_vars(value: str) -> Dict[str, Any]:
+    if value.startswith("@"):
+        try:
+            with open(os.path.expanduser(value[1:]), "r") as f:
+                data = load_yaml(f)
+        except OSError as e:
+            raise NotSupported(f"can't read extra vars file: {e}") from e
+    elif value.lstrip().startswith("{"):
+        data = load_yaml(value)
+    else:
+        data = {}
+        for word in shlex.split(value):
+            key, sep, item = word.partition("=")
+            if not sep:
+                raise NotSupported(f"can't parse extra vars {value!r}")
+            data[key] = item
+    if not isinstance(data, dict):
+        raise NotSupported(f"extra vars {value!r} aren't a mapping")
+    return data
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return [value]
+
+
+def _selected(tags: List[str], requested: Set[str]) -> bool:
+    """Whether ``--tags`` selects an item with these (inherited) tags."""
+    return "always" in tags or bool(requested.intersection(tags))
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("yes", "on", "1", "true", "y")
+    return bool(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _environment(native: bool):
+    """Jinja2 environment with Ansible's template defaults."""
+    import jinja2
+    import jinja2.nativetypes
+
+    cls = jinja2.nativetypes.NativeEnvironment if native else jinja2.Environment
+    env = cls(
+        undefined=jinja2.StrictUndefined,
+        trim_blocks=True,
+        keep_trailing_newline=True,
+    )
+    env.filters.update(
+        {
+            "bool": _to_bool,
+            "basename": os.path.basename,
+            "dirname": os.path.dirname,
+            "expanduser": os.path.expanduser,
+            "quote": shlex.quote,
+            "to_json": json.dumps,
+        }
+    )
+    return env
+
+
+class _Variables:
+    """Variables of one task, templated on first use.
+
+    ``layers`` go from lowest to highest precedence; they are looked up,
+    not merged, so shared layers (like the facts that ``set_fact`` adds
+    to) stay live.
+    """
+
+    def __init__(self, layers: List[Dict[str, Any]]) -> None:
+        self.layers = layers
+        self._resolved: Dict[str, Any] = {}
+        self._resolving: Set[str] = set()
+
+    def has(self, name: str) -> bool:
+        return any(name in layer for layer in self.layers)
+
+    def resolve(self, name: str) -> Any:
+        if name in self._resolved:
+            return self._resolved[name]
+        if name in self._resolving:
+            raise NotSupported(f"variable '{name}' refers to itself")
+        raw = next(layer[name] for layer in reversed(self.layers) if name in layer)
+        self._resolving.add(name)
+        try:
+            value = self.render(raw)
+        finally:
+            self._resolving.discard(name)
+        self._resolved[name] = value
+        return value
+
+    def render(self, value: Any, native: bool = True) -> Any:
+        """Template strings inside ``value``."""
+        if isinstance(value, dict):
+            return {k: self.render(v, native) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.render(v, native) for v in value]
+        if isinstance(value, str) and ("{{" in value or "{%" in value):
+            return self._template(value, native)
+        return value
+
+    def condition(self, expression: Any) -> bool:
+        if not isinstance(expression, str):
+            return _to_bool(expression)
+        return _to_bool(self.render("{{ " + expression + " }}"))
+
+    def _template(self, source: str, native: bool) -> Any:
+        import jinja2
+        import jinja2.meta
+
+        env = _environment(native)
+        try:
+            names = jinja2.meta.find_undeclared_variables(env.parse(source))
+            context = {name: self.resolve(name) for name in names if self.has(name)}
+            value = env.from_string(source).render(context)
+            if isinstance(value, jinja2.Undefined):
+                # A lone expression renders to the undefined object itself
+                value._fail_with_undefined_error()
+            return value
+        except jinja2.TemplateError as e:
+            snippet = source if len(source) < 80 else source[:77] + "..."
+            raise NotSupported(f"can't template {snippet!r}: {e}") from e
+
+
+class NativeRunner:
+    """Plan and apply the selected roles of a playbook in-process."""
+
+    def __init__(
+        self,
+        playbook_path: Path,
+        ansible_dir: Path,
+        facts: Optional[Dict[str, Any]] = None,
+        output: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """Initialize the runner.
+
+        Args:
+            playbook_path: Playbook whose roles are run
+            ansible_dir: Directory holding ``ansible.cfg``
+            facts: Host facts (default: ``detect_facts()``)
+            output: Called with one line per step (default: print)
+        """
+        self.playbook_path = playbook_path
+        self.ansible_dir = ansible_dir
+        self.facts = facts
+        self.output = output or print
+
+    def plan(
+        self,
+        tags: List[str],
+        extra_args: Optional[List[str]] = None,
+        partial: bool = False,
+    ) -> NativePlan:
+        """Template every task the tags select, without changing anything.
+
+        Args:
+            tags: Requested tags
+            extra_args: ansible-playbook arguments (see ``parse_extra_args``)
+            partial: Leave roles that can't run natively out of the plan
+                (listed in ``unsupported``) instead of raising
+
+        Raises:
+            NotSupported: If any part of the run needs ansible-playbook
+        """
+        if not jinja2_available():
+            raise NotSupported("Jinja2 isn't installed (pip install 'dotfiles-config[native]')")
+        requested = {t for tag in tags for t in tag.split(",") if t}
+        if not requested:
+            raise NotSupported("no tags given")
+        special = requested & {"all", "tagged", "untagged"}
+        if special:
+            raise NotSupported(f"tag '{sorted(special)[0]}' isn't supported natively")
+        extra_vars, check = parse_extra_args(extra_args or [])
+        try:
+            with open(self.playbook_path, "r") as f:
+                plays = load_yaml(f)
+        except OSError as e:
+            raise NotSupported(f"can't read playbook: {e}") from e
+
+        facts = self.facts if self.facts is not None else detect_facts()
+        playbook_dir = self.playbook_path.resolve().parent
+        plan = NativePlan(roles=[], steps=[], check=check, extra_vars=extra_vars)
+        inventory_vars = self._inventory_vars(playbook_dir, plan.vars_files)
+        roles = find_roles(roles_paths(self.ansible_dir, self.playbook_path.parent))
+        host_facts: Dict[str, Any] = {}
+        for play in plays if isinstance(plays, list) else []:
+            if not isinstance(play, dict):
+                continue
+            unknown = set(play) - PLAY_KEYS
+            if unknown:
+                raise NotSupported(f"play keyword '{sorted(unknown)[0]}' isn't supported")
+            if str(play.get("hosts", "")) not in LOCAL_HOSTS:
+                raise NotSupported(f"play targets hosts '{play.get('hosts')}'")
+            play_tags = _as_list(play.get("tags"))
+            for section in ("pre_tasks", "tasks", "post_tasks"):
+                for task in play.get(section) or []:
+                    if isinstance(task, dict) and _selected(
+                        play_tags + _as_list(task.get("tags")), requested
+                    ):
+                        raise NotSupported(
+                            f"play task '{task.get('name', '')}' is selected"
+                        )
+            gathered = facts if play.get("gather_facts", True) is not False else {}
+            magic = {
+                "playbook_dir": str(playbook_dir),
+                "inventory_hostname": "localhost",
+                "ansible_check_mode": check,
+                "ansible_facts": gathered,
+                **{f"ansible_{key}": value for key, value in gathered.items()},
+            }
+            play_vars = play.get("vars") or {}
+            if not isinstance(play_vars, dict):
+                raise NotSupported("play vars aren't a mapping")
+            for entry in play.get("roles") or []:
+                if isinstance(entry, str):
+                    entry = {"role": entry}
+                if not isinstance(entry, dict):
+                    continue
+                name = entry.get("role", entry.get("name"))
+                role_tags = play_tags + _as_list(entry.get("tags"))
+                if not _selected(role_tags, requested):
+                    continue
+                try:
+                    unknown = set(entry) - {"role", "name", "tags", "vars"}
+                    if unknown:
+                        raise NotSupported(
+                            f"role '{name}' uses '{sorted(unknown)[0]}' in the playbook"
+                        )
+                    if name not in roles:
+                        raise NotSupported(f"role '{name}' isn't on the roles path")
+                    context = _RoleContext(
+                        name=name,
+                        path=roles[name],
+                        playbook_dir=playbook_dir,
+                        requested=requested,
+                        become=_to_bool(play.get("become", False)),
+                    )
+                    role_layers = self._role_layers(
+                        context, inventory_vars, play_vars, entry.get("vars") or {},
+                        magic, host_facts, extra_vars,
+                    )
+                    steps = self._plan_role(context, role_tags, role_layers)
+                except NotSupported as e:
+                    if not partial:
+                        raise
+                    plan.unsupported[str(name)] = str(e)
+                    continue
+                plan.roles.append(name)
+                plan.role_paths[name] = str(context.path)
+                plan.steps.extend(steps)
+        if not plan.roles and not partial:
+            raise NotSupported("the tags select no role")
+        return plan
+
+    def _inventory_vars(self, playbook_dir: Path, files: List[str]) -> Dict[str, Any]:
+        """group_vars/all of the inventory and the playbook directory.
+
+        The files read are appended to ``files``.
+        """
+        merged: Dict[str, Any] = {}
+        for directory in (self.ansible_dir / "inventory", playbook_dir):
+            group_vars = directory / "group_vars"
+            all_dir = group_vars / "all"
+            paths = [group_vars / "all.yml", group_vars / "all.yaml"]
+            if all_dir.is_dir():
+                paths.extend(sorted(all_dir.glob("*.y*ml")))
+            for path in paths:
+                data = _load_yaml_file(path)
+                if isinstance(data, dict):
+                    merged.update(data)
+                    files.append(os.path.normpath(path))
+        return merged
+
+    def _role_layers(
+        self,
+        context: "_RoleContext",
+        inventory_vars: Dict[str, Any],
+        play_vars: Dict[str, Any],
+        role_params: Dict[str, Any],
+        magic: Dict[str, Any],
+        host_facts: Dict[str, Any],
+        extra_vars: Dict[str, Any],
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Variable layers below and above task vars, in precedence order."""
+        meta = _load_vars(context.path / "meta")
+        if meta.get("dependencies"):
+            raise NotSupported(f"role '{context.name}' has dependencies")
+        role_magic = {
+            **magic,
+            "role_name": context.name,
+            "role_path": str(context.path),
+        }
+        below = [
+            _load_vars(context.path / "defaults"),
+            inventory_vars,
+            play_vars,
+            _load_vars(context.path / "vars"),
+        ]
+        above = [host_facts, role_params, role_magic, extra_vars]
+        return below, above
+
+    def _plan_role(
+        self,
+        context: "_RoleContext",
+        role_tags: List[str],
+        layers: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]],
+    ) -> List[NativeStep]:
+        below, above = layers
+        host_facts = above[0]
+        steps = []
+        tasks = _load_yaml_file(context.path / "tasks" / "main.yml")
+        for task, scope in _walk(
+            context.path / "tasks",
+            tasks if isinstance(tasks, list) else [],
+            _Scope(tags=role_tags, become=context.become),
+            set(),
+        ):
+            name = str(task.get("name", ""))
+            module, args = task_module(task)
+            if module not in NATIVE_MODULES:
+                raise NotSupported(
+                    f"role '{context.name}' uses the {module or 'unknown'} module"
+                )
+            unknown = _unsupported_keywords(task)
+            if unknown:
+                raise NotSupported(
+                    f"task '{name}' of role '{context.name}' uses '{unknown[0]}'"
+                )
+            tags = scope.tags + _as_list(task.get("tags"))
+            if not _selected(tags, context.requested):
+                continue
+            variables = _Variables(below + scope.vars + [task.get("vars") or {}] + above)
+            conditions = scope.when + _as_list(task.get("when"))
+            if not all(variables.condition(c) for c in conditions):
+                continue
+            if not isinstance(args, dict):
+                raise NotSupported(
+                    f"task '{name}' of role '{context.name}' uses free-form arguments"
+                )
+            if module in MODULE_ARGS:
+                unknown = set(args) - MODULE_ARGS[module]
+                if unknown:
+                    raise NotSupported(
+                        f"{module} option '{sorted(unknown)[0]}' of task '{name}' "
+                        "isn't supported natively"
+                    )
+            become = _to_bool(task.get("become", scope.become))
+            rendered = variables.render(args)
+            step = NativeStep(context.name, name, module, rendered, become)
+            if module == "set_fact":
+                if "cacheable" in rendered:
+                    raise NotSupported("set_fact with cacheable isn't supported")
+                host_facts.update(rendered)
+            elif module == "template":
+                step.args["content"] = self._render_template(context, rendered, variables)
+            elif module == "copy":
+                self._check_copy(context, step)
+            elif module == "package":
+                self._check_package(step, variables)
+            if module in ("file", "copy", "template"):
+                _check_mode(step)
+            if become and module in ("file", "copy", "template") and os.geteuid() != 0:
+                raise NotSupported(f"task '{name}' needs become for a file change")
+            steps.append(step)
+        return steps
+
+    def _render_template(
+        self, context: "_RoleContext", args: Dict[str, Any], variables: _Variables
+    ) -> str:
+        if "src" not in args or "dest" not in args:
+            raise NotSupported("template needs src and dest")
+        source = _find_source(context, str(args["src"]), "templates")
+        try:
+            text = source.read_text()
+        except (OSError, UnicodeDecodeError) as e:
+            raise NotSupported(f"can't read template {source}: {e}") from e
+        args["src"] = str(source)
+        return variables.render(text, native=False)
+
+    def _check_copy(self, context: "_RoleContext", step: NativeStep) -> None:
+        args = step.args
+        if "dest" not in args or ("src" in args) == ("content" in args):
+            raise NotSupported("copy needs dest and one of src or content")
+        if "src" in args:
+            src = str(args["src"])
+            found = _find_source(context, src, "files")
+            # A trailing slash copies a directory's contents
+            args["src"] = str(found) + ("/" if src.endswith("/") else "")
+
+    def _check_package(self, step: NativeStep, variables: _Variables) -> None:
+        if str(step.args.get("state", "present")) not in ("present", "installed"):
+            raise NotSupported(f"package state '{step.args.get('state')}' isn't supported")
+        family = variables.resolve("ansible_facts").get("os_family")
+        if family not in PACKAGE_MANAGERS:
+            raise NotSupported(f"no package manager known for os_family '{family}'")
+        step.args["name"] = [str(n) for n in _as_list(step.args.get("name"))]
+        step.args["os_family"] = family
+
+    def apply(self, plan: NativePlan) -> List[NativeStepResult]:
+        """Run the planned steps in order.
+
+        Raises:
+            TaskFailed: If a step fails; later steps don't run
+        """
+        results = []
+        for step in plan.steps:
+            try:
+                changed = _APPLY[step.module](step, plan.check)
+            except OSError as e:
+                raise TaskFailed(f"[{step.role}] {step.name or step.module}: {e}") from e
+            except TaskFailed as e:
+                raise TaskFailed(f"[{step.role}] {step.name or step.module}: {e}") from e
+            results.append(NativeStepResult(step.role, step.name, step.module, changed))
+            status = "changed" if changed else "ok"
+            self.output(f"{status + ':':<8} [{step.role}] {step.name or step.module}")
+        return results
+
+
+@dataclass
+class _RoleContext:
+    name: str
+    path: Path
+    playbook_dir: Path
+    requested: Set[str]
+    become: bool
+
+
+@dataclass
+class _Scope:
+    """What a task inherits from its blocks and includes."""
+
+    tags: List[str] = field(default_factory=list)
+    when: List[Any] = field(default_factory=list)
+    vars: List[Dict[str, Any]] = field(default_factory=list)
+    become: bool = False
+
+
+def _walk(
+    tasks_dir: Path, tasks: List[Any], scope: _Scope, seen: Set[str]
+) -> Iterator[Tuple[Dict[str, Any], _Scope]]:
+    """Yield tasks with the scope inherited from blocks and static includes."""
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        module, args = task_module(task)
+        nested = None
+        if "block" in task:
+            if "rescue" in task or "always" in task:
+                raise NotSupported("blocks with rescue or always aren't supported")
+            nested = task.get("block") or []
+        elif module in ("include_tasks", "import_tasks"):
+            target = args.get("file") if isinstance(args, dict) else args
+            if not isinstance(target, str) or "{{" in target or target in seen:
+                raise NotSupported(f"dynamic or recursive {module} isn't supported")
+            seen.add(target)
+            data = _load_yaml_file(tasks_dir / target)
+            nested = data if isinstance(data, list) else []
+        if nested is None:
+            yield task, scope
+            continue
+        unknown = _unsupported_keywords(task)
+        if unknown:
+            raise NotSupported(f"'{unknown[0]}' on a block isn't supported")
+        inner = _Scope(
+            tags=scope.tags + _as_list(task.get("tags")),
+            when=scope.when + _as_list(task.get("when")),
+            vars=scope.vars + [task.get("vars") or {}],
+            become=_to_bool(task.get("become", scope.become)),
+        )
+        yield from _walk(tasks_dir, nested, inner, seen)
+
+
+def _unsupported_keywords(task: Dict[str, Any]) -> List[str]:
+    """Task keywords (not the module) that the runner doesn't understand."""
+    return [
+        key for key in task
+        if key not in NATIVE_KEYWORDS
+        and (key in TASK_KEYWORDS or key.startswith("with_"))
+    ]
+
+
+def _find_source(context: _RoleContext, src: str, subdir: str) -> Path:
+    """Locate a copy/template ``src`` the way Ansible searches for it."""
+    path = Path(os.path.expanduser(src.rstrip("/") or "/"))
+    if path.is_absolute():
+        candidates = [path]
+    else:
+        candidates = [
+            context.path / subdir / path,
+            context.path / path,
+            context.playbook_dir / subdir / path,
+            context.playbook_dir / path,
+        ]
+    for candidate in candidates:
+        if candidate.exists():
+            return Path(os.path.normpath(candidate))
+    raise NotSupported(f"source '{src}' of role '{context.name}' not found")
+
+
+def _load_vars(directory: Path) -> Dict[str, Any]:
+    for name in ("main.yml", "main.yaml"):
+        data = _load_yaml_file(directory / name)
+        if data is not None:
+            return data if isinstance(data, dict) else {}
+    return {}
+
+
+def _load_yaml_file(path: Path) -> Any:
+    try:
+        with open(path, "r") as f:
+            return load_yaml(f)
+    except OSError:
+        return None
+
+
+def _mode(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value), 8)
+    except ValueError:
+        raise TaskFailed(f"mode {value!r} isn't an octal number") from None
+
+
+def _check_mode(step: NativeStep) -> None:
+    """Refuse modes ``_mode`` can't parse before anything is changed.
+
+    Ansible also accepts symbolic modes (``u=rw,g=r``), so these fall back
+    to it rather than fail.
+    """
+    value = step.args.get("mode")
+    if value is None or (value == "preserve" and step.module != "file"):
+        return
+    try:
+        _mode(value)
+    except TaskFailed as e:
+        raise NotSupported(f"{e} (task '{step.name}' of role '{step.role}')") from None
+
+
+def _chmod(path: Path, mode: Optional[int], check: bool) -> bool:
+    if mode is None or os.stat(path).st_mode & 0o7777 == mode:
+        return False
+    if not check:
+        os.chmod(path, mode)
+    return True
+
+
+def _put_file(
+    dest: Path,
+    data: bytes,
+    mode: Optional[int],
+    check: bool,
+    force: bool = True,
+    backup: bool = False,
+    follow: bool = False,
+) -> bool:
+    """Write ``data`` to ``dest`` if it differs; True if anything changed.
+
+    Like Ansible's ``copy`` and ``template``, a symlink at ``dest`` is
+    replaced by the file unless ``follow`` is set, in which case its
+    target is written instead.
+    """
+    if follow:
+        dest = Path(os.path.realpath(dest))
+    link = dest.is_symlink()
+    if link and not force:
+        return False
+    try:
+        current: Optional[bytes] = None if link else dest.read_bytes()
+    except FileNotFoundError:
+        current = None
+    if current is not None and (current == data or not force):
+        return _chmod(dest, mode, check)
+    if not dest.parent.is_dir():
+        raise TaskFailed(f"destination directory {dest.parent} does not exist")
+    if check:
+        return True
+    if current is not None or (link and dest.exists()):
+        if mode is None:
+            mode = os.stat(dest).st_mode & 0o7777
+        if backup:
+            stamp = time.strftime("%Y-%m-%d@%H:%M:%S")
+            shutil.copy2(dest, f"{dest}.{os.getpid()}.{stamp}~")
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, dest)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return True
+
+
+def missing_packages(step: NativeStep) -> List[str]:
+    """Packages of a ``package`` step that aren't installed.
+
+    Raises:
+        TaskFailed: If the package manager can't be run
+    """
+    query = PACKAGE_MANAGERS[step.args["os_family"]][0]
+    missing = []
+    for name in step.args["name"]:
+        try:
+            result = subprocess.run(
+                query + [name], capture_output=True, text=True, check=False
+            )
+        except FileNotFoundError as e:
+            raise TaskFailed(f"{query[0]} not found") from e
+        installed = result.returncode == 0
+        if query[0] == "dpkg-query":
+            installed = installed and result.stdout.startswith("ii")
+        if not installed:
+            missing.append(name)
+    return missing
+
+
+def step_targets(step: NativeStep) -> List[Path]:
+    """Paths a ``file``, ``copy`` or ``template`` step writes."""
+    args = step.args
+    if step.module == "file":
+        target = args.get("path", args.get("dest", args.get("name")))
+        return [Path(os.path.expanduser(str(target)))] if target is not None else []
+    if step.module not in ("copy", "template"):
+        return []
+    dest = str(args["dest"])
+    if "src" not in args or step.module == "template":
+        target = Path(dest)
+        if step.module == "template" and target.is_dir():
+            target = target / Path(str(args["src"])).name
+        return [target]
+    src = str(args["src"])
+    source = Path(src.rstrip("/") or "/")
+    if source.is_dir():
+        root = Path(dest) if src.endswith("/") else Path(dest) / source.name
+        targets = []
+        for directory, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            target_dir = root / Path(directory).relative_to(source)
+            targets.extend(target_dir / name for name in sorted(filenames))
+        return targets
+    target = Path(dest)
+    if dest.endswith("/") or target.is_dir():
+        target = target / source.name
+    return [target]
+
+
+def _apply_package(step: NativeStep, check: bool) -> bool:
+    install = PACKAGE_MANAGERS[step.args["os_family"]][1]
+    missing = missing_packages(step)
+    if not missing or check:
+        return bool(missing)
+    command = install + missing
+    if step.become and os.geteuid() != 0:
+        command = ["sudo", "--"] + command
+    try:
+        returncode = subprocess.run(command, check=False).returncode
+    except FileNotFoundError as e:
+        raise TaskFailed(f"{command[0]} not found") from e
+    if returncode != 0:
+        raise TaskFailed(f"{' '.join(command)} exited with status {returncode}")
+    return True
+
+
+def _apply_file(step: NativeStep, check: bool) -> bool:
+    args = step.args
+    target = args.get("path", args.get("dest", args.get("name")))
+    if target is None:
+        raise TaskFailed("file needs path")
+    path = Path(os.path.expanduser(str(target)))
+    state = str(args.get("state", "file"))
+    mode = _mode(args.get("mode"))
+    if state == "directory":
+        if path.is_dir():
+            return _chmod(path, mode, check)
+        if path.exists():
+            raise TaskFailed(f"{path} exists and isn't a directory")
+        if not check:
+            path.mkdir(parents=True)
+            _chmod(path, mode, check)
+        return True
+    if state == "absent":
+        if not path.exists() and not path.is_symlink():
+            return False
+        if not check:
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        return True
+    if state == "touch":
+        if not check:
+            path.touch()
+            _chmod(path, mode, check)
+        return True
+    if state == "file":
+        if not path.exists():
+            raise TaskFailed(f"{path} does not exist")
+        return _chmod(path, mode, check)
+    raise TaskFailed(f"file state '{state}' isn't supported natively")
+
+
+def _apply_copy(step: NativeStep, check: bool) -> bool:
+    args = step.args
+    dest = str(args["dest"])
+    force = _to_bool(args.get("force", True))
+    backup = _to_bool(args.get("backup", False))
+    follow = _to_bool(args.get("follow", False))
+    preserve = args.get("mode") == "preserve"
+    mode = None if preserve else _mode(args.get("mode"))
+    if "content" in args:
+        content = args["content"]
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        return _put_file(
+            Path(dest), content.encode(), mode, check, force, backup, follow
+        )
+
+    src = str(args["src"])
+    source = Path(src.rstrip("/") or "/")
+    if source.is_dir():
+        # "dir/" copies the contents, "dir" the directory itself
+        root = Path(dest) if src.endswith("/") else Path(dest) / source.name
+        changed = False
+        for directory, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            target_dir = root / Path(directory).relative_to(source)
+            if not target_dir.is_dir():
+                changed = True
+                if not check:
+                    target_dir.mkdir(parents=True)
+            for filename in sorted(filenames):
+                file_src = Path(directory) / filename
+                file_mode = os.stat(file_src).st_mode & 0o7777 if preserve else mode
+                if check and not target_dir.is_dir():
+                    continue
+                changed |= _put_file(
+                    target_dir / filename, file_src.read_bytes(), file_mode,
+                    check, force, backup, follow,
+                )
+        return changed
+
+    target = Path(dest)
+    if dest.endswith("/") or target.is_dir():
+        if not target.is_dir() and not check:
+            target.mkdir(parents=True)
+        target = target / source.name
+    file_mode = os.stat(source).st_mode & 0o7777 if preserve else mode
+    return _put_file(
+        target, source.read_bytes(), file_mode, check, force, backup, follow
+    )
+
+
+def _apply_template(step: NativeStep, check: bool) -> bool:
+    args = step.args
+    target = Path(str(args["dest"]))
+    if target.is_dir():
+        target = target / Path(str(args["src"])).name
+    preserve = args.get("mode") == "preserve"
+    mode = os.stat(args["src"]).st_mode & 0o7777 if preserve else _mode(args.get("mode"))
+    return _put_file(
+        target,
+        args["content"].encode(),
+        mode,
+        check,
+        _to_bool(args.get("force", True)),
+        _to_bool(args.get("backup", False)),
+        _to_bool(args.get("follow", False)),
+    )
+
+
+def _apply_set_fact(step: NativeStep, check: bool) -> bool:
+    # Applied while planning
+    return False
+
+
+_APPLY: Dict[str, Callable[[NativeStep, bool], bool]] = {
+    "package": _apply_package,
+    "file": _apply_file,
+    "copy": _apply_copy,
+    "template": _apply_template,
+    "set_fact": _apply_set_fact,
+}
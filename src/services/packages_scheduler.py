@@ -0,0 +1,199 @@
+# src/services/packages_scheduler.py
+"""Run a DAG of subprocess jobs with a worker limit.
+
+Jobs start as soon as the jobs they depend on have succeeded, up to
+``workers`` at a time. When several are ready the one heading the longest
+remaining chain of expected durations goes first (critical-path list
+scheduling), so slow jobs don't end up running alone at the end. Jobs
+that name the same ``resource`` never overlap (e.g. two roles that both
+need the distribution's package manager lock).
+
+The output of each job is read line by line and passed on with the job's
+name as a prefix, so concurrent jobs stay readable. When a job fails the
+jobs depending on it are skipped; independent jobs still run.
+"""
+import queue
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Set
+
+# Expected duration of a job that has never run; high so that unknown
+# (possibly slow) jobs start early
+UNKNOWN_DURATION = 3600.0
+
+
+@dataclass
+class Job:
+    """A command to run once its dependencies have succeeded."""
+
+    name: str
+    command: List[str]
+    deps: List[str] = field(default_factory=list)
+    duration: Optional[float] = None
+    resource: Optional[str] = None
+
+
+@dataclass
+class JobResult:
+    """Outcome of one job."""
+
+    name: str
+    status: str
+    returncode: int = 0
+    duration: float = 0.0
+    reason: str = ""
+
+    @property
+    def ok(self) -> bool:
+        """True if the job ran and succeeded."""
+        return self.status == "ok"
+
+
+def critical_paths(jobs: List[Job]) -> Dict[str, float]:
+    """Expected time from each job's start to the end of its longest chain.
+
+    Raises:
+        ValueError: If the dependencies contain a cycle or unknown jobs
+    """
+    by_name = {job.name: job for job in jobs}
+    dependents: Dict[str, List[str]] = {name: [] for name in by_name}
+    for job in jobs:
+        for dep in job.deps:
+            if dep not in by_name:
+                raise ValueError(f"Job '{job.name}' depends on unknown job '{dep}'")
+            dependents[dep].append(job.name)
+
+    lengths: Dict[str, float] = {}
+    visiting: Set[str] = set()
+
+    def length(name: str) -> float:
+        if name in lengths:
+            return lengths[name]
+        if name in visiting:
+            raise ValueError(f"Dependency cycle involving '{name}'")
+        visiting.add(name)
+        job = by_name[name]
+        own = UNKNOWN_DURATION if job.duration is None else job.duration
+        lengths[name] = own + max((length(d) for d in dependents[name]), default=0.0)
+        visiting.discard(name)
+        return lengths[name]
+
+    for name in by_name:
+        length(name)
+    return lengths
+
+
+def run_jobs(
+    jobs: List[Job],
+    workers: int,
+    output: Callable[[str], None],
+    cwd: Optional[Path] = None,
+    env: Optional[Mapping[str, str]] = None,
+) -> List[JobResult]:
+    """Run jobs in dependency order, at most ``workers`` at a time.
+
+    Args:
+        jobs: Jobs to run; dependencies must name other jobs in the list
+        workers: Maximum number of concurrent subprocesses
+        output: Called with each prefixed output line
+        cwd: Working directory of the subprocesses
+        env: Environment of the subprocesses (default: inherited)
+
+    Returns:
+        One result per job, in the order of ``jobs``
+
+    Raises:
+        ValueError: If the dependencies contain a cycle or unknown jobs
+        FileNotFoundError: If a command can't be found (running jobs are
+            terminated first)
+    """
+    priority = critical_paths(jobs)
+    order = {job.name: index for index, job in enumerate(jobs)}
+    by_name = {job.name: job for job in jobs}
+    pending = dict(by_name)
+    waiting_on = {job.name: set(job.deps) for job in jobs}
+    dependents: Dict[str, List[str]] = {job.name: [] for job in jobs}
+    for job in jobs:
+        for dep in job.deps:
+            dependents[dep].append(job.name)
+
+    width = max((len(job.name) for job in jobs), default=0)
+    write_lock = threading.Lock()
+    finished: "queue.Queue[tuple]" = queue.Queue()
+    running: Dict[str, subprocess.Popen] = {}
+    results: Dict[str, JobResult] = {}
+
+    def pump(job: Job, process: subprocess.Popen, started: float) -> None:
+        prefix = f"[{job.name:<{width}}] "
+        assert process.stdout is not None
+        for line in process.stdout:
+            with write_lock:
+                output(prefix + line.rstrip("\n"))
+        finished.put((job.name, process.wait(), time.monotonic() - started))
+
+    def start(job: Job) -> None:
+        process = subprocess.Popen(
+            job.command,
+            cwd=cwd,
+            env=None if env is None else dict(env),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+        )
+        running[job.name] = process
+        threading.Thread(
+            target=pump, args=(job, process, time.monotonic()), daemon=True
+        ).start()
+
+    def skip(name: str, failed: str) -> None:
+        for child in dependents[name]:
+            if child in pending:
+                del pending[child]
+                results[child] = JobResult(
+                    child, "skipped", reason=f"depends on failed job '{failed}'"
+                )
+                skip(child, failed)
+
+    try:
+        while pending or running:
+            busy = {by_name[name].resource for name in running}
+            ready = sorted(
+                (name for name in pending if not waiting_on[name]),
+                key=lambda name: (-priority[name], order[name]),
+            )
+            for name in ready:
+                if len(running) >= workers:
+                    break
+                job = pending[name]
+                if job.resource is not None and job.resource in busy:
+                    continue
+                del pending[name]
+                start(job)
+                if job.resource is not None:
+                    busy.add(job.resource)
+            if not running:
+                break
+            name, returncode, duration = finished.get()
+            del running[name]
+            if returncode == 0:
+                results[name] = JobResult(name, "ok", 0, duration)
+                for child in dependents[name]:
+                    waiting_on[child].discard(name)
+            else:
+                results[name] = JobResult(
+                    name, "failed", returncode, duration, f"exit status {returncode}"
+                )
+                skip(name, name)
+    except BaseException:
+        for process in running.values():
+            process.terminate()
+        for process in running.values():
+            process.wait()
+        raise
+    return [results[job.name] for job in jobs]
+
@@ -1,11 +1,42 @@
 # src/services/packages_service.py
 """Service layer for package management."""
+import os
 import subprocess
-from dataclasses import dataclass
+import sys
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import List, Optional
-
-import yaml
+from typing import Any, Callable, Collection, Dict, List, Optional, Set, Tuple
+
+from src.services.packages_cache import ParseCache, default_cache_dir, load_yaml
+from src.services.packages_catalog import (
+    RoleInfo,
+    build_catalog,
+    find_roles,
+    roles_paths,
+)
+from src.services.packages_inputs import (
+    RoleInputs,
+    change_reason,
+    input_record,
+    role_inputs,
+)
+from src.services.packages_native import NativeRunner, NotSupported, TaskFailed
+from src.services.packages_scheduler import Job, JobResult, run_jobs
+from src.services.packages_state import StateStore, default_state_dir
+
+# Play-level keys that pull in another playbook
+PLAYBOOK_IMPORT_KEYS = ("import_playbook", "ansible.builtin.import_playbook", "include")
+
+# Tags with a special meaning to Ansible; never used to select one role
+SPECIAL_TAGS = frozenset(["always", "never", "all", "tagged", "untagged"])
+
+# Modules that take the distribution's package manager lock
+PACKAGE_MODULES = frozenset(["package", "apt", "dnf", "yum", "pacman", "zypper", "apk"])
+
+# Prompts can't be shared by several ansible-playbook processes
+PROMPT_ARGS = frozenset(
+    ["-K", "--ask-become-pass", "-k", "--ask-pass", "--ask-vault-pass", "--ask-vault-password"]
+)
 
 
 class PackagesError(Exception):
@@ -29,6 +60,31 @@ class AnsibleNotFoundError(PackagesError):
     """Raised when Ansible is not installed."""
 
 
+class RoleNotFoundError(PackagesError):
+    """Raised when a role isn't on the roles path."""
+
+
+class NativeTaskError(PackagesError):
+    """Raised when a task run by the native executor fails."""
+
+
+@dataclass
+class ParallelInstallResult:
+    """Outcome of an install split into parallel ansible-playbook runs."""
+
+    jobs: List[JobResult] = field(default_factory=list)
+
+    @property
+    def returncode(self) -> int:
+        """0 if every run succeeded, otherwise the highest exit status."""
+        return max((job.returncode for job in self.jobs), default=0)
+
+    @property
+    def ok(self) -> bool:
+        """True if every run succeeded."""
+        return all(job.ok for job in self.jobs)
+
+
 @dataclass
 class PackageRole:
     """Represents a package role from the playbook."""
@@ -44,12 +100,18 @@ class PackagesService:
         self,
         playbook_path: Optional[Path] = None,
         ansible_dir: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        state_dir: Optional[Path] = None,
     ):
         """Initialize PackagesService.
 
         Args:
             playbook_path: Path to Ansible playbook (defaults to packages/ansible/playbooks/bootstrap.yml)
             ansible_dir: Path to ansible directory (defaults to packages/ansible)
+            cache_dir: Directory for parse caches (defaults to
+                ``$XDG_CACHE_HOME/dotfiles-config/packages``)
+            state_dir: Directory for the record of past runs (defaults to
+                ``$XDG_STATE_HOME/dotfiles-config/packages``)
         """
         if playbook_path is None:
             project_root = Path.cwd()
@@ -60,63 +122,386 @@ class PackagesService:
 
         self.playbook_path = playbook_path
         self.ansible_dir = ansible_dir
+        self.cache_dir = cache_dir or default_cache_dir()
+        self._parse_cache = ParseCache(self.cache_dir / "playbooks.json")
+        self._role_cache = ParseCache(self.cache_dir / "roles.json")
+        self.state_dir = state_dir or default_state_dir()
+        self._state = StateStore(self.state_dir / "state.json")
 
     def list_packages(self) -> List[PackageRole]:
         """List available package roles with their tags.
 
+        Roles of imported playbooks (``import_playbook``) are listed where
+        they are imported, with the import's tags added to their own. The
+        result is cached with the size and mtime of every playbook read,
+        so as long as none of them changed no YAML is parsed.
+
         Returns:
             List of PackageRole objects with name and tags
 
         Raises:
-            PlaybookNotFoundError: If playbook file doesn't exist
+            PlaybookNotFoundError: If the playbook or a playbook it imports
+                doesn't exist
         """
         if not self.playbook_path.exists():
             raise PlaybookNotFoundError(f"Playbook not found at {self.playbook_path}")
 
-        with open(self.playbook_path, "r") as f:
-            playbook_data = yaml.safe_load(f)
+        key = os.path.abspath(self.playbook_path)
+        cached = self._parse_cache.get(key)
+        if cached is not None:
+            return [PackageRole(**role) for role in cached]
+
+        files: List[Path] = []
+        roles = self._read_playbook(self.playbook_path, [], files)
+        self._parse_cache.put(key, files, [asdict(role) for role in roles])
+        return roles
+
+    def _read_playbook(
+        self, path: Path, import_tags: List[str], files: List[Path]
+    ) -> List[PackageRole]:
+        """Parse the roles of a playbook, following playbook imports.
+
+        Args:
+            path: Playbook to read
+            import_tags: Tags of the imports that led here
+            files: Playbooks read so far; ``path`` is appended
+        """
+        files.append(path)
+        with open(path, "r") as f:
+            playbook_data = load_yaml(f)
 
         roles = []
-        if playbook_data:
-            for play in playbook_data:
-                if "roles" in play:
-                    for role_entry in play["roles"]:
-                        if isinstance(role_entry, dict):
-                            role_name = role_entry.get("role", "unknown")
-                            role_tags = role_entry.get("tags", [])
-                        elif isinstance(role_entry, str):
-                            role_name = role_entry
-                            role_tags = []
-                        else:
-                            continue
-
-                        roles.append(PackageRole(name=role_name, tags=role_tags))
+        for play in playbook_data or []:
+            if not isinstance(play, dict):
+                continue
+            imported = next((play[k] for k in PLAYBOOK_IMPORT_KEYS if k in play), None)
+            if imported is not None:
+                if not isinstance(imported, str) or "{{" in imported:
+                    # Templated imports can't be resolved without Ansible
+                    continue
+                target = Path(os.path.normpath(path.parent / imported))
+                if not target.exists():
+                    raise PlaybookNotFoundError(
+                        f"Imported playbook not found at {target}"
+                    )
+                if target in files:
+                    # Already listed (or an import cycle)
+                    continue
+                roles.extend(
+                    self._read_playbook(
+                        target, _merge_tags(import_tags, play.get("tags")), files
+                    )
+                )
+                continue
+            for role_entry in play.get("roles") or []:
+                if isinstance(role_entry, dict):
+                    role_name = role_entry.get("role", "unknown")
+                    role_tags = role_entry.get("tags", [])
+                elif isinstance(role_entry, str):
+                    role_name = role_entry
+                    role_tags = []
+                else:
+                    continue
+                if import_tags:
+                    role_tags = _merge_tags(role_tags, import_tags)
+
+                roles.append(PackageRole(name=role_name, tags=role_tags))
 
         return roles
 
+    def roles_paths(self) -> List[Path]:
+        """Return the directories searched for roles, in order.
+
+        Taken from ``ANSIBLE_ROLES_PATH`` or ``roles_path`` in the
+        ``ansible.cfg`` of the ansible directory.
+        """
+        return roles_paths(self.ansible_dir, self.playbook_path.parent)
+
+    def role_catalog(self) -> Dict[str, RoleInfo]:
+        """Describe every role on the roles path.
+
+        Records are cached by role directory; only roles with changed,
+        added or removed files are parsed again.
+
+        Returns:
+            RoleInfo records by role name, in roles path order
+        """
+        roles = find_roles(self.roles_paths())
+        return build_catalog(roles, self._role_cache)
+
+    def role_info(self, name: str) -> RoleInfo:
+        """Describe one role.
+
+        Args:
+            name: Role name
+
+        Returns:
+            The role's RoleInfo record
+
+        Raises:
+            RoleNotFoundError: If no role of that name is on the roles path
+        """
+        roles = find_roles(self.roles_paths())
+        if name not in roles:
+            raise RoleNotFoundError(f"Role not found on roles path: {name}")
+        return build_catalog({name: roles[name]}, self._role_cache, prune=False)[name]
+
+    def plan_install(
+        self,
+        tags: List[str],
+        extra_args: Optional[List[str]] = None,
+        skip: Collection[str] = (),
+    ) -> List[Job]:
+        """Split an install into one ansible-playbook run per selected role.
+
+        Each run selects its role with a tag no other role of the playbook
+        has; roles without such a tag share one run. Requested tags that
+        select no role (e.g. ``debug``) get a run of their own. A role
+        waits for the selected roles it depends on (``meta/main.yml``,
+        also through unselected roles), and roles that install packages
+        never run at the same time, since they'd contend for the package
+        manager lock.
+
+        Args:
+            tags: Requested tags (comma-separated values are split)
+            extra_args: Arguments added to every ansible-playbook run
+            skip: Roles to leave out (only roles with a tag of their own
+                can be); roles depending on them don't wait for them
+
+        Returns:
+            Jobs in playbook order, with last known durations
+
+        Raises:
+            PlaybookNotFoundError: If playbook file doesn't exist
+        """
+        requested = _split_tags(tags)
+        tags_of = self._role_tags()
+        owners = _tag_owners(tags_of)
+
+        # One group per role with a tag of its own; the rest share a group
+        groups: Dict[str, List[str]] = {}
+        group_tags: Dict[str, List[str]] = {}
+        shared: List[str] = []
+        shared_tags: List[str] = []
+        for name, role_tags in tags_of.items():
+            wanted = [tag for tag in role_tags if tag in requested]
+            if not wanted:
+                continue
+            own = _own_tag(name, tags_of, owners, requested)
+            if own is not None:
+                groups[name] = [name]
+                group_tags[name] = [own]
+            else:
+                shared.append(name)
+                shared_tags = _merge_tags(shared_tags, wanted)
+        if shared:
+            key = "+".join(shared)
+            groups[key] = shared
+            group_tags[key] = shared_tags
+        leftover = [tag for tag in requested if tag not in owners]
+        job_of = {name: key for key, names in groups.items() for name in names}
+        dropped = {key for key, names in groups.items() if names == [key] and key in skip}
+
+        catalog = self.role_catalog()
+        durations = self._state.section("durations")
+        base = ["ansible-playbook", str(self.playbook_path)]
+        jobs = []
+        for key, names in groups.items():
+            if key in dropped:
+                continue
+            deps: List[str] = []
+            for name in names:
+                for dep in _dependency_closure(name, catalog):
+                    job = job_of.get(dep)
+                    if job is not None and job != key and job not in dropped and job not in deps:
+                        deps.append(job)
+            command = base + ["--tags", ",".join(group_tags[key])]
+            # A shared tag also selects roles that have their own run
+            overlap = [
+                group_tags[other][0]
+                for other, members in groups.items()
+                if other != key
+                and len(members) == 1
+                and set(tags_of[members[0]]) & set(group_tags[key])
+            ]
+            if overlap:
+                command += ["--skip-tags", ",".join(overlap)]
+            installs = any(
+                task.module in PACKAGE_MODULES
+                for name in names if name in catalog
+                for task in catalog[name].tasks
+            )
+            jobs.append(
+                Job(
+                    name=key,
+                    command=command + (extra_args or []),
+                    deps=deps,
+                    duration=durations.get(key),
+                    resource="package-manager" if installs else None,
+                )
+            )
+        if leftover:
+            key = ",".join(leftover)
+            jobs.append(
+                Job(
+                    name=key,
+                    command=base + ["--tags", key] + (extra_args or []),
+                    duration=durations.get(key),
+                )
+            )
+        return jobs
+
+    def install_parallel(
+        self,
+        tags: List[str],
+        extra_args: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        output: Optional[Callable[[str], None]] = None,
+        force: bool = False,
+    ) -> ParallelInstallResult:
+        """Install the roles selected by ``tags`` in concurrent runs.
+
+        Runs the jobs of ``plan_install`` as separate ansible-playbook
+        processes, at most ``jobs`` at a time, longest expected chain
+        first (durations of earlier runs are recorded in the state
+        directory). Each output line is prefixed with its job's name. If
+        a run fails the runs depending on it are skipped. Roles whose
+        inputs and written files are unchanged since their last
+        successful run are skipped too (see ``install``).
+
+        Args:
+            tags: Requested tags
+            extra_args: Additional arguments for every ansible-playbook run
+            jobs: Maximum concurrent runs (default: CPU count)
+            output: Called with each output line (default: print)
+            force: Run unchanged roles as well
+
+        Returns:
+            ParallelInstallResult with one result per run, and one per
+            unchanged role (status ``skipped``)
+
+        Raises:
+            PlaybookNotFoundError: If playbook file doesn't exist
+            AnsibleNotFoundError: If ansible-playbook command is not found
+            PackagesError: If no tags are given, jobs is less than 1, an
+                argument prompts for input, or role dependencies form a
+                cycle
+        """
+        if not tags:
+            raise PackagesError("Parallel install needs --tags to select roles")
+        if jobs is not None and jobs < 1:
+            raise PackagesError(f"Job count must be at least 1, got {jobs}")
+        prompts = sorted(PROMPT_ARGS.intersection(extra_args or []))
+        if prompts:
+            raise PackagesError(
+                f"{', '.join(prompts)} can't be used with parallel runs; "
+                "use --become-password-file or run sudo -v first"
+            )
+        output = output or print
+        tracked, unchanged = self._unchanged_roles(tags, extra_args or [], force, output)
+        planned = self.plan_install(tags, extra_args, skip=unchanged)
+        env = dict(os.environ)
+        if sys.stdout.isatty():
+            # Output goes through a pipe; keep Ansible's colours
+            env.setdefault("ANSIBLE_FORCE_COLOR", "1")
+        try:
+            results = run_jobs(
+                planned,
+                jobs or os.cpu_count() or 1,
+                output,
+                cwd=self.ansible_dir,
+                env=env,
+            )
+        except FileNotFoundError as e:
+            raise AnsibleNotFoundError(
+                "ansible-playbook command not found. Please install Ansible."
+            ) from e
+        except ValueError as e:
+            raise PackagesError(str(e)) from e
+        self._state.update(
+            "durations",
+            {result.name: round(result.duration, 3) for result in results if result.ok},
+        )
+        self._record_inputs(
+            tags, extra_args or [], tracked, ran=[result.name for result in results if result.ok]
+        )
+        results.extend(
+            JobResult(name, "skipped", reason=reason) for name, reason in unchanged.items()
+        )
+        return ParallelInstallResult(results)
+
     def install(
         self,
         tags: Optional[List[str]] = None,
         extra_args: Optional[List[str]] = None,
+        native: bool = False,
+        output: Optional[Callable[[str], None]] = None,
+        force: bool = False,
     ) -> subprocess.CompletedProcess:
         """Install packages using Ansible playbook.
 
+        Selected roles whose inputs (role directory, config files they
+        read, group_vars, extra vars) hash the same as at their last
+        successful run, and whose written files are still in place, are
+        skipped with ``--skip-tags``; the reason is passed to ``output``.
+        Only roles the native executor can plan, and that have a tag of
+        their own, are tracked this way. Installed packages are only
+        checked with ``native``, which queries the package manager anyway.
+
+        With ``native``, roles that only use ``package``, ``file``,
+        ``copy``, ``template`` and ``set_fact`` are run in-process (see
+        ``src/services/packages_native.py``), skipping ansible-playbook's
+        startup and fact gathering. If anything the tags select needs
+        Ansible, the whole install runs through ansible-playbook.
+
         Args:
             tags: List of Ansible tags to run
             extra_args: Additional arguments to pass to ansible-playbook
+            native: Try the in-process executor first
+            output: Called with skipped roles and native progress lines
+                (default: print)
+            force: Run unchanged roles as well
 
         Returns:
-            CompletedProcess from subprocess.run
+            CompletedProcess from subprocess.run, or with ``args``
+            ``["native", <roles>...]`` for a native run and
+            ``["skipped", <roles>...]`` if every selected role was
+            unchanged
 
         Raises:
             AnsibleNotFoundError: If ansible-playbook command is not found
             AnsibleError: If ansible-playbook execution fails
+            NativeTaskError: If a natively run task fails
         """
+        output = output or print
+        tracked, unchanged = self._unchanged_roles(
+            tags or [], extra_args or [], force, output, check_packages=native
+        )
+
+        if native:
+            result = self._install_native(
+                tags or [], extra_args or [], output, unchanged
+            )
+            if result is not None:
+                self._record_inputs(tags or [], extra_args or [], tracked, skipped=unchanged)
+                return result
+
         cmd = ["ansible-playbook", str(self.playbook_path)]
 
         if tags:
             cmd.extend(["--tags", ",".join(tags)])
 
+        if unchanged:
+            tags_of = self._role_tags()
+            owners = _tag_owners(tags_of)
+            requested = _split_tags(tags or [])
+            if all(tag in owners and owners[tag] <= set(unchanged) for tag in requested):
+                return subprocess.CompletedProcess(["skipped"] + list(unchanged), 0)
+            own_tags = [
+                _own_tag(role, tags_of, owners, requested) for role in unchanged
+            ]
+            cmd.extend(["--skip-tags", ",".join(t for t in own_tags if t)])
+
         if extra_args:
             cmd.extend(extra_args)
 
@@ -126,10 +511,187 @@ class PackagesService:
                 cwd=self.ansible_dir,
                 check=True,
             )
-            return result
         except FileNotFoundError as e:
             raise AnsibleNotFoundError(
                 "ansible-playbook command not found. Please install Ansible."
             ) from e
         except subprocess.CalledProcessError as e:
             raise AnsibleError(f"Error running ansible-playbook: {e}", return_code=e.returncode) from e
+        self._record_inputs(tags or [], extra_args or [], tracked, skipped=unchanged)
+        return result
+
+    def _install_native(
+        self,
+        tags: List[str],
+        extra_args: List[str],
+        output: Callable[[str], None],
+        unchanged: Collection[str] = (),
+    ) -> Optional[subprocess.CompletedProcess]:
+        """Run an install in-process; None if it needs ansible-playbook."""
+        if not self.playbook_path.exists():
+            raise PlaybookNotFoundError(f"Playbook not found at {self.playbook_path}")
+        runner = NativeRunner(self.playbook_path, self.ansible_dir, output=output)
+        try:
+            plan = runner.plan(tags, extra_args)
+        except NotSupported as e:
+            output(f"Running ansible-playbook: {e}")
+            return None
+        plan.roles = [role for role in plan.roles if role not in unchanged]
+        plan.steps = [step for step in plan.steps if step.role not in unchanged]
+        try:
+            runner.apply(plan)
+        except TaskFailed as e:
+            raise NativeTaskError(str(e)) from e
+        return subprocess.CompletedProcess(["native"] + plan.roles, 0)
+
+    def _role_tags(self) -> Dict[str, List[str]]:
+        """Tags of each role of the playbook."""
+        tags_of: Dict[str, List[str]] = {}
+        for role in self.list_packages():
+            tags_of[role.name] = _merge_tags(tags_of.get(role.name), role.tags)
+        return tags_of
+
+    def _unchanged_roles(
+        self,
+        tags: List[str],
+        extra_args: List[str],
+        force: bool,
+        output: Callable[[str], None],
+        check_packages: bool = False,
+    ) -> Tuple[Dict[str, RoleInputs], Dict[str, str]]:
+        """Hash the inputs of the selected roles and find unchanged ones.
+
+        Nothing is planned or hashed unless a selected role could be
+        skipped: it has a tag of its own and a recorded run. Unchanged
+        roles are reported through ``output``.
+
+        Args:
+            check_packages: Also require the roles' packages to be
+                installed, asking the package manager
+
+        Returns:
+            Inputs of the tracked roles (empty if nothing could be
+            skipped), and the roles to skip with the reason
+        """
+        if force or not tags or not self.playbook_path.exists():
+            return {}, {}
+        records = self._state.section("inputs")
+        tags_of = self._role_tags()
+        owners = _tag_owners(tags_of)
+        requested = _split_tags(tags)
+        # Only roles with a tag of their own can be left out of a run
+        candidates = {
+            role for role, role_tags in tags_of.items()
+            if role in records
+            and ("all" in requested or set(role_tags) & set(requested))
+            and _own_tag(role, tags_of, owners, requested) is not None
+        }
+        if not candidates:
+            return {}, {}
+        tracked = self._role_inputs(tags, extra_args)
+        unchanged: Dict[str, str] = {}
+        for role, inputs in tracked.items():
+            if role not in candidates:
+                continue
+            if change_reason(inputs, records.get(role), check_packages) is None:
+                unchanged[role] = (
+                    f"inputs and target files unchanged since {records[role].get('time')}"
+                )
+                output(f"Skipping {role}: {unchanged[role]} (use --force to run it)")
+        return tracked, unchanged
+
+    def _role_inputs(self, tags: List[str], extra_args: List[str]) -> Dict[str, RoleInputs]:
+        """Hash the inputs of the selected roles the native planner resolves.
+
+        A dry run (``--check``) tracks nothing, so it neither skips nor
+        records roles.
+        """
+        if not tags or not self.playbook_path.exists():
+            return {}
+        runner = NativeRunner(self.playbook_path, self.ansible_dir)
+        try:
+            plan = runner.plan(tags, extra_args, partial=True)
+        except NotSupported:
+            return {}
+        if plan.check:
+            return {}
+        return role_inputs(plan, self.playbook_path)
+
+    def _record_inputs(
+        self,
+        tags: List[str],
+        extra_args: List[str],
+        tracked: Dict[str, RoleInputs],
+        skipped: Collection[str] = (),
+        ran: Optional[Collection[str]] = None,
+    ) -> None:
+        """Store the input hashes of tracked roles that ran successfully.
+
+        Hashes that weren't needed before the run are computed now.
+
+        Args:
+            tags: Requested tags
+            extra_args: Additional ansible-playbook arguments
+            tracked: Inputs hashed before the run, if any
+            skipped: Roles left out of the run
+            ran: Roles that ran (default: every tracked role not skipped)
+        """
+        tracked = tracked or self._role_inputs(tags, extra_args)
+        roles = [role for role in tracked if role not in skipped] if ran is None else ran
+        records = {role: input_record(tracked[role]) for role in roles if role in tracked}
+        if records:
+            self._state.update("inputs", records)
+
+
+def _merge_tags(tags: Any, extra: Any) -> List[str]:
+    """Combine two tag specs (lists or single strings) without duplicates."""
+    merged: List[str] = []
+    for spec in (tags, extra):
+        if isinstance(spec, str):
+            spec = [spec]
+        for tag in spec or []:
+            if tag not in merged:
+                merged.append(tag)
+    return merged
+
+
+def _split_tags(tags: List[str]) -> List[str]:
+    """Split comma-separated tag values."""
+    return [t for tag in tags for t in tag.split(",") if t]
+
+
+def _tag_owners(tags_of: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """Map each tag to the roles that have it."""
+    owners: Dict[str, Set[str]] = {}
+    for name, role_tags in tags_of.items():
+        for tag in role_tags:
+            owners.setdefault(tag, set()).add(name)
+    return owners
+
+
+def _own_tag(
+    name: str,
+    tags_of: Dict[str, List[str]],
+    owners: Dict[str, Set[str]],
+    requested: List[str],
+) -> Optional[str]:
+    """A tag selecting only role ``name``, preferring requested ones."""
+    unique = [
+        tag for tag in tags_of.get(name, [])
+        if tag not in SPECIAL_TAGS and owners[tag] == {name}
+    ]
+    return next((t for t in unique if t in requested), unique[0] if unique else None)
+
+
+def _dependency_closure(name: str, catalog: Dict[str, RoleInfo]) -> List[str]:
+    """Return every role ``name`` depends on, directly or indirectly."""
+    found: List[str] = []
+    stack = list(catalog[name].dependencies) if name in catalog else []
+    while stack:
+        dep = stack.pop()
+        if dep in found or dep == name:
+            continue
+        found.append(dep)
+        if dep in catalog:
+            stack.extend(catalog[dep].dependencies)
+    return found
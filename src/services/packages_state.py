@@ -0,0 +1,80 @@
+# src/services/packages_state.py
+"""Small persistent record of past package runs.
+
+Holds what the previous runs learned about each role under the XDG
+state directory: how long it took (``durations``, which guide scheduling)
+and the hashes of its inputs at its last successful run (``inputs``,
+which let unchanged roles be skipped). Unlike the parse caches this isn't
+derived from files in the repository, but losing it is harmless: runs
+are ordered by guesswork and every role runs once more.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+STATE_VERSION = 1
+
+
+def default_state_dir() -> Path:
+    """Return the packages state directory below the XDG state home."""
+    state_home = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(state_home) / "dotfiles-config" / "packages"
+
+
+class StateStore:
+    """JSON file of named sections, each a mapping of role names to values."""
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the store.
+
+        Args:
+            path: State file (created on the first ``update``)
+        """
+        self.path = path
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+            return {}
+        return data
+
+    def section(self, name: str) -> Dict[str, Any]:
+        """Return one section (empty if missing)."""
+        value = self._read().get(name)
+        return value if isinstance(value, dict) else {}
+
+    def update(
+        self, name: str, values: Dict[str, Any], remove: Optional[list] = None
+    ) -> None:
+        """Merge ``values`` into a section and write the file atomically.
+
+        Failures to write are ignored.
+
+        Args:
+            name: Section name
+            values: Entries to set
+            remove: Keys to delete from the section
+        """
+        data = self._read()
+        section = data.get(name)
+        if not isinstance(section, dict):
+            section = {}
+        section.update(values)
+        for key in remove or []:
+            section.pop(key, None)
+        data[name] = section
+        data["version"] = STATE_VERSION
+        tmp_path = self.path.with_name(
+            f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
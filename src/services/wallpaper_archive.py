@@ -0,0 +1,1056 @@
+# src/services/wallpaper_archive.py
+"""Low-level helpers for the segmented wallpaper archive format.
+
+The archive is an ordinary compressed tarball written as a sequence of
+independently compressed frames ("segments"), followed by a fixed trailer
+segment that holds nothing but the tar end-of-archive marker. Concatenated
+frames decompress as a single stream, so ``tar`` reads the result
+unchanged, while new members can be appended by replacing the trailer
+instead of recompressing the whole archive. See ``wallpaper_codecs`` for
+the supported compression formats; only gzip archives can be read with
+``tar -z``, so ``manage_wallpapers.sh`` leaves detecting the codec to
+``tar``.
+
+Content is stored once: a wallpaper identical to one already in the archive
+is written as a tar hard link to it, so only its header takes up space.
+
+With more than one worker, each file becomes its own segment and segments
+are compressed on a thread pool (zlib, lzma and zstd release the GIL), the
+same block-parallel layout ``pigz`` produces. Extraction decompresses
+different segments in parallel.
+
+Uncompressed (store) archives skip the Python data path: file data is
+copied into the archive and back out with ``copy_file_range`` or
+``sendfile`` and hashed and read through ``mmap`` (see ``zero_copy``).
+
+Removing wallpapers appends a small hidden ``.wallpapers-removed`` member
+listing their names (tombstones); a scan drops earlier records of those
+names. A rename is a hard link under the new name followed by a tombstone
+for the old one. Either way the cost doesn't depend on the archive's size,
+and the data stays in place until ``compact_archive`` rewrites the archive
+with only the wallpapers still listed.
+"""
+import bisect
+import contextlib
+import hashlib
+import io
+import itertools
+import os
+import tarfile
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from src.services import zero_copy
+from src.services.image_probe import probe_bytes
+from src.services.wallpaper_codecs import Codec, detect_codec
+from src.services.wallpaper_journal import append_journal, recover
+
+BLOCKSIZE = tarfile.BLOCKSIZE
+COPY_BUFSIZE = 1024 * 1024
+
+Entry = Tuple[tarfile.TarInfo, Optional[BinaryIO]]
+
+# Hidden member listing removed wallpapers, NUL-separated
+REMOVALS_NAME = ".wallpapers-removed"
+
+# Compressed segments buffered per worker before they must be written out
+_PENDING_PER_WORKER = 2
+
+
+@dataclass(slots=True)
+class ArchiveMember:
+    """Location and identity of one member inside the archive.
+
+    ``segment`` is the byte offset of the compressed frame holding the data
+    in the archive file, and ``offset`` is the position of the data within
+    that segment once decompressed. Members stored as hard links point at
+    the data of the member they link to. ``format``, ``width`` and
+    ``height`` come from the image header and are None when the content
+    isn't a recognised image.
+
+    Records use ``__slots__``: an index of a few hundred thousand members
+    holds no per-record ``__dict__``.
+    """
+
+    name: str
+    size: int
+    mtime: int
+    segment: int
+    offset: int
+    sha256: str
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+MEMBER_FIELDS = tuple(field.name for field in fields(ArchiveMember))
+
+
+def member_row(member: ArchiveMember) -> list:
+    """Return a member's fields as a list, in ``MEMBER_FIELDS`` order."""
+    return [getattr(member, name) for name in MEMBER_FIELDS]
+
+
+def is_wallpaper(info: tarfile.TarInfo) -> bool:
+    """Check whether a tar member is a visible wallpaper file or hard link."""
+    return (info.isfile() or info.islnk()) and not info.name.startswith(".")
+
+
+class SegmentReader(io.RawIOBase):
+    """Decompress concatenated segments, recording where each begins.
+
+    ``segments`` holds one ``(compressed_offset, decompressed_offset)``
+    pair per segment read so far. An uncompressed (store) archive is a
+    single segment starting at the reader's initial position.
+    """
+
+    def __init__(
+        self, fileobj: BinaryIO, codec: Codec, single_segment: bool = False
+    ) -> None:
+        """Initialize the reader at the current position of ``fileobj``.
+
+        Args:
+            fileobj: Binary file positioned at the start of a segment
+            codec: Codec the archive was written with
+            single_segment: If True, stop at the end of the first segment
+        """
+        super().__init__()
+        self._fileobj = fileobj
+        self._codec = codec
+        self._single_segment = single_segment
+        self._decompressor = None
+        self._pending = b""
+        self._buffer = bytearray()
+        self._compressed = fileobj.tell()
+        self._produced = 0
+        self._eof = False
+        self.segments: List[Tuple[int, int]] = []
+
+    def readable(self) -> bool:
+        """Return True; the reader is always readable."""
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        """Read decompressed bytes into ``buffer``."""
+        while not self._buffer and not self._eof:
+            self._fill()
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        return size
+
+    def segment_at(self, position: int) -> Tuple[int, int]:
+        """Return the segment containing a decompressed stream position."""
+        starts = [start for _, start in self.segments]
+        return self.segments[bisect.bisect_right(starts, position) - 1]
+
+    def _fill(self) -> None:
+        """Decompress the next chunk of input into the buffer."""
+        if not self._codec.framed:
+            if not self.segments:
+                self.segments.append((self._compressed, 0))
+            data = self._fileobj.read(COPY_BUFSIZE)
+            self._eof = not data
+            self._buffer += data
+            return
+
+        if self._decompressor is None:
+            if not self._pending:
+                self._pending = self._fileobj.read(COPY_BUFSIZE)
+            # gzip and xz allow zero padding between frames
+            stripped = self._pending.lstrip(b"\0")
+            self._compressed += len(self._pending) - len(stripped)
+            self._pending = stripped
+            if not self._pending or (self._single_segment and self.segments):
+                self._eof = True
+                return
+            self.segments.append((self._compressed, self._produced))
+            self._decompressor = self._codec.decompressor()
+
+        data = self._pending or self._fileobj.read(COPY_BUFSIZE)
+        self._pending = b""
+        if not data:
+            raise EOFError(
+                "Compressed file ended before the end-of-stream marker was reached"
+            )
+        output = self._decompressor.decompress(data)
+        self._compressed += len(data) - len(self._decompressor.unused_data)
+        if self._decompressor.eof:
+            self._pending = self._decompressor.unused_data
+            self._decompressor = None
+        self._buffer += output
+        self._produced += len(output)
+
+
+class _SegmentWriter:
+    """File-like object compressing everything written into one frame."""
+
+    def __init__(self, fileobj: BinaryIO, codec: Codec) -> None:
+        self._fileobj = fileobj
+        self._compressor = codec.compressor()
+
+    def write(self, data: bytes) -> None:
+        self._fileobj.write(self._compressor.compress(data))
+
+    def close(self) -> None:
+        self._fileobj.write(self._compressor.flush())
+
+
+def has_trailer(archive_path: Path, codec: Codec) -> bool:
+    """Check whether an archive ends with the segmented-format trailer.
+
+    Args:
+        archive_path: Path to the archive
+        codec: Codec the archive was written with
+
+    Returns:
+        True if new segments can be appended in place
+    """
+    trailer = codec.trailer
+    size = archive_path.stat().st_size
+    if size < len(trailer):
+        return False
+    with open(archive_path, "rb") as f:
+        f.seek(size - len(trailer))
+        if f.read() != trailer:
+            return False
+        if codec.framed:
+            return True
+        # Plain tars written by other tools are padded to whole records, so
+        # the trailer must also start right where the last member ends
+        f.seek(0)
+        return _tar_end(f) == size - len(trailer)
+
+
+def _tar_end(fileobj: BinaryIO) -> int:
+    """Offset just past the last member of a plain tar file."""
+    end = 0
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r:") as tar:
+            for info in tar:
+                blocks = -(-info.size // BLOCKSIZE) if info.isreg() else 0
+                end = info.offset_data + blocks * BLOCKSIZE
+    except tarfile.ReadError:
+        return -1
+    return end
+
+
+@contextlib.contextmanager
+def open_tar(archive_path: Path) -> Iterator[tarfile.TarFile]:
+    """Open an archive for sequential reading, whatever its codec.
+
+    Archives in a format this module doesn't write (e.g. bzip2) are handed
+    to ``tarfile`` directly.
+
+    Args:
+        archive_path: Path to the archive
+
+    Yields:
+        TarFile in stream mode
+    """
+    codec = detect_codec(archive_path)
+    if codec is None:
+        with tarfile.open(archive_path, "r|*") as tar:
+            yield tar
+        return
+    with open(archive_path, "rb") as f:
+        with tarfile.open(fileobj=SegmentReader(f, codec), mode="r|") as tar:
+            yield tar
+
+
+def iter_tar(tar: tarfile.TarFile) -> Iterator[tarfile.TarInfo]:
+    """Iterate over a tar stream without keeping every header in memory.
+
+    ``TarFile`` appends each header it reads to ``tar.members``, so plain
+    iteration over an archive of many members holds all of their TarInfo
+    objects until the end. Streamed reads never look back, so the list is
+    cleared as we go.
+
+    Args:
+        tar: TarFile in stream mode
+
+    Yields:
+        Each member's TarInfo, in archive order
+    """
+    while True:
+        info = tar.next()
+        if info is None:
+            return
+        tar.members.clear()
+        yield info
+
+
+def tarinfo_for_file(source: Path, arcname: str) -> tarfile.TarInfo:
+    """Build a regular-file TarInfo for a file on disk.
+
+    Args:
+        source: File whose size, mtime and mode are recorded
+        arcname: Member name inside the archive
+
+    Returns:
+        TarInfo describing the file
+    """
+    stat = source.stat()
+    info = tarfile.TarInfo(arcname)
+    info.size = stat.st_size
+    info.mtime = int(stat.st_mtime)
+    info.mode = stat.st_mode & 0o7777
+    info.type = tarfile.REGTYPE
+    return info
+
+
+def tarinfo_for_link(source: Path, arcname: str, target: str) -> tarfile.TarInfo:
+    """Build a hard-link TarInfo for a file whose content is already stored.
+
+    Args:
+        source: File whose mtime and mode are recorded
+        arcname: Member name inside the archive
+        target: Name of the earlier member holding identical content
+
+    Returns:
+        TarInfo describing the link
+    """
+    info = tarinfo_for_file(source, arcname)
+    info.size = 0
+    info.type = tarfile.LNKTYPE
+    info.linkname = target
+    return info
+
+
+def link_entry(member: ArchiveMember, arcname: str, target: str) -> Entry:
+    """Build a hard-link entry giving stored content another name.
+
+    Args:
+        member: Record of the content being linked to (its mtime is kept)
+        arcname: Member name inside the archive
+        target: Name of the member holding the content
+
+    Returns:
+        Entry without data
+    """
+    info = tarfile.TarInfo(arcname)
+    info.mtime = member.mtime
+    info.mode = 0o644
+    info.type = tarfile.LNKTYPE
+    info.linkname = target
+    return info, None
+
+
+def removal_entry(names: Iterable[str]) -> Entry:
+    """Build the hidden member recording that wallpapers were removed.
+
+    Args:
+        names: Member names to drop from the archive's listing
+
+    Returns:
+        Entry whose data lists the names
+    """
+    data = "\0".join(names).encode("utf-8", "surrogateescape")
+    info = tarfile.TarInfo(REMOVALS_NAME)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    info.type = tarfile.REGTYPE
+    return info, io.BytesIO(data)
+
+
+def write_segment(
+    fileobj: BinaryIO,
+    entries: Iterable[Entry],
+    codec: Codec,
+    existing: Optional[Mapping[str, ArchiveMember]] = None,
+) -> List[ArchiveMember]:
+    """Write tar members as one segment without an end-of-archive marker.
+
+    Args:
+        fileobj: Binary file positioned where the segment should start
+        entries: Pairs of TarInfo and a stream holding exactly ``info.size``
+            bytes (None for members without data)
+        codec: Codec used to compress the segment
+        existing: Current members of the archive, used to resolve hard
+            links to members written earlier
+
+    Returns:
+        ArchiveMember records for the visible wallpapers written
+    """
+    segment = fileobj.tell()
+    members = []
+    known: Dict[str, ArchiveMember] = dict(existing or {})
+    with contextlib.closing(_SegmentWriter(fileobj, codec)) as gz:
+        position = 0
+        for info, data in entries:
+            header = info.tobuf(
+                tarfile.DEFAULT_FORMAT, tarfile.ENCODING, "surrogateescape"
+            )
+            gz.write(header)
+            position += len(header)
+            digest = hashlib.sha256()
+            head = b""
+            if data is not None and info.size:
+                source = None
+                if not codec.framed:
+                    source = zero_copy.file_range(data, info.size)
+                if source is not None:
+                    head = _copy_range(source, fileobj, digest)
+                else:
+                    for chunk in iter(lambda: data.read(COPY_BUFSIZE), b""):
+                        digest.update(chunk)
+                        gz.write(chunk)
+                        head = head or chunk
+                remainder = info.size % BLOCKSIZE
+                if remainder:
+                    gz.write(b"\0" * (BLOCKSIZE - remainder))
+            if info.islnk():
+                member = _link_member(info, known)
+            elif is_wallpaper(info):
+                member = ArchiveMember(
+                    name=info.name,
+                    size=info.size,
+                    mtime=int(info.mtime),
+                    segment=segment,
+                    offset=position,
+                    sha256=digest.hexdigest(),
+                    **_image_fields(head),
+                )
+            else:
+                member = None
+            if member is not None:
+                known[member.name] = member
+                members.append(member)
+            position += _padded(info.size) if data is not None else 0
+    return members
+
+
+def write_segments(
+    fileobj: BinaryIO,
+    batches: Iterable[List[Entry]],
+    codec: Codec,
+    existing: Optional[Mapping[str, ArchiveMember]] = None,
+    workers: int = 1,
+) -> List[ArchiveMember]:
+    """Write batches of entries, compressing them on a thread pool.
+
+    Each batch becomes its own segment, compressed into memory by a worker
+    and written in order. Batches containing hard links are written by the
+    calling thread once everything before them is on disk, since links
+    must resolve to members already written. With a single worker, or
+    an uncompressed archive (there is nothing to compress, and file data
+    is copied in the kernel), all batches go into one segment instead.
+
+    Data streams in the batches are closed once written.
+
+    Args:
+        fileobj: Binary file positioned where the first segment should start
+        batches: Lists of entries, produced lazily
+        codec: Codec used to compress the segments
+        existing: Current members of the archive, used to resolve links
+        workers: Number of compression threads
+
+    Returns:
+        ArchiveMember records for the visible wallpapers written
+    """
+    if workers <= 1 or not codec.framed:
+        return write_segment(fileobj, _closing_entries(batches), codec, existing)
+
+    known: Dict[str, ArchiveMember] = dict(existing or {})
+    members: List[ArchiveMember] = []
+
+    def record(written: List[ArchiveMember]) -> None:
+        for member in written:
+            known[member.name] = member
+            members.append(member)
+
+    def finish(future: Future) -> None:
+        data, written = future.result()
+        segment = fileobj.tell()
+        fileobj.write(data)
+        for member in written:
+            member.segment += segment
+        record(written)
+
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for batch in batches:
+                if any(info.islnk() for info, _ in batch):
+                    while pending:
+                        finish(pending.popleft())
+                    entries = _closing_entries([batch])
+                    record(write_segment(fileobj, entries, codec, known))
+                    continue
+                pending.append(pool.submit(_compress_batch, batch, codec))
+                if len(pending) >= workers * _PENDING_PER_WORKER:
+                    finish(pending.popleft())
+            while pending:
+                finish(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+    return members
+
+
+def scan_archive(archive_path: Path) -> List[ArchiveMember]:
+    """Read every member of an archive and record where its data lives.
+
+    This decompresses the whole archive and is the fallback used when no
+    up-to-date index is available.
+
+    Args:
+        archive_path: Path to an archive written with a known codec
+
+    Returns:
+        ArchiveMember records for the visible wallpapers, in archive order;
+        a later record for a name replaces an earlier one and removed
+        names are left out
+
+    Raises:
+        ValueError: If the archive's compression format isn't supported
+    """
+    members: Dict[str, ArchiveMember] = {}
+    for name, member in iter_scan(archive_path):
+        if member is None:
+            members.pop(name, None)
+        else:
+            members[name] = member
+    return list(members.values())
+
+
+def iter_scan(archive_path: Path) -> Iterator[Tuple[str, Optional[ArchiveMember]]]:
+    """Yield wallpaper records and removals as the archive is read.
+
+    ``scan_archive`` without the bookkeeping: each wallpaper record is
+    yielded as ``(name, member)`` once its data has been hashed, and each
+    name listed by a removal member as ``(name, None)``.
+
+    Args:
+        archive_path: Path to an archive written with a known codec
+
+    Yields:
+        ``(name, member)`` pairs in archive order
+
+    Raises:
+        ValueError: If the archive's compression format isn't supported
+    """
+    codec = _require_codec(archive_path)
+    # Links resolve to earlier members even if those were removed since
+    known: Dict[str, ArchiveMember] = {}
+    with open(archive_path, "rb") as f:
+        reader = SegmentReader(f, codec)
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            for info in iter_tar(tar):
+                if info.islnk():
+                    member = _link_member(info, known)
+                    if member is not None:
+                        known[member.name] = member
+                        yield member.name, member
+                    continue
+                if _is_removals(info):
+                    for name in _removed_names(tar.extractfile(info).read()):
+                        yield name, None
+                    continue
+                if not is_wallpaper(info):
+                    continue
+                digest = hashlib.sha256()
+                head = b""
+                data = tar.extractfile(info)
+                for chunk in iter(lambda: data.read(COPY_BUFSIZE), b""):
+                    digest.update(chunk)
+                    head = head or chunk
+                segment, start = reader.segment_at(info.offset_data)
+                member = ArchiveMember(
+                    name=info.name,
+                    size=info.size,
+                    mtime=int(info.mtime),
+                    segment=segment,
+                    offset=info.offset_data - start,
+                    sha256=digest.hexdigest(),
+                    **_image_fields(head),
+                )
+                known[member.name] = member
+                yield member.name, member
+
+
+def open_member(archive_path: Path, member: ArchiveMember) -> BinaryIO:
+    """Open a stream over one member's data.
+
+    Only the member's own segment is decompressed, and only up to the end
+    of the member's data. Members of an uncompressed archive are read
+    from a memory mapping of the file.
+
+    Args:
+        archive_path: Path to the archive
+        member: Record locating the member
+
+    Returns:
+        Readable binary stream; closing it closes the archive file
+    """
+    codec = _require_codec(archive_path)
+    f = open(archive_path, "rb")
+    try:
+        if not codec.framed:
+            # Uncompressed data is read straight from a mapping of the file
+            return zero_copy.FileRange(
+                f,
+                member.segment + member.offset,
+                member.size,
+                zero_copy.map_file(f),
+                owner=f,
+                owns_mapping=True,
+            )
+        reader = _open_segment(f, member.segment, codec)
+        _skip(reader, member.offset)
+    except BaseException:
+        f.close()
+        raise
+    return io.BufferedReader(_LimitedReader(reader, member.size, owner=f))
+
+
+def iter_member_data(
+    archive_path: Path, members: Iterable[ArchiveMember]
+) -> Iterator[Tuple[ArchiveMember, BinaryIO]]:
+    """Yield a data stream for each member, in archive order.
+
+    Members sharing a segment are read in a single forward pass over it, so
+    each segment is decompressed at most once. A stream is only valid until
+    the next item is requested.
+
+    Args:
+        archive_path: Path to the archive
+        members: Records locating the members to read
+
+    Yields:
+        Pairs of member record and a stream over its data
+    """
+    codec = _require_codec(archive_path)
+    ordered = sorted(members, key=lambda m: (m.segment, m.offset))
+    with open(archive_path, "rb") as f:
+        if not codec.framed:
+            # Uncompressed data is read from one mapping of the file
+            mapping = zero_copy.map_file(f)
+            try:
+                for member in ordered:
+                    start = member.segment + member.offset
+                    yield member, zero_copy.FileRange(f, start, member.size, mapping)
+            finally:
+                if mapping is not None:
+                    mapping.close()
+            return
+
+        reader: Optional[BinaryIO] = None
+        segment = -1
+        position = 0
+        for member in ordered:
+            if reader is None or member.segment != segment or member.offset < position:
+                reader = _open_segment(f, member.segment, codec)
+                segment = member.segment
+                position = 0
+            _skip(reader, member.offset - position)
+            stream = _LimitedReader(reader, member.size)
+            yield member, stream
+            _skip(stream, member.size)
+            position = member.offset + member.size
+
+
+def append_files(
+    archive_path: Path,
+    files: Iterable[Tuple[Path, str]],
+    codec: Codec,
+    links: Optional[Mapping[str, str]] = None,
+    existing: Optional[Mapping[str, ArchiveMember]] = None,
+    workers: int = 1,
+) -> List[ArchiveMember]:
+    """Append files to a segmented archive.
+
+    Only the trailer is rewritten; existing segments are left untouched.
+    The files form a single new segment, or one segment each when
+    compressed by several workers. The append is journaled and fsynced,
+    so an interrupted append can be rolled back (see ``wallpaper_journal``).
+
+    Args:
+        archive_path: Archive ending with the codec's trailer
+        files: Pairs of source path and member name
+        codec: Codec the archive was written with
+        links: Member names to store as hard links, mapped to the name of
+            the member (existing or written earlier in ``files``) holding
+            identical content
+        existing: Current members of the archive
+        workers: Number of compression threads
+
+    Returns:
+        ArchiveMember records for the appended files
+    """
+    return _append(
+        archive_path, _file_batches(files, links or {}), codec, existing, workers
+    )
+
+
+def append_entries(
+    archive_path: Path,
+    entries: List[Entry],
+    codec: Codec,
+    existing: Optional[Mapping[str, ArchiveMember]] = None,
+) -> List[ArchiveMember]:
+    """Append prepared entries (links, removals) as one new segment.
+
+    Journaled like ``append_files``.
+
+    Args:
+        archive_path: Archive ending with the codec's trailer
+        entries: Entries to write, e.g. from ``link_entry`` and
+            ``removal_entry``
+        codec: Codec the archive was written with
+        existing: Current members of the archive, used to resolve links
+
+    Returns:
+        ArchiveMember records for the visible wallpapers written
+    """
+    return _append(archive_path, [entries], codec, existing, workers=1)
+
+
+def create_archive(
+    archive_path: Path,
+    files: Iterable[Tuple[Path, str]],
+    codec: Codec,
+    links: Optional[Mapping[str, str]] = None,
+    workers: int = 1,
+) -> List[ArchiveMember]:
+    """Create a new segmented archive containing the given files.
+
+    The data is fsynced before returning; callers write to a temporary
+    path and rename it into place.
+
+    Args:
+        archive_path: Destination path (overwritten if present)
+        files: Pairs of source path and member name
+        codec: Codec used to compress the archive
+        links: Member names to store as hard links to an earlier file
+        workers: Number of compression threads
+
+    Returns:
+        ArchiveMember records for the written files
+    """
+    with open(archive_path, "wb") as f:
+        members = write_segments(
+            f, _file_batches(files, links or {}), codec, workers=workers
+        )
+        f.write(codec.trailer)
+        _fsync(f)
+    return members
+
+
+def compact_archive(
+    source_path: Path,
+    dest_path: Path,
+    codec: Codec,
+    members: Iterable[ArchiveMember],
+    workers: int = 1,
+) -> List[ArchiveMember]:
+    """Rewrite an archive keeping only the data of the given members.
+
+    Replaced and removed wallpapers, tombstones and links are dropped.
+    Each stored content is written once, under the first name using it;
+    the other names become hard links to it at the end of the archive.
+    Other members (directories, hidden files) are copied unchanged.
+
+    Args:
+        source_path: Segmented archive to compact
+        dest_path: Destination path for the compacted archive
+        codec: Codec used to compress the new archive
+        members: Current records of the wallpapers to keep
+        workers: Number of compression threads
+
+    Returns:
+        ArchiveMember records for the wallpapers written
+
+    Raises:
+        ValueError: If the data of a member isn't found in the archive
+    """
+    source_codec = _require_codec(source_path)
+    by_location: Dict[Tuple[int, int], List[ArchiveMember]] = defaultdict(list)
+    for member in members:
+        by_location[(member.segment, member.offset)].append(member)
+
+    def batches(tar: tarfile.TarFile, reader: SegmentReader) -> Iterator[List[Entry]]:
+        links: List[Entry] = []
+        for info in iter_tar(tar):
+            if info.islnk() or _is_removals(info):
+                continue
+            data = tar.extractfile(info) if info.isfile() else None
+            if workers > 1 and data is not None:
+                data = io.BytesIO(data.read())
+            if not is_wallpaper(info):
+                yield [(info, data)]
+                continue
+            segment, start = reader.segment_at(info.offset_data)
+            sharing = by_location.pop((segment, info.offset_data - start), None)
+            if sharing is None:
+                continue
+            first, *others = sharing
+            yield [(_kept_info(info, first), data)]
+            links.extend(link_entry(other, other.name, first.name) for other in others)
+        if by_location:
+            missing = sorted(m.name for found in by_location.values() for m in found)
+            raise ValueError(f"Data not found in archive: {', '.join(missing)}")
+        if links:
+            yield links
+
+    with open(source_path, "rb") as src, open(dest_path, "wb") as f:
+        reader = SegmentReader(src, source_codec)
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            written = write_segments(f, batches(tar, reader), codec, workers=workers)
+        f.write(codec.trailer)
+        _fsync(f)
+    return written
+
+
+def convert_archive(
+    source_path: Path, dest_path: Path, codec: Codec, workers: int = 1
+) -> List[ArchiveMember]:
+    """Rewrite any readable tarball as a segmented archive.
+
+    Members are streamed from the source; nothing is extracted to disk.
+    With several workers each member is buffered in memory and compressed
+    as its own segment, which also lets later extractions run in parallel.
+    This is used both to make foreign archives appendable and to migrate
+    an archive to another codec.
+
+    Args:
+        source_path: Existing archive in any format ``tarfile`` can read
+        dest_path: Destination path for the segmented archive
+        codec: Codec used to compress the new archive
+        workers: Number of compression threads
+
+    Returns:
+        ArchiveMember records for the visible wallpapers
+    """
+    with open_tar(source_path) as src, open(dest_path, "wb") as f:
+        members = write_segments(
+            f, _tar_batches(src, buffered=workers > 1), codec, workers=workers
+        )
+        f.write(codec.trailer)
+        _fsync(f)
+    return members
+
+
+class _LimitedReader(io.RawIOBase):
+    """Expose at most ``size`` bytes of an underlying stream."""
+
+    def __init__(
+        self, stream: BinaryIO, size: int, owner: Optional[BinaryIO] = None
+    ) -> None:
+        super().__init__()
+        self._stream = stream
+        self._remaining = size
+        self._owner = owner
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[: self._remaining]
+        data = self._stream.read(len(view))
+        if not data:
+            raise EOFError("Archive ended inside a member's data")
+        view[: len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if self._owner is not None:
+            self._owner.close()
+        super().close()
+
+
+def _require_codec(archive_path: Path) -> Codec:
+    """Detect an archive's codec, rejecting formats that can't be indexed."""
+    codec = detect_codec(archive_path)
+    if codec is None:
+        raise ValueError(f"Unsupported archive format: {archive_path}")
+    return codec
+
+
+def _open_segment(fileobj: BinaryIO, segment: int, codec: Codec) -> BinaryIO:
+    """Return a buffered stream decompressing the segment at ``segment``."""
+    fileobj.seek(segment)
+    return io.BufferedReader(
+        SegmentReader(fileobj, codec, single_segment=True), COPY_BUFSIZE
+    )
+
+
+def _skip(stream: BinaryIO, count: int) -> None:
+    """Read and discard ``count`` bytes (or until the stream ends)."""
+    while count > 0:
+        chunk = stream.read(min(count, COPY_BUFSIZE))
+        if not chunk:
+            return
+        count -= len(chunk)
+
+
+def _append(
+    archive_path: Path,
+    batches: Iterable[List[Entry]],
+    codec: Codec,
+    existing: Optional[Mapping[str, ArchiveMember]],
+    workers: int,
+) -> List[ArchiveMember]:
+    """Replace the trailer with new segments, journaled and fsynced."""
+    try:
+        with open(archive_path, "r+b") as f:
+            trailer_offset = f.seek(-len(codec.trailer), os.SEEK_END)
+            with append_journal(archive_path, trailer_offset, codec.name):
+                f.truncate()
+                members = write_segments(f, batches, codec, existing, workers)
+                f.write(codec.trailer)
+                _fsync(f)
+    except BaseException:
+        # The file is closed (and flushed) by now, so nothing lands after
+        # the restored trailer
+        recover(archive_path)
+        raise
+    return members
+
+
+def _copy_range(
+    source: zero_copy.FileRange, fileobj: BinaryIO, digest
+) -> bytes:
+    """Copy uncompressed member data from a file in the kernel.
+
+    The data is hashed through a mapping of the source instead of being
+    read into Python.
+
+    Returns:
+        The leading bytes, for probing the image header
+    """
+    with source:
+        source.update_digest(digest)
+        head = source.read(COPY_BUFSIZE)
+        source.seek(0)
+        zero_copy.copy_stream(source, fileobj, source.size)
+    return head
+
+
+def _is_removals(info: tarfile.TarInfo) -> bool:
+    """Check whether a tar member is a tombstone listing removed names."""
+    return info.isfile() and info.name == REMOVALS_NAME
+
+
+def _removed_names(data: bytes) -> List[str]:
+    """Decode the names listed by a tombstone member."""
+    names = data.decode("utf-8", "surrogateescape").split("\0")
+    return [name for name in names if name]
+
+
+def _kept_info(info: tarfile.TarInfo, member: ArchiveMember) -> tarfile.TarInfo:
+    """Header for data kept by compaction, under the member's current name.
+
+    A fresh header is built so stale pax records (such as a long original
+    path) don't carry over.
+    """
+    kept = tarfile.TarInfo(member.name)
+    kept.size = info.size
+    kept.mtime = member.mtime
+    kept.mode = info.mode
+    kept.uid, kept.gid = info.uid, info.gid
+    kept.uname, kept.gname = info.uname, info.gname
+    kept.type = tarfile.REGTYPE
+    return kept
+
+
+def _fsync(fileobj: BinaryIO) -> None:
+    """Flush a file's buffered and cached data to disk."""
+    fileobj.flush()
+    os.fsync(fileobj.fileno())
+
+
+def _padded(size: int) -> int:
+    """Round a member size up to a whole number of tar blocks."""
+    return -(-size // BLOCKSIZE) * BLOCKSIZE
+
+
+def _link_member(
+    info: tarfile.TarInfo, known: Mapping[str, ArchiveMember]
+) -> Optional[ArchiveMember]:
+    """Resolve a hard-link member to the data of the member it links to."""
+    target = known.get(info.linkname)
+    if target is None or info.name.startswith("."):
+        return None
+    return ArchiveMember(
+        name=info.name,
+        size=target.size,
+        mtime=int(info.mtime),
+        segment=target.segment,
+        offset=target.offset,
+        sha256=target.sha256,
+        format=target.format,
+        width=target.width,
+        height=target.height,
+    )
+
+
+def _image_fields(head: bytes) -> Dict[str, object]:
+    """Probe the leading bytes of a member for its image metadata."""
+    image = probe_bytes(head)
+    if image is None:
+        return {}
+    return {"format": image.format, "width": image.width, "height": image.height}
+
+
+def _compress_batch(
+    batch: List[Entry], codec: Codec
+) -> Tuple[bytes, List[ArchiveMember]]:
+    """Compress a batch into memory as one segment starting at offset 0."""
+    buffer = io.BytesIO()
+    members = write_segment(buffer, _closing_entries([batch]), codec)
+    return buffer.getvalue(), members
+
+
+def _closing_entries(batches: Iterable[List[Entry]]) -> Iterator[Entry]:
+    """Yield the entries of each batch, closing its streams afterwards."""
+    for batch in batches:
+        try:
+            yield from batch
+        finally:
+            for _, data in batch:
+                if data is not None:
+                    data.close()
+
+
+def _file_batches(
+    files: Iterable[Tuple[Path, str]], links: Mapping[str, str]
+) -> Iterator[List[Entry]]:
+    """Yield one batch per file on disk, grouping consecutive links.
+
+    Files are opened as their batch is produced, so only the batches in
+    flight hold open handles.
+    """
+    for is_link, group in itertools.groupby(files, lambda file: file[1] in links):
+        if is_link:
+            yield [
+                (tarinfo_for_link(source, arcname, links[arcname]), None)
+                for source, arcname in group
+            ]
+            continue
+        for source, arcname in group:
+            yield [(tarinfo_for_file(source, arcname), open(source, "rb"))]
+
+
+def _tar_batches(tar: tarfile.TarFile, buffered: bool) -> Iterator[List[Entry]]:
+    """Yield one batch per member of a tar stream.
+
+    Args:
+        tar: TarFile in stream mode
+        buffered: Read each member's data into memory so the batch stays
+            valid after the stream moves on
+    """
+    for info in iter_tar(tar):
+        # Links have no data of their own (and can't be opened in stream mode)
+        data = None if info.islnk() else tar.extractfile(info)
+        if buffered and data is not None:
+            data = io.BytesIO(data.read())
+        yield [(info, data)]
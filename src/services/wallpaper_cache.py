@@ -0,0 +1,151 @@
+# src/services/wallpaper_cache.py
+"""Local content-addressed cache of extracted wallpaper data.
+
+Each distinct wallpaper is decompressed once into the cache, keyed by its
+SHA-256, and extraction targets are materialized from there as hard links,
+reflinks or symlinks, falling back to a plain copy. Extracting the same
+archive to several places then costs almost no I/O or disk space.
+
+Data read from an uncompressed archive is copied into the cache in the
+kernel (see ``zero_copy``).
+
+Cached blobs are made read-only: a hard link shares its inode with the
+cache, so editing an extracted file in place would corrupt the cache.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from src.services.zero_copy import copy_stream, file_range
+
+LINK_MODES = ("hardlink", "reflink", "symlink", "copy")
+
+# ioctl request number for cloning a file's extents (Linux <linux/fs.h>)
+FICLONE = 0x40049409
+
+COPY_BUFSIZE = 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """Return the blob cache directory below the XDG data home."""
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / "dotfiles-config" / "wallpapers" / "blobs"
+
+
+class BlobCache:
+    """Directory of wallpaper contents named by their SHA-256."""
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        """Initialize the cache.
+
+        Args:
+            root: Cache directory (defaults to ``default_cache_dir()``)
+        """
+        self.root = root or default_cache_dir()
+
+    def path_for(self, sha256: str) -> Path:
+        """Return where the blob for a content hash is stored."""
+        return self.root / sha256[:2] / sha256
+
+    def has(self, sha256: str) -> bool:
+        """Check whether a content hash is already cached."""
+        return self.path_for(sha256).is_file()
+
+    def store(self, sha256: str, data: BinaryIO, mtime: int) -> Path:
+        """Copy a stream into the cache, verifying its hash.
+
+        The blob is written to a temporary file and renamed into place, so
+        concurrent extractions never see a partial blob.
+
+        Args:
+            sha256: Expected content hash
+            data: Stream over the content
+            mtime: Modification time given to the blob
+
+        Returns:
+            Path to the cached blob
+
+        Raises:
+            ValueError: If the content doesn't match ``sha256``
+        """
+        path = self.path_for(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as out:
+                source = file_range(data)
+                if source is not None:
+                    # Hashed through a mapping and copied in the kernel
+                    with source:
+                        source.update_digest(digest)
+                        copy_stream(source, out, source.size)
+                else:
+                    for chunk in iter(lambda: data.read(COPY_BUFSIZE), b""):
+                        digest.update(chunk)
+                        out.write(chunk)
+            if digest.hexdigest() != sha256:
+                raise ValueError(
+                    f"Content hash mismatch: expected {sha256}, "
+                    f"got {digest.hexdigest()}"
+                )
+            os.chmod(tmp_path, 0o444)
+            os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return path
+
+
+def materialize(blob: Path, target: Path, mode: str) -> str:
+    """Create ``target`` with the content of a cached blob.
+
+    Hard links and reflinks fall back to a copy when the filesystem can't
+    provide them (e.g. the target is on another device).
+
+    Args:
+        blob: Cached blob
+        target: File to create; an existing file is replaced
+        mode: One of ``LINK_MODES``
+
+    Returns:
+        The mode actually used
+    """
+    target.unlink(missing_ok=True)
+    if mode == "symlink":
+        target.symlink_to(blob)
+        return "symlink"
+    if mode == "hardlink":
+        try:
+            os.link(blob, target)
+            return "hardlink"
+        except OSError:
+            pass
+    if mode == "reflink":
+        try:
+            _reflink(blob, target)
+            return "reflink"
+        except OSError:
+            target.unlink(missing_ok=True)
+    shutil.copyfile(blob, target)
+    return "copy"
+
+
+def _reflink(source: Path, target: Path) -> None:
+    """Clone a file's extents with FICLONE (btrfs, XFS, bcachefs...).
+
+    Raises:
+        OSError: If the platform or filesystem doesn't support it
+    """
+    try:
+        import fcntl
+    except ImportError as e:
+        raise OSError("Reflinks are not supported on this platform") from e
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
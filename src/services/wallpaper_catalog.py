@@ -0,0 +1,303 @@
+# src/services/wallpaper_catalog.py
+"""In-memory query engine over the wallpaper index.
+
+A catalog keeps the indexed members in one sorted order per queryable
+attribute. Range filters (minimum width, aspect ratio, byte size, literal
+name prefix) become two binary searches each; the narrowest range supplies
+the candidates and the remaining filters are checked on those alone.
+Results sorted by an indexed attribute are read off its order directly, so
+a limited query stops as soon as it has enough matches.
+"""
+import bisect
+import fnmatch
+import heapq
+import itertools
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.services.wallpaper_archive import ArchiveMember
+
+SORT_KEYS = ("name", "width", "height", "size", "mtime", "aspect")
+
+DEFAULT_ASPECT_TOLERANCE = 0.02
+
+# With a limit, walking the sorted order wins once candidates exceed this share
+_WALK_ABOVE = 0.125
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+_ASPECT = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[:/xX]\s*(\d+(?:\.\d+)?)\s*$")
+
+Range = Tuple[Optional[float], Optional[float]]
+
+
+def parse_aspect(value: str) -> float:
+    """Parse an aspect ratio such as ``21:9``, ``16/10``, ``3440x1440`` or ``2.39``.
+
+    Raises:
+        ValueError: If the value isn't a positive ratio
+    """
+    match = _ASPECT.match(value)
+    try:
+        if match:
+            ratio = float(match.group(1)) / float(match.group(2))
+        else:
+            ratio = float(value)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"Invalid aspect ratio: {value}") from None
+    if not ratio > 0:
+        raise ValueError(f"Invalid aspect ratio: {value}")
+    return ratio
+
+
+def _aspect(member: ArchiveMember) -> Optional[float]:
+    if not member.width or not member.height:
+        return None
+    return member.width / member.height
+
+
+_KEYS: Dict[str, Callable[[ArchiveMember], object]] = {
+    "name": lambda member: member.name,
+    "width": lambda member: member.width,
+    "height": lambda member: member.height,
+    "size": lambda member: member.size,
+    "mtime": lambda member: member.mtime,
+    "aspect": _aspect,
+}
+
+
+def member_filter(
+    min_width: Optional[int] = None,
+    min_height: Optional[int] = None,
+    aspect: Optional[float] = None,
+    aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    name_glob: Optional[str] = None,
+) -> Callable[[ArchiveMember], bool]:
+    """Build a predicate applying the filters of ``WallpaperCatalog.query``.
+
+    Used to filter members one at a time as they stream past, where
+    building the sorted views of a catalog isn't worth it.
+    """
+    ranges: List[Tuple[Callable[[ArchiveMember], object], Range]] = []
+    if min_width is not None:
+        ranges.append((_KEYS["width"], (min_width, None)))
+    if min_height is not None:
+        ranges.append((_KEYS["height"], (min_height, None)))
+    if aspect is not None:
+        spread = aspect * aspect_tolerance
+        ranges.append((_aspect, (aspect - spread, aspect + spread)))
+    if min_size is not None or max_size is not None:
+        ranges.append((_KEYS["size"], (min_size, max_size)))
+    glob = re.compile(fnmatch.translate(name_glob)).match if name_glob else None
+
+    def match(member: ArchiveMember) -> bool:
+        for key, (low, high) in ranges:
+            value = key(member)
+            if value is None:
+                return False
+            if low is not None and value < low:
+                return False
+            if high is not None and value > high:
+                return False
+        return glob is None or glob(member.name) is not None
+
+    return match
+
+
+class _SortedKey:
+    """Members ordered by one attribute, unknown values last."""
+
+    def __init__(self, keys: List[object], by_name: List[int]) -> None:
+        """Sort positions by their key.
+
+        Args:
+            keys: Key value (or None) of each member, by position
+            by_name: Positions in name order, used to break ties
+        """
+        self.keys = keys
+        known = [i for i in by_name if keys[i] is not None]
+        known.sort(key=keys.__getitem__)
+        self.values = [keys[i] for i in known]
+        self.order = known + [i for i in by_name if keys[i] is None]
+        self.rank = [0] * len(self.order)
+        for rank, position in enumerate(self.order):
+            self.rank[position] = rank
+
+    def between(self, low: Optional[object], high: Optional[object]) -> List[int]:
+        """Positions of members with ``low <= value <= high``."""
+        start = 0 if low is None else bisect.bisect_left(self.values, low)
+        end = (
+            len(self.values)
+            if high is None
+            else bisect.bisect_right(self.values, high)
+        )
+        return self.order[start:end]
+
+    def ordered(self, descending: bool) -> Iterator[int]:
+        """Walk all positions in order, keeping unknown values last."""
+        if not descending:
+            return iter(self.order)
+        known = len(self.values)
+        return itertools.chain(reversed(self.order[:known]), self.order[known:])
+
+    def sort_key(self, descending: bool) -> Callable[[int], int]:
+        """Key function ranking positions the way ``ordered`` walks them."""
+        if not descending:
+            return self.rank.__getitem__
+        known = len(self.values)
+        rank = self.rank
+        return lambda position: (
+            known - 1 - rank[position] if rank[position] < known else rank[position]
+        )
+
+
+class WallpaperCatalog:
+    """Sorted views of the index, answering queries without a full scan."""
+
+    def __init__(self, members: Iterable[ArchiveMember]) -> None:
+        """Build the sorted views.
+
+        Args:
+            members: Current index records
+        """
+        self.members: List[ArchiveMember] = list(members)
+        names = [member.name for member in self.members]
+        by_name = sorted(range(len(names)), key=names.__getitem__)
+        self._sorted = {
+            name: _SortedKey([key(member) for member in self.members], by_name)
+            for name, key in _KEYS.items()
+        }
+
+    def query(
+        self,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[float] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> List[ArchiveMember]:
+        """Return the members matching every given filter.
+
+        Filters on width, height or aspect ratio only match members whose
+        dimensions are known.
+
+        Args:
+            min_width: Minimum width in pixels
+            min_height: Minimum height in pixels
+            aspect: Width / height ratio to match
+            aspect_tolerance: Allowed relative deviation from ``aspect``
+            min_size: Minimum size in bytes
+            max_size: Maximum size in bytes
+            name_glob: Case-sensitive glob the name must match
+            sort: One of ``SORT_KEYS``, prefixed with ``-`` for descending.
+                Ties are broken by name (reversed when descending); members
+                without a value for the key come last
+            limit: Maximum number of results
+
+        Returns:
+            Matching members in the requested order
+
+        Raises:
+            ValueError: If ``sort`` is unknown
+        """
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in self._sorted:
+            raise ValueError(
+                f"Unknown sort key: {sort_key} (expected one of {', '.join(SORT_KEYS)})"
+            )
+        if limit is not None and limit <= 0:
+            return []
+
+        ranges: Dict[str, Range] = {}
+        if min_width is not None:
+            ranges["width"] = (min_width, None)
+        if min_height is not None:
+            ranges["height"] = (min_height, None)
+        if aspect is not None:
+            spread = aspect * aspect_tolerance
+            ranges["aspect"] = (aspect - spread, aspect + spread)
+        if min_size is not None or max_size is not None:
+            ranges["size"] = (min_size, max_size)
+        prefix = _GLOB_CHARS.split(name_glob, 1)[0] if name_glob else ""
+        if prefix:
+            ranges["name"] = (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+        ordering = self._sorted[sort_key]
+        if not ranges and name_glob is None:
+            return self._pick(ordering.ordered(descending), limit)
+
+        # The narrowest range supplies the candidates; the others are checked
+        chosen, candidates = min(
+            (
+                (key, self._sorted[key].between(*bounds))
+                for key, bounds in ranges.items()
+            ),
+            key=lambda item: len(item[1]),
+            default=(None, None),
+        )
+        if candidates is None:
+            # Only a glob without a literal prefix: check every member
+            match = self._matcher(ranges, None, name_glob)
+            return self._pick(filter(match, ordering.ordered(descending)), limit)
+
+        match = self._matcher(ranges, chosen, name_glob)
+        if chosen == sort_key:
+            # Candidates are already in the requested order
+            ordered = reversed(candidates) if descending else candidates
+            return self._pick(filter(match, ordered), limit)
+        if limit is None or len(candidates) < len(self.members) * _WALK_ABOVE:
+            found = [position for position in candidates if match(position)]
+            rank = ordering.sort_key(descending)
+            if limit is not None and limit < len(found):
+                found = heapq.nsmallest(limit, found, key=rank)
+            else:
+                found.sort(key=rank)
+            return self._pick(found, None)
+
+        # Many candidates and a small limit: walk the sorted order instead
+        match = self._matcher(ranges, None, name_glob)
+        return self._pick(filter(match, ordering.ordered(descending)), limit)
+
+    def _matcher(
+        self, ranges: Dict[str, Range], skip: Optional[str], name_glob: Optional[str]
+    ) -> Callable[[int], bool]:
+        """Build a predicate over member positions for the given filters.
+
+        ``skip`` names a range the candidates already satisfy. The name
+        prefix range never needs checking: the glob implies it.
+        """
+        checks = [
+            (self._sorted[key].keys, low, high)
+            for key, (low, high) in ranges.items()
+            if key not in (skip, "name")
+        ]
+        names = self._sorted["name"].keys
+        glob = re.compile(fnmatch.translate(name_glob)).match if name_glob else None
+
+        def match(position: int) -> bool:
+            for keys, low, high in checks:
+                value = keys[position]
+                if value is None:
+                    return False
+                if low is not None and value < low:
+                    return False
+                if high is not None and value > high:
+                    return False
+            return glob is None or glob(names[position]) is not None
+
+        return match
+
+    def _pick(
+        self, positions: Iterable[int], limit: Optional[int]
+    ) -> List[ArchiveMember]:
+        """Resolve positions to members, stopping after ``limit``."""
+        return [
+            self.members[position]
+            for position in itertools.islice(positions, limit)
+        ]
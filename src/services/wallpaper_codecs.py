@@ -0,0 +1,231 @@
+# src/services/wallpaper_codecs.py
+"""Compression codecs for the segmented wallpaper archive.
+
+Every codec compresses each archive segment as an independent frame
+(a gzip member, an xz stream or a zstd frame). Concatenated frames
+decompress as one stream with the standard tools, which is what lets
+segments be appended. The ``store`` codec writes a plain, uncompressed tar,
+which avoids spending CPU on images that are already compressed.
+
+zstd support requires the optional ``zstandard`` package.
+"""
+import gzip
+import lzma
+import tarfile
+import zlib
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type
+
+DEFAULT_CODEC = "gzip"
+
+# Two zero blocks mark the end of a tar archive
+END_OF_ARCHIVE = b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+class Codec:
+    """Base class describing how segments are compressed."""
+
+    name = ""
+    magic = b""
+    framed = True
+
+    def compressor(self):
+        """Return a fresh object with ``compress(data)`` and ``flush()``."""
+        raise NotImplementedError
+
+    def decompressor(self):
+        """Return a fresh object with ``decompress``, ``eof`` and ``unused_data``."""
+        raise NotImplementedError
+
+    @property
+    def available(self) -> bool:
+        """Whether the codec's dependencies are installed."""
+        return True
+
+    @property
+    def errors(self) -> Tuple[Type[Exception], ...]:
+        """Exceptions the decompressor raises for corrupt data."""
+        return ()
+
+    @cached_property
+    def trailer(self) -> bytes:
+        """The end-of-archive marker compressed as its own frame.
+
+        It must be byte-for-byte reproducible so it can be recognised at
+        the end of an archive without decompressing anything.
+        """
+        compressor = self.compressor()
+        return compressor.compress(END_OF_ARCHIVE) + compressor.flush()
+
+
+class GzipCodec(Codec):
+    """gzip members, readable by ``tar -xzf``."""
+
+    name = "gzip"
+    magic = b"\x1f\x8b"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compressor(self):
+        # wbits=31 selects the gzip container (header with mtime 0)
+        return zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def decompressor(self):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    @property
+    def errors(self) -> Tuple[Type[Exception], ...]:
+        return (zlib.error,)
+
+    @cached_property
+    def trailer(self) -> bytes:
+        # Kept identical to the trailer written by earlier versions
+        return gzip.compress(END_OF_ARCHIVE, mtime=0)
+
+
+class XzCodec(Codec):
+    """xz streams, readable by ``tar -xJf``."""
+
+    name = "xz"
+    magic = b"\xfd7zXZ\x00"
+
+    def __init__(self, preset: int = 6) -> None:
+        self.preset = preset
+
+    def compressor(self):
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=self.preset)
+
+    def decompressor(self):
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+    @property
+    def errors(self) -> Tuple[Type[Exception], ...]:
+        return (lzma.LZMAError,)
+
+
+class ZstdCodec(Codec):
+    """zstd frames, readable by ``tar --zstd -xf``."""
+
+    name = "zstd"
+    magic = b"\x28\xb5\x2f\xfd"
+
+    def __init__(self, level: int = 3) -> None:
+        self.level = level
+
+    @property
+    def available(self) -> bool:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def compressor(self):
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def decompressor(self):
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    @property
+    def errors(self) -> Tuple[Type[Exception], ...]:
+        import zstandard
+
+        return (zstandard.ZstdError,)
+
+
+class _Passthrough:
+    """Identity (de)compressor used by the store codec."""
+
+    eof = False
+    unused_data = b""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class StoreCodec(Codec):
+    """Uncompressed tar, readable by ``tar -xf``."""
+
+    name = "store"
+    framed = False
+
+    def compressor(self):
+        return _Passthrough()
+
+    def decompressor(self):
+        return _Passthrough()
+
+    @cached_property
+    def trailer(self) -> bytes:
+        return END_OF_ARCHIVE
+
+
+CODECS: Dict[str, Codec] = {
+    codec.name: codec
+    for codec in (GzipCodec(), XzCodec(), ZstdCodec(), StoreCodec())
+}
+
+
+def codec_names() -> List[str]:
+    """Return the names of all known codecs."""
+    return list(CODECS)
+
+
+def get_codec(name: str) -> Codec:
+    """Look up a codec by name.
+
+    Args:
+        name: One of ``codec_names()``
+
+    Returns:
+        The codec
+
+    Raises:
+        ValueError: If the codec is unknown or its dependency is missing
+    """
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(
+            f"Unknown codec '{name}'. Choose from: {', '.join(CODECS)}"
+        )
+    if not codec.available:
+        raise ValueError(
+            f"Codec '{name}' requires an optional dependency "
+            "(pip install 'dotfiles-config[zstd]')"
+        )
+    return codec
+
+
+def detect_codec(archive_path: Path) -> Optional[Codec]:
+    """Detect an archive's codec from its leading magic bytes.
+
+    Args:
+        archive_path: Existing archive
+
+    Returns:
+        The matching codec, StoreCodec for a plain tar, or None if the
+        format isn't one this module writes (e.g. bzip2)
+    """
+    with open(archive_path, "rb") as f:
+        head = f.read(512)
+    for codec in CODECS.values():
+        if codec.framed and head.startswith(codec.magic):
+            return codec
+    if len(head) == 512 and head[257:262] == b"ustar":
+        return CODECS["store"]
+    if head and not head.strip(b"\0"):
+        # A tar holding nothing but the end-of-archive marker
+        return CODECS["store"]
+    return None
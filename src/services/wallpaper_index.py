@@ -0,0 +1,177 @@
+# src/services/wallpaper_index.py
+"""Sidecar index describing the members of a wallpaper archive.
+
+The index lives next to the archive (``wallpapers.tar.gz.index.json``) and
+records each wallpaper's size, mtime, location, content hash and image
+format and dimensions, together with the archive's own size and mtime. As long as those still match the
+archive, listing and lookups never need to decompress it. Members are
+stored as rows of values under a single ``fields`` header rather than one
+object each, which keeps the file (and parsing it) small for very large
+archives.
+
+Perceptual hashes and colour palettes are kept per content hash rather
+than per member: they are computed on demand, take a full image decode,
+and carry over when the index is rebuilt from a scan.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.services.wallpaper_archive import (
+    MEMBER_FIELDS,
+    ArchiveMember,
+    member_row,
+    scan_archive,
+)
+
+INDEX_VERSION = 3
+
+
+def index_path_for(archive_path: Path) -> Path:
+    """Return the sidecar index path for an archive."""
+    return archive_path.with_name(archive_path.name + ".index.json")
+
+
+class WallpaperIndex:
+    """In-memory view of the sidecar index for one archive."""
+
+    def __init__(
+        self,
+        archive_path: Path,
+        members: Optional[Iterable[ArchiveMember]] = None,
+        archive_size: int = -1,
+        archive_mtime_ns: int = -1,
+    ) -> None:
+        """Initialize the index.
+
+        Args:
+            archive_path: Archive the index describes
+            members: Member records in archive order; later records for the
+                same name replace earlier ones
+            archive_size: Archive size the records were taken from
+            archive_mtime_ns: Archive mtime the records were taken from
+        """
+        self.archive_path = archive_path
+        self.path = index_path_for(archive_path)
+        self.members: Dict[str, ArchiveMember] = {}
+        self.archive_size = archive_size
+        self.archive_mtime_ns = archive_mtime_ns
+        # Perceptual hash (hex) by SHA-256; "" marks undecodable content
+        self.phashes: Dict[str, str] = {}
+        # Dominant colours (#rrggbb) by SHA-256; [] marks undecodable content
+        self.palettes: Dict[str, List[str]] = {}
+        self.update(members or [])
+
+    @property
+    def names(self) -> List[str]:
+        """Wallpaper names in archive order."""
+        return list(self.members)
+
+    def update(self, members: Iterable[ArchiveMember]) -> None:
+        """Record new or replacement members."""
+        for member in members:
+            self.members[member.name] = member
+
+    def remove(self, names: Iterable[str]) -> None:
+        """Forget removed members."""
+        for name in names:
+            self.members.pop(name, None)
+
+    def inherit(self, other: Optional["WallpaperIndex"]) -> None:
+        """Carry over hashes and palettes of content still in the archive."""
+        if other is None:
+            return
+        present = {member.sha256 for member in self.members.values()}
+        for mine, theirs in (
+            (self.phashes, other.phashes),
+            (self.palettes, other.palettes),
+        ):
+            for sha256, value in theirs.items():
+                if sha256 in present:
+                    mine.setdefault(sha256, value)
+
+    def is_fresh(self) -> bool:
+        """Check the recorded archive size and mtime against the archive."""
+        try:
+            stat = self.archive_path.stat()
+        except FileNotFoundError:
+            return False
+        return (
+            stat.st_size == self.archive_size
+            and stat.st_mtime_ns == self.archive_mtime_ns
+        )
+
+    def stamp(self) -> None:
+        """Record the archive's current size and mtime."""
+        stat = self.archive_path.stat()
+        self.archive_size = stat.st_size
+        self.archive_mtime_ns = stat.st_mtime_ns
+
+    def save(self) -> None:
+        """Write the index next to the archive.
+
+        The file is replaced atomically so readers never see a partial index.
+        """
+        data = {
+            "version": INDEX_VERSION,
+            "archive_size": self.archive_size,
+            "archive_mtime_ns": self.archive_mtime_ns,
+            "fields": MEMBER_FIELDS,
+            "members": [member_row(member) for member in self.members.values()],
+            "phashes": self.phashes,
+            "palettes": self.palettes,
+        }
+        tmp_path = self.path.with_name(
+            f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, archive_path: Path) -> Optional["WallpaperIndex"]:
+        """Load the sidecar index for an archive.
+
+        Args:
+            archive_path: Archive whose index should be read
+
+        Returns:
+            The stored index, or None if it is missing or unreadable
+        """
+        try:
+            data = json.loads(index_path_for(archive_path).read_text())
+            if data.get("version") != INDEX_VERSION:
+                return None
+            if tuple(data["fields"]) != MEMBER_FIELDS:
+                return None
+            index = cls(
+                archive_path,
+                (ArchiveMember(*row) for row in data["members"]),
+                archive_size=data["archive_size"],
+                archive_mtime_ns=data["archive_mtime_ns"],
+            )
+            index.phashes = dict(data.get("phashes", {}))
+            index.palettes = dict(data.get("palettes", {}))
+            return index
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def build(cls, archive_path: Path) -> "WallpaperIndex":
+        """Build an index by scanning the whole archive.
+
+        Args:
+            archive_path: Archive to scan
+
+        Returns:
+            Index stamped with the archive's current size and mtime
+        """
+        index = cls(archive_path)
+        # Stamp first: if the archive changes mid-scan the index stays stale
+        index.stamp()
+        index.update(scan_archive(archive_path))
+        return index
@@ -0,0 +1,195 @@
+# src/services/wallpaper_journal.py
+"""Crash safety for wallpaper archive writes.
+
+Whole-archive writes (creating or converting an archive) go to a temporary
+file in the same directory, which is fsynced and atomically renamed over
+the archive. Appends modify the archive in place, so before the trailer is
+replaced a small journal records where it started; if the process dies
+mid-append, the next operation truncates the partial segment and restores
+the trailer, returning the archive to its last committed state.
+
+Concurrent processes coordinate through an advisory ``flock`` on a sidecar
+lock file: writers take it exclusively, readers that may rescan the
+archive take it shared. Readers of an archive in a read-only directory
+(a system-wide install or a read-only mount) can't create the lock file
+and go without it, since nobody can be writing there either.
+"""
+import contextlib
+import errno
+import json
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+from src.services.wallpaper_codecs import get_codec
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+def lock_path_for(archive_path: Path) -> Path:
+    """Return the advisory lock file path for an archive."""
+    return archive_path.with_name(archive_path.name + ".lock")
+
+
+def journal_path_for(archive_path: Path) -> Path:
+    """Return the append journal path for an archive."""
+    return archive_path.with_name(archive_path.name + ".journal")
+
+
+@contextlib.contextmanager
+def archive_lock(archive_path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on an archive for the duration of the block.
+
+    Blocks until the lock is available. Without ``fcntl`` (Windows) this
+    is a no-op.
+
+    Args:
+        archive_path: Archive to lock (its directory must exist)
+        shared: Take a shared (reader) lock instead of an exclusive one.
+            Where the lock file can't be created or opened because the
+            directory is read-only, the block runs without a lock
+    """
+    if fcntl is None:
+        yield
+        return
+    f = _open_lock_file(lock_path_for(archive_path), shared)
+    if f is None:
+        yield
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _open_lock_file(lock_path: Path, shared: bool) -> Optional[BinaryIO]:
+    """Open (creating) a lock file; None if a reader can't in a read-only place."""
+    try:
+        return open(lock_path, "a+b")
+    except OSError as e:
+        if not shared or e.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+            raise
+    try:
+        # An existing lock file can still be locked through a read-only handle
+        return open(lock_path, "rb")
+    except OSError:
+        return None
+
+
+def fsync_directory(path: Path) -> None:
+    """Flush a directory entry change (create, rename, unlink) to disk."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_output(path: Path) -> Iterator[Path]:
+    """Provide a temporary path that replaces ``path`` on success.
+
+    The caller writes (and fsyncs) the temporary file; it is then renamed
+    over ``path`` and the directory is fsynced. On error the temporary file
+    is removed and ``path`` is left untouched. The temporary file gets the
+    permissions of the file it replaces, or the umask default.
+
+    Args:
+        path: Final destination
+
+    Yields:
+        Temporary file path in the same directory
+    """
+    tmp_path = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = None
+    os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666))
+    try:
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    fsync_directory(path.parent)
+
+
+@contextlib.contextmanager
+def append_journal(
+    archive_path: Path, trailer_offset: int, codec: str
+) -> Iterator[None]:
+    """Journal an in-place append so a crash can be rolled back.
+
+    Args:
+        archive_path: Archive being appended to
+        trailer_offset: Position of the current trailer, where the new
+            data starts
+        codec: Name of the archive's codec
+    """
+    journal = journal_path_for(archive_path)
+    with open(journal, "w") as f:
+        json.dump({"trailer_offset": trailer_offset, "codec": codec}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    fsync_directory(archive_path.parent)
+    yield
+    journal.unlink()
+    fsync_directory(archive_path.parent)
+
+
+def recover(archive_path: Path) -> bool:
+    """Roll back an append that was interrupted, if any.
+
+    Must be called with the archive locked exclusively.
+
+    Args:
+        archive_path: Archive to check
+
+    Returns:
+        True if an interrupted append was rolled back
+    """
+    journal = journal_path_for(archive_path)
+    try:
+        state = json.loads(journal.read_text())
+        trailer_offset = int(state["trailer_offset"])
+        codec = get_codec(state["codec"])
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, KeyError, TypeError):
+        # A journal that was never fully written: the archive wasn't touched
+        journal.unlink(missing_ok=True)
+        return False
+
+    if archive_path.exists():
+        with open(archive_path, "r+b") as f:
+            f.truncate(trailer_offset)
+            f.seek(trailer_offset)
+            f.write(codec.trailer)
+            f.flush()
+            os.fsync(f.fileno())
+    journal.unlink()
+    fsync_directory(archive_path.parent)
+    return True
+
+
+def needs_recovery(archive_path: Path) -> bool:
+    """Check whether an interrupted append left a journal behind."""
+    return journal_path_for(archive_path).exists()
+
@@ -0,0 +1,122 @@
+# src/services/wallpaper_palette.py
+"""Dominant colour palettes of wallpapers.
+
+Each image is reduced to a 64x64 RGB sample and clustered with k-means.
+Samples are decoded one image at a time (in worker processes) and
+clustered a whole batch at once: every iteration is a few NumPy array
+operations over all images of the batch. Clusters start from pixels at
+evenly spaced luminance quantiles, so the result is deterministic.
+
+Palettes are precomputed so theme switching can read the colours of a
+wallpaper from the index instead of analysing the image again.
+
+Requires the optional ``Pillow`` and ``numpy`` packages.
+"""
+import io
+from typing import List, Sequence
+
+PALETTE_SIZE = 8
+SAMPLE_SIZE = 64
+
+_ITERATIONS = 12
+# Rec. 601 luma weights, used to order the initial cluster centres
+_LUMA = (0.299, 0.587, 0.114)
+
+
+def sample_colors(data: bytes) -> bytes:
+    """Decode an image into the RGB sample its palette is computed from.
+
+    The image is squashed to a fixed size regardless of aspect ratio, so
+    samples of different images can be stacked; this scales every region
+    equally and doesn't change the colour shares.
+
+    Runs in worker processes, so it takes and returns plain bytes.
+
+    Args:
+        data: Encoded image
+
+    Returns:
+        ``SAMPLE_SIZE * SAMPLE_SIZE`` RGB pixels, row by row
+
+    Raises:
+        ValueError: If the image can't be decoded
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+            sample = image.convert("RGB").resize(
+                (SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX
+            )
+            return sample.tobytes()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Cannot decode image: {e}") from e
+
+
+def extract_palettes(
+    samples: Sequence[bytes], colors: int = PALETTE_SIZE
+) -> List[List[str]]:
+    """Cluster a batch of samples from ``sample_colors``.
+
+    Args:
+        samples: RGB samples
+        colors: Number of clusters per image
+
+    Returns:
+        For each sample, up to ``colors`` ``#rrggbb`` colours, most common
+        first (clusters that end up empty are dropped)
+    """
+    import numpy as np
+
+    if not samples:
+        return []
+    count = len(samples)
+    pixels = np.frombuffer(b"".join(samples), dtype=np.uint8)
+    pixels = pixels.reshape(count, -1, 3).astype(np.float32)
+    size = pixels.shape[1]
+
+    # Start from pixels at the middle of equal luminance slices
+    luma = pixels @ np.array(_LUMA, dtype=np.float32)
+    order = np.argsort(luma, axis=1, kind="stable")
+    picks = order[:, ((np.arange(colors) + 0.5) * size / colors).astype(int)]
+    centers = np.take_along_axis(pixels, picks[:, :, None], axis=1)
+
+    # Cluster ids offset per image, so one bincount sums the whole batch
+    offsets = (np.arange(count) * colors)[:, None]
+    channels = [pixels[:, :, channel].ravel() for channel in range(3)]
+    for _ in range(_ITERATIONS):
+        # argmin |p - c|^2 = argmin |c|^2 - 2 p.c, for all images at once
+        distances = (centers**2).sum(axis=2)[:, None, :] - 2 * (
+            pixels @ centers.transpose(0, 2, 1)
+        )
+        labels = (distances.argmin(axis=2) + offsets).ravel()
+        counts = np.bincount(labels, minlength=count * colors)
+        sums = np.stack(
+            [
+                np.bincount(labels, weights=values, minlength=count * colors)
+                for values in channels
+            ],
+            axis=1,
+        )
+        counts = counts.reshape(count, colors)
+        sums = sums.reshape(count, colors, 3)
+        # Empty clusters keep their centre
+        centers = np.where(
+            counts[:, :, None] > 0,
+            sums / np.maximum(counts, 1)[:, :, None],
+            centers,
+        ).astype(np.float32)
+
+    rgb = np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+    palettes = []
+    for image_counts, image_rgb in zip(counts, rgb):
+        ranked = np.argsort(-image_counts, kind="stable")
+        palettes.append(
+            [
+                "#{:02x}{:02x}{:02x}".format(*image_rgb[cluster])
+                for cluster in ranked
+                if image_counts[cluster] > 0
+            ]
+        )
+    return palettes
@@ -0,0 +1,363 @@
+# src/services/wallpaper_search.py
+"""Ranked fuzzy search over wallpaper names.
+
+Names are case-folded and split into words at anything that isn't a
+letter or digit. A query is answered in tiers, each from a sorted table
+searched by bisection:
+
+- exact names, with or without their extension;
+- names starting with the query;
+- names with a word starting with the query;
+- fuzzy matches: each word of the query is compared with the vocabulary
+  (the distinct words of all names) through trigram postings, and names
+  containing the closest words, for every query word if possible, come
+  first.
+
+Names are listed alphabetically within each word's postings, so a tier
+hands out its first results without ranking every name it matches: a
+query costs about the same for a hundred names as for a million.
+Fuzzy matching works on the vocabulary rather than the names, which is
+much smaller because words such as ``sunset`` or ``png`` recur.
+
+The tables are saved next to the archive (``wallpapers.tar.gz.search``)
+as a JSON header line followed by arrays of 32-bit positions, and rebuilt
+when the archive's size or mtime changes.
+"""
+import array
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+SEARCH_VERSION = 1
+DEFAULT_LIMIT = 20
+
+# Trigram (Jaccard) similarity a vocabulary word needs to match a query word
+_MIN_SIMILARITY = 0.2
+# Length difference up to which candidates are compared by edit distance
+_MAX_EDITS = 2
+# Candidates (most shared trigrams first) compared by edit distance
+_MAX_EDIT_CANDIDATES = 64
+# Closest vocabulary words considered per query word
+_MAX_WORD_MATCHES = 32
+# Vocabulary words taken from a prefix range (``4`` may start thousands)
+_MAX_PREFIX_WORDS = 256
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def search_path_for(archive_path: Path) -> Path:
+    """Return the persisted search index path for an archive."""
+    return archive_path.with_name(archive_path.name + ".search")
+
+
+def _trigrams(word: str) -> Set[str]:
+    """Trigrams of a word, padded so its start and end count."""
+    padded = f" {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_similarity(a: str, b: str) -> float:
+    """One minus the edit distance over the longer length.
+
+    Insertions, deletions, substitutions and swaps of adjacent characters
+    each count as one edit (optimal string alignment distance).
+    """
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        before, previous = previous, current
+    return 1 - previous[-1] / max(len(a), len(b), 1)
+
+
+def _prefix_end(prefix: str) -> str:
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _prefix_range(keys: Sequence[str], prefix: str) -> Tuple[int, int]:
+    """Slice of sorted ``keys`` that start with ``prefix``."""
+    start = bisect.bisect_left(keys, prefix)
+    return start, bisect.bisect_left(keys, _prefix_end(prefix), lo=start)
+
+
+class NameSearchIndex:
+    """Sorted names, vocabulary postings and vocabulary trigrams."""
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        archive_size: int = -1,
+        archive_mtime_ns: int = -1,
+        _tables: Optional[Tuple] = None,
+    ) -> None:
+        """Build the search tables (or adopt loaded ones).
+
+        Args:
+            names: Wallpaper names; results are drawn from these
+            archive_size: Archive size the names were taken from
+            archive_mtime_ns: Archive mtime the names were taken from
+        """
+        self.names = list(names)
+        self.archive_size = archive_size
+        self.archive_mtime_ns = archive_mtime_ns
+        self._folded = [name.casefold() for name in self.names]
+        if _tables is not None:
+            (
+                self._name_order,
+                self._vocab,
+                self._vocab_offsets,
+                self._word_ids,
+                self._grams,
+                self._gram_ids,
+            ) = _tables
+            self._sorted = [self._folded[i] for i in self._name_order]
+            return
+
+        self._name_order = array.array(
+            "I", sorted(range(len(self.names)), key=self._folded.__getitem__)
+        )
+        self._sorted = [self._folded[i] for i in self._name_order]
+
+        # Visiting names in sorted order keeps each word's postings sorted
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for position in self._name_order:
+            for word in dict.fromkeys(_WORD.findall(self._folded[position])):
+                postings[word].append(position)
+        self._vocab = sorted(postings)
+        self._vocab_offsets = array.array("I", [0])
+        self._word_ids = array.array("I")
+        for word in self._vocab:
+            self._word_ids.extend(postings[word])
+            self._vocab_offsets.append(len(self._word_ids))
+
+        gram_postings: Dict[str, List[int]] = defaultdict(list)
+        for word_id, word in enumerate(self._vocab):
+            for gram in _trigrams(word):
+                gram_postings[gram].append(word_id)
+        self._grams: Dict[str, Tuple[int, int]] = {}
+        self._gram_ids = array.array("I")
+        for gram, word_ids in gram_postings.items():
+            self._grams[gram] = (len(self._gram_ids), len(word_ids))
+            self._gram_ids.extend(word_ids)
+
+    def is_fresh_for(self, archive_size: int, archive_mtime_ns: int) -> bool:
+        """Check whether the index was built from this archive state."""
+        return (self.archive_size, self.archive_mtime_ns) == (
+            archive_size,
+            archive_mtime_ns,
+        )
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """Find names matching ``text``, best first.
+
+        Args:
+            text: Query; matched case-insensitively
+            limit: Maximum number of results
+
+        Returns:
+            Matching names: exact names (extension ignored), then names
+            starting with the query, names with a word starting with it,
+            and finally fuzzy matches
+        """
+        query = text.casefold().strip()
+        if not query or limit <= 0:
+            return []
+        found: List[int] = []
+        seen: Set[int] = set()
+        for tier in (
+            self._exact(query),
+            self._name_prefixes(query),
+            self._word_prefixes(query),
+            self._fuzzy(query),
+        ):
+            for position in tier:
+                if position not in seen:
+                    seen.add(position)
+                    found.append(position)
+                    if len(found) == limit:
+                        return [self.names[i] for i in found]
+        return [self.names[i] for i in found]
+
+    def _exact(self, query: str) -> Iterator[int]:
+        """Names equal to the query, or to the query plus an extension."""
+        start = bisect.bisect_left(self._sorted, query)
+        end = bisect.bisect_right(self._sorted, query, lo=start)
+        yield from (self._name_order[i] for i in range(start, end))
+        start, end = _prefix_range(self._sorted, query + ".")
+        for i in range(start, end):
+            if "." not in self._sorted[i][len(query) + 1 :]:
+                yield self._name_order[i]
+
+    def _name_prefixes(self, query: str) -> Iterator[int]:
+        """Names starting with the query, in name order."""
+        start, end = _prefix_range(self._sorted, query)
+        return (self._name_order[i] for i in range(start, end))
+
+    def _word_prefixes(self, query: str) -> Iterator[int]:
+        """Names with a word starting with the query, in word order."""
+        start, end = _prefix_range(self._vocab, query)
+        return self._postings(range(start, end))
+
+    def _postings(self, word_ids: Iterable[int]) -> Iterator[int]:
+        """Names containing each of the vocabulary words in turn."""
+        for word_id in word_ids:
+            start = self._vocab_offsets[word_id]
+            end = self._vocab_offsets[word_id + 1]
+            yield from self._word_ids[start:end]
+
+    def _posting_set(self, word_ids: Iterable[int]) -> Set[int]:
+        """Names containing any of the vocabulary words."""
+        names: Set[int] = set()
+        for word_id in word_ids:
+            start = self._vocab_offsets[word_id]
+            names.update(self._word_ids[start : self._vocab_offsets[word_id + 1]])
+        return names
+
+    def _fuzzy(self, query: str) -> Iterator[int]:
+        """Names containing words close to the query's words.
+
+        Names where every query word finds its best match come first, then
+        names where every query word finds some match, then names matching
+        some of them. Each group follows the rarest query word's matches.
+        """
+        matches = [
+            self._similar_words(word)
+            for word in dict.fromkeys(_WORD.findall(query))
+        ]
+        matches = [ranked for ranked in matches if ranked]
+        if not matches:
+            return
+        every = [[word_id for word_id, _ in ranked] for ranked in matches]
+        if len(matches) > 1:
+            best = [
+                [word_id for word_id, score in ranked if score == ranked[0][1]]
+                for ranked in matches
+            ]
+            for level in (best, every):
+                sets = [self._posting_set(word_ids) for word_ids in level]
+                common = set.intersection(*sets)
+                driver = min(range(len(sets)), key=lambda i: len(sets[i]))
+                for position in self._postings(level[driver]):
+                    if position in common:
+                        yield position
+        for word_ids in every:
+            yield from self._postings(word_ids)
+
+    def _similar_words(self, word: str) -> List[Tuple[int, float]]:
+        """Vocabulary words closest to ``word``, best first.
+
+        Candidates share at least one trigram with ``word`` and score
+        their trigram (Jaccard) similarity; those sharing the most also
+        get their edit similarity, which forgives transposed letters, if
+        it is higher. Words starting with
+        ``word`` (it may still be being typed) score at least one half,
+        more the more of them it covers.
+
+        Returns:
+            (vocabulary position, score) pairs
+        """
+        grams = _trigrams(word)
+        shared: Counter = Counter()
+        for gram in grams:
+            span = self._grams.get(gram)
+            if span is not None:
+                offset, count = span
+                shared.update(self._gram_ids[offset : offset + count])
+        scores = {}
+        for word_id, count in shared.items():
+            # A padded word of n characters has (at most) n trigrams
+            score = count / (len(grams) + len(self._vocab[word_id]) - count)
+            if score >= _MIN_SIMILARITY:
+                scores[word_id] = score
+        for word_id, _ in shared.most_common(_MAX_EDIT_CANDIDATES):
+            other = self._vocab[word_id]
+            if abs(len(other) - len(word)) <= _MAX_EDITS:
+                score = _edit_similarity(word, other)
+                if score > scores.get(word_id, _MIN_SIMILARITY):
+                    scores[word_id] = score
+        start, end = _prefix_range(self._vocab, word)
+        for word_id in range(start, min(end, start + _MAX_PREFIX_WORDS)):
+            prefix_score = 0.5 + 0.5 * len(word) / len(self._vocab[word_id])
+            scores[word_id] = max(scores.get(word_id, 0.0), prefix_score)
+        ranked = sorted(
+            scores.items(),
+            key=lambda item: (-item[1], len(self._vocab[item[0]]), self._vocab[item[0]]),
+        )
+        return ranked[:_MAX_WORD_MATCHES]
+
+    def save(self, path: Path) -> None:
+        """Write the index atomically.
+
+        Args:
+            path: Destination (see ``search_path_for``)
+        """
+        tables = (self._name_order, self._vocab_offsets, self._word_ids, self._gram_ids)
+        header = {
+            "version": SEARCH_VERSION,
+            "byteorder": sys.byteorder,
+            "archive_size": self.archive_size,
+            "archive_mtime_ns": self.archive_mtime_ns,
+            "names": self.names,
+            "vocab": self._vocab,
+            "grams": self._grams,
+            "tables": [len(table) for table in tables],
+        }
+        tmp_path = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode() + b"\n")
+            for table in tables:
+                table.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["NameSearchIndex"]:
+        """Read a saved index.
+
+        Returns:
+            The index, or None if it is missing, unreadable or written by
+            another version or byte order
+        """
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                if (
+                    header.get("version") != SEARCH_VERSION
+                    or header.get("byteorder") != sys.byteorder
+                ):
+                    return None
+                tables = []
+                for count in header["tables"]:
+                    table = array.array("I")
+                    table.fromfile(f, count)
+                    tables.append(table)
+                name_order, vocab_offsets, word_ids, gram_ids = tables
+                grams = {gram: tuple(span) for gram, span in header["grams"].items()}
+                return cls(
+                    header["names"],
+                    archive_size=header["archive_size"],
+                    archive_mtime_ns=header["archive_mtime_ns"],
+                    _tables=(
+                        name_order,
+                        header["vocab"],
+                        vocab_offsets,
+                        word_ids,
+                        grams,
+                        gram_ids,
+                    ),
+                )
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            return None
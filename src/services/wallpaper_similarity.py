@@ -0,0 +1,206 @@
+# src/services/wallpaper_similarity.py
+"""Perceptual hashes for finding near-duplicate wallpapers.
+
+Each image is reduced to a 32x32 grayscale sample; the hash keeps the sign
+of its lowest 8x8 DCT frequencies relative to their median (pHash).
+Rescaling and re-encoding barely move those frequencies, so copies of one
+picture at other resolutions or qualities hash within a few bits of each
+other. Samples are decoded one image at a time (in worker processes) and
+transformed a whole batch at once as NumPy matrix products.
+
+Similar hashes are found with multi-index hashing instead of comparing
+every pair: see ``HammingIndex``.
+
+Requires the optional ``Pillow`` and ``numpy`` packages.
+"""
+import functools
+import io
+import itertools
+from typing import Dict, Hashable, Iterator, List, Mapping, Sequence, Tuple
+
+HASH_BITS = 64
+SAMPLE_SIZE = 32
+DEFAULT_THRESHOLD = 8
+
+# Low frequencies kept per axis: 8 x 8 = HASH_BITS
+_LOW = 8
+# Bit ranges the Hamming index splits hashes into: 21, 21 and 22 bits
+_PARTS = ((0, 21), (21, 21), (42, 22))
+
+
+def similarity_available() -> bool:
+    """Check whether Pillow and numpy are installed."""
+    try:
+        import numpy  # noqa: F401
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def sample_pixels(data: bytes) -> bytes:
+    """Decode an image into the grayscale sample its hash is computed from.
+
+    Runs in worker processes, so it takes and returns plain bytes.
+
+    Args:
+        data: Encoded image
+
+    Returns:
+        ``SAMPLE_SIZE * SAMPLE_SIZE`` 8-bit luminance values, row by row
+
+    Raises:
+        ValueError: If the image can't be decoded
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))
+            sample = image.convert("L").resize(
+                (SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX
+            )
+            return sample.tobytes()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Cannot decode image: {e}") from e
+
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix():
+    """Rows of the DCT-II basis for the kept frequencies."""
+    import numpy as np
+
+    n = np.arange(SAMPLE_SIZE)
+    k = np.arange(_LOW)[:, None]
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * SAMPLE_SIZE))
+
+
+def perceptual_hashes(samples: Sequence[bytes]) -> List[int]:
+    """Hash a batch of samples from ``sample_pixels``.
+
+    Args:
+        samples: Grayscale samples
+
+    Returns:
+        One 64-bit hash per sample, in order
+    """
+    import numpy as np
+
+    if not samples:
+        return []
+    pixels = np.frombuffer(b"".join(samples), dtype=np.uint8)
+    pixels = pixels.reshape(len(samples), SAMPLE_SIZE, SAMPLE_SIZE).astype(np.float32)
+    dct = _dct_matrix().astype(np.float32)
+    # Separable 2-D DCT of every sample: (8x32) @ (Nx32x32) @ (32x8)
+    low = (dct @ pixels @ dct.T).reshape(len(samples), HASH_BITS)
+    bits = low > np.median(low, axis=1, keepdims=True)
+    packed = np.packbits(bits, axis=1).view(">u8").ravel()
+    return [int(value) for value in packed]
+
+
+def format_hash(value: int) -> str:
+    """Render a hash as the hex string stored in the index."""
+    return f"{value:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+@functools.lru_cache(maxsize=None)
+def _flips(width: int, radius: int) -> Tuple[int, ...]:
+    """All ``width``-bit masks with at most ``radius`` bits set."""
+    return tuple(
+        sum(1 << bit for bit in bits)
+        for count in range(radius + 1)
+        for bits in itertools.combinations(range(width), count)
+    )
+
+
+class HammingIndex:
+    """Multi-index hashing over 64-bit hashes.
+
+    Every hash is split into three parts of about 21 bits with one table
+    per part. Two hashes within distance ``r`` have at least one part
+    within ``r // 3`` bits of each other (pigeonhole), so a query only
+    looks up the few part values that close to its own and checks the
+    hashes found there, instead of comparing against every stored hash.
+    """
+
+    def __init__(self, hashes: Sequence[int]) -> None:
+        """Build the part tables.
+
+        Args:
+            hashes: Hashes to search, referred to by position
+        """
+        self.hashes: List[int] = []
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in _PARTS]
+        for value in hashes:
+            self.add(value)
+
+    def add(self, value: int) -> int:
+        """Store another hash and return its position."""
+        position = len(self.hashes)
+        self.hashes.append(value)
+        for (shift, width), table in zip(_PARTS, self._tables):
+            key = (value >> shift) & ((1 << width) - 1)
+            table.setdefault(key, []).append(position)
+        return position
+
+    def near(self, value: int, radius: int) -> Iterator[Tuple[int, int]]:
+        """Find stored hashes within ``radius`` bits of ``value``.
+
+        Yields:
+            ``(position, distance)`` pairs, each position once
+        """
+        part_radius = radius // len(_PARTS)
+        seen = set()
+        for (shift, width), table in zip(_PARTS, self._tables):
+            key = (value >> shift) & ((1 << width) - 1)
+            flips = _flips(width, part_radius)
+            if len(table) < len(flips):
+                # Few distinct values: scanning them beats enumerating flips
+                keys = [k for k in table if (k ^ key).bit_count() <= part_radius]
+            else:
+                keys = [key ^ flip for flip in flips if key ^ flip in table]
+            for k in keys:
+                for position in table[k]:
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    distance = hamming(value, self.hashes[position])
+                    if distance <= radius:
+                        yield position, distance
+
+
+def group_similar(hashes: Mapping[Hashable, int], radius: int) -> List[List[Hashable]]:
+    """Group keys whose hashes are within ``radius`` bits, transitively.
+
+    Args:
+        hashes: Hash of each key
+        radius: Maximum Hamming distance between neighbours
+
+    Returns:
+        Groups of two or more keys, in the order keys were given
+    """
+    keys = list(hashes)
+    index = HammingIndex([hashes[key] for key in keys])
+    parent = list(range(len(keys)))
+
+    def root(position: int) -> int:
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    for position, key in enumerate(keys):
+        for other, _ in index.near(hashes[key], radius):
+            a, b = root(position), root(other)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    groups: Dict[int, List[Hashable]] = {}
+    for position, key in enumerate(keys):
+        groups.setdefault(root(position), []).append(key)
+    return [group for group in groups.values() if len(group) > 1]
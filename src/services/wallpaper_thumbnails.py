@@ -0,0 +1,153 @@
+# src/services/wallpaper_thumbnails.py
+"""Downscaled wallpaper previews cached by content hash.
+
+Thumbnails are PNG files under the XDG cache directory, named after the
+SHA-256 of the wallpaper they were made from and their size, so renamed or
+duplicated wallpapers share one preview and changed content gets a new
+one. Reading a thumbnail refreshes its mtime; when the cache grows past
+its byte budget, the least recently used files are deleted first.
+
+Rendering requires the optional ``Pillow`` package.
+"""
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Collection, Optional
+
+DEFAULT_SIZE = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_thumbnail_dir() -> Path:
+    """Return the thumbnail directory below the XDG cache home."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "dotfiles-config" / "wallpapers" / "thumbnails"
+
+
+def pillow_available() -> bool:
+    """Check whether Pillow is installed."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def render_thumbnail(data: bytes, size: int) -> bytes:
+    """Downscale an image to fit a ``size`` x ``size`` box.
+
+    Runs in worker processes, so it takes and returns plain bytes. JPEG
+    images are decoded at reduced scale where possible, which skips most
+    of the full-resolution decode.
+
+    Args:
+        data: Encoded image
+        size: Longest edge of the thumbnail in pixels
+
+    Returns:
+        The thumbnail encoded as PNG
+
+    Raises:
+        ValueError: If the image can't be decoded
+    """
+    from PIL import Image
+
+    out = io.BytesIO()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (size, size))
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            image.save(out, format="PNG")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # Pillow reports corrupt data with several exception types
+        raise ValueError(f"Cannot decode image: {e}") from e
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    """Directory of thumbnails with least-recently-used eviction by size."""
+
+    def __init__(
+        self, root: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            root: Cache directory (defaults to ``default_thumbnail_dir()``)
+            max_bytes: Total size the cache is trimmed to after writes
+        """
+        self.root = root or default_thumbnail_dir()
+        self.max_bytes = max_bytes
+
+    def path_for(self, sha256: str, size: int) -> Path:
+        """Return where the thumbnail of some content at a size is stored."""
+        return self.root / sha256[:2] / f"{sha256}-{size}.png"
+
+    def get(self, sha256: str, size: int) -> Optional[Path]:
+        """Look up a thumbnail, marking it as recently used.
+
+        Returns:
+            Path to the cached thumbnail, or None if it isn't cached
+        """
+        path = self.path_for(sha256, size)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, sha256: str, size: int, data: bytes) -> Path:
+        """Write a thumbnail atomically.
+
+        Returns:
+            Path to the cached thumbnail
+        """
+        path = self.path_for(sha256, size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return path
+
+    def evict(
+        self, keep: Collection[Path] = (), max_bytes: Optional[int] = None
+    ) -> int:
+        """Delete least recently used thumbnails until under the budget.
+
+        Args:
+            keep: Thumbnails that must survive, e.g. ones just handed out
+            max_bytes: Budget overriding ``self.max_bytes``
+
+        Returns:
+            Number of bytes freed
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= budget:
+                break
+            if path in keep:
+                continue
+            path.unlink(missing_ok=True)
+            freed += size
+        return freed
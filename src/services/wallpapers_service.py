@@ -1,10 +1,83 @@
 # src/services/wallpapers_service.py
 """Core wallpaper management service."""
-import shutil
+import contextlib
+import fnmatch
+import glob
+import hashlib
+import itertools
+import os
 import tarfile
-import tempfile
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from src.services import wallpaper_archive, zero_copy
+from src.services.image_probe import probe_file
+from src.services.wallpaper_archive import ArchiveMember
+from src.services.wallpaper_cache import LINK_MODES, BlobCache, materialize
+from src.services.wallpaper_catalog import (
+    DEFAULT_ASPECT_TOLERANCE,
+    WallpaperCatalog,
+    member_filter,
+    parse_aspect,
+)
+from src.services.wallpaper_codecs import (
+    DEFAULT_CODEC,
+    Codec,
+    detect_codec,
+    get_codec,
+)
+from src.services.wallpaper_index import WallpaperIndex
+from src.services.wallpaper_journal import (
+    archive_lock,
+    atomic_output,
+    needs_recovery,
+    recover,
+)
+from src.services.wallpaper_palette import extract_palettes, sample_colors
+from src.services.wallpaper_search import (
+    DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT,
+    NameSearchIndex,
+    search_path_for,
+)
+from src.services.wallpaper_similarity import (
+    DEFAULT_THRESHOLD as DEFAULT_SIMILARITY_THRESHOLD,
+    HASH_BITS,
+    HammingIndex,
+    format_hash,
+    group_similar,
+    perceptual_hashes,
+    sample_pixels,
+    similarity_available,
+)
+from src.services.wallpaper_thumbnails import (
+    DEFAULT_SIZE as DEFAULT_THUMBNAIL_SIZE,
+    ThumbnailCache,
+    pillow_available,
+    render_thumbnail,
+)
+
+NEAR_DUPLICATE_MODES = ("warn", "reject")
+
+# Samples turned into perceptual hashes per NumPy call
+_HASH_BATCH = 1024
+# Samples clustered together (each iteration holds batch x 4096 x 8 floats)
+_PALETTE_BATCH = 256
 
 
 class WallpaperError(Exception):
@@ -31,6 +104,143 @@ class InvalidImageError(WallpaperError):
     pass
 
 
+def _is_glob_pattern(pattern: str) -> bool:
+    """Check whether a path string contains glob wildcards."""
+    return any(char in pattern for char in "*?[")
+
+
+@dataclass
+class AddResult:
+    """Outcome of adding one file in a batch.
+
+    ``status`` is one of ``"added"``, ``"overwritten"``, ``"skipped"``
+    (a wallpaper with the same name exists and overwrite was disabled),
+    ``"unchanged"`` (the archive already holds identical content under that
+    name) or ``"rejected"`` (a near-duplicate, when rejecting those).
+    ``duplicate_of`` names the wallpaper whose stored content was reused
+    instead of writing the file's bytes again; ``similar_to`` names a
+    wallpaper that looks the same when near-duplicates are checked.
+    """
+
+    path: Path
+    name: str
+    status: str
+    duplicate_of: Optional[str] = None
+    similar_to: Optional[str] = None
+
+
+@dataclass(slots=True)
+class WallpaperInfo:
+    """Metadata recorded in the index for one wallpaper.
+
+    ``format``, ``width`` and ``height`` are None when the stored content
+    isn't a recognised image (e.g. it was added without validation).
+    """
+
+    name: str
+    size: int
+    mtime: int
+    sha256: str
+    format: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+
+    @classmethod
+    def from_member(cls, member: ArchiveMember) -> "WallpaperInfo":
+        """Build the public record for an archive member."""
+        return cls(
+            name=member.name,
+            size=member.size,
+            mtime=member.mtime,
+            sha256=member.sha256,
+            format=member.format,
+            width=member.width,
+            height=member.height,
+        )
+
+
+@dataclass
+class ConvertResult:
+    """Outcome of rewriting the archive with another codec."""
+
+    old_codec: str
+    new_codec: str
+    old_size: int
+    new_size: int
+
+
+@dataclass
+class VerifyResult:
+    """Outcome of checking the archive against its stored index."""
+
+    checked: int
+    problems: List[str]
+
+    @property
+    def ok(self) -> bool:
+        """True if no problems were found."""
+        return not self.problems
+
+
+@dataclass
+class SyncResult:
+    """Outcome of synchronising a directory with the archive."""
+
+    path: Path
+    copied: List[str]
+    skipped: List[str]
+    removed: List[str]
+
+
+@dataclass
+class ThumbnailResult:
+    """Outcome of building thumbnails.
+
+    ``paths`` maps each wallpaper to its cached thumbnail. ``generated``
+    and ``cached`` count distinct contents rendered now or found in the
+    cache; ``failed`` lists wallpapers whose data couldn't be decoded.
+    """
+
+    paths: Dict[str, Path]
+    generated: int
+    cached: int
+    failed: List[str]
+
+
+@dataclass
+class PaletteResult:
+    """Outcome of computing palettes.
+
+    ``palettes`` maps each wallpaper to its dominant colours (``#rrggbb``,
+    most common first). ``computed`` and ``stored`` count distinct
+    contents analysed now or already in the index; ``failed`` lists
+    wallpapers whose data couldn't be decoded.
+    """
+
+    palettes: Dict[str, List[str]]
+    computed: int
+    stored: int
+    failed: List[str]
+
+
+@dataclass
+class CompactResult:
+    """Outcome of compacting the archive.
+
+    With ``dry_run`` the compacted archive was written to a temporary
+    file and discarded, so ``new_size`` is what compaction would leave.
+    """
+
+    old_size: int
+    new_size: int
+    dry_run: bool = False
+
+    @property
+    def freed(self) -> int:
+        """Bytes reclaimed (or reclaimable) by compaction."""
+        return self.old_size - self.new_size
+
+
 class WallpapersService:
     """Service for managing wallpapers in a tar.gz archive."""
 
@@ -38,13 +248,53 @@ class WallpapersService:
         ["jpg", "jpeg", "png", "gif", "bmp", "webp", "tiff", "tif"]
     )
 
-    def __init__(self, archive_path: Path) -> None:
+    def __init__(
+        self,
+        archive_path: Path,
+        codec: Optional[str] = None,
+        workers: Optional[int] = None,
+        cache_dir: Optional[Path] = None,
+        thumbnail_dir: Optional[Path] = None,
+    ) -> None:
         """Initialize the service with the archive path.
 
         Args:
             archive_path: Path to the wallpapers.tar.gz archive
+            codec: Compression codec for newly created archives (gzip, xz,
+                zstd or store; defaults to gzip). Existing archives keep
+                the codec they were written with, detected from their
+                magic bytes.
+            workers: Threads used to compress and decompress segments
+                (defaults to the number of CPUs; 1 disables parallelism)
+            cache_dir: Blob cache used by linked extraction (defaults to
+                ``$XDG_DATA_HOME/dotfiles-config/wallpapers/blobs``)
+            thumbnail_dir: Thumbnail cache (defaults to
+                ``$XDG_CACHE_HOME/dotfiles-config/wallpapers/thumbnails``)
+
+        Raises:
+            WallpaperError: If the codec is unknown or unavailable, or
+                workers is less than 1
         """
         self.archive_path = archive_path
+        try:
+            self.codec = get_codec(codec or DEFAULT_CODEC)
+        except ValueError as e:
+            raise WallpaperError(str(e)) from e
+        if workers is not None and workers < 1:
+            raise WallpaperError(f"Worker count must be at least 1, got {workers}")
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = BlobCache(cache_dir)
+        self.thumbnail_cache = ThumbnailCache(thumbnail_dir)
+        # Per-thread lock mode ("shared"/"exclusive") so nested operations
+        # don't re-take the file lock
+        self._lock_state = threading.local()
+        # Threads whose unfinished iter_wallpapers() scan holds a shared lock
+        self._scanning: Counter = Counter()
+        self._scanning_lock = threading.Lock()
+        # Query catalog and the archive (size, mtime) it was built from
+        self._catalog: Optional[Tuple[Tuple[int, int], WallpaperCatalog]] = None
+        # Name search index, checked against the archive before each use
+        self._search_index: Optional[NameSearchIndex] = None
 
     @classmethod
     def is_valid_image_extension(cls, filename: str) -> bool:
@@ -61,6 +311,34 @@ class WallpapersService:
         extension = filename.rsplit(".", 1)[-1].lower()
         return extension in cls.VALID_EXTENSIONS
 
+    @classmethod
+    def is_valid_image(cls, path: Path) -> bool:
+        """Check a file's extension and that its header is a readable image.
+
+        Only the first few hundred bytes are read; the image isn't decoded.
+
+        Args:
+            path: The file to check
+
+        Returns:
+            True if the file looks like an image in a supported format
+        """
+        if not cls.is_valid_image_extension(path.name):
+            return False
+        try:
+            return probe_file(path) is not None
+        except OSError:
+            return False
+
+    def _validate_image(self, path: Path) -> None:
+        """Raise InvalidImageError unless ``path`` is a supported image."""
+        if not self.is_valid_image_extension(path.name):
+            raise InvalidImageError(
+                f"File does not have a valid image extension: {path.name}"
+            )
+        if not self.is_valid_image(path):
+            raise InvalidImageError(f"File is not a readable image: {path.name}")
+
     def _ensure_archive_exists(self) -> None:
         """Raise ArchiveNotFoundError if archive doesn't exist."""
         if not self.archive_path.exists():
@@ -68,6 +346,42 @@ class WallpapersService:
                 f"Archive not found: {self.archive_path}"
             )
 
+    def _ensure_archive_readable(self) -> Codec:
+        """Check the archive exists and is in a format that can be read.
+
+        Returns:
+            The archive's codec
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the format is unsupported or needs a missing
+                optional dependency
+        """
+        self._ensure_archive_exists()
+        codec = self._archive_codec()
+        if codec is None:
+            raise WallpaperError(
+                f"Unsupported archive format: {self.archive_path}"
+            )
+        return codec
+
+    def _archive_codec(self) -> Optional[Codec]:
+        """Detect the codec of the existing archive.
+
+        Returns:
+            The codec, or None for formats this service doesn't write
+
+        Raises:
+            WallpaperError: If the codec needs a missing optional dependency
+        """
+        codec = detect_codec(self.archive_path)
+        if codec is not None and not codec.available:
+            try:
+                get_codec(codec.name)
+            except ValueError as e:
+                raise WallpaperError(f"Cannot read archive: {e}") from e
+        return codec
+
     def list_wallpapers(self) -> List[str]:
         """List all wallpaper names in the archive.
 
@@ -77,34 +391,384 @@ class WallpapersService:
         Raises:
             ArchiveNotFoundError: If archive doesn't exist
         """
-        self._ensure_archive_exists()
+        self._ensure_archive_readable()
+        return self._load_index().names
+
+    def list_wallpaper_details(self) -> List[WallpaperInfo]:
+        """List every wallpaper with its size, hash, format and dimensions.
+
+        Everything comes from the index; the archive isn't decompressed
+        unless the index has to be rebuilt.
+
+        Returns:
+            WallpaperInfo records in archive order
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+        """
+        self._ensure_archive_readable()
+        members = self._load_index().members.values()
+        return [WallpaperInfo.from_member(member) for member in members]
+
+    def iter_wallpapers(
+        self,
+        details: bool = False,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Union[str, WallpaperInfo]]:
+        """Stream wallpapers in archive order, optionally filtered.
+
+        Unlike ``query_wallpapers`` nothing is sorted or collected: each
+        index record is filtered and handed out as the iterator advances,
+        and ``WallpaperInfo`` records are only built for wallpapers that
+        are requested. Arguments are checked before the iterator is
+        returned.
+
+        If the index is stale, records are streamed from the archive as it
+        is scanned and the rebuilt index is saved once the scan completes.
+        The archive stays locked for reading until then, so it can't be
+        changed from the same thread before the iterator is exhausted or
+        discarded. Each name is yielded once, as first read: a wallpaper
+        that is replaced or removed further on in the archive has already
+        been handed out by then.
+
+        Args:
+            details: Yield WallpaperInfo records instead of names
+            min_width: Minimum width in pixels
+            min_height: Minimum height in pixels
+            aspect: Aspect ratio as a number or a string such as ``21:9``
+            aspect_tolerance: Allowed relative deviation from ``aspect``
+            min_size: Minimum file size in bytes
+            max_size: Maximum file size in bytes
+            name_glob: Glob pattern the name must match
+            limit: Stop after this many wallpapers
+
+        Returns:
+            Iterator over names (or records)
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the aspect ratio is invalid
+        """
+        try:
+            if isinstance(aspect, str):
+                aspect = parse_aspect(aspect)
+        except ValueError as e:
+            raise WallpaperError(str(e)) from e
+        match = member_filter(
+            min_width=min_width,
+            min_height=min_height,
+            aspect=aspect,
+            aspect_tolerance=aspect_tolerance,
+            min_size=min_size,
+            max_size=max_size,
+            name_glob=name_glob,
+        )
+        self._ensure_archive_readable()
+        index = WallpaperIndex.load(self.archive_path)
+        if index is not None and index.is_fresh():
+            records: Iterable[ArchiveMember] = index.members.values()
+        elif getattr(self._lock_state, "held", None) is not None:
+            # Called from a locked operation; rebuild under that lock
+            records = self._load_index().members.values()
+        else:
+            records = self._scan_members()
+        members = filter(match, records)
+        members = itertools.islice(members, limit)
+        if details:
+            return map(WallpaperInfo.from_member, members)
+        return (member.name for member in members)
+
+    def query_wallpapers(
+        self,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        aspect: Optional[Union[str, float]] = None,
+        aspect_tolerance: float = DEFAULT_ASPECT_TOLERANCE,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        name_glob: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> List[WallpaperInfo]:
+        """Find wallpapers by resolution, aspect ratio, size and name.
+
+        Queries are answered from an in-memory catalog of the index, kept
+        for as long as the archive is unchanged.
+
+        Args:
+            min_width: Minimum width in pixels
+            min_height: Minimum height in pixels
+            aspect: Aspect ratio as a number or a string such as ``21:9``
+                or ``3440x1440``
+            aspect_tolerance: Allowed relative deviation from ``aspect``
+            min_size: Minimum file size in bytes
+            max_size: Maximum file size in bytes
+            name_glob: Glob pattern the name must match
+            sort: ``name``, ``width``, ``height``, ``size``, ``mtime`` or
+                ``aspect``, prefixed with ``-`` for descending
+            limit: Maximum number of results
+
+        Returns:
+            Matching WallpaperInfo records
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the aspect ratio or sort key is invalid
+        """
+        try:
+            if isinstance(aspect, str):
+                aspect = parse_aspect(aspect)
+            catalog = self._load_catalog()
+            members = catalog.query(
+                min_width=min_width,
+                min_height=min_height,
+                aspect=aspect,
+                aspect_tolerance=aspect_tolerance,
+                min_size=min_size,
+                max_size=max_size,
+                name_glob=name_glob,
+                sort=sort,
+                limit=limit,
+            )
+        except ValueError as e:
+            raise WallpaperError(str(e)) from e
+        return [WallpaperInfo.from_member(member) for member in members]
+
+    def _load_catalog(self) -> WallpaperCatalog:
+        """Return the query catalog, rebuilding it if the archive changed."""
+        self._ensure_archive_readable()
+        stat = self.archive_path.stat()
+        cached = self._catalog
+        if cached is not None and cached[0] == (stat.st_size, stat.st_mtime_ns):
+            return cached[1]
+        index = self._load_index()
+        catalog = WallpaperCatalog(index.members.values())
+        self._catalog = ((index.archive_size, index.archive_mtime_ns), catalog)
+        return catalog
+
+    def search_wallpapers(
+        self, text: str, limit: int = DEFAULT_SEARCH_LIMIT
+    ) -> List[str]:
+        """Find wallpapers whose names match ``text``, best match first.
+
+        Matching ignores case. Exact names (with or without extension)
+        come first, then names starting with the text, names with a word
+        starting with it, and finally fuzzy matches that share most of its
+        trigrams, so typos and partial words still find something.
+
+        Queries are answered from a trigram and prefix index saved next to
+        the archive; the archive and its index are only read again when
+        the archive has changed.
+
+        Args:
+            text: Text to search for
+            limit: Maximum number of results
+
+        Returns:
+            Matching wallpaper names
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the text is empty or the limit less than 1
+        """
+        if not text.strip():
+            raise WallpaperError("Search text must not be empty")
+        if limit < 1:
+            raise WallpaperError(f"Search limit must be at least 1, got {limit}")
+        return self._load_search_index().search(text, limit)
+
+    def _load_search_index(self) -> NameSearchIndex:
+        """Return the name search index, rebuilding it if the archive changed."""
+        self._ensure_archive_readable()
+        stat = self.archive_path.stat()
+        current = (stat.st_size, stat.st_mtime_ns)
+        search_index = self._search_index
+        if search_index is not None and search_index.is_fresh_for(*current):
+            return search_index
+        path = search_path_for(self.archive_path)
+        search_index = NameSearchIndex.load(path)
+        if search_index is None or not search_index.is_fresh_for(*current):
+            index = self._load_index()
+            search_index = NameSearchIndex(
+                index.names, index.archive_size, index.archive_mtime_ns
+            )
+            try:
+                search_index.save(path)
+            except OSError:
+                pass
+        self._search_index = search_index
+        return search_index
 
-        with tarfile.open(self.archive_path, "r:gz") as tar:
-            # Filter out directories, only return files
-            return [
-                member.name
-                for member in tar.getmembers()
-                if member.isfile() and not member.name.startswith(".")
-            ]
+    @contextlib.contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        """Hold the archive's advisory lock unless this thread already does.
+
+        Writers lock exclusively; readers that scan or read member data
+        take a shared lock so they never see a half-written segment.
+        Before a shared lock is granted, an append interrupted by a crash
+        is rolled back under the exclusive lock, so holders of the shared
+        lock never need to recover (and can't, since the lock can't be
+        upgraded without letting writers in).
+
+        Raises:
+            RuntimeError: If the exclusive lock is requested while this
+                thread holds the shared one
+        """
+        held = getattr(self._lock_state, "held", None)
+        if held is not None:
+            if held == "shared" and not shared:
+                raise RuntimeError("Archive lock is held shared; it can't be made exclusive")
+            yield
+            return
+        if not shared and self._scanning[threading.get_ident()]:
+            raise RuntimeError(
+                "Archive lock is held shared by an unfinished iter_wallpapers(); "
+                "it can't be made exclusive"
+            )
+        lock = self._shared_lock() if shared else archive_lock(self.archive_path)
+        with lock:
+            self._lock_state.held = "shared" if shared else "exclusive"
+            try:
+                yield
+            finally:
+                self._lock_state.held = None
+
+    @contextlib.contextmanager
+    def _shared_lock(self) -> Iterator[None]:
+        """Take the shared archive lock once no crashed append is left.
+
+        Unlike ``_locked`` this doesn't record the lock for the thread, so
+        it can be held by a generator that other threads resume.
+        """
+        while True:
+            self._recover_if_needed()
+            with archive_lock(self.archive_path, shared=True):
+                if needs_recovery(self.archive_path):
+                    # A writer crashed after the check above; recover first
+                    continue
+                yield
+            return
+
+    def _recover_if_needed(self) -> None:
+        """Roll back an append that was interrupted by a crash.
+
+        Takes the exclusive lock, so it must not be called while this thread
+        holds the shared one; ``_locked(shared=True)`` recovers beforehand.
+        """
+        if needs_recovery(self.archive_path):
+            with self._locked():
+                recover(self.archive_path)
+
+    def _load_index(self) -> WallpaperIndex:
+        """Return an up-to-date index, rescanning the archive if needed.
+
+        The sidecar index is used as long as it matches the archive's size
+        and mtime; otherwise the archive is scanned and the index rewritten.
+        A stale index may just mean another process is appending, so the
+        scan waits for the archive lock and rechecks the index first.
+        """
+        index = WallpaperIndex.load(self.archive_path)
+        if index is not None and index.is_fresh():
+            return index
+        if getattr(self._lock_state, "held", None) == "exclusive":
+            # _locked recovers before granting a shared lock
+            self._recover_if_needed()
+        with self._locked(shared=True):
+            index = WallpaperIndex.load(self.archive_path)
+            if index is None or not index.is_fresh():
+                stale = index
+                index = WallpaperIndex.build(self.archive_path)
+                index.inherit(stale)
+                self._save_index(index)
+        return index
+
+    def _scan_members(self) -> Iterator[ArchiveMember]:
+        """Yield wallpaper records while the archive is scanned.
+
+        The shared lock is taken on the first ``next()`` and held until the
+        scan completes or the generator is closed; the rebuilt index is
+        saved only if the scan completes. See ``iter_wallpapers``.
+        """
+        with self._shared_lock():
+            # Another process may have rebuilt the index while we waited
+            index = WallpaperIndex.load(self.archive_path)
+            if index is not None and index.is_fresh():
+                yield from index.members.values()
+                return
+            stale = index
+            index = WallpaperIndex(self.archive_path)
+            index.stamp()
+            thread = threading.get_ident()
+            with self._scanning_lock:
+                self._scanning[thread] += 1
+            try:
+                yielded: Set[str] = set()
+                for name, member in wallpaper_archive.iter_scan(self.archive_path):
+                    if member is None:
+                        index.remove([name])
+                        continue
+                    index.update([member])
+                    if name not in yielded:
+                        yielded.add(name)
+                        yield member
+            finally:
+                with self._scanning_lock:
+                    self._scanning[thread] -= 1
+                    if not self._scanning[thread]:
+                        del self._scanning[thread]
+            index.inherit(stale)
+            self._save_index(index)
+
+    @staticmethod
+    def _save_index(index: WallpaperIndex) -> None:
+        """Persist the index, ignoring failures (it can always be rebuilt)."""
+        try:
+            index.save()
+        except OSError:
+            pass
 
     def add_wallpaper(
         self,
         wallpaper_path: Path,
         overwrite: bool = True,
         validate_extension: bool = True,
-    ) -> None:
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> Optional[str]:
         """Add a wallpaper to the archive.
 
         Args:
             wallpaper_path: Path to the wallpaper file
             overwrite: If True, replace existing wallpaper with same name
-            validate_extension: If True, validate file has image extension
+            validate_extension: If True, validate file has an image extension
+                and an image header
+            near_duplicates: ``"warn"`` or ``"reject"`` to compare the image
+                against the archive's perceptual hashes (default: no check)
+            threshold: Maximum perceptual hash distance, in bits, for two
+                images to count as near-duplicates
+            palette: If True, also compute the image's colour palette
+
+        Returns:
+            Name of a wallpaper that looks the same, when checking for
+            near-duplicates; None otherwise
 
         Raises:
             WallpaperNotFoundError: If wallpaper file doesn't exist
-            InvalidImageError: If file doesn't have valid image extension
-            WallpaperError: If wallpaper exists and overwrite=False
+            InvalidImageError: If file isn't a valid image
+            WallpaperError: If wallpaper exists and overwrite=False, or it
+                is a near-duplicate and near_duplicates is "reject"
         """
+        self._check_near_duplicates(near_duplicates, threshold)
+        if palette:
+            self._check_palettes()
         # Resolve path (handles relative paths)
         wallpaper_path = wallpaper_path.resolve()
 
@@ -115,63 +779,1424 @@ class WallpapersService:
 
         filename = wallpaper_path.name
 
-        if validate_extension and not self.is_valid_image_extension(filename):
-            raise InvalidImageError(
-                f"File does not have a valid image extension: {filename}"
-            )
+        if validate_extension:
+            self._validate_image(wallpaper_path)
+
+        # Ensure parent directory exists
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Check for duplicates if archive exists
-        if self.archive_path.exists():
-            existing = self.list_wallpapers()
-            if filename in existing and not overwrite:
+        with self._locked():
+            index = self._load_existing_index()
+            # Check for duplicates
+            if filename in index.members and not overwrite:
                 raise WallpaperError(
                     f"Wallpaper '{filename}' already exists in archive. "
                     "Use --force to overwrite."
                 )
 
-        # Create or update archive
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_path = Path(tmpdir)
+            files = [(wallpaper_path, filename)]
+            links = self._match_stored_content(files, index)
+            similar = None
+            if near_duplicates is not None:
+                similar = self._find_similar(files, links, index, threshold).get(
+                    filename
+                )
+            if similar is not None and near_duplicates == "reject":
+                raise WallpaperError(
+                    f"Wallpaper '{filename}' looks like '{similar}' "
+                    "already in archive."
+                )
+            index = self._write_files(files, index, links)
+            if palette:
+                self._fill_palettes(index, [index.members[filename]])
+        return similar
+
+    def collect_wallpapers(
+        self,
+        paths: Iterable[Path],
+        recursive: bool = False,
+        validate_extension: bool = True,
+    ) -> List[Path]:
+        """Expand files, directories and glob patterns into wallpaper files.
+
+        Files named explicitly must exist and (when validating) have an image
+        extension and image header. Files found through a directory or glob
+        pattern are filtered instead: hidden files are skipped, and so are
+        non-images when validating.
+
+        Args:
+            paths: Files, directories or glob patterns (``**`` is supported)
+            recursive: If True, descend into subdirectories of directories
+            validate_extension: If True, require image extensions and headers
+
+        Returns:
+            Resolved file paths in a stable order, without duplicates
+
+        Raises:
+            WallpaperNotFoundError: If a path doesn't exist or a pattern
+                matches nothing
+            InvalidImageError: If an explicit file isn't a valid image
+        """
+        collected: Dict[Path, None] = {}
+        for path in paths:
+            path = Path(path).expanduser()
+            pattern = str(path)
+            if _is_glob_pattern(pattern):
+                matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+                if not matches:
+                    raise WallpaperNotFoundError(
+                        f"No files match pattern: {pattern}"
+                    )
+                found = (p for p in matches if p.is_file())
+            elif path.is_dir():
+                candidates = path.rglob("*") if recursive else path.iterdir()
+                found = (p for p in sorted(candidates) if p.is_file())
+            elif path.exists():
+                if validate_extension:
+                    self._validate_image(path)
+                collected[path.resolve()] = None
+                continue
+            else:
+                raise WallpaperNotFoundError(f"Wallpaper file not found: {path}")
+
+            for file_path in found:
+                if file_path.name.startswith("."):
+                    continue
+                if validate_extension and not self.is_valid_image(file_path):
+                    continue
+                collected[file_path.resolve()] = None
+        return list(collected)
+
+    def add_wallpapers(
+        self,
+        paths: Iterable[Path],
+        overwrite: bool = True,
+        validate_extension: bool = True,
+        recursive: bool = False,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> List[AddResult]:
+        """Add many wallpapers with a single archive update.
+
+        Every path is expanded and validated before the archive is touched,
+        so an invalid input leaves the archive unchanged. Unlike
+        ``add_wallpaper``, duplicates are skipped rather than raised when
+        ``overwrite`` is False, and near-duplicates are reported per file.
+
+        Args:
+            paths: Files, directories or glob patterns to add
+            overwrite: If True, replace existing wallpapers with same name
+            validate_extension: If True, validate files have image extensions
+                and image headers
+            recursive: If True, descend into subdirectories of directories
+            near_duplicates: ``"warn"`` to record near-duplicates of stored
+                wallpapers or earlier files in ``similar_to``, ``"reject"``
+                to also leave them out (default: no check)
+            threshold: Maximum perceptual hash distance, in bits, for two
+                images to count as near-duplicates
+            palette: If True, also compute colour palettes of the written
+                wallpapers
+
+        Returns:
+            One AddResult per collected file, in input order
+
+        Raises:
+            WallpaperNotFoundError: If a path doesn't exist or a pattern
+                matches nothing
+            InvalidImageError: If an explicit file isn't a valid image
+        """
+        self._check_near_duplicates(near_duplicates, threshold)
+        if palette:
+            self._check_palettes()
+        sources = self.collect_wallpapers(
+            paths, recursive=recursive, validate_extension=validate_extension
+        )
+
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            return self._add_sources(
+                sources, overwrite, near_duplicates, threshold, palette
+            )
+
+    def _add_sources(
+        self,
+        sources: List[Path],
+        overwrite: bool,
+        near_duplicates: Optional[str] = None,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        palette: bool = False,
+    ) -> List[AddResult]:
+        """Plan and write a batch of collected files (archive locked)."""
+        index = self._load_existing_index()
+
+        planned: Dict[str, Path] = {}
+        results = []
+        for source in sources:
+            name = source.name
+            exists = name in index.members or name in planned
+            if exists and not overwrite:
+                results.append(AddResult(source, name, "skipped"))
+                continue
+            planned[name] = source
+            results.append(
+                AddResult(source, name, "overwritten" if exists else "added")
+            )
+
+        files = [(source, name) for name, source in planned.items()]
+        links = self._match_stored_content(files, index)
+        for result in results:
+            if result.status == "skipped" or planned[result.name] != result.path:
+                continue
+            target = links.get(result.name)
+            if target == result.name:
+                result.status = "unchanged"
+            elif target is not None:
+                result.duplicate_of = target
+
+        if near_duplicates is not None:
+            similar = self._find_similar(files, links, index, threshold)
+            for result in results:
+                if result.status == "skipped" or planned[result.name] != result.path:
+                    continue
+                result.similar_to = similar.get(result.name)
+                if result.similar_to is not None and near_duplicates == "reject":
+                    result.status = "rejected"
+            if near_duplicates == "reject":
+                files = [entry for entry in files if entry[1] not in similar]
+                links = {
+                    name: target
+                    for name, target in links.items()
+                    if name not in similar
+                }
+
+        index = self._write_files(files, index, links)
+        if palette:
+            written = {name for _, name in files}
+            self._fill_palettes(
+                index,
+                [member for member in index.members.values() if member.name in written],
+            )
+        return results
+
+    def _match_stored_content(
+        self, files: List[Tuple[Path, str]], index: WallpaperIndex
+    ) -> Dict[str, str]:
+        """Find files whose content is already stored under some name.
+
+        Only files whose size matches a stored wallpaper or another file
+        in the batch are hashed, so new content usually costs no extra read.
+
+        Args:
+            files: Pairs of source path and member name to be written
+            index: Current index of the archive
+
+        Returns:
+            Member names mapped to the name holding identical content: the
+            name itself if it is unchanged, a wallpaper that stays in the
+            archive, or an earlier file of the batch
+        """
+        stored_sizes = {member.size for member in index.members.values()}
+        sizes = {name: source.stat().st_size for source, name in files}
+        counts = Counter(sizes.values())
+        hashes = {
+            name: self._hash_file(source)
+            for source, name in files
+            if sizes[name] in stored_sizes or counts[sizes[name]] > 1
+        }
+
+        matches = {
+            name: name
+            for name, digest in hashes.items()
+            if name in index.members and index.members[name].sha256 == digest
+        }
+        # Content of names about to be replaced can't be linked to
+        rewritten = {name for _, name in files} - matches.keys()
+        by_hash: Dict[str, str] = {}
+        for member in index.members.values():
+            if member.name not in rewritten:
+                by_hash.setdefault(member.sha256, member.name)
+
+        for _, name in files:
+            digest = hashes.get(name)
+            if digest is None or name in matches:
+                continue
+            if digest in by_hash:
+                matches[name] = by_hash[digest]
+            else:
+                by_hash[digest] = name
+        return matches
+
+    def _find_similar(
+        self,
+        files: List[Tuple[Path, str]],
+        links: Dict[str, str],
+        index: WallpaperIndex,
+        threshold: int,
+    ) -> Dict[str, str]:
+        """Find files that look like a stored wallpaper or an earlier file.
+
+        Only files with new content are decoded; files identical to
+        another file of the batch inherit its match. Wallpapers about to
+        be replaced are not compared against.
+
+        Args:
+            files: Pairs of source path and member name to be written
+            links: Result of ``_match_stored_content`` for ``files``
+            index: Current index of the archive
+            threshold: Maximum perceptual hash distance in bits
+
+        Returns:
+            Member names mapped to the closest similar wallpaper or file
+        """
+        rewritten = {name for _, name in files if links.get(name) != name}
+        stored = self._perceptual_hashes(index)
+        names: List[str] = []
+        hashes: List[int] = []
+        seen = set()
+        for member in index.members.values():
+            if (
+                member.name not in rewritten
+                and member.sha256 in stored
+                and member.sha256 not in seen
+            ):
+                seen.add(member.sha256)
+                names.append(member.name)
+                hashes.append(stored[member.sha256])
+        search = HammingIndex(hashes)
+
+        new = [(source, name) for source, name in files if name not in links]
+        samples = [
+            (name, sample)
+            for name, sample in self._decode_all(
+                ((name, source.read_bytes()) for source, name in new),
+                len(new),
+                sample_pixels,
+            )
+            if sample is not None
+        ]
+        similar: Dict[str, str] = {}
+        values = perceptual_hashes([sample for _, sample in samples])
+        for (name, _), value in zip(samples, values):
+            closest = min(
+                search.near(value, threshold),
+                key=lambda match: (match[1], match[0]),
+                default=None,
+            )
+            if closest is not None:
+                similar[name] = names[closest[0]]
+            names.append(name)
+            search.add(value)
+        for name, target in links.items():
+            if target in similar and name != target:
+                similar[name] = similar[target]
+        return similar
+
+    def _perceptual_hashes(self, index: WallpaperIndex) -> Dict[str, int]:
+        """Return the perceptual hash of each distinct image in the index.
+
+        Hashes missing from the index are computed in batches and saved
+        with it. Content that isn't an image or can't be decoded has none.
+
+        Returns:
+            Hashes keyed by SHA-256
+        """
+        computed = self._compute_missing(
+            index.members.values(),
+            index.phashes,
+            sample_pixels,
+            lambda samples: [
+                format_hash(value) for value in perceptual_hashes(samples)
+            ],
+            "",
+            _HASH_BATCH,
+        )
+        if computed:
+            self._save_index(index)
+
+        present = {member.sha256 for member in index.members.values()}
+        return {
+            sha256: int(phash, 16)
+            for sha256, phash in index.phashes.items()
+            if phash and sha256 in present
+        }
+
+    def _compute_missing(
+        self,
+        members: Iterable[ArchiveMember],
+        table: Dict[str, Any],
+        decode: Callable[[bytes], bytes],
+        compute: Callable[[List[bytes]], List[Any]],
+        empty: Any,
+        batch_size: int,
+    ) -> int:
+        """Fill a per-content table of the index for images missing from it.
+
+        Data is decoded with ``decode`` on a process pool and turned into
+        values with ``compute``, one call per batch of samples. Contents
+        that fail to decode are recorded as ``empty`` so they aren't
+        retried; content that isn't an image is left out.
+
+        Args:
+            members: Members whose content should be in ``table``
+            table: Values keyed by SHA-256, updated in place
+            decode: Turns encoded image data into a sample
+            compute: Turns a list of samples into one value each
+            empty: Value recorded for undecodable content
+            batch_size: Samples per ``compute`` call
+
+        Returns:
+            Number of contents processed
+        """
+        missing: Dict[str, ArchiveMember] = {}
+        for member in members:
+            if member.format is not None and member.sha256 not in table:
+                missing.setdefault(member.sha256, member)
+        if not missing:
+            return 0
+        samples = self._decode_members(missing.values(), decode)
+        for batch in itertools.batched(samples, batch_size):
+            decoded = [(member, sample) for member, sample in batch if sample]
+            values = compute([sample for _, sample in decoded])
+            for member, _ in batch:
+                table[member.sha256] = empty
+            for (member, _), value in zip(decoded, values):
+                table[member.sha256] = value
+        return len(missing)
+
+    @staticmethod
+    def _check_near_duplicates(mode: Optional[str], threshold: int) -> None:
+        """Validate near-duplicate options before any work is done."""
+        if mode is None:
+            return
+        if mode not in NEAR_DUPLICATE_MODES:
+            raise WallpaperError(
+                f"Unknown near-duplicate mode: {mode} "
+                f"(expected one of {', '.join(NEAR_DUPLICATE_MODES)})"
+            )
+        WallpapersService._check_similarity(threshold)
+
+    @staticmethod
+    def _check_similarity(threshold: int) -> None:
+        """Raise unless perceptual hashing is available for ``threshold``."""
+        if not 0 <= threshold <= HASH_BITS:
+            raise WallpaperError(
+                f"Similarity threshold must be between 0 and {HASH_BITS}, "
+                f"got {threshold}"
+            )
+        if not similarity_available():
+            raise WallpaperError(
+                "Near-duplicate detection requires the optional Pillow and "
+                "numpy packages (pip install 'dotfiles-config[similarity]')"
+            )
+
+    @staticmethod
+    def _check_palettes() -> None:
+        """Raise unless palettes can be computed."""
+        if not similarity_available():
+            raise WallpaperError(
+                "Palettes require the optional Pillow and numpy packages "
+                "(pip install 'dotfiles-config[palette]')"
+            )
+
+    def make_palettes(
+        self,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> PaletteResult:
+        """Compute (or read) the dominant colours of wallpapers.
+
+        Palettes are stored in the index by content hash, so each distinct
+        image is analysed once; later calls only read the index.
+
+        Args:
+            names: Only these wallpapers (default: all)
+            pattern: Only wallpapers whose names match this glob pattern
+
+        Returns:
+            PaletteResult mapping names to their palettes
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a named wallpaper isn't in the archive
+            WallpaperError: If Pillow or numpy isn't installed
+        """
+        self._check_palettes()
+        self._ensure_archive_readable()
+        with self._locked(shared=True):
+            index = self._load_index()
+            if names is None and pattern is None:
+                selected = list(index.members.values())
+            else:
+                selected = [
+                    index.members[name]
+                    for name in self._select(index, names, pattern)
+                ]
+            stored = len(
+                {
+                    member.sha256
+                    for member in selected
+                    if index.palettes.get(member.sha256)
+                }
+            )
+            computed = self._fill_palettes(index, selected)
+
+        palettes = {
+            member.name: index.palettes[member.sha256]
+            for member in selected
+            if index.palettes.get(member.sha256)
+        }
+        return PaletteResult(
+            palettes=palettes,
+            computed=computed,
+            stored=stored,
+            failed=[member.name for member in selected if member.name not in palettes],
+        )
+
+    def palette(self, name: str) -> List[str]:
+        """Return the dominant colours of one wallpaper, most common first.
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+            WallpaperError: If it can't be decoded or Pillow or numpy
+                isn't installed
+        """
+        result = self.make_palettes(names=[name])
+        if name not in result.palettes:
+            raise WallpaperError(f"Cannot decode wallpaper: {name}")
+        return result.palettes[name]
+
+    def _fill_palettes(
+        self, index: WallpaperIndex, members: Iterable[ArchiveMember]
+    ) -> int:
+        """Compute missing palettes of members and save them with the index."""
+        computed = self._compute_missing(
+            members,
+            index.palettes,
+            sample_colors,
+            extract_palettes,
+            [],
+            _PALETTE_BATCH,
+        )
+        if computed:
+            self._save_index(index)
+        return computed
+
+    def find_duplicates(
+        self, threshold: int = DEFAULT_SIMILARITY_THRESHOLD
+    ) -> List[List[str]]:
+        """Group wallpapers that show the same picture.
+
+        A group holds identical content stored under several names and
+        images whose perceptual hashes differ in at most ``threshold``
+        bits, such as the same picture at another resolution or quality,
+        chained transitively. Hashes missing from the index are computed
+        once and stored in it.
+
+        Args:
+            threshold: Maximum perceptual hash distance in bits
+
+        Returns:
+            Groups of two or more names, each sorted, ordered by first name
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If Pillow or numpy is missing or the threshold
+                is out of range
+        """
+        self._check_similarity(threshold)
+        self._ensure_archive_readable()
+        with self._locked(shared=True):
+            index = self._load_index()
+            hashes = self._perceptual_hashes(index)
+
+        names: Dict[str, List[str]] = defaultdict(list)
+        for member in index.members.values():
+            names[member.sha256].append(member.name)
+        similar = group_similar(hashes, threshold)
+        grouped = {sha256 for group in similar for sha256 in group}
+        groups = [
+            sorted(name for sha256 in group for name in names[sha256])
+            for group in similar
+        ]
+        groups.extend(
+            sorted(group)
+            for sha256, group in names.items()
+            if len(group) > 1 and sha256 not in grouped
+        )
+        return sorted(groups)
+
+    def _write_files(
+        self,
+        files: List[Tuple[Path, str]],
+        index: WallpaperIndex,
+        links: Optional[Dict[str, str]] = None,
+    ) -> WallpaperIndex:
+        """Write files to the archive as one segment and update the index.
+
+        Files in ``links`` are stored as hard links to the named member
+        (written after the files they may refer to); files mapped to their
+        own name are already stored and skipped.
+
+        Args:
+            files: Pairs of source path and member name
+            index: Current index of the archive (empty if it doesn't exist)
+            links: Result of ``_match_stored_content`` for ``files``
+
+        Returns:
+            The updated index (a new one if the archive had to be converted)
+        """
+        links = links or {}
+        files = [entry for entry in files if entry[1] not in links] + [
+            entry for entry in files if links.get(entry[1], entry[1]) != entry[1]
+        ]
+        links = {name: target for name, target in links.items() if name != target}
+        if not files:
+            return index
+
+        if not self.archive_path.exists():
+            with atomic_output(self.archive_path) as tmp_path:
+                members = wallpaper_archive.create_archive(
+                    tmp_path, files, self.codec, links, self.workers
+                )
+        else:
+            codec, index = self._appendable(index)
+            # Append a new segment; a later member shadows an earlier one
+            # with the same name, which is how overwrites are recorded.
+            members = wallpaper_archive.append_files(
+                self.archive_path, files, codec, links, index.members, self.workers
+            )
+
+        index.update(members)
+        index.stamp()
+        self._save_index(index)
+        return index
+
+    def _appendable(self, index: WallpaperIndex) -> Tuple[Codec, WallpaperIndex]:
+        """Make sure the archive can be appended to, converting it if not.
+
+        Returns:
+            The archive's codec and its index (a new one if converted)
+        """
+        codec = self._archive_codec() or self.codec
+        if not wallpaper_archive.has_trailer(self.archive_path, codec):
+            index = self._convert_archive(codec)
+        return codec, index
+
+    def remove_wallpapers(
+        self,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> List[str]:
+        """Remove wallpapers from the archive.
+
+        Only a tombstone naming them is appended; their data stays in the
+        archive until ``compact_archive`` rewrites it.
+
+        Args:
+            names: Exact wallpaper names to remove
+            pattern: fnmatch-style pattern selecting wallpapers to remove
+
+        Returns:
+            Removed names in archive order
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+            WallpaperError: If neither names nor a pattern is given
+        """
+        if names is None and pattern is None:
+            raise WallpaperError("No wallpapers selected for removal")
+        self._ensure_archive_exists()
+        with self._locked():
+            index = self._load_existing_index()
+            selected = self._select(index, names, pattern)
+            if selected:
+                codec, index = self._appendable(index)
+                wallpaper_archive.append_entries(
+                    self.archive_path,
+                    [wallpaper_archive.removal_entry(selected)],
+                    codec,
+                    index.members,
+                )
+                index.remove(selected)
+                index.stamp()
+                self._save_index(index)
+        return selected
+
+    def rename_wallpaper(self, old: str, new: str, overwrite: bool = False) -> None:
+        """Give a wallpaper another name without rewriting its data.
+
+        A hard link under the new name and a tombstone for the old one are
+        appended together as one segment.
+
+        Args:
+            old: Current wallpaper name
+            new: New wallpaper name
+            overwrite: If True, replace a wallpaper already named ``new``
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If ``old`` isn't in the archive
+            WallpaperError: If ``new`` is invalid, or taken and overwrite
+                is disabled
+        """
+        parts = new.split("/")
+        if (
+            not new
+            or new == old
+            or new.startswith("/")
+            or parts[-1].startswith(".")
+            or ".." in parts
+            or "\0" in new
+        ):
+            raise WallpaperError(f"Invalid new wallpaper name: {new!r}")
+        self._ensure_archive_exists()
+        with self._locked():
+            index = self._load_existing_index()
+            member = index.members.get(old)
+            if member is None:
+                raise WallpaperNotFoundError(f"Wallpaper not found in archive: {old}")
+            if new in index.members and not overwrite:
+                raise WallpaperError(f"Wallpaper '{new}' already exists in archive.")
+            codec, index = self._appendable(index)
+            members = wallpaper_archive.append_entries(
+                self.archive_path,
+                [
+                    wallpaper_archive.link_entry(member, new, old),
+                    wallpaper_archive.removal_entry([old]),
+                ],
+                codec,
+                index.members,
+            )
+            index.update(members)
+            index.remove([old])
+            index.stamp()
+            self._save_index(index)
+
+    def compact_archive(self, dry_run: bool = False) -> CompactResult:
+        """Rewrite the archive without removed or replaced data.
+
+        Removing, renaming and overwriting wallpapers only append to the
+        archive; compaction copies the current wallpapers into a new
+        archive once (each content stored once) and swaps it in.
+
+        Args:
+            dry_run: Only measure how much space compaction would free;
+                the compacted copy is written to a temporary file and
+                deleted
+
+        Returns:
+            CompactResult with the archive size before and after
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the archive can't be compacted
+        """
+        codec = self._ensure_archive_readable()
+        with self._locked():
+            recover(self.archive_path)
+            index = self._load_index()
+            old_size = self.archive_path.stat().st_size
+            try:
+                if dry_run:
+                    tmp_path = self.archive_path.with_name(
+                        f".{self.archive_path.name}.{os.getpid()}.compact.tmp"
+                    )
+                    try:
+                        self._compact_into(tmp_path, codec, index)
+                        new_size = tmp_path.stat().st_size
+                    finally:
+                        tmp_path.unlink(missing_ok=True)
+                    return CompactResult(old_size, new_size, dry_run=True)
+
+                with atomic_output(self.archive_path) as tmp_path:
+                    compacted = self._compact_into(tmp_path, codec, index)
+            except ValueError as e:
+                raise WallpaperError(f"Cannot compact archive: {e}") from e
+            compacted.stamp()
+            self._save_index(compacted)
+        return CompactResult(old_size, self.archive_path.stat().st_size)
+
+    def _compact_into(
+        self, dest_path: Path, codec: Codec, index: WallpaperIndex
+    ) -> WallpaperIndex:
+        """Write the compacted archive to ``dest_path`` and index it."""
+        members = wallpaper_archive.compact_archive(
+            self.archive_path,
+            dest_path,
+            codec,
+            index.members.values(),
+            self.workers,
+        )
+        compacted = WallpaperIndex(self.archive_path, members)
+        compacted.inherit(index)
+        return compacted
+
+    def _load_existing_index(self) -> WallpaperIndex:
+        """Load the index of an archive that may be in any format, or missing.
+
+        Must be called with the archive locked exclusively. An interrupted
+        append is rolled back, and archives in a format that can't be
+        indexed directly (e.g. bzip2) are converted to the service's codec.
+        """
+        recover(self.archive_path)
+        if not self.archive_path.exists():
+            return WallpaperIndex(self.archive_path)
+        if self._archive_codec() is None:
+            self._convert_archive(self.codec)
+        return self._load_index()
+
+    def convert_archive(self, codec: str) -> ConvertResult:
+        """Rewrite the archive with another compression codec.
+
+        Args:
+            codec: Target codec name (gzip, xz, zstd or store)
+
+        Returns:
+            ConvertResult with the old and new codec and archive sizes
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperError: If the codec is unknown or unavailable
+        """
+        self._ensure_archive_exists()
+        try:
+            target = get_codec(codec)
+        except ValueError as e:
+            raise WallpaperError(str(e)) from e
+
+        with self._locked():
+            recover(self.archive_path)
+            source = self._archive_codec()
+            old_size = self.archive_path.stat().st_size
+
+            index = self._convert_archive(target)
+            index.stamp()
+            self._save_index(index)
+
+        return ConvertResult(
+            old_codec=source.name if source else "unknown",
+            new_codec=target.name,
+            old_size=old_size,
+            new_size=self.archive_path.stat().st_size,
+        )
+
+    def _convert_archive(self, codec: Codec) -> WallpaperIndex:
+        """Rewrite the archive in the appendable segmented format.
+
+        Args:
+            codec: Codec for the rewritten archive
+
+        Returns:
+            Index of the converted archive (not yet stamped)
+        """
+        previous = WallpaperIndex.load(self.archive_path)
+        with atomic_output(self.archive_path) as tmp_path:
+            members = wallpaper_archive.convert_archive(
+                self.archive_path, tmp_path, codec, self.workers
+            )
+        index = WallpaperIndex(self.archive_path, members)
+        index.inherit(previous)
+        return index
+
+    def match_wallpapers(
+        self,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+    ) -> List[str]:
+        """Select wallpapers by exact name and/or glob pattern.
+
+        Args:
+            names: Exact wallpaper names; each must exist in the archive
+            pattern: fnmatch-style pattern matched against wallpaper names
+
+        Returns:
+            Matching wallpaper names in archive order (union of both filters)
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+        """
+        self._ensure_archive_readable()
+        return self._select(self._load_index(), names, pattern)
+
+    @staticmethod
+    def _select(
+        index: WallpaperIndex,
+        names: Optional[Iterable[str]],
+        pattern: Optional[str],
+    ) -> List[str]:
+        """Return indexed names matching ``names`` or ``pattern``."""
+        wanted = set(names or [])
+        missing = sorted(wanted - index.members.keys())
+        if missing:
+            raise WallpaperNotFoundError(
+                f"Wallpaper not found in archive: {', '.join(missing)}"
+            )
+        return [
+            name
+            for name in index.members
+            if name in wanted
+            or (pattern is not None and fnmatch.fnmatchcase(name, pattern))
+        ]
+
+    def open_wallpaper(self, name: str) -> BinaryIO:
+        """Open a stream over one wallpaper's data.
 
-            # Extract existing files if archive exists
-            if self.archive_path.exists():
-                with tarfile.open(self.archive_path, "r:gz") as tar:
-                    tar.extractall(tmp_path)
+        Uses the index to seek straight to the wallpaper's segment, so only
+        that segment is decompressed, and only as far as the wallpaper.
 
-            # Copy new wallpaper (overwrites if exists)
-            shutil.copy2(wallpaper_path, tmp_path / filename)
+        Args:
+            name: Wallpaper name
+
+        Returns:
+            Readable binary stream; the caller must close it
 
-            # Create new archive
-            # Ensure parent directory exists
-            self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+        """
+        self._ensure_archive_readable()
+        # The open file keeps reading the same data even if the archive is
+        # replaced afterwards
+        with self._locked(shared=True):
+            member = self._load_index().members.get(name)
+            if member is None:
+                raise WallpaperNotFoundError(
+                    f"Wallpaper not found in archive: {name}"
+                )
+            return wallpaper_archive.open_member(self.archive_path, member)
 
-            with tarfile.open(self.archive_path, "w:gz") as tar:
-                for file_path in tmp_path.iterdir():
-                    if file_path.is_file() and not file_path.name.startswith("."):
-                        tar.add(file_path, arcname=file_path.name)
+    def extract_wallpapers(
+        self,
+        output_path: Path,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        link_mode: Optional[str] = None,
+    ) -> Path:
+        """Extract wallpapers to a directory.
 
-    def extract_wallpapers(self, output_path: Path) -> Path:
-        """Extract all wallpapers to a directory.
+        Creates a 'wallpapers' subdirectory in the output path. Without
+        ``names`` or ``pattern`` every wallpaper is extracted; otherwise only
+        the selected wallpapers are decompressed and written. Content
+        shared by several names is decompressed once.
 
-        Creates a 'wallpapers' subdirectory in the output path.
+        With ``link_mode``, content is decompressed into the blob cache
+        (unless already there) and files are created as hard links,
+        reflinks or symlinks to it, falling back to copies.
 
         Args:
             output_path: Parent directory for extraction
+            names: Exact wallpaper names to extract
+            pattern: fnmatch-style pattern selecting wallpapers to extract
+            link_mode: One of hardlink, reflink, symlink or copy (from the
+                cache); None writes files directly
 
         Returns:
             Path to the 'wallpapers' subdirectory containing extracted files
 
         Raises:
             ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+            WallpaperError: If the link mode is unknown
         """
-        self._ensure_archive_exists()
+        self._check_link_mode(link_mode)
+        self._ensure_archive_readable()
+        with self._locked(shared=True):
+            index = self._load_index()
+            if names is None and pattern is None:
+                selected = index.names
+            else:
+                selected = self._select(index, names, pattern)
+
+            # Create the wallpapers subdirectory
+            wallpapers_dir = output_path / "wallpapers"
+            wallpapers_dir.mkdir(parents=True, exist_ok=True)
+
+            self._extract_members(
+                wallpapers_dir, [index.members[name] for name in selected], link_mode
+            )
+        return wallpapers_dir
+
+    def sync_wallpapers(
+        self,
+        output_path: Path,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        delete: bool = False,
+        checksum: bool = False,
+        link_mode: Optional[str] = None,
+    ) -> SyncResult:
+        """Extract only wallpapers that are missing or changed on disk.
+
+        A file already in the 'wallpapers' subdirectory is left alone when
+        its size and mtime match the archive member (or, with ``checksum``,
+        its SHA-256), or is already linked to the cached blob. Only the
+        remaining members are decompressed.
+
+        Args:
+            output_path: Parent directory for extraction
+            names: Only sync these wallpapers
+            pattern: Only sync wallpapers matching this glob pattern
+            delete: Remove files that are no longer in the archive
+            checksum: Compare content hashes instead of size and mtime
+            link_mode: Materialize files from the blob cache, as in
+                ``extract_wallpapers``
+
+        Returns:
+            SyncResult listing copied, skipped and removed names
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a requested name isn't in the archive
+            WallpaperError: If the link mode is unknown
+        """
+        self._check_link_mode(link_mode)
+        self._ensure_archive_readable()
+        with self._locked(shared=True):
+            return self._sync_locked(
+                output_path, names, pattern, delete, checksum, link_mode
+            )
+
+    def _sync_locked(
+        self,
+        output_path: Path,
+        names: Optional[Iterable[str]],
+        pattern: Optional[str],
+        delete: bool,
+        checksum: bool,
+        link_mode: Optional[str],
+    ) -> SyncResult:
+        """Body of ``sync_wallpapers``, run with the archive locked."""
+        index = self._load_index()
+        if names is None and pattern is None:
+            selected = index.names
+        else:
+            selected = self._select(index, names, pattern)
 
-        # Create the wallpapers subdirectory
         wallpapers_dir = output_path / "wallpapers"
         wallpapers_dir.mkdir(parents=True, exist_ok=True)
 
-        # Extract files
-        with tarfile.open(self.archive_path, "r:gz") as tar:
-            tar.extractall(wallpapers_dir)
+        changed = []
+        skipped = []
+        for name in selected:
+            member = index.members[name]
+            blob = self.cache.path_for(member.sha256) if link_mode else None
+            if self._is_unchanged(wallpapers_dir / name, member, checksum, blob):
+                skipped.append(name)
+            else:
+                changed.append(member)
 
-        return wallpapers_dir
+        self._extract_members(wallpapers_dir, changed, link_mode)
+
+        removed = []
+        if delete:
+            for file_path in sorted(wallpapers_dir.rglob("*")):
+                name = file_path.relative_to(wallpapers_dir).as_posix()
+                if (
+                    file_path.is_file()
+                    and not file_path.name.startswith(".")
+                    and name not in index.members
+                ):
+                    file_path.unlink()
+                    removed.append(name)
+
+        return SyncResult(
+            path=wallpapers_dir,
+            copied=[member.name for member in changed],
+            skipped=skipped,
+            removed=removed,
+        )
+
+    def make_thumbnails(
+        self,
+        size: int = DEFAULT_THUMBNAIL_SIZE,
+        names: Optional[Iterable[str]] = None,
+        pattern: Optional[str] = None,
+        max_cache_bytes: Optional[int] = None,
+    ) -> ThumbnailResult:
+        """Build (or reuse) downscaled previews of wallpapers.
+
+        Thumbnails are cached by content hash and size, so only contents
+        without a cached thumbnail are decompressed; they are decoded and
+        scaled on a process pool. Afterwards the cache is trimmed to its
+        byte budget, least recently used first, keeping the thumbnails
+        returned here.
+
+        Args:
+            size: Longest edge of the thumbnails in pixels
+            names: Only these wallpapers (default: all)
+            pattern: Only wallpapers whose names match this glob pattern
+            max_cache_bytes: Cache budget (default: 256 MiB)
+
+        Returns:
+            ThumbnailResult mapping names to thumbnail paths
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If a named wallpaper isn't in the archive
+            WallpaperError: If Pillow isn't installed or size is below 1
+        """
+        if size < 1:
+            raise WallpaperError(f"Thumbnail size must be at least 1, got {size}")
+        if not pillow_available():
+            raise WallpaperError(
+                "Thumbnails require the optional Pillow package "
+                "(pip install 'dotfiles-config[thumbnails]')"
+            )
+        self._ensure_archive_readable()
+        with self._locked(shared=True):
+            index = self._load_index()
+            if names is None and pattern is None:
+                selected = list(index.members.values())
+            else:
+                selected = [
+                    index.members[name]
+                    for name in self._select(index, names, pattern)
+                ]
+
+            thumbnails: Dict[str, Path] = {}
+            missing: Dict[str, ArchiveMember] = {}
+            for member in selected:
+                if member.sha256 in thumbnails or member.sha256 in missing:
+                    continue
+                path = self.thumbnail_cache.get(member.sha256, size)
+                if path is None:
+                    missing[member.sha256] = member
+                else:
+                    thumbnails[member.sha256] = path
+            cached = len(thumbnails)
+            thumbnails.update(self._render_thumbnails(missing.values(), size))
+
+        self.thumbnail_cache.evict(
+            keep=set(thumbnails.values()), max_bytes=max_cache_bytes
+        )
+        return ThumbnailResult(
+            paths={
+                member.name: thumbnails[member.sha256]
+                for member in selected
+                if member.sha256 in thumbnails
+            },
+            generated=len(thumbnails) - cached,
+            cached=cached,
+            failed=[
+                member.name for member in selected if member.sha256 not in thumbnails
+            ],
+        )
+
+    def thumbnail(self, name: str, size: int = DEFAULT_THUMBNAIL_SIZE) -> Path:
+        """Return the cached thumbnail of one wallpaper, building it if needed.
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+            WallpaperNotFoundError: If the wallpaper isn't in the archive
+            WallpaperError: If the wallpaper can't be decoded or Pillow
+                isn't installed
+        """
+        result = self.make_thumbnails(size, names=[name])
+        if name not in result.paths:
+            raise WallpaperError(f"Cannot decode wallpaper: {name}")
+        return result.paths[name]
+
+    def _render_thumbnails(
+        self, members: Iterable[ArchiveMember], size: int
+    ) -> Dict[str, Path]:
+        """Render and cache thumbnails, keyed by content hash.
+
+        Contents that fail to decode are left out.
+        """
+        rendered: Dict[str, Path] = {}
+        for member, thumbnail in self._decode_members(
+            members, render_thumbnail, size
+        ):
+            if thumbnail is not None:
+                rendered[member.sha256] = self.thumbnail_cache.store(
+                    member.sha256, size, thumbnail
+                )
+        return rendered
+
+    def _decode_members(
+        self, members: Iterable[ArchiveMember], decode: Callable[..., bytes], *args
+    ) -> Iterator[Tuple[ArchiveMember, Optional[bytes]]]:
+        """Run an image decoding function over the data of members.
+
+        Data is decompressed in this process, one pass per segment, and
+        ``decode(data, *args)`` runs on a process pool (image decoding holds
+        the GIL). Results come back in archive order.
+
+        Yields:
+            Each member with the function's result, or None if it raised
+            ValueError
+        """
+        members = list(members)
+        data = (
+            (member, stream.read())
+            for member, stream in wallpaper_archive.iter_member_data(
+                self.archive_path, members
+            )
+        )
+        return self._decode_all(data, len(members), decode, *args)
+
+    def _decode_all(
+        self,
+        items: Iterable[Tuple[Any, bytes]],
+        count: int,
+        decode: Callable[..., bytes],
+        *args,
+    ) -> Iterator[Tuple[Any, Optional[bytes]]]:
+        """Apply ``decode(data, *args)`` to ``(key, data)`` items, in order.
+
+        ``count`` is the number of items, used to size the process pool.
+        """
+
+        def finish(key: Any, result: Callable[[], bytes]) -> Tuple[Any, Optional[bytes]]:
+            try:
+                return key, result()
+            except ValueError:
+                return key, None
+
+        workers = min(self.workers, count)
+        if workers <= 1:
+            for key, content in items:
+                yield finish(key, lambda: decode(content, *args))
+            return
+
+        pending: deque = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for key, content in items:
+                future = pool.submit(decode, content, *args)
+                pending.append((key, future.result))
+                # Bound the decompressed images held in memory
+                if len(pending) >= workers * 2:
+                    yield finish(*pending.popleft())
+            while pending:
+                yield finish(*pending.popleft())
+
+    def verify_archive(self) -> VerifyResult:
+        """Check the archive's data against the stored index.
+
+        Every stored wallpaper is decompressed and its SHA-256 compared
+        with the index. Unlike other operations, a stale index is reported
+        rather than silently rebuilt.
+
+        Returns:
+            VerifyResult with the number of wallpapers checked and a
+            description of each problem found
+
+        Raises:
+            ArchiveNotFoundError: If archive doesn't exist
+        """
+        codec = self._ensure_archive_readable()
+        with self._locked(shared=True):
+            problems = []
+            index = WallpaperIndex.load(self.archive_path)
+            if index is None:
+                problems.append("index: missing or unreadable")
+                return VerifyResult(checked=0, problems=problems)
+            if not index.is_fresh():
+                problems.append(
+                    "index: archive size or mtime changed since it was written"
+                )
+
+            # Deduplicated names share one location; check it once
+            by_location: Dict[Tuple[int, int], List[ArchiveMember]] = defaultdict(list)
+            for member in index.members.values():
+                by_location[(member.segment, member.offset)].append(member)
+            by_segment: Dict[int, List[ArchiveMember]] = defaultdict(list)
+            for (segment, _), sharing in by_location.items():
+                by_segment[segment].append(sharing[0])
+
+            def verify_segment(
+                members: List[ArchiveMember],
+            ) -> List[Tuple[ArchiveMember, str]]:
+                found = []
+                unread = {(m.segment, m.offset): m for m in members}
+                try:
+                    for member, data in wallpaper_archive.iter_member_data(
+                        self.archive_path, members
+                    ):
+                        digest = self._hash_stream(data)
+                        del unread[(member.segment, member.offset)]
+                        if digest != member.sha256:
+                            found.append((member, "content hash mismatch"))
+                except (EOFError, OSError, tarfile.TarError, *codec.errors) as e:
+                    reason = f"unreadable ({e or type(e).__name__})"
+                    found.extend((member, reason) for member in unread.values())
+                return found
+
+            workers = min(self.workers, len(by_segment))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(verify_segment, by_segment.values()))
+            else:
+                results = [verify_segment(m) for m in by_segment.values()]
+
+            for found in results:
+                for member, reason in found:
+                    problems.extend(
+                        f"{other.name}: {reason}"
+                        for other in by_location[(member.segment, member.offset)]
+                    )
+            return VerifyResult(checked=len(index.members), problems=problems)
+
+    @staticmethod
+    def _check_link_mode(link_mode: Optional[str]) -> None:
+        """Raise WallpaperError for an unknown link mode."""
+        if link_mode is not None and link_mode not in LINK_MODES:
+            raise WallpaperError(
+                f"Unknown link mode '{link_mode}'. "
+                f"Choose from: {', '.join(LINK_MODES)}"
+            )
+
+    @staticmethod
+    def _is_unchanged(
+        target: Path,
+        member: ArchiveMember,
+        checksum: bool,
+        blob: Optional[Path] = None,
+    ) -> bool:
+        """Check whether an extracted file still matches its archive member.
+
+        A file that is (or links to) the member's cached ``blob`` matches.
+        """
+        if blob is not None:
+            try:
+                if os.path.samefile(target, blob):
+                    return True
+            except OSError:
+                pass
+        try:
+            stat = target.stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size != member.size:
+            return False
+        if not checksum:
+            return int(stat.st_mtime) == member.mtime
+        return WallpapersService._hash_file(target) == member.sha256
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        """Return the SHA-256 hex digest of a file's content."""
+        with open(path, "rb") as f:
+            return WallpapersService._hash_stream(f)
+
+    @staticmethod
+    def _hash_stream(stream: BinaryIO) -> str:
+        """Return the SHA-256 hex digest of a stream's remaining content."""
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(wallpaper_archive.COPY_BUFSIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def _extract_members(
+        self,
+        wallpapers_dir: Path,
+        members: List[ArchiveMember],
+        link_mode: Optional[str] = None,
+    ) -> None:
+        """Write members below the wallpapers directory.
+
+        Content shared by several names is decompressed once and copied
+        (or linked from the blob cache) for the others.
+        """
+        unique: Dict[str, ArchiveMember] = {}
+        for member in members:
+            unique.setdefault(member.sha256, member)
+
+        if link_mode is not None:
+            missing = [m for m in unique.values() if not self.cache.has(m.sha256)]
+            self._decompress(missing, self._store_blob)
+            for member in members:
+                target = self._target_path(wallpapers_dir, member.name)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                used = materialize(
+                    self.cache.path_for(member.sha256), target, link_mode
+                )
+                if used in ("reflink", "copy"):
+                    os.utime(target, (member.mtime, member.mtime))
+            return
+
+        written = self._decompress(
+            unique.values(),
+            lambda member, data: self._write_member(wallpapers_dir, member, data),
+        )
+        for member in members:
+            if unique[member.sha256] is not member:
+                with open(written[member.sha256], "rb") as data:
+                    self._write_member(wallpapers_dir, member, data)
+
+    def _decompress(
+        self,
+        members: Iterable[ArchiveMember],
+        write: Callable[[ArchiveMember, BinaryIO], Path],
+    ) -> Dict[str, Path]:
+        """Pass each member's data to ``write``, keyed by content hash.
+
+        Different segments are decompressed in parallel.
+        """
+        by_segment: Dict[int, List[ArchiveMember]] = defaultdict(list)
+        for member in members:
+            by_segment[member.segment].append(member)
+
+        written: Dict[str, Path] = {}
+
+        def extract_segment(segment_members: List[ArchiveMember]) -> None:
+            for member, data in wallpaper_archive.iter_member_data(
+                self.archive_path, segment_members
+            ):
+                written[member.sha256] = write(member, data)
+
+        workers = min(self.workers, len(by_segment))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # list() re-raises the first worker exception
+                list(pool.map(extract_segment, by_segment.values()))
+        else:
+            for segment_members in by_segment.values():
+                extract_segment(segment_members)
+        return written
+
+    def _store_blob(self, member: ArchiveMember, data: BinaryIO) -> Path:
+        """Copy a member's data into the blob cache."""
+        try:
+            return self.cache.store(member.sha256, data, member.mtime)
+        except ValueError as e:
+            raise WallpaperError(f"Corrupt data for '{member.name}': {e}") from e
+
+    @staticmethod
+    def _target_path(wallpapers_dir: Path, name: str) -> Path:
+        """Return where a member is extracted, refusing unsafe names.
+
+        Only the parent directory is resolved, so an existing target that
+        is a symlink into the blob cache is replaced rather than followed.
+
+        Raises:
+            WallpaperError: If the member name would escape the directory
+        """
+        target = wallpapers_dir / name
+        target = target.parent.resolve() / target.name
+        if not target.is_relative_to(wallpapers_dir.resolve()):
+            raise WallpaperError(f"Refusing to extract unsafe path: {name}")
+        return target
+
+    @staticmethod
+    def _write_member(
+        wallpapers_dir: Path, member: ArchiveMember, data: BinaryIO
+    ) -> Path:
+        """Write one member's data below the wallpapers directory.
+
+        Raises:
+            WallpaperError: If the member name would escape the directory
+        """
+        target = WallpapersService._target_path(wallpapers_dir, member.name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Replace rather than truncate: the file may be a hard link
+        target.unlink(missing_ok=True)
+        with open(target, "wb") as out:
+            # Copied in the kernel when the archive is uncompressed
+            zero_copy.copy_stream(data, out, member.size)
+        os.utime(target, (member.mtime, member.mtime))
+        return target
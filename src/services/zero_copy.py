@@ -0,0 +1,284 @@
+# src/services/zero_copy.py
+"""Copies and reads of file byte ranges that bypass Python buffers.
+
+An uncompressed (store) archive keeps each member's data as a plain byte
+range of the archive file, so it can be moved between files without
+passing through Python: ``os.copy_file_range`` copies inside the kernel
+(and shares extents on filesystems with reflinks), ``os.sendfile`` takes
+over where it is refused (older kernels, some filesystems), and plain
+``pread``/``pwrite`` are the last resort. Reads and hashes go through a
+read-only ``mmap`` of the file, so hashing a range is a single C call.
+
+Streams that aren't backed by a regular file (decompressors, pipes,
+in-memory buffers) are copied the ordinary way.
+"""
+import errno
+import io
+import mmap
+import os
+import stat
+from typing import BinaryIO, Optional
+
+COPY_BUFSIZE = 1024 * 1024
+
+# copy_file_range/sendfile errors that mean "not here", not "failed"
+_UNSUPPORTED = frozenset(
+    {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+)
+
+
+class FileRange(io.RawIOBase):
+    """Seekable read-only view of ``size`` bytes of a file at ``offset``.
+
+    Reads come from ``mapping`` when given, otherwise from ``os.pread``;
+    either way the file's own position is never used, so ranges of one
+    file can be read side by side.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        offset: int,
+        size: int,
+        mapping: Optional[mmap.mmap] = None,
+        owner: Optional[BinaryIO] = None,
+        owns_mapping: bool = False,
+    ) -> None:
+        """Initialize the view.
+
+        Args:
+            fileobj: Open regular file
+            offset: Start of the range in the file
+            size: Length of the range
+            mapping: Read-only mapping of the whole file, if any
+            owner: File closed along with the view
+            owns_mapping: Close ``mapping`` along with the view
+        """
+        super().__init__()
+        self._fd = fileobj.fileno()
+        self.offset = offset
+        self.size = size
+        self._position = 0
+        self._mapping = mapping
+        self._owner = owner
+        self._owns_mapping = owns_mapping
+
+    def fileno(self) -> int:
+        """Return the underlying file descriptor."""
+        return self._fd
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self.size}
+        self._position = max(0, base[whence] + offset)
+        return self._position
+
+    @property
+    def remaining(self) -> int:
+        """Bytes left between the current position and the end of the range."""
+        return max(0, self.size - self._position)
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        count = min(len(buffer), self.remaining)
+        if not count:
+            return 0
+        start = self.offset + self._position
+        if self._mapping is not None:
+            if start + count > len(self._mapping):
+                raise EOFError("File ended inside the range")
+            with memoryview(self._mapping) as view:
+                buffer[:count] = view[start : start + count]
+        else:
+            data = os.pread(self._fd, count, start)
+            if not data:
+                raise EOFError("File ended inside the range")
+            count = len(data)
+            buffer[:count] = data
+        self._position += count
+        return count
+
+    def readall(self) -> bytes:
+        """Read the rest of the range in one go."""
+        data = bytearray(self.remaining)
+        with memoryview(data) as view:
+            filled = 0
+            while filled < len(data):
+                filled += self.readinto(view[filled:])
+        return bytes(data)
+
+    def update_digest(self, digest) -> None:
+        """Feed the rest of the range to a hashlib object.
+
+        The position is left unchanged.
+        """
+        start = self.offset + self._position
+        end = self.offset + self.size
+        if self._mapping is not None and end <= len(self._mapping):
+            # One call over the mapping; hashlib releases the GIL
+            with memoryview(self._mapping) as view:
+                digest.update(view[start:end])
+            return
+        while start < end:
+            chunk = os.pread(self._fd, min(COPY_BUFSIZE, end - start), start)
+            if not chunk:
+                raise EOFError("File ended inside the range")
+            digest.update(chunk)
+            start += len(chunk)
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._owns_mapping and self._mapping is not None:
+                self._mapping.close()
+            if self._owner is not None:
+                self._owner.close()
+        super().close()
+
+
+def map_file(fileobj: BinaryIO) -> Optional[mmap.mmap]:
+    """Map a whole file read-only.
+
+    Returns:
+        The mapping, or None for empty files or files that can't be mapped
+    """
+    try:
+        return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def file_range(stream: BinaryIO, size: Optional[int] = None) -> Optional[FileRange]:
+    """View the next bytes of a stream as a FileRange, if it is a file.
+
+    The stream's own position is not moved. The view maps the file (or
+    shares the mapping of ``stream`` if it is a FileRange) and should be
+    closed after use.
+
+    Args:
+        stream: Stream to view
+        size: Number of bytes (default: up to the end of the file or range)
+
+    Returns:
+        The view, or None if ``stream`` isn't backed by a regular file
+    """
+    if isinstance(stream, FileRange):
+        remaining = stream.remaining
+        return FileRange(
+            stream,
+            stream.offset + stream.tell(),
+            remaining if size is None else min(size, remaining),
+            mapping=stream._mapping,
+        )
+    position = _file_position(stream)
+    if position is None:
+        return None
+    if size is None:
+        size = max(0, os.fstat(stream.fileno()).st_size - position)
+    return FileRange(stream, position, size, map_file(stream), owns_mapping=True)
+
+
+def copy_stream(data: BinaryIO, out: BinaryIO, size: int) -> None:
+    """Copy ``size`` bytes from ``data`` to ``out`` at their positions.
+
+    Both positions advance by ``size``. When both streams are backed by
+    regular files the copy happens in the kernel.
+
+    Raises:
+        EOFError: If ``data`` ends early
+    """
+    source = (
+        data.offset + data.tell() if isinstance(data, FileRange) else _file_position(data)
+    )
+    out.flush()
+    target = _file_position(out)
+    if source is None or target is None:
+        _copy_buffered(data, out, size)
+        return
+    copy_range(data.fileno(), source, out.fileno(), target, size)
+    data.seek(data.tell() + size)
+    out.seek(target + size)
+
+
+def copy_range(
+    src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int
+) -> None:
+    """Copy ``count`` bytes between file descriptors at explicit offsets.
+
+    Tries ``copy_file_range``, then ``sendfile``, then ``pread``/``pwrite``.
+    The descriptors' file positions are not used.
+
+    Raises:
+        EOFError: If the source ends early
+    """
+    done = 0
+    methods = [_copy_file_range, _sendfile, _pread_pwrite]
+    while done < count:
+        try:
+            copied = methods[0](
+                src_fd, src_offset + done, dst_fd, dst_offset + done, count - done
+            )
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED or len(methods) == 1:
+                raise
+            methods.pop(0)
+            continue
+        if not copied:
+            raise EOFError("Source file ended before the copy was complete")
+        done += copied
+
+
+def _copy_file_range(
+    src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int
+) -> int:
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    return os.copy_file_range(src_fd, dst_fd, count, src_offset, dst_offset)
+
+
+def _sendfile(
+    src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int
+) -> int:
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile is not available")
+    # sendfile writes at the target's file position
+    os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, src_offset, min(count, 1 << 30))
+
+
+def _pread_pwrite(
+    src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int
+) -> int:
+    data = os.pread(src_fd, min(count, COPY_BUFSIZE), src_offset)
+    with memoryview(data) as view:
+        written = 0
+        while written < len(data):
+            written += os.pwrite(dst_fd, view[written:], dst_offset + written)
+    return len(data)
+
+
+def _file_position(stream: BinaryIO) -> Optional[int]:
+    """Offset of a stream's position in its regular file, or None."""
+    try:
+        fd = stream.fileno()
+        if not stat.S_ISREG(os.fstat(fd).st_mode) or not stream.seekable():
+            return None
+        return stream.tell()
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def _copy_buffered(data: BinaryIO, out: BinaryIO, size: int) -> None:
+    """Copy exactly ``size`` bytes through a buffer."""
+    while size > 0:
+        chunk = data.read(min(size, COPY_BUFSIZE))
+        if not chunk:
+            raise EOFError("Stream ended before the copy was complete")
+        out.write(chunk)
+        size -= len(chunk)
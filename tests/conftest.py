@@ -1,12 +1,40 @@
 # tests/conftest.py
+import struct
 import tarfile
 import tempfile
+import zlib
 from pathlib import Path
-from typing import Generator
+from typing import Dict, Generator
 
 import pytest
 
 
+def png_bytes(payload: bytes = b"", width: int = 1, height: int = 1) -> bytes:
+    """Return a PNG header for an image of the given size, then ``payload``.
+
+    The header is all that add-time validation reads, so ``payload`` can be
+    arbitrary bytes that keep test images distinct.
+    """
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + b"IHDR"
+        + ihdr
+        + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+        + payload
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Keep caches and state written by the code under test out of the user's home."""
+    cache_home = tmp_path / "xdg-cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "xdg-state"))
+    return cache_home
+
+
 @pytest.fixture
 def temp_dir() -> Generator[Path, None, None]:
     """Provide a temporary directory that is cleaned up after the test."""
@@ -54,3 +82,185 @@ def empty_archive(temp_dir: Path) -> Path:
 def nonexistent_archive(temp_dir: Path) -> Path:
     """Return path to a nonexistent archive."""
     return temp_dir / "nonexistent.tar.gz"
+
+
+@pytest.fixture
+def ansible_tree(temp_dir: Path) -> Path:
+    """Create packages/ansible with a playbook and two roles on the roles path.
+
+    Returns the playbook path.
+    """
+    ansible_dir = temp_dir / "packages" / "ansible"
+    playbooks = ansible_dir / "playbooks"
+    playbooks.mkdir(parents=True)
+    (ansible_dir / "ansible.cfg").write_text(
+        "[defaults]\nroles_path = ./playbooks/roles/base:./playbooks/roles/features\n"
+    )
+    zsh = playbooks / "roles" / "base" / "zsh"
+    for sub in ("tasks", "vars", "defaults"):
+        (zsh / sub).mkdir(parents=True)
+    (zsh / "tasks" / "main.yml").write_text(
+        "- name: Install zsh\n"
+        "  ansible.builtin.package:\n"
+        "    name: \"{{ zsh_packages_map.get(ansible_facts['distribution'], []) }}\"\n"
+        "- name: Render .zshrc\n"
+        "  ansible.builtin.template:\n"
+        "    src: \"{{ zsh_template_src }}\"\n"
+        "    dest: \"{{ home_root }}/.zshrc\"\n"
+    )
+    (zsh / "vars" / "main.yml").write_text(
+        "zsh_packages_map:\n  Archlinux: [zsh, fzf]\n  Debian: [zsh]\n"
+    )
+    (zsh / "defaults" / "main.yml").write_text(
+        'zsh_template_src: "{{ config_files_root }}/zsh/.zshrc.j2"\n'
+    )
+    nvim = playbooks / "roles" / "features" / "nvim"
+    (nvim / "tasks").mkdir(parents=True)
+    (nvim / "tasks" / "main.yml").write_text(
+        "- block:\n"
+        "    - ansible.builtin.package:\n"
+        "        name: [neovim]\n"
+        "  become: true\n"
+        "- ansible.builtin.import_tasks: copy.yml\n"
+    )
+    (nvim / "tasks" / "copy.yml").write_text(
+        "- name: Copy config\n"
+        "  ansible.builtin.copy:\n"
+        "    src: \"{{ config_files_root }}/nvim/\"\n"
+        "    dest: /tmp/nvim/\n"
+    )
+    playbook = playbooks / "bootstrap.yml"
+    playbook.write_text(
+        "- hosts: localhost\n  roles:\n"
+        "    - role: zsh\n      tags: [zsh]\n"
+        "    - role: nvim\n      tags: [nvim]\n"
+    )
+    return playbook
+
+
+@pytest.fixture
+def native_tree(temp_dir: Path) -> Path:
+    """Create a repository with group_vars, config files and two simple roles.
+
+    Returns the playbook path.
+    """
+    ansible_dir = temp_dir / "packages" / "ansible"
+    playbooks = ansible_dir / "playbooks"
+    (ansible_dir / "inventory" / "group_vars").mkdir(parents=True)
+    (ansible_dir / "ansible.cfg").write_text(
+        "[defaults]\nroles_path = ./playbooks/roles\n"
+    )
+    (ansible_dir / "inventory" / "group_vars" / "all.yml").write_text(
+        'dotfiles_root: "{{ playbook_dir }}/../../.."\n'
+        'config_files_root: "{{ dotfiles_root }}/config-files"\n'
+        "home_root: \"{{ ansible_facts['env']['HOME'] }}\"\n"
+    )
+    config = temp_dir / "config-files"
+    (config / "tool" / "lua").mkdir(parents=True)
+    (config / "tool" / "init.lua").write_text("-- init\n")
+    (config / "tool" / "lua" / "options.lua").write_text("-- options\n")
+    (config / "shell").mkdir()
+    (config / "shell" / "rc.j2").write_text(
+        "export PLUGIN={{ PLUGIN }}\n{% if extra %}\nexport EXTRA=1\n{% endif %}\n"
+    )
+
+    shell = playbooks / "roles" / "shell"
+    for sub in ("tasks", "vars", "defaults"):
+        (shell / sub).mkdir(parents=True)
+    (shell / "tasks" / "main.yml").write_text(
+        "- name: Install shell\n"
+        "  ansible.builtin.package:\n"
+        "    name: \"{{ shell_packages_map.get(ansible_facts['distribution'], []) }}\"\n"
+        "    state: present\n"
+        "- name: Pick plugin path\n"
+        "  ansible.builtin.set_fact:\n"
+        "    PLUGIN: \"{{ shell_plugins.get(ansible_facts['distribution'], '') }}\"\n"
+        "  when: shell_use_distro_paths | default(true)\n"
+        "- name: Render rc\n"
+        "  ansible.builtin.template:\n"
+        "    src: \"{{ config_files_root }}/shell/rc.j2\"\n"
+        "    dest: \"{{ home_root }}/.shellrc\"\n"
+        "    mode: \"0644\"\n"
+        "    backup: true\n"
+    )
+    (shell / "vars" / "main.yml").write_text(
+        "shell_packages_map:\n  Archlinux: [zsh, fzf]\n"
+        "shell_plugins:\n  Archlinux: /usr/share/plugin.zsh\n"
+    )
+    (shell / "defaults" / "main.yml").write_text("PLUGIN: ''\nextra: false\n")
+
+    tool = playbooks / "roles" / "tool"
+    (tool / "tasks").mkdir(parents=True)
+    (tool / "tasks" / "main.yml").write_text(
+        "- block:\n"
+        "    - name: Ensure config dir\n"
+        "      ansible.builtin.file:\n"
+        "        path: \"{{ tool_dest }}\"\n"
+        "        state: directory\n"
+        "        mode: \"0755\"\n"
+        "  vars:\n"
+        "    tool_dest: \"{{ home_root }}/.config/tool\"\n"
+        "- ansible.builtin.import_tasks: copy.yml\n"
+        "- name: Debug only\n"
+        "  ansible.builtin.file:\n"
+        "    path: /nonexistent\n"
+        "    state: absent\n"
+        "  when: tool_debug | default(false)\n"
+    )
+    (tool / "tasks" / "copy.yml").write_text(
+        "- name: Copy config\n"
+        "  ansible.builtin.copy:\n"
+        "    src: \"{{ config_files_root }}/tool/\"\n"
+        "    dest: \"{{ home_root }}/.config/tool/\"\n"
+        "    mode: preserve\n"
+    )
+
+    playbook = playbooks / "bootstrap.yml"
+    playbook.write_text(
+        "- hosts: localhost\n"
+        "  gather_facts: true\n"
+        "  pre_tasks:\n"
+        "    - name: Debug paths\n"
+        "      ansible.builtin.debug:\n"
+        "        msg: hi\n"
+        "      tags: [debug]\n"
+        "  roles:\n"
+        "    - role: shell\n      tags: [shell, never]\n"
+        "    - role: tool\n      tags: [tool, never]\n"
+    )
+    return playbook
+
+
+@pytest.fixture
+def home(temp_dir: Path) -> Path:
+    """Home directory the roles write to."""
+    path = temp_dir / "home"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def facts(home: Path) -> Dict:
+    """Facts of an Arch Linux host."""
+    return {
+        "distribution": "Archlinux",
+        "os_family": "Archlinux",
+        "env": {"HOME": str(home)},
+    }
+
+
+@pytest.fixture
+def fake_pacman(temp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put a pacman on PATH that has ``zsh`` installed and logs installs."""
+    bin_dir = temp_dir / "bin"
+    bin_dir.mkdir()
+    log = temp_dir / "pacman.log"
+    command = bin_dir / "pacman"
+    command.write_text(
+        "#!/bin/sh\n"
+        f'if [ "$1" = "-Q" ]; then [ "$2" = zsh ] || grep -qw "$2" "{log}"; exit $?; fi\n'
+        f'echo "$*" >> "{log}"\n'
+    )
+    command.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:/usr/bin:/bin")
+    return log
@@ -8,6 +8,8 @@ import pytest
 from typer.testing import CliRunner
 
 from src.main import app
+from src.services.packages_scheduler import JobResult
+from src.services.packages_service import NativeTaskError, ParallelInstallResult
 
 
 @pytest.fixture
@@ -315,3 +317,158 @@ class TestPackagesListRoleFormats:
 
         assert result.exit_code == 0
         assert "Total: 3 role(s)" in result.output
+
+
+class TestPackagesInfoCommand:
+    """Tests for 'config packages info' command."""
+
+    def test_info_shows_packages_per_distro(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """Info lists the role's packages, tasks and templates."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir):
+            result = cli_runner.invoke(app, ["packages", "info", "zsh"])
+
+        assert result.exit_code == 0
+        assert "Archlinux:" in result.output
+        assert "zsh, fzf" in result.output
+        assert "Render .zshrc [template]" in result.output
+        assert "{{ zsh_template_src }}" in result.output
+
+    def test_info_filters_by_distro(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--distro keeps only that distribution's packages."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir):
+            result = cli_runner.invoke(
+                app, ["packages", "info", "zsh", "--distro", "Debian"]
+            )
+            fedora = cli_runner.invoke(app, ["packages", "info", "zsh", "-d", "Fedora"])
+
+        assert result.exit_code == 0
+        assert "Debian:" in result.output
+        assert "Archlinux" not in result.output
+        assert "(none for Fedora)" in fedora.output
+
+    def test_info_unknown_role(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """Info fails for a role that isn't on the roles path."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir):
+            result = cli_runner.invoke(app, ["packages", "info", "fish"])
+
+        assert result.exit_code == 1
+        assert "Role not found" in result.output
+
+
+class TestPackagesInstallParallel:
+    """Tests for 'config packages install --jobs'."""
+
+    def test_jobs_prints_summary(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--jobs runs roles separately and summarizes the runs."""
+        ok = [
+            JobResult("zsh", "ok", 0, 1.5),
+            JobResult("nvim", "failed", 2, 0.5, "exit status 2"),
+        ]
+        with patch("pathlib.Path.cwd", return_value=temp_dir), patch(
+            "src.services.packages_service.PackagesService.install_parallel",
+            return_value=ParallelInstallResult(ok),
+        ) as install:
+            result = cli_runner.invoke(
+                app, ["packages", "install", "--tags", "zsh,nvim", "-j", "2", "-v"]
+            )
+
+        assert result.exit_code == 2
+        assert install.call_args.args[:3] == (["zsh,nvim"], ["-v"], 2)
+        assert "ok       zsh   1.5s" in result.output
+        assert "failed   nvim  0.5s  (exit status 2)" in result.output
+
+    def test_jobs_without_tags(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--jobs needs --tags."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir):
+            result = cli_runner.invoke(app, ["packages", "install", "-j", "4"])
+
+        assert result.exit_code == 1
+        assert "needs --tags" in result.output
+
+
+class TestPackagesInstallNative:
+    """Tests for 'config packages install --native'."""
+
+    def test_native_flag(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--native asks the service for an in-process run."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir), patch(
+            "src.services.packages_service.PackagesService.install",
+            return_value=subprocess.CompletedProcess(["native", "nvim"], 0),
+        ) as install:
+            result = cli_runner.invoke(
+                app, ["packages", "install", "--tags", "nvim", "--native", "-C"]
+            )
+
+        assert result.exit_code == 0
+        assert install.call_args.kwargs["native"] is True
+        assert install.call_args.kwargs["extra_args"] == ["-C"]
+        assert "Running: ansible-playbook" not in result.output
+
+    def test_native_task_failure(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """A failing native task exits with status 1."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir), patch(
+            "src.services.packages_service.PackagesService.install",
+            side_effect=NativeTaskError("[nvim] Copy config: denied"),
+        ):
+            result = cli_runner.invoke(
+                app, ["packages", "install", "--tags", "nvim", "--native"]
+            )
+
+        assert result.exit_code == 1
+        assert "Error: [nvim] Copy config: denied" in result.output
+
+    def test_native_with_jobs_is_rejected(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--native and --jobs can't be combined."""
+        with patch("pathlib.Path.cwd", return_value=temp_dir), patch(
+            "src.services.packages_service.PackagesService.install_parallel"
+        ) as install_parallel:
+            result = cli_runner.invoke(
+                app, ["packages", "install", "--tags", "nvim", "--native", "-j", "4"]
+            )
+
+        assert result.exit_code == 1
+        assert "Error: --native can't be combined with --jobs" in result.output
+        install_parallel.assert_not_called()
+
+
+class TestPackagesInstallForce:
+    """Tests for 'config packages install --force'."""
+
+    def test_force_is_passed_on(
+        self, cli_runner: CliRunner, temp_dir: Path, ansible_tree: Path
+    ) -> None:
+        """--force reaches the service, and skip reasons are printed."""
+        def install(**kwargs):
+            kwargs["output"]("Skipping zsh: inputs and target files unchanged")
+            return subprocess.CompletedProcess(["skipped", "zsh"], 0)
+
+        with patch("pathlib.Path.cwd", return_value=temp_dir), patch(
+            "src.services.packages_service.PackagesService.install",
+            side_effect=install,
+        ) as mock_install:
+            result = cli_runner.invoke(app, ["packages", "install", "--tags", "zsh"])
+            forced = cli_runner.invoke(
+                app, ["packages", "install", "--tags", "zsh", "--force"]
+            )
+
+        assert result.exit_code == 0
+        assert "Skipping zsh: inputs and target files unchanged" in result.output
+        assert mock_install.call_args_list[0].kwargs["force"] is False
+        assert forced.exit_code == 0
+        assert mock_install.call_args_list[1].kwargs["force"] is True
@@ -7,6 +7,7 @@ import pytest
 from typer.testing import CliRunner
 
 from src.main import app
+from tests.conftest import png_bytes
 
 
 @pytest.fixture
@@ -32,7 +33,7 @@ class TestWallpapersAddCommand:
     ) -> None:
         """Add wallpaper successfully."""
         new_image = temp_dir / "new.png"
-        new_image.write_bytes(b"png content")
+        new_image.write_bytes(png_bytes(b"png content"))
 
         with patch(
             "src.commands.assets.wallpapers.get_default_archive_path",
@@ -7,6 +7,8 @@ import pytest
 from typer.testing import CliRunner
 
 from src.main import app
+from src.services.wallpapers_service import WallpapersService
+from tests.conftest import png_bytes
 
 
 @pytest.fixture
@@ -82,15 +84,14 @@ class TestListCommandOutput:
             result = cli_runner.invoke(app, ["assets", "wallpapers", "list"])
 
         assert result.exit_code == 0
-        # Output should show "(1)" for 1 wallpaper
-        assert "(1)" in result.output
+        assert "1 wallpaper(s)" in result.output
 
     def test_list_output_is_sorted(
         self,
         cli_runner: CliRunner,
         temp_dir: Path,
     ) -> None:
-        """List displays wallpapers in sorted order."""
+        """List --sort name displays wallpapers in sorted order."""
         # Create archive with multiple wallpapers
         import tarfile
 
@@ -100,14 +101,16 @@ class TestListCommandOutput:
         with tarfile.open(archive_path, "w:gz") as tar:
             for name in names:
                 file_path = temp_dir / name
-                file_path.write_bytes(b"content")
+                file_path.write_bytes(png_bytes(b"content"))
                 tar.add(file_path, arcname=name)
 
         with patch(
             "src.commands.assets.wallpapers.get_default_archive_path",
             return_value=archive_path,
         ):
-            result = cli_runner.invoke(app, ["assets", "wallpapers", "list"])
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "list", "--sort", "name"]
+            )
 
         assert result.exit_code == 0
         # Verify sorted order in output
@@ -139,6 +142,30 @@ class TestExtractCommandBehavior:
         assert result.exit_code == 0
         assert "Extracted 1 wallpaper(s)" in result.output
 
+    def test_extract_count_ignores_existing_files(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """Files already in the output directory aren't counted."""
+        output_dir = temp_dir / "output"
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            cli_runner.invoke(app, ["assets", "wallpapers", "extract", str(output_dir)])
+            extracted = next(output_dir.rglob("test_wallpaper.png")).parent
+            (extracted / "mine.png").write_bytes(b"x")
+            (extracted / "subdir").mkdir()
+
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "extract", str(output_dir)]
+            )
+
+        assert result.exit_code == 0
+        assert "Extracted 1 wallpaper(s)" in result.output
+
     def test_extract_shows_destination_path(
         self,
         cli_runner: CliRunner,
@@ -317,3 +344,771 @@ class TestDefaultArchivePath:
         assert default_path.name == "wallpapers.tar.gz"
         assert default_path.parent.name == "wallpapers"
         assert default_path.parent.parent.name == "assets"
+
+
+class TestAddManyCommand:
+    """Tests for adding several wallpapers in one command."""
+
+    def test_add_directory_reports_each_file(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """Adding a directory reports per-file status and a summary."""
+        folder = temp_dir / "import"
+        folder.mkdir()
+        (folder / "new.png").write_bytes(png_bytes(b"new"))
+        (folder / "test_wallpaper.png").write_bytes(png_bytes(b"dup"))
+
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "add", str(folder)]
+            )
+
+        assert result.exit_code == 0
+        assert "added       new.png" in result.output
+        assert "skipped     test_wallpaper.png" in result.output
+        assert "Added 1, overwrote 0, skipped 1" in result.output
+
+    def test_add_multiple_files(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """Several file arguments are added together."""
+        first = temp_dir / "first.png"
+        second = temp_dir / "second.png"
+        first.write_bytes(png_bytes(b"1"))
+        second.write_bytes(png_bytes(b"2"))
+
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "add", str(first), str(second)]
+            )
+
+        assert result.exit_code == 0
+        assert "Added 2" in result.output
+
+
+class TestSelectiveExtractCommand:
+    """Tests for extract --only and --glob."""
+
+    def test_extract_only(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """--only extracts just the named wallpaper."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                [
+                    "assets", "wallpapers", "extract", str(temp_dir / "out"),
+                    "--only", "test_wallpaper.png",
+                ],
+            )
+
+        assert result.exit_code == 0
+        assert "Extracted 1 wallpaper(s)" in result.output
+        assert (temp_dir / "out" / "wallpapers" / "test_wallpaper.png").exists()
+
+    def test_extract_glob_without_matches(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """--glob with no matches extracts nothing."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "extract", str(temp_dir / "out"), "--glob", "*.jpg"],
+            )
+
+        assert result.exit_code == 0
+        assert "Extracted 0 wallpaper(s)" in result.output
+
+    def test_extract_only_unknown_fails(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """--only with an unknown name exits with an error."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "extract", str(temp_dir / "out"), "--only", "nope.png"],
+            )
+
+        assert result.exit_code == 1
+        assert "not found" in result.output
+
+
+class TestSyncExtractCommand:
+    """Tests for extract --sync."""
+
+    def test_sync_reports_counts(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """Repeated syncs report copied, then skipped wallpapers."""
+        args = ["assets", "wallpapers", "extract", str(temp_dir / "out"), "--sync"]
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            first = cli_runner.invoke(app, args)
+            second = cli_runner.invoke(app, args + ["--delete"])
+
+        assert first.exit_code == 0
+        assert "1 copied, 0 skipped, 0 removed" in first.output
+        assert second.exit_code == 0
+        assert "0 copied, 1 skipped, 0 removed" in second.output
+
+    def test_delete_requires_sync(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """--delete without --sync is rejected."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "extract", str(temp_dir / "out"), "--delete"],
+            )
+
+        assert result.exit_code == 1
+        assert "require --sync" in result.output
+
+
+class TestCodecCommands:
+    """Tests for add --codec and convert."""
+
+    def test_add_with_codec_creates_archive(
+        self,
+        cli_runner: CliRunner,
+        nonexistent_archive: Path,
+        sample_image: Path,
+    ) -> None:
+        """--codec selects the compression of a new archive."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=nonexistent_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "add", str(sample_image), "--codec", "xz"],
+            )
+
+        assert result.exit_code == 0
+        assert nonexistent_archive.read_bytes().startswith(b"\xfd7zXZ\x00")
+
+    def test_convert_reports_sizes(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+    ) -> None:
+        """convert rewrites the archive and reports the codec change."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "convert", "store"]
+            )
+            listing = cli_runner.invoke(app, ["assets", "wallpapers", "list"])
+
+        assert result.exit_code == 0
+        assert "Converted archive from gzip to store" in result.output
+        assert "test_wallpaper.png" in listing.output
+
+    def test_convert_unknown_codec(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+    ) -> None:
+        """An unknown codec is reported as an error."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "convert", "lz4"]
+            )
+
+        assert result.exit_code == 1
+        assert "Unknown codec" in result.output
+
+
+class TestDeduplicatedAddCommand:
+    """Tests for reporting reused content during add."""
+
+    def test_reports_duplicate_and_unchanged(
+        self,
+        cli_runner: CliRunner,
+        nonexistent_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """Duplicates name the stored copy; identical re-adds are unchanged."""
+        folder = temp_dir / "import"
+        folder.mkdir()
+        (folder / "a.png").write_bytes(png_bytes(b"same"))
+        (folder / "b.png").write_bytes(png_bytes(b"same"))
+        args = ["assets", "wallpapers", "add", str(folder)]
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=nonexistent_archive,
+        ):
+            first = cli_runner.invoke(app, args)
+            second = cli_runner.invoke(app, args + ["--force"])
+
+        assert first.exit_code == 0
+        assert "b.png (same content as a.png)" in first.output
+        assert second.exit_code == 0
+        assert "2 unchanged" in second.output
+
+
+class TestWorkersOption:
+    """Tests for --workers on commands that (de)compress segments."""
+
+    def test_extract_with_workers(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """-j sets the number of extraction threads."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "extract", str(temp_dir / "out"), "-j", "4"],
+            )
+
+        assert result.exit_code == 0
+        assert (temp_dir / "out" / "wallpapers" / "test_wallpaper.png").exists()
+
+    def test_zero_workers_rejected(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """A worker count below one is a usage error."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                ["assets", "wallpapers", "extract", str(temp_dir), "--workers", "0"],
+            )
+
+        assert result.exit_code == 2
+
+
+class TestLinkedExtractCommand:
+    """Tests for extract --link."""
+
+    def test_extract_with_hardlinks(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """--link hardlink materializes files from the XDG blob cache."""
+        monkeypatch.setenv("XDG_DATA_HOME", str(temp_dir / "data"))
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                [
+                    "assets", "wallpapers", "extract", str(temp_dir / "out"),
+                    "--link", "hardlink",
+                ],
+            )
+
+        assert result.exit_code == 0
+        extracted = temp_dir / "out" / "wallpapers" / "test_wallpaper.png"
+        assert extracted.stat().st_nlink == 2
+        assert any((temp_dir / "data").rglob("*"))
+
+
+class TestVerifyCommand:
+    """Tests for the verify subcommand."""
+
+    def test_verify_ok(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+    ) -> None:
+        """A healthy archive verifies with exit code 0."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            cli_runner.invoke(app, ["assets", "wallpapers", "list"])
+            result = cli_runner.invoke(app, ["assets", "wallpapers", "verify"])
+
+        assert result.exit_code == 0
+        assert "Verified 1 wallpaper(s): OK" in result.output
+
+    def test_verify_reports_problems(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+    ) -> None:
+        """Problems are listed and the command fails."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(app, ["assets", "wallpapers", "verify"])
+
+        assert result.exit_code == 1
+        assert "index: missing or unreadable" in result.output
+
+
+class TestListLongCommand:
+    """Tests for list --long."""
+
+    def test_list_long_shows_dimensions(
+        self,
+        cli_runner: CliRunner,
+        sample_archive: Path,
+        sample_image: Path,
+    ) -> None:
+        """Format, dimensions and size are printed next to each name."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sample_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "list", "--long"]
+            )
+
+        assert result.exit_code == 0
+        size = sample_image.stat().st_size
+        assert f"test_wallpaper.png  png 1x1, {size} bytes" in result.output
+
+
+class TestListQueryCommand:
+    """Tests for list filtering and sorting flags."""
+
+    @pytest.fixture
+    def sized_archive(self, temp_dir: Path) -> Path:
+        """Archive holding images of several resolutions."""
+        archive = temp_dir / "sized.tar.gz"
+        sources = temp_dir / "sources"
+        sources.mkdir()
+        for name, width, height in [
+            ("ultrawide.png", 3440, 1440),
+            ("uhd.png", 3840, 2160),
+            ("hd.png", 1920, 1080),
+        ]:
+            (sources / name).write_bytes(png_bytes(name.encode(), width, height))
+        WallpapersService(archive).add_wallpapers([sources])
+        return archive
+
+    def test_filter_and_sort(
+        self,
+        cli_runner: CliRunner,
+        sized_archive: Path,
+    ) -> None:
+        """Filters narrow the listing and --sort orders it."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sized_archive,
+        ):
+            flags = ["--min-width", "2560", "--sort", "-width", "--limit", "5"]
+            result = cli_runner.invoke(app, ["assets", "wallpapers", "list", *flags])
+
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            "Matching wallpapers (2):",
+            "  - uhd.png",
+            "  - ultrawide.png",
+        ]
+
+    def test_streams_in_archive_order(
+        self,
+        cli_runner: CliRunner,
+        sized_archive: Path,
+    ) -> None:
+        """Without --sort, list prints in archive order with a trailing count."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sized_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "list", "--min-width", "2560", "-l"]
+            )
+
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            "Matching wallpapers:",
+            "  - uhd.png  png 3840x2160, 40 bytes",
+            "  - ultrawide.png  png 3440x1440, 46 bytes",
+            "2 wallpaper(s)",
+        ]
+
+    def test_aspect_without_matches(
+        self,
+        cli_runner: CliRunner,
+        sized_archive: Path,
+    ) -> None:
+        """An empty result is reported without failing."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sized_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "list", "--aspect", "4:3"]
+            )
+
+        assert result.exit_code == 0
+        assert "No matching wallpapers" in result.output
+
+    def test_invalid_sort_key(
+        self,
+        cli_runner: CliRunner,
+        sized_archive: Path,
+    ) -> None:
+        """An unknown sort key is an error."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=sized_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "list", "--sort", "colour"]
+            )
+
+        assert result.exit_code == 1
+        assert "Unknown sort key" in result.output
+
+
+class TestThumbnailsCommand:
+    """Tests for the thumbnails subcommand."""
+
+    @pytest.fixture
+    def photo_archive(self, temp_dir: Path) -> Path:
+        """Archive holding one decodable and one corrupt image."""
+        image_module = pytest.importorskip("PIL.Image")
+        archive = temp_dir / "photos.tar.gz"
+        sources = temp_dir / "photos"
+        sources.mkdir()
+        image_module.new("RGB", (640, 320), "red").save(sources / "red.png")
+        (sources / "corrupt.png").write_bytes(png_bytes(b"corrupt", 64, 64))
+        WallpapersService(archive).add_wallpapers([sources])
+        return archive
+
+    def test_print_paths_and_failures(
+        self,
+        cli_runner: CliRunner,
+        photo_archive: Path,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Paths go below XDG_CACHE_HOME; undecodable images fail the command."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(temp_dir / "cache"))
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=photo_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                [
+                    "assets", "wallpapers", "thumbnails",
+                    "--size", "64", "--print-paths",
+                ],
+            )
+
+        assert result.exit_code == 1
+        assert "cannot decode corrupt.png" in result.output
+        name, path = next(
+            line.split("\t") for line in result.output.splitlines() if "\t" in line
+        )
+        assert name == "red.png"
+        assert Path(path).is_relative_to(temp_dir / "cache")
+        assert Path(path).exists()
+
+    def test_summary(
+        self,
+        cli_runner: CliRunner,
+        photo_archive: Path,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """The second run is served from the cache."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(temp_dir / "cache"))
+        args = ["assets", "wallpapers", "thumbnails", "--only", "red.png"]
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=photo_archive,
+        ):
+            cli_runner.invoke(app, args)
+            result = cli_runner.invoke(app, args)
+
+        assert result.exit_code == 0
+        assert "Thumbnails for 1 wallpaper(s): 0 generated, 1 cached" in result.output
+
+
+class TestNearDuplicateCommands:
+    """Tests for find-duplicates and add --near-duplicates."""
+
+    @pytest.fixture
+    def forest_archive(self, temp_dir: Path) -> Path:
+        """Archive holding one picture and a smaller copy of it."""
+        pytest.importorskip("numpy")
+        image_module = pytest.importorskip("PIL.Image")
+        archive = temp_dir / "forest.tar.gz"
+        sources = temp_dir / "forest"
+        sources.mkdir()
+        base = image_module.linear_gradient("L").rotate(30).convert("RGB")
+        base.resize((640, 360)).save(sources / "forest.png")
+        base.resize((320, 180)).save(sources / "forest_small.png")
+        image_module.radial_gradient("L").save(sources / "moon.png")
+        WallpapersService(archive).add_wallpapers([sources])
+        return archive
+
+    def test_find_duplicates(
+        self,
+        cli_runner: CliRunner,
+        forest_archive: Path,
+    ) -> None:
+        """Groups are printed one per line."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=forest_archive,
+        ):
+            result = cli_runner.invoke(
+                app, ["assets", "wallpapers", "find-duplicates", "-j", "1"]
+            )
+
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            "Near-duplicate groups (1):",
+            "  - forest.png, forest_small.png",
+        ]
+
+    def test_add_rejects_near_duplicate(
+        self,
+        cli_runner: CliRunner,
+        forest_archive: Path,
+        temp_dir: Path,
+    ) -> None:
+        """A resized copy is refused and the archive is unchanged."""
+        image_module = pytest.importorskip("PIL.Image")
+        copy = temp_dir / "forest_large.png"
+        with image_module.open(temp_dir / "forest" / "forest.png") as image:
+            image.resize((1280, 720)).save(copy)
+
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=forest_archive,
+        ):
+            result = cli_runner.invoke(
+                app,
+                [
+                    "assets", "wallpapers", "add", str(copy),
+                    "--near-duplicates", "reject",
+                ],
+            )
+
+        assert result.exit_code == 1
+        assert "looks like 'forest.png'" in result.output
+        assert "forest_large.png" not in WallpapersService(
+            forest_archive
+        ).list_wallpapers()
+
+
+class TestPalettesCommand:
+    """Tests for the palettes subcommand and add --palette."""
+
+    def test_add_with_palette_then_print(
+        self,
+        cli_runner: CliRunner,
+        temp_dir: Path,
+    ) -> None:
+        """Palettes stored on add are printed without being recomputed."""
+        pytest.importorskip("numpy")
+        image_module = pytest.importorskip("PIL.Image")
+        image = temp_dir / "teal.png"
+        image_module.new("RGB", (64, 36), "#008080").save(image)
+        archive = temp_dir / "palettes.tar.gz"
+
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            added = cli_runner.invoke(
+                app, ["assets", "wallpapers", "add", str(image), "--palette"]
+            )
+            summary = cli_runner.invoke(app, ["assets", "wallpapers", "palettes"])
+            printed = cli_runner.invoke(
+                app, ["assets", "wallpapers", "palettes", "--print-colors"]
+            )
+
+        assert added.exit_code == 0
+        assert "Palettes for 1 wallpaper(s): 0 computed, 1 stored" in summary.output
+        assert printed.output.splitlines() == ["teal.png\t#008080"]
+
+
+class TestRemoveRenameCompactCommands:
+    """Tests for the remove, rename and compact subcommands."""
+
+    @pytest.fixture
+    def archive(self, temp_dir: Path) -> Path:
+        archive = temp_dir / "wallpapers.tar.gz"
+        service = WallpapersService(archive, workers=1)
+        for name in ("a.png", "b.png", "c.png"):
+            image = temp_dir / name
+            image.write_bytes(png_bytes(name.encode() * 2000))
+            service.add_wallpaper(image)
+        return archive
+
+    def test_remove_rename_then_compact(
+        self, cli_runner: CliRunner, archive: Path
+    ) -> None:
+        """Changes show up in list at once; compact reports the space freed."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            removed = cli_runner.invoke(
+                app, ["assets", "wallpapers", "remove", "--glob", "a*"]
+            )
+            renamed = cli_runner.invoke(
+                app, ["assets", "wallpapers", "rename", "b.png", "beach.png"]
+            )
+            listing = cli_runner.invoke(app, ["assets", "wallpapers", "list"])
+            dry_run = cli_runner.invoke(
+                app, ["assets", "wallpapers", "compact", "--dry-run"]
+            )
+            compacted = cli_runner.invoke(app, ["assets", "wallpapers", "compact"])
+
+        assert removed.exit_code == 0
+        assert "Removed 1 wallpaper(s)" in removed.output
+        assert "Renamed b.png to beach.png" in renamed.output
+        assert "a.png" not in listing.output
+        assert "b.png" not in listing.output
+        assert "beach.png" in listing.output
+        assert "Compaction would free" in dry_run.output
+        assert "Compacted archive, freed" in compacted.output
+
+    def test_rename_onto_existing_needs_force(
+        self, cli_runner: CliRunner, archive: Path
+    ) -> None:
+        """An existing target name is an error unless --force is given."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            refused = cli_runner.invoke(
+                app, ["assets", "wallpapers", "rename", "a.png", "b.png"]
+            )
+            forced = cli_runner.invoke(
+                app, ["assets", "wallpapers", "rename", "a.png", "b.png", "--force"]
+            )
+
+        assert refused.exit_code == 1
+        assert "already exists" in refused.output
+        assert forced.exit_code == 0
+
+    def test_remove_needs_selection(
+        self, cli_runner: CliRunner, archive: Path
+    ) -> None:
+        """remove without names or --glob fails; unknown names are reported."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            empty = cli_runner.invoke(app, ["assets", "wallpapers", "remove"])
+            missing = cli_runner.invoke(
+                app, ["assets", "wallpapers", "remove", "missing.png"]
+            )
+
+        assert empty.exit_code == 1
+        assert missing.exit_code == 1
+        assert "not found" in missing.output
+
+
+class TestSearchCommand:
+    """Tests for the search subcommand."""
+
+    @pytest.fixture
+    def archive(self, temp_dir: Path) -> Path:
+        archive = temp_dir / "wallpapers.tar.gz"
+        service = WallpapersService(archive, workers=1)
+        for name in ("sunset.png", "sunset_beach.png", "forest.png"):
+            image = temp_dir / name
+            image.write_bytes(png_bytes(name.encode()))
+            service.add_wallpaper(image)
+        return archive
+
+    def test_prints_one_name_per_line(
+        self, cli_runner: CliRunner, archive: Path
+    ) -> None:
+        """Names are printed bare, best match first, up to --limit."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            result = cli_runner.invoke(app, ["assets", "wallpapers", "search", "sunst"])
+            limited = cli_runner.invoke(
+                app, ["assets", "wallpapers", "search", "SUNSET", "-n", "1"]
+            )
+
+        assert result.exit_code == 0
+        assert result.output.splitlines()[:2] == ["sunset.png", "sunset_beach.png"]
+        assert limited.output.splitlines() == ["sunset.png"]
+
+    def test_no_match_and_missing_archive(
+        self, cli_runner: CliRunner, archive: Path, nonexistent_archive: Path
+    ) -> None:
+        """No match is not an error; a missing archive is."""
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=archive,
+        ):
+            none = cli_runner.invoke(app, ["assets", "wallpapers", "search", "qqqq"])
+        with patch(
+            "src.commands.assets.wallpapers.get_default_archive_path",
+            return_value=nonexistent_archive,
+        ):
+            missing = cli_runner.invoke(app, ["assets", "wallpapers", "search", "sun"])
+
+        assert none.exit_code == 0
+        assert "No matching wallpapers" in none.output
+        assert missing.exit_code == 1
+        assert "Error:" in missing.output
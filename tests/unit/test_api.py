@@ -11,6 +11,7 @@ from src.api.config import Config
 from src.api.packages import Packages
 from src.api.wallpapers import Wallpapers
 from src.services.packages_service import PackageRole
+from tests.conftest import png_bytes
 
 
 class TestConfigClass:
@@ -164,6 +165,23 @@ class TestWallpapersAPIClass:
         assert isinstance(result, list)
         assert "test_wallpaper.png" in result
 
+    def test_wallpapers_list_details(self, sample_archive: Path) -> None:
+        """Wallpapers.list(details=True) returns metadata records."""
+        wallpapers = Wallpapers(archive_path=sample_archive)
+        [info] = wallpapers.list(details=True)
+
+        assert info.name == "test_wallpaper.png"
+        assert (info.format, info.width, info.height) == ("png", 1, 1)
+
+    def test_wallpapers_query(self, sample_archive: Path) -> None:
+        """Wallpapers.query() filters records by dimensions."""
+        wallpapers = Wallpapers(archive_path=sample_archive)
+
+        assert [i.name for i in wallpapers.query(aspect="1:1")] == [
+            "test_wallpaper.png"
+        ]
+        assert wallpapers.query(min_width=2) == []
+
     def test_wallpapers_add_success(self, temp_dir: Path, sample_image: Path) -> None:
         """Wallpapers.add() adds wallpaper to archive."""
         archive_path = temp_dir / "test.tar.gz"
@@ -180,7 +198,7 @@ class TestWallpapersAPIClass:
     ) -> None:
         """Wallpapers.add() with force=True overwrites existing."""
         duplicate = temp_dir / "test_wallpaper.png"
-        duplicate.write_bytes(b"new content")
+        duplicate.write_bytes(png_bytes(b"new content"))
 
         wallpapers = Wallpapers(archive_path=sample_archive)
         wallpapers.add(duplicate, force=True)
@@ -215,3 +233,17 @@ class TestWallpapersAPIClass:
         assert result.name == "wallpapers"
         assert result.exists()
         assert (result / "test_wallpaper.png").exists()
+
+    def test_wallpapers_add_many_returns_results(self, temp_dir: Path) -> None:
+        """Wallpapers.add_many() adds a folder and reports each file."""
+        folder = temp_dir / "images"
+        folder.mkdir()
+        (folder / "a.png").write_bytes(png_bytes(b"a"))
+        (folder / "b.png").write_bytes(png_bytes(b"b"))
+
+        wallpapers = Wallpapers(archive_path=temp_dir / "test.tar.gz")
+        results = wallpapers.add_many([folder])
+        again = wallpapers.add_many([folder])
+
+        assert [r.status for r in results] == ["added", "added"]
+        assert [r.status for r in again] == ["skipped", "skipped"]
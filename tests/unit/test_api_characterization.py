@@ -22,6 +22,7 @@ from src.services.wallpapers_service import (
     WallpaperError,
     WallpaperNotFoundError,
 )
+from tests.conftest import png_bytes
 
 
 class TestConfigCharacterization:
@@ -369,7 +370,7 @@ class TestWallpapersAPICharacterization:
     ) -> None:
         """Wallpapers.add(force=False) raises when wallpaper already exists."""
         duplicate = temp_dir / "test_wallpaper.png"
-        duplicate.write_bytes(b"new")
+        duplicate.write_bytes(png_bytes(b"new"))
 
         wallpapers = Wallpapers(archive_path=sample_archive)
 
@@ -382,7 +383,7 @@ class TestWallpapersAPICharacterization:
     ) -> None:
         """Wallpapers.add(force=True) overwrites existing wallpaper."""
         duplicate = temp_dir / "test_wallpaper.png"
-        duplicate.write_bytes(b"new content")
+        duplicate.write_bytes(png_bytes(b"new content"))
 
         wallpapers = Wallpapers(archive_path=sample_archive)
         # Should not raise
@@ -427,7 +428,7 @@ class TestWallpapersAPICharacterization:
 
         for fmt in formats:
             image_file = temp_dir / f"test.{fmt}"
-            image_file.write_bytes(b"fake image data")
+            image_file.write_bytes(png_bytes(b"fake image data"))
 
             wallpapers = Wallpapers(archive_path=archive_path)
             wallpapers.add(image_file, force=True)
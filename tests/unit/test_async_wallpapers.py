@@ -0,0 +1,229 @@
+# tests/unit/test_async_wallpapers.py
+"""Unit tests for the asyncio wallpapers API."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.api import async_wallpapers
+from src.api.async_wallpapers import AsyncWallpapers
+from src.services.wallpapers_service import WallpaperError, WallpaperNotFoundError
+from tests.conftest import png_bytes
+
+
+@pytest.fixture
+def images(temp_dir: Path) -> Path:
+    folder = temp_dir / "images"
+    folder.mkdir()
+    for name in ("a.png", "b.png", "c.png"):
+        (folder / name).write_bytes(png_bytes(name.encode() * 1000))
+    return folder
+
+
+def make_api(archive: Path, **kwargs) -> AsyncWallpapers:
+    return AsyncWallpapers(archive, cache_dir=archive.parent / "blobs", **kwargs)
+
+
+class Gate:
+    """Blocking stand-in for an API call that records what runs when."""
+
+    def __init__(self, events: List[str], name: str) -> None:
+        self.events = events
+        self.name = name
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args, **kwargs) -> str:
+        self.events.append(f"{self.name} start")
+        self.started.set()
+        self.release.wait(5)
+        self.events.append(f"{self.name} end")
+        return self.name
+
+
+async def started(gate: Gate) -> None:
+    """Wait for a gate's call to start without blocking the loop."""
+    while not gate.started.is_set():
+        await asyncio.sleep(0.001)
+
+
+class TestAsyncWallpapers:
+    """Tests for AsyncWallpapers."""
+
+    def test_round_trip(
+        self, nonexistent_archive: Path, images: Path, temp_dir: Path
+    ) -> None:
+        """Calls mirror the synchronous API."""
+
+        async def main() -> None:
+            async with make_api(nonexistent_archive) as api:
+                results = await api.add_many([images])
+                assert [r.status for r in results] == ["added"] * 3
+                assert await api.list() == ["a.png", "b.png", "c.png"]
+                assert [n async for n in api.iter(name_glob="b*")] == ["b.png"]
+                out, data = await asyncio.gather(
+                    api.extract(temp_dir / "out", names=["a.png", "c.png"]),
+                    api.read("b.png"),
+                )
+                assert data == (images / "b.png").read_bytes()
+                assert sorted(p.name for p in out.iterdir()) == ["a.png", "c.png"]
+                await api.rename("a.png", "z.png")
+                assert await api.search("z") == ["z.png"]
+                with pytest.raises(WallpaperNotFoundError):
+                    await api.read("a.png")
+
+        asyncio.run(main())
+
+    def test_loop_keeps_running(self, nonexistent_archive: Path) -> None:
+        """The event loop isn't blocked while a call runs."""
+        events: List[str] = []
+        gate = Gate(events, "list")
+
+        async def main() -> None:
+            api = make_api(nonexistent_archive)
+            api._wallpapers.list = gate
+            task = asyncio.create_task(api.list())
+            await started(gate)
+            events.append("tick")
+            gate.release.set()
+            assert await task == "list"
+            await api.aclose()
+
+        asyncio.run(main())
+        assert events == ["list start", "tick", "list end"]
+
+    def test_concurrency_limit(self, nonexistent_archive: Path) -> None:
+        """No more than max_concurrency reads run at once."""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def read(name: str) -> bytes:
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            threading.Event().wait(0.02)
+            with lock:
+                running -= 1
+            return name.encode()
+
+        async def main() -> List[bytes]:
+            # A shared pool larger than the limit
+            with ThreadPoolExecutor(8) as pool:
+                api = make_api(nonexistent_archive, max_concurrency=2, executor=pool)
+                api._read = read
+                return await asyncio.gather(*(api.read(str(i)) for i in range(6)))
+
+        assert asyncio.run(main()) == [str(i).encode() for i in range(6)]
+        assert peak == 2
+
+    def test_iter_streams_in_batches(
+        self, nonexistent_archive: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """iter pulls records as it goes and holds writes until closed."""
+        monkeypatch.setattr(async_wallpapers, "ITER_BATCH", 2)
+        events: List[str] = []
+        write = Gate(events, "write")
+
+        def records(**kwargs):
+            for name in "abcde":
+                events.append(f"pull {name}")
+                yield name
+
+        async def main() -> None:
+            api = make_api(nonexistent_archive)
+            api._wallpapers.iter = records
+            api._wallpapers.rename = write
+            stream = api.iter()
+            assert await stream.__anext__() == "a"
+            assert events == ["pull a", "pull b"]
+            task = asyncio.create_task(api.rename("a", "z"))
+            assert await stream.__anext__() == "b"
+            await asyncio.sleep(0.01)
+            assert not write.started.is_set()
+            await stream.aclose()
+            write.release.set()
+            await task
+            await api.aclose()
+
+        asyncio.run(main())
+        assert events == ["pull a", "pull b", "write start", "write end"]
+
+    def test_writes_run_alone_in_order(self, nonexistent_archive: Path) -> None:
+        """Reads share the archive; a write waits for them and holds later reads."""
+        events: List[str] = []
+        first, write, last = (Gate(events, n) for n in ("read1", "write", "read2"))
+
+        async def main() -> None:
+            api = make_api(nonexistent_archive)
+            # A second instance on the same archive shares the lock
+            other = make_api(nonexistent_archive)
+            api._wallpapers.list = first
+            other._wallpapers.remove = write
+            api._wallpapers.search = last
+            reading = asyncio.create_task(api.list())
+            await started(first)
+            writing = asyncio.create_task(other.remove(["a.png"]))
+            searching = asyncio.create_task(api.search("a"))
+            await asyncio.sleep(0.05)
+            assert events == ["read1 start"]
+            first.release.set()
+            await started(write)
+            await asyncio.sleep(0.05)
+            assert not last.started.is_set()
+            write.release.set()
+            last.release.set()
+            await asyncio.gather(reading, writing, searching)
+            await api.aclose()
+            await other.aclose()
+
+        asyncio.run(main())
+        assert events == [
+            "read1 start",
+            "read1 end",
+            "write start",
+            "write end",
+            "read2 start",
+            "read2 end",
+        ]
+
+    def test_cancellation(self, nonexistent_archive: Path) -> None:
+        """Queued calls never run; a running write keeps the archive locked."""
+        events: List[str] = []
+        write, queued, read = (Gate(events, n) for n in ("write", "queued", "read"))
+
+        async def main() -> None:
+            api = make_api(nonexistent_archive)
+            api._wallpapers.compact = write
+            api._wallpapers.convert = queued
+            api._wallpapers.list = read
+            writing = asyncio.create_task(api.compact())
+            await started(write)
+            waiting = asyncio.create_task(api.convert("xz"))
+            reading = asyncio.create_task(api.list())
+            await asyncio.sleep(0.01)
+
+            waiting.cancel()
+            writing.cancel()
+            for task in (waiting, writing):
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            # The cancelled write is still running, so the read waits
+            await asyncio.sleep(0.05)
+            assert not read.started.is_set()
+            write.release.set()
+            read.release.set()
+            assert await reading == "read"
+            await api.aclose()
+
+        asyncio.run(main())
+        assert events == ["write start", "write end", "read start", "read end"]
+
+    def test_invalid_concurrency(self, nonexistent_archive: Path) -> None:
+        """The concurrency limit must be positive."""
+        with pytest.raises(WallpaperError, match="at least 1"):
+            AsyncWallpapers(nonexistent_archive, max_concurrency=0)
@@ -0,0 +1,147 @@
+# tests/unit/test_image_probe.py
+"""Unit tests for the header-only image prober."""
+import io
+import struct
+from pathlib import Path
+
+import pytest
+
+from src.services.image_probe import ImageInfo, probe_bytes, probe_file, probe_image
+from tests.conftest import png_bytes
+
+
+def gif_bytes(width: int, height: int) -> bytes:
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\x00" * 16
+
+
+def bmp_bytes(width: int, height: int, header_size: int = 40) -> bytes:
+    if header_size == 12:
+        dib = struct.pack("<IHH", 12, width, height)
+    else:
+        dib = struct.pack("<Iii", header_size, width, height)
+    return b"BM" + b"\x00" * 12 + dib + b"\x00" * 16
+
+
+def webp_bytes(chunk: bytes, payload: bytes) -> bytes:
+    body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def jpeg_bytes(width: int, height: int, sof: int = 0xC0) -> bytes:
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    dqt = b"\xff\xdb" + struct.pack(">H", 67) + b"\x00" * 65
+    frame = bytes([0xFF, sof]) + struct.pack(">HBHH", 17, 8, height, width)
+    return b"\xff\xd8" + app0 + dqt + frame + b"\x00" * 12
+
+
+def tiff_bytes(width: int, height: int, order: str) -> bytes:
+    magic = b"II*\x00" if order == "<" else b"MM\x00*"
+    entries = [
+        struct.pack(order + "HHI", 254, 4, 1) + struct.pack(order + "I", 0),
+        struct.pack(order + "HHI", 256, 3, 1) + struct.pack(order + "HH", width, 0),
+        struct.pack(order + "HHI", 257, 4, 1) + struct.pack(order + "I", height),
+    ]
+    ifd = struct.pack(order + "H", len(entries)) + b"".join(entries)
+    # Put the IFD after some filler, as real files usually do
+    return magic + struct.pack(order + "I", 64) + b"\x00" * 56 + ifd
+
+
+class TestProbeFormats:
+    """Each supported format is identified with its dimensions."""
+
+    @pytest.mark.parametrize(
+        "data, expected",
+        [
+            (png_bytes(width=1920, height=1080), ImageInfo("png", 1920, 1080)),
+            (gif_bytes(640, 480), ImageInfo("gif", 640, 480)),
+            (bmp_bytes(800, 600), ImageInfo("bmp", 800, 600)),
+            (bmp_bytes(800, -600), ImageInfo("bmp", 800, 600)),
+            (bmp_bytes(320, 200, header_size=12), ImageInfo("bmp", 320, 200)),
+            (jpeg_bytes(3840, 2160), ImageInfo("jpeg", 3840, 2160)),
+            (jpeg_bytes(1024, 768, sof=0xC2), ImageInfo("jpeg", 1024, 768)),
+            (tiff_bytes(1280, 1024, "<"), ImageInfo("tiff", 1280, 1024)),
+            (tiff_bytes(1280, 1024, ">"), ImageInfo("tiff", 1280, 1024)),
+        ],
+    )
+    def test_probe_format(self, data: bytes, expected: ImageInfo) -> None:
+        """Dimensions are read from the header."""
+        assert probe_bytes(data) == expected
+
+    def test_webp_lossy(self) -> None:
+        """VP8 frames carry 14-bit dimensions after the start code."""
+        payload = b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 1024, 768)
+        assert probe_bytes(webp_bytes(b"VP8 ", payload)) == ImageInfo(
+            "webp", 1024, 768
+        )
+
+    def test_webp_lossless(self) -> None:
+        """VP8L packs width-1 and height-1 into 14-bit fields."""
+        bits = (2560 - 1) | ((1440 - 1) << 14)
+        payload = b"\x2f" + struct.pack("<I", bits)
+        assert probe_bytes(webp_bytes(b"VP8L", payload)) == ImageInfo(
+            "webp", 2560, 1440
+        )
+
+    def test_webp_extended(self) -> None:
+        """VP8X stores the canvas size as 24-bit width-1 and height-1."""
+        payload = b"\x00" * 4 + (5119).to_bytes(3, "little") + (2879).to_bytes(
+            3, "little"
+        )
+        assert probe_bytes(webp_bytes(b"VP8X", payload)) == ImageInfo(
+            "webp", 5120, 2880
+        )
+
+
+class TestProbeRejects:
+    """Data that isn't a readable image header probes as None."""
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            b"",
+            b"not an image at all",
+            png_bytes()[:20],
+            b"\x89PNG\r\n\x1a\n" + b"\x00" * 24,
+            png_bytes(width=0, height=10),
+            b"\xff\xd8\xff\xda" + b"\x00" * 32,
+            b"\xff\xd8" + b"\xff\xe0\x00\x10",
+            b"RIFF\x00\x00\x00\x00WAVEfmt ",
+            b"GIF89a",
+        ],
+    )
+    def test_rejects(self, data: bytes) -> None:
+        """Unknown, truncated or implausible headers aren't images."""
+        assert probe_bytes(data) is None
+
+
+class TestProbeIO:
+    """Tests for how much the prober reads."""
+
+    def test_reads_from_current_position(self) -> None:
+        """Probing starts where the stream is positioned."""
+        stream = io.BytesIO(b"junk" + png_bytes(width=2, height=3))
+        stream.seek(4)
+        assert probe_image(stream) == ImageInfo("png", 2, 3)
+
+    def test_jpeg_skips_segments_without_reading_them(self) -> None:
+        """Large metadata segments before the frame header are seeked over."""
+        exif = b"\xff\xe1" + struct.pack(">H", 60002) + b"\x00" * 60000
+        data = b"\xff\xd8" + exif + jpeg_bytes(800, 600)[2:]
+
+        class CountingReader(io.BytesIO):
+            consumed = 0
+
+            def read(self, size: int = -1) -> bytes:
+                chunk = super().read(size)
+                self.consumed += len(chunk)
+                return chunk
+
+        stream = CountingReader(data)
+        assert probe_image(stream) == ImageInfo("jpeg", 800, 600)
+        assert stream.consumed < 512
+
+    def test_probe_file(self, temp_dir: Path) -> None:
+        """Files are probed from disk."""
+        path = temp_dir / "image.gif"
+        path.write_bytes(gif_bytes(16, 9))
+        assert probe_file(path) == ImageInfo("gif", 16, 9)
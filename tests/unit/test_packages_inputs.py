@@ -0,0 +1,203 @@
+# tests/unit/test_packages_inputs.py
+"""Unit tests for skipping roles whose inputs are unchanged."""
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.services.packages_inputs import change_reason, input_record, role_inputs
+from src.services.packages_native import NativeRunner
+from src.services.packages_service import AnsibleError, PackagesService
+from src.services.packages_state import StateStore
+
+pytest.importorskip("jinja2")
+
+
+@pytest.fixture(autouse=True)
+def host_facts(facts: Dict):
+    """Use the fixture facts instead of the host's."""
+    with patch("src.services.packages_native.detect_facts", return_value=facts):
+        yield
+
+
+def inputs(playbook: Path, facts: Dict, tags: List[str], extra_args=None):
+    runner = NativeRunner(playbook, playbook.parent.parent, facts)
+    return role_inputs(runner.plan(tags, extra_args, partial=True), playbook)
+
+
+class TestChangeReason:
+    """Tests for deciding whether a role has to run."""
+
+    def test_inputs_cover_role_config_and_group_vars(
+        self, native_tree: Path, facts: Dict, temp_dir: Path
+    ) -> None:
+        """Role files, copied config files and group_vars are hashed."""
+        tool = inputs(native_tree, facts, ["tool"])["tool"]
+
+        files = set(tool.files)
+        assert str(temp_dir / "config-files" / "tool" / "lua" / "options.lua") in files
+        assert str(native_tree.parent / "roles" / "tool" / "tasks" / "copy.yml") in files
+        assert any(path.endswith("group_vars/all.yml") for path in files)
+        assert str(temp_dir / "home" / ".config" / "tool" / "init.lua") in tool.targets
+
+    def test_reasons(
+        self, native_tree: Path, facts: Dict, temp_dir: Path, home: Path
+    ) -> None:
+        """The first differing input or target is named."""
+        before = inputs(native_tree, facts, ["tool"])["tool"]
+        record = input_record(before)
+        assert change_reason(before, None) == "no successful run recorded"
+        assert change_reason(before, record) is None
+
+        source = temp_dir / "config-files" / "tool" / "init.lua"
+        source.write_text("-- changed\n")
+        assert change_reason(
+            inputs(native_tree, facts, ["tool"])["tool"], record
+        ) == f"{source} changed"
+        source.write_text("-- init\n")
+
+        with_vars = inputs(native_tree, facts, ["tool"], ["-e", "x=1"])["tool"]
+        assert change_reason(with_vars, record) == "variables changed"
+
+        (home / ".config" / "tool").mkdir(parents=True)
+        assert change_reason(before, record) == (
+            f"{home}/.config/tool changed since the last run"
+        )
+
+
+class TestPackagesServiceSkipUnchanged:
+    """Tests for installs that leave out unchanged roles."""
+
+    def test_native_rerun_is_skipped(
+        self, native_tree: Path, home: Path, fake_pacman: Path
+    ) -> None:
+        """A second run with nothing changed does nothing and says why."""
+        service = PackagesService(native_tree)
+        lines: List[str] = []
+
+        first = service.install(["tool"], native=True, output=lines.append)
+        second = service.install(["tool"], native=True, output=lines.append)
+
+        assert first.args == ["native", "tool"]
+        assert second.args == ["native"]
+        assert lines[-1].startswith(
+            "Skipping tool: inputs and target files unchanged since "
+        )
+        assert lines[-1].endswith("(use --force to run it)")
+
+    def test_changed_target_runs_again(
+        self, native_tree: Path, home: Path, fake_pacman: Path
+    ) -> None:
+        """A target edited since the last run is restored."""
+        service = PackagesService(native_tree)
+        service.install(["tool"], native=True, output=lambda line: None)
+        target = home / ".config" / "tool" / "init.lua"
+        target.write_text("-- edited\n")
+
+        result = service.install(["tool"], native=True, output=lambda line: None)
+
+        assert result.args == ["native", "tool"]
+        assert target.read_text() == "-- init\n"
+
+    def test_force(self, native_tree: Path, home: Path, fake_pacman: Path) -> None:
+        """--force runs unchanged roles."""
+        service = PackagesService(native_tree)
+        service.install(["tool"], native=True, output=lambda line: None)
+
+        result = service.install(
+            ["tool"], native=True, output=lambda line: None, force=True
+        )
+
+        assert result.args == ["native", "tool"]
+
+    def test_ansible_run_skips_unchanged_roles(
+        self, native_tree: Path, temp_dir: Path
+    ) -> None:
+        """ansible-playbook runs get --skip-tags, or don't start at all."""
+        state_dir = temp_dir / "state"
+        service = PackagesService(native_tree, state_dir=state_dir)
+        lines: List[str] = []
+
+        with patch("subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0)
+            service.install(["tool"], output=lines.append)
+            service.install(["shell,tool"], output=lines.append)
+            skipped = service.install(["tool"], output=lines.append)
+        commands = [
+            call.args[0] for call in mock_run.call_args_list
+            if call.args[0][0] == "ansible-playbook"
+        ]
+
+        assert commands[1] == [
+            "ansible-playbook", str(native_tree), "--tags", "shell,tool", "--skip-tags", "tool"
+        ]
+        assert skipped.args == ["skipped", "tool"]
+        assert len(commands) == 2
+        assert set(StateStore(state_dir / "state.json").section("inputs")) == {"shell", "tool"}
+
+    def test_ansible_run_probes_nothing_up_front(
+        self, native_tree: Path, temp_dir: Path
+    ) -> None:
+        """Hashing waits for a possible skip; packages aren't queried."""
+        service = PackagesService(native_tree, state_dir=temp_dir / "state")
+        calls: List[str] = []
+        plan = NativeRunner.plan
+
+        def run(cmd, **kwargs):
+            calls.append(cmd[0])
+            return MagicMock(returncode=0)
+
+        def traced_plan(runner, *args, **kwargs):
+            calls.append("plan")
+            return plan(runner, *args, **kwargs)
+
+        with patch("subprocess.run", side_effect=run), patch.object(
+            NativeRunner, "plan", traced_plan
+        ), patch("src.services.packages_inputs.missing_packages") as missing:
+            service.install(["shell"], output=lambda line: None)
+            first = list(calls)
+            skipped = service.install(["shell"], output=lambda line: None)
+
+        # Recorded after the run; planned again only once a skip was possible
+        assert first == ["ansible-playbook", "plan"]
+        assert calls[2:] == ["plan"]
+        assert skipped.args == ["skipped", "shell"]
+        missing.assert_not_called()
+
+    def test_failed_run_is_not_recorded(self, native_tree: Path, temp_dir: Path) -> None:
+        """Only successful runs are recorded."""
+        state_dir = temp_dir / "state"
+        service = PackagesService(native_tree, state_dir=state_dir)
+
+        with patch("subprocess.run") as mock_run:
+            mock_run.side_effect = subprocess.CalledProcessError(2, "ansible-playbook")
+            with pytest.raises(AnsibleError):
+                service.install(["tool"], output=lambda line: None)
+
+        assert StateStore(state_dir / "state.json").section("inputs") == {}
+
+    def test_check_mode_is_not_recorded(self, native_tree: Path, temp_dir: Path) -> None:
+        """A --check run neither skips roles nor records them."""
+        state_dir = temp_dir / "state"
+        service = PackagesService(native_tree, state_dir=state_dir)
+
+        with patch("subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0)
+            service.install(["tool"], ["--check"], output=lambda line: None)
+
+        assert StateStore(state_dir / "state.json").section("inputs") == {}
+
+    def test_parallel_plan_leaves_out_skipped_roles(
+        self, native_tree: Path, temp_dir: Path
+    ) -> None:
+        """Skipped roles get no job, and their dependents don't wait for them."""
+        meta = native_tree.parent / "roles" / "tool" / "meta"
+        meta.mkdir()
+        (meta / "main.yml").write_text("dependencies: [shell]\n")
+        service = PackagesService(native_tree, cache_dir=temp_dir / "cache")
+
+        jobs = service.plan_install(["shell,tool"], skip={"shell"})
+
+        assert [(job.name, job.deps) for job in jobs] == [("tool", [])]
@@ -0,0 +1,252 @@
+# tests/unit/test_packages_native.py
+"""Unit tests for the in-process executor of simple roles."""
+import os
+from pathlib import Path
+from typing import Dict, List
+from unittest.mock import patch
+
+import pytest
+
+from src.services.packages_native import (
+    NativeRunner,
+    NotSupported,
+    TaskFailed,
+    detect_facts,
+    parse_extra_args,
+)
+from src.services.packages_service import NativeTaskError, PackagesService
+
+pytest.importorskip("jinja2")
+
+
+def runner(playbook: Path, facts: Dict, lines: List[str]) -> NativeRunner:
+    return NativeRunner(playbook, playbook.parent.parent, facts, lines.append)
+
+
+class TestDetectFacts:
+    """Tests for reading the distribution from os-release."""
+
+    def test_arch(self, temp_dir: Path) -> None:
+        """Arch Linux maps to Ansible's names."""
+        release = temp_dir / "os-release"
+        release.write_text('NAME="Arch Linux"\nID=arch\nBUILD_ID=rolling\n')
+
+        facts = detect_facts(release)
+
+        assert facts["distribution"] == "Archlinux"
+        assert facts["os_family"] == "Archlinux"
+        assert facts["env"]["PATH"] == os.environ["PATH"]
+
+    def test_family_from_id_like(self, temp_dir: Path) -> None:
+        """Derivatives get their family from ID_LIKE."""
+        release = temp_dir / "os-release"
+        release.write_text(
+            'NAME="Ubuntu"\nID=ubuntu\nID_LIKE=debian\nVERSION_ID="24.04"\n'
+            "VERSION_CODENAME=noble\n"
+        )
+
+        facts = detect_facts(release)
+
+        assert facts["distribution"] == "Ubuntu"
+        assert facts["os_family"] == "Debian"
+        assert facts["distribution_version"] == "24.04"
+
+
+class TestParseExtraArgs:
+    """Tests for the ansible-playbook arguments a native run accepts."""
+
+    def test_extra_vars_and_check(self, temp_dir: Path) -> None:
+        """-e in key=value, JSON and @file forms, and --check."""
+        (temp_dir / "vars.yml").write_text("c: 3\n")
+
+        extra, check = parse_extra_args(
+            ["-e", "a=1 b='x y'", '--extra-vars={"d": [1]}', f"-e@{temp_dir}/vars.yml", "-C", "-vv"]
+        )
+
+        assert extra == {"a": "1", "b": "x y", "d": [1], "c": 3}
+        assert check
+
+    def test_unknown_argument(self) -> None:
+        """Arguments only Ansible understands aren't accepted."""
+        with pytest.raises(NotSupported, match="--limit"):
+            parse_extra_args(["--limit", "localhost"])
+
+
+class TestNativeRunner:
+    """Tests for planning and applying roles in-process."""
+
+    def test_plan_templates_tasks(
+        self, native_tree: Path, facts: Dict, home: Path
+    ) -> None:
+        """Variables follow Ansible's precedence and set_fact feeds later tasks."""
+        plan = runner(native_tree, facts, []).plan(["shell"])
+
+        assert plan.roles == ["shell"]
+        install, fact, render = plan.steps
+        assert install.args["name"] == ["zsh", "fzf"]
+        assert fact.args == {"PLUGIN": "/usr/share/plugin.zsh"}
+        assert render.args["dest"] == f"{home}/.shellrc"
+        assert render.args["content"] == "export PLUGIN=/usr/share/plugin.zsh\n"
+
+    def test_extra_vars_win(self, native_tree: Path, facts: Dict) -> None:
+        """-e overrides role vars, defaults and facts set by tasks."""
+        plan = runner(native_tree, facts, []).plan(
+            ["shell"], ["-e", "PLUGIN=/opt/p extra=true"]
+        )
+
+        assert plan.steps[2].args["content"] == "export PLUGIN=/opt/p\nexport EXTRA=1\n"
+
+    def test_apply_is_idempotent(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path
+    ) -> None:
+        """Files are written once; missing packages are installed."""
+        lines: List[str] = []
+        native = runner(native_tree, facts, lines)
+
+        first = native.apply(native.plan(["shell,tool"]))
+        second = native.apply(native.plan(["shell", "tool"]))
+
+        assert fake_pacman.read_text() == "-S --needed --noconfirm fzf\n"
+        assert [r.changed for r in first] == [True, False, True, True, True]
+        assert (home / ".shellrc").stat().st_mode & 0o777 == 0o644
+        assert (home / ".config" / "tool" / "lua" / "options.lua").read_text() == "-- options\n"
+        assert (home / ".config" / "tool").stat().st_mode & 0o777 == 0o755
+        # Tasks whose condition is false aren't run
+        assert "Debug only" not in "\n".join(lines)
+        assert [r.changed for r in second if r.module != "package"] == [False] * 4
+        assert lines[2] == "changed: [shell] Render rc"
+
+    def test_template_change_keeps_backup(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path
+    ) -> None:
+        """A rendered file that changed is backed up before being replaced."""
+        (home / ".shellrc").write_text("old\n")
+        native = runner(native_tree, facts, [])
+
+        native.apply(native.plan(["shell"]))
+
+        backups = [p for p in home.iterdir() if p.name.startswith(".shellrc.")]
+        assert len(backups) == 1
+        assert backups[0].read_text() == "old\n"
+
+    @pytest.mark.parametrize("follow", [False, True])
+    def test_symlinked_destination(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path, follow: bool
+    ) -> None:
+        """A symlink is replaced, or its target written with follow: true."""
+        dotfiles = home / "dotfiles"
+        dotfiles.mkdir()
+        (dotfiles / "shellrc").write_text("old\n")
+        (home / ".shellrc").symlink_to(dotfiles / "shellrc")
+        if follow:
+            tasks = native_tree.parent / "roles" / "shell" / "tasks" / "main.yml"
+            tasks.write_text(tasks.read_text() + "    follow: true\n")
+        native = runner(native_tree, facts, [])
+
+        native.apply(native.plan(["shell"]))
+
+        assert (home / ".shellrc").is_symlink() is follow
+        rendered = "export PLUGIN=/usr/share/plugin.zsh\n"
+        assert (home / ".shellrc").read_text() == rendered
+        assert (dotfiles / "shellrc").read_text() == (rendered if follow else "old\n")
+
+    def test_check_mode_changes_nothing(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path
+    ) -> None:
+        """--check reports what would change without touching anything."""
+        native = runner(native_tree, facts, [])
+
+        results = native.apply(native.plan(["tool"], ["--check"]))
+
+        assert all(r.changed for r in results)
+        assert list(home.iterdir()) == []
+
+    @pytest.mark.parametrize(
+        "tags, task, reason",
+        [
+            (["debug"], None, "play task 'Debug paths' is selected"),
+            (["all"], None, "tag 'all'"),
+            (["tool"], "- ansible.builtin.git:\n    repo: x\n", "uses the git module"),
+            (["tool"], "- copy:\n    src: a\n    dest: b\n  register: r\n", "uses 'register'"),
+            (["tool"], "- file:\n    path: /x\n    state: link\n    src: /y\n", "option 'src'"),
+            (["tool"], "- name: x\n  file: path=/x\n", "free-form"),
+            (["tool"], "- copy:\n    content: x\n    dest: /x\n    mode: u=rw\n", "'u=rw' isn't an octal"),
+        ],
+    )
+    def test_unsupported(
+        self, native_tree: Path, facts: Dict, tags: List[str], task: str, reason: str
+    ) -> None:
+        """Anything outside the supported subset is refused before any change."""
+        if task is not None:
+            tasks = native_tree.parent / "roles" / "tool" / "tasks" / "main.yml"
+            tasks.write_text(task)
+
+        with pytest.raises(NotSupported, match=reason):
+            runner(native_tree, facts, []).plan(tags)
+
+    def test_undefined_variable(self, native_tree: Path, facts: Dict) -> None:
+        """A variable Ansible would have to provide makes the run unsupported."""
+        (native_tree.parent / "roles" / "tool" / "tasks" / "main.yml").write_text(
+            "- file:\n    path: \"{{ ansible_user_shell }}\"\n    state: touch\n"
+        )
+
+        with pytest.raises(NotSupported, match="ansible_user_shell"):
+            runner(native_tree, facts, []).plan(["tool"])
+
+    def test_failed_package_install(
+        self, native_tree: Path, facts: Dict, fake_pacman: Path
+    ) -> None:
+        """A failing package manager stops the run."""
+        fake_pacman.parent.joinpath("bin", "pacman").write_text("#!/bin/sh\nexit 1\n")
+        native = runner(native_tree, facts, [])
+
+        with pytest.raises(TaskFailed, match=r"\[shell\] Install shell: .*status 1"):
+            native.apply(native.plan(["shell"]))
+
+
+class TestPackagesServiceNativeInstall:
+    """Tests for install(native=True)."""
+
+    def test_runs_in_process(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path
+    ) -> None:
+        """Supported roles never start ansible-playbook."""
+        service = PackagesService(native_tree)
+        lines: List[str] = []
+
+        with patch(
+            "src.services.packages_native.detect_facts", return_value=facts
+        ), patch("subprocess.run", wraps=__import__("subprocess").run) as run:
+            result = service.install(["tool"], native=True, output=lines.append)
+
+        assert result.returncode == 0
+        assert result.args == ["native", "tool"]
+        assert not any(call.args[0][0] == "ansible-playbook" for call in run.call_args_list)
+        assert (home / ".config" / "tool" / "init.lua").exists()
+
+    def test_falls_back_to_ansible(self, native_tree: Path, facts: Dict) -> None:
+        """Unsupported runs go through ansible-playbook unchanged."""
+        service = PackagesService(native_tree)
+        lines: List[str] = []
+
+        with patch(
+            "src.services.packages_native.detect_facts", return_value=facts
+        ), patch("subprocess.run") as run:
+            run.return_value.returncode = 0
+            service.install(["debug"], ["--limit", "localhost"], native=True, output=lines.append)
+
+        assert run.call_args.args[0] == [
+            "ansible-playbook", str(native_tree), "--tags", "debug", "--limit", "localhost"
+        ]
+        assert lines == ["Running ansible-playbook: argument --limit isn't supported natively"]
+
+    def test_task_failure(
+        self, native_tree: Path, facts: Dict, home: Path, fake_pacman: Path
+    ) -> None:
+        """A failing native task raises NativeTaskError."""
+        (home / ".config").write_text("not a directory\n")
+        service = PackagesService(native_tree)
+
+        with patch("src.services.packages_native.detect_facts", return_value=facts):
+            with pytest.raises(NativeTaskError, match="Ensure config dir"):
+                service.install(["tool"], native=True, output=lambda line: None)
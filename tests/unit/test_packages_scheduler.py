@@ -0,0 +1,162 @@
+# tests/unit/test_packages_scheduler.py
+"""Unit tests for the parallel job scheduler."""
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.services.packages_scheduler import Job, critical_paths, run_jobs
+
+
+def script(code: str) -> List[str]:
+    """Command running a short Python snippet."""
+    return [sys.executable, "-c", code]
+
+
+def recorder(log: Path, name: str, seconds: float = 0.0, code: int = 0) -> List[str]:
+    """Command that appends start/end markers for ``name`` to ``log``."""
+    return script(
+        "import sys, time\n"
+        f"open({str(log)!r}, 'a').write('start {name}\\n')\n"
+        f"time.sleep({seconds})\n"
+        f"print('hello from {name}')\n"
+        f"open({str(log)!r}, 'a').write('end {name}\\n')\n"
+        f"sys.exit({code})\n"
+    )
+
+
+class TestCriticalPaths:
+    """Tests for the priority of jobs."""
+
+    def test_chain_lengths(self) -> None:
+        """A job's length includes the longest chain of its dependents."""
+        jobs = [
+            Job("a", [], duration=1.0),
+            Job("b", [], deps=["a"], duration=5.0),
+            Job("c", [], deps=["a"], duration=2.0),
+            Job("d", [], duration=4.0),
+        ]
+
+        assert critical_paths(jobs) == {"a": 6.0, "b": 5.0, "c": 2.0, "d": 4.0}
+
+    def test_cycle(self) -> None:
+        """Cyclic dependencies are rejected."""
+        jobs = [Job("a", [], deps=["b"]), Job("b", [], deps=["a"])]
+
+        with pytest.raises(ValueError, match="cycle"):
+            critical_paths(jobs)
+
+    def test_unknown_dependency(self) -> None:
+        """Dependencies must name jobs in the list."""
+        with pytest.raises(ValueError, match="unknown job 'x'"):
+            critical_paths([Job("a", [], deps=["x"])])
+
+
+class TestRunJobs:
+    """Tests for running jobs as subprocesses."""
+
+    def test_output_is_prefixed(self, temp_dir: Path) -> None:
+        """Each output line carries its job's name, padded to a common width."""
+        lines: List[str] = []
+        log = temp_dir / "log"
+
+        results = run_jobs(
+            [Job("zsh", recorder(log, "zsh")), Job("nvim", recorder(log, "nvim"))],
+            2,
+            lines.append,
+        )
+
+        assert [r.status for r in results] == ["ok", "ok"]
+        assert sorted(lines) == ["[nvim] hello from nvim", "[zsh ] hello from zsh"]
+
+    def test_dependencies_run_first(self, temp_dir: Path) -> None:
+        """A job starts only after the jobs it depends on ended."""
+        log = temp_dir / "log"
+
+        run_jobs(
+            [
+                Job("b", recorder(log, "b"), deps=["a"]),
+                Job("a", recorder(log, "a", 0.2)),
+            ],
+            4,
+            lambda line: None,
+        )
+
+        assert log.read_text().split("\n")[:4] == ["start a", "end a", "start b", "end b"]
+
+    def test_longest_first(self, temp_dir: Path) -> None:
+        """With one worker the job with the longest expected chain runs first."""
+        log = temp_dir / "log"
+
+        run_jobs(
+            [
+                Job("short", recorder(log, "short"), duration=1.0),
+                Job("long", recorder(log, "long"), duration=9.0),
+                Job("new", recorder(log, "new")),
+            ],
+            1,
+            lambda line: None,
+        )
+
+        starts = [l.split()[1] for l in log.read_text().splitlines() if l.startswith("start")]
+        # Jobs without a recorded duration are assumed slow
+        assert starts == ["new", "long", "short"]
+
+    def test_worker_limit(self, temp_dir: Path) -> None:
+        """No more than ``workers`` jobs run at once."""
+        log = temp_dir / "log"
+        jobs = [Job(str(i), recorder(log, str(i), 0.1)) for i in range(5)]
+
+        run_jobs(jobs, 2, lambda line: None)
+
+        running = peak = 0
+        for line in log.read_text().splitlines():
+            running += 1 if line.startswith("start") else -1
+            peak = max(peak, running)
+        assert peak == 2
+
+    def test_shared_resource_is_exclusive(self, temp_dir: Path) -> None:
+        """Jobs naming the same resource never overlap."""
+        log = temp_dir / "log"
+        jobs = [
+            Job(name, recorder(log, name, 0.1), resource="pkg")
+            for name in ("a", "b", "c")
+        ]
+
+        run_jobs(jobs, 3, lambda line: None)
+
+        lines = log.read_text().splitlines()
+        assert all(
+            lines[i].startswith("start") and lines[i + 1].startswith("end")
+            for i in range(0, len(lines), 2)
+        )
+
+    def test_failure_skips_dependents(self, temp_dir: Path) -> None:
+        """Dependents of a failed job are skipped; other jobs still run."""
+        log = temp_dir / "log"
+
+        results = run_jobs(
+            [
+                Job("a", recorder(log, "a", code=3)),
+                Job("b", recorder(log, "b"), deps=["a"]),
+                Job("c", recorder(log, "c"), deps=["b"]),
+                Job("d", recorder(log, "d")),
+            ],
+            2,
+            lambda line: None,
+        )
+
+        assert [(r.name, r.status, r.returncode) for r in results] == [
+            ("a", "failed", 3),
+            ("b", "skipped", 0),
+            ("c", "skipped", 0),
+            ("d", "ok", 0),
+        ]
+        assert results[2].reason == "depends on failed job 'a'"
+        assert "start b" not in log.read_text()
+
+    def test_missing_command(self) -> None:
+        """A command that doesn't exist raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            run_jobs([Job("a", ["/nonexistent/command"])], 1, lambda line: None)
@@ -7,6 +7,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 import yaml
 
+from src.services import packages_catalog
 from src.services.packages_service import (
     PackagesService,
     PackagesError,
@@ -14,7 +15,9 @@ from src.services.packages_service import (
     AnsibleError,
     AnsibleNotFoundError,
     PackageRole,
+    RoleNotFoundError,
 )
+from src.services.packages_state import StateStore
 
 
 @pytest.fixture
@@ -25,6 +28,28 @@ def playbook_dir(temp_dir: Path) -> Path:
     return playbook_path
 
 
+@pytest.fixture
+def fake_ansible(temp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put an ansible-playbook on PATH that logs its arguments.
+
+    Returns the log file; ``FAIL_TAGS`` makes runs with those tags fail.
+    """
+    bin_dir = temp_dir / "bin"
+    bin_dir.mkdir()
+    log = temp_dir / "ansible.log"
+    command = bin_dir / "ansible-playbook"
+    command.write_text(
+        "#!/bin/sh\n"
+        f'echo "$*" >> "{log}"\n'
+        'echo "PLAY RECAP"\n'
+        'case "$*" in *"--tags $FAIL_TAGS"*) exit 2;; esac\n'
+    )
+    command.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:/usr/bin:/bin")
+    monkeypatch.setenv("FAIL_TAGS", "none")
+    return log
+
+
 @pytest.fixture
 def sample_playbook(playbook_dir: Path) -> Path:
     """Create a sample Ansible playbook with roles."""
@@ -246,3 +271,253 @@ class TestPackagesServiceInstall:
             result = service.install()
 
             assert result == mock_result
+
+
+class TestPackagesServiceParseCache:
+    """Tests for cached playbook parsing and playbook imports."""
+
+    @pytest.fixture
+    def imports(self, playbook_dir: Path) -> Path:
+        """A playbook that imports another one with extra tags."""
+        (playbook_dir / "shell.yml").write_text(
+            "- hosts: localhost\n  roles:\n    - role: zsh\n      tags: [zsh]\n"
+        )
+        playbook_path = playbook_dir / "bootstrap.yml"
+        playbook_path.write_text(
+            "- hosts: localhost\n  roles:\n    - nvim\n"
+            "- import_playbook: shell.yml\n  tags: [shell]\n"
+            "- ansible.builtin.import_playbook: shell.yml\n"
+        )
+        return playbook_path
+
+    def test_imported_roles_are_listed(self, imports: Path, temp_dir: Path) -> None:
+        """Imported roles appear once, with the import's tags."""
+        service = PackagesService(playbook_path=imports, cache_dir=temp_dir / "c")
+
+        assert service.list_packages() == [
+            PackageRole(name="nvim", tags=[]),
+            PackageRole(name="zsh", tags=["zsh", "shell"]),
+        ]
+
+    def test_missing_import(self, playbook_dir: Path, temp_dir: Path) -> None:
+        """An import of a missing playbook is reported."""
+        playbook_path = playbook_dir / "bootstrap.yml"
+        playbook_path.write_text("- import_playbook: gone.yml\n")
+        service = PackagesService(playbook_path=playbook_path, cache_dir=temp_dir)
+
+        with pytest.raises(PlaybookNotFoundError, match="gone.yml"):
+            service.list_packages()
+
+    def test_warm_list_does_not_parse_yaml(
+        self, imports: Path, temp_dir: Path
+    ) -> None:
+        """A second service reads the cached records instead of the YAML."""
+        cache_dir = temp_dir / "cache"
+        expected = PackagesService(imports, cache_dir=cache_dir).list_packages()
+
+        with patch("src.services.packages_service.load_yaml") as load:
+            roles = PackagesService(imports, cache_dir=cache_dir).list_packages()
+
+        assert roles == expected
+        load.assert_not_called()
+
+    def test_changed_import_invalidates(self, imports: Path, temp_dir: Path) -> None:
+        """Editing an imported playbook is picked up."""
+        service = PackagesService(imports, cache_dir=temp_dir / "cache")
+        service.list_packages()
+
+        (imports.parent / "shell.yml").write_text(
+            "- hosts: localhost\n  roles:\n    - fish\n"
+        )
+
+        assert [role.name for role in service.list_packages()] == ["nvim", "fish"]
+
+    def test_unreadable_cache_is_ignored(self, imports: Path, temp_dir: Path) -> None:
+        """A corrupt cache file is rebuilt."""
+        cache_dir = temp_dir / "cache"
+        cache_dir.mkdir()
+        (cache_dir / "playbooks.json").write_text("{not json")
+        service = PackagesService(imports, cache_dir=cache_dir)
+
+        assert len(service.list_packages()) == 2
+        assert len(service.list_packages()) == 2
+
+
+class TestPackagesServiceCatalog:
+    """Tests for the role catalog built from the roles tree."""
+
+    def test_catalog_describes_roles(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """Package maps, tasks, templates and sources are read from each role."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        catalog = service.role_catalog()
+
+        assert list(catalog) == ["zsh", "nvim"]
+        zsh = catalog["zsh"]
+        assert zsh.packages == {"Archlinux": ["zsh", "fzf"], "Debian": ["zsh"]}
+        assert [t.module for t in zsh.tasks] == ["package", "template"]
+        assert zsh.templates == ["{{ zsh_template_src }}"]
+        assert zsh.defaults["zsh_template_src"].endswith(".zshrc.j2")
+        assert list(zsh.variables) == ["zsh_packages_map"]
+        assert zsh.files == ["defaults/main.yml", "tasks/main.yml", "vars/main.yml"]
+        nvim = catalog["nvim"]
+        # Blocks and static imports are inlined
+        assert nvim.packages == {"*": ["neovim"]}
+        assert nvim.sources == ["{{ config_files_root }}/nvim/"]
+        assert [t.module for t in nvim.tasks] == ["package", "copy"]
+
+    def test_unchanged_roles_are_not_parsed(
+        self, ansible_tree: Path, temp_dir: Path
+    ) -> None:
+        """Only roles whose files changed are parsed again."""
+        cache_dir = temp_dir / "cache"
+        first = PackagesService(ansible_tree, cache_dir=cache_dir).role_catalog()
+        roles = ansible_tree.parent / "roles"
+        (roles / "features" / "nvim" / "tasks" / "copy.yml").write_text("[]\n")
+
+        with patch(
+            "src.services.packages_catalog.scan_role",
+            wraps=packages_catalog.scan_role,
+        ) as scan:
+            second = PackagesService(ansible_tree, cache_dir=cache_dir).role_catalog()
+
+        assert [call.args[0] for call in scan.call_args_list] == ["nvim"]
+        assert second["zsh"] == first["zsh"]
+        assert second["nvim"].sources == []
+
+    def test_added_file_invalidates(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """A file added to a role is picked up."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+        service.role_catalog()
+        templates = ansible_tree.parent / "roles" / "base" / "zsh" / "templates"
+        templates.mkdir()
+        (templates / "zshrc.j2").write_text("# zsh\n")
+
+        assert "templates/zshrc.j2" in service.role_info("zsh").files
+
+    def test_first_role_on_path_wins(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """A role name found in several roles_path entries uses the first."""
+        shadow = ansible_tree.parent / "roles" / "features" / "zsh"
+        (shadow / "tasks").mkdir(parents=True)
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        assert "base" in service.role_info("zsh").path
+
+    def test_unknown_role(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """Asking for a role that isn't on the roles path raises."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        with pytest.raises(RoleNotFoundError, match="fish"):
+            service.role_info("fish")
+
+
+class TestPackagesServiceParallelInstall:
+    """Tests for installs split into parallel ansible-playbook runs."""
+
+    def test_plan_one_run_per_role(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """Each selected role gets a run selecting it by its own tag."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        jobs = service.plan_install(["zsh,nvim", "debug"], ["-v"])
+
+        assert [job.name for job in jobs] == ["zsh", "nvim", "debug"]
+        assert jobs[0].command == [
+            "ansible-playbook", str(ansible_tree), "--tags", "zsh", "-v"
+        ]
+        assert jobs[2].command[-3:] == ["--tags", "debug", "-v"]
+        # Both roles install packages, so they never overlap
+        assert jobs[0].resource == jobs[1].resource == "package-manager"
+        assert jobs[2].resource is None
+
+    def test_plan_follows_meta_dependencies(
+        self, ansible_tree: Path, temp_dir: Path
+    ) -> None:
+        """A role waits for selected roles it depends on."""
+        meta = ansible_tree.parent / "roles" / "features" / "nvim" / "meta"
+        meta.mkdir()
+        (meta / "main.yml").write_text("dependencies:\n  - role: zsh\n")
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        jobs = {job.name: job for job in service.plan_install(["zsh", "nvim"])}
+
+        assert jobs["nvim"].deps == ["zsh"]
+        assert jobs["zsh"].deps == []
+
+    def test_plan_shared_tags(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """Roles without a tag of their own share a run that skips the others."""
+        ansible_tree.write_text(
+            "- hosts: localhost\n  roles:\n"
+            "    - role: zsh\n      tags: [zsh, shell]\n"
+            "    - role: fish\n      tags: [shell]\n"
+            "    - role: bash\n      tags: [shell]\n"
+        )
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        jobs = service.plan_install(["shell"])
+
+        assert [job.name for job in jobs] == ["zsh", "fish+bash"]
+        assert jobs[1].command[2:] == ["--tags", "shell", "--skip-tags", "zsh"]
+
+    def test_install_parallel(
+        self, ansible_tree: Path, temp_dir: Path, fake_ansible: Path
+    ) -> None:
+        """Runs are prefixed, succeed together and record their durations."""
+        state_dir = temp_dir / "state"
+        service = PackagesService(
+            ansible_tree, cache_dir=temp_dir / "cache", state_dir=state_dir
+        )
+        lines: list = []
+
+        result = service.install_parallel(["zsh", "nvim"], jobs=2, output=lines.append)
+
+        assert result.ok and result.returncode == 0
+        assert sorted(lines) == ["[nvim] PLAY RECAP", "[zsh ] PLAY RECAP"]
+        assert len(fake_ansible.read_text().splitlines()) == 2
+        durations = StateStore(state_dir / "state.json").section("durations")
+        assert set(durations) == {"zsh", "nvim"}
+
+    def test_install_parallel_failure(
+        self,
+        ansible_tree: Path,
+        temp_dir: Path,
+        fake_ansible: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """The overall exit status is the worst run's."""
+        monkeypatch.setenv("FAIL_TAGS", "nvim")
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        result = service.install_parallel(["zsh", "nvim"], output=lambda line: None)
+
+        assert not result.ok
+        assert result.returncode == 2
+        assert [job.status for job in result.jobs] == ["ok", "failed"]
+
+    @pytest.mark.parametrize("args", [["-K"], ["--ask-vault-pass"]])
+    def test_prompts_rejected(
+        self, ansible_tree: Path, temp_dir: Path, args: list
+    ) -> None:
+        """Arguments that prompt for input can't be shared by parallel runs."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        with pytest.raises(PackagesError, match="become-password-file"):
+            service.install_parallel(["zsh"], args)
+
+    def test_tags_required(self, ansible_tree: Path, temp_dir: Path) -> None:
+        """A parallel install has to select roles."""
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        with pytest.raises(PackagesError, match="--tags"):
+            service.install_parallel([])
+        with pytest.raises(PackagesError, match="at least 1"):
+            service.install_parallel(["zsh"], jobs=0)
+
+    def test_ansible_missing(
+        self, ansible_tree: Path, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A missing ansible-playbook raises AnsibleNotFoundError."""
+        monkeypatch.setenv("PATH", str(temp_dir / "empty"))
+        service = PackagesService(ansible_tree, cache_dir=temp_dir / "cache")
+
+        with pytest.raises(AnsibleNotFoundError):
+            service.install_parallel(["zsh"], output=lambda line: None)
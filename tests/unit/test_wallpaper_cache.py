@@ -0,0 +1,137 @@
+# tests/unit/test_wallpaper_cache.py
+"""Unit tests for the local wallpaper blob cache and linked extraction."""
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+
+from src.services.wallpaper_cache import BlobCache, default_cache_dir, materialize
+from src.services.wallpapers_service import WallpaperError, WallpapersService
+from tests.conftest import png_bytes
+
+
+@pytest.fixture
+def cache(temp_dir: Path) -> BlobCache:
+    """Provide an empty cache inside the temporary directory."""
+    return BlobCache(temp_dir / "blobs")
+
+
+@pytest.fixture
+def blob(cache: BlobCache) -> Path:
+    """Store one blob in the cache."""
+    content = b"cached wallpaper"
+    sha256 = hashlib.sha256(content).hexdigest()
+    return cache.store(sha256, io.BytesIO(content), mtime=1_700_000_000)
+
+
+class TestBlobCache:
+    """Tests for storing blobs."""
+
+    def test_default_dir_follows_xdg_data_home(
+        self, monkeypatch: pytest.MonkeyPatch, temp_dir: Path
+    ) -> None:
+        """The cache lives below $XDG_DATA_HOME."""
+        monkeypatch.setenv("XDG_DATA_HOME", str(temp_dir))
+        assert default_cache_dir() == (
+            temp_dir / "dotfiles-config" / "wallpapers" / "blobs"
+        )
+
+    def test_store_is_read_only_and_keyed_by_hash(
+        self, cache: BlobCache, blob: Path
+    ) -> None:
+        """Blobs are named by their hash and protected from edits."""
+        assert blob == cache.path_for(hashlib.sha256(b"cached wallpaper").hexdigest())
+        assert blob.read_bytes() == b"cached wallpaper"
+        assert blob.stat().st_mode & 0o222 == 0
+        assert int(blob.stat().st_mtime) == 1_700_000_000
+
+    def test_store_rejects_hash_mismatch(self, cache: BlobCache) -> None:
+        """Content that doesn't match its hash never enters the cache."""
+        with pytest.raises(ValueError, match="mismatch"):
+            cache.store("0" * 64, io.BytesIO(b"other"), mtime=0)
+        assert not cache.has("0" * 64)
+        assert not any(cache.root.rglob("*.tmp"))
+
+
+class TestMaterialize:
+    """Tests for creating files from cached blobs."""
+
+    def test_hardlink_shares_inode(self, blob: Path, temp_dir: Path) -> None:
+        """Hard links point at the cached inode."""
+        target = temp_dir / "a.png"
+        assert materialize(blob, target, "hardlink") == "hardlink"
+        assert target.stat().st_ino == blob.stat().st_ino
+
+    def test_symlink_points_at_blob(self, blob: Path, temp_dir: Path) -> None:
+        """Symlinks resolve to the cached blob."""
+        target = temp_dir / "a.png"
+        assert materialize(blob, target, "symlink") == "symlink"
+        assert target.resolve() == blob.resolve()
+
+    def test_reflink_falls_back_to_copy(self, blob: Path, temp_dir: Path) -> None:
+        """Reflinks are used where supported, copies elsewhere."""
+        target = temp_dir / "a.png"
+        assert materialize(blob, target, "reflink") in ("reflink", "copy")
+        assert target.read_bytes() == b"cached wallpaper"
+        assert target.stat().st_ino != blob.stat().st_ino
+
+    def test_replaces_existing_file(self, blob: Path, temp_dir: Path) -> None:
+        """An existing target is replaced, not written through."""
+        target = temp_dir / "a.png"
+        target.write_bytes(b"old")
+        materialize(blob, target, "copy")
+        assert target.read_bytes() == b"cached wallpaper"
+
+
+class TestLinkedExtraction:
+    """Tests for extracting through the blob cache."""
+
+    @pytest.fixture
+    def service(self, nonexistent_archive: Path, temp_dir: Path) -> WallpapersService:
+        """Create an archive of two wallpapers with a private cache."""
+        for name in ("a.png", "b.png"):
+            (temp_dir / name).write_bytes(png_bytes(name.encode() * 1000))
+        service = WallpapersService(
+            nonexistent_archive, cache_dir=temp_dir / "blobs"
+        )
+        service.add_wallpapers([temp_dir / "a.png", temp_dir / "b.png"])
+        return service
+
+    def test_second_location_reuses_cache(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """Two extraction targets hard-link the same cached blobs."""
+        first = service.extract_wallpapers(temp_dir / "one", link_mode="hardlink")
+        second = service.extract_wallpapers(temp_dir / "two", link_mode="hardlink")
+
+        assert (first / "a.png").read_bytes() == png_bytes(b"a.png" * 1000)
+        assert (first / "a.png").stat().st_ino == (second / "a.png").stat().st_ino
+        assert (second / "a.png").stat().st_nlink == 3
+
+    def test_sync_skips_linked_files(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """Files already linked to their blob are left alone."""
+        service.sync_wallpapers(temp_dir / "out", link_mode="symlink")
+        result = service.sync_wallpapers(temp_dir / "out", link_mode="symlink")
+
+        assert result.copied == []
+        assert result.skipped == ["a.png", "b.png"]
+
+    def test_plain_extract_replaces_links(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """Writing over a linked file leaves the cached blob intact."""
+        result = service.extract_wallpapers(temp_dir / "out", link_mode="symlink")
+        service.extract_wallpapers(temp_dir / "out")
+
+        assert not (result / "a.png").is_symlink()
+        assert service.cache.has(hashlib.sha256(png_bytes(b"a.png" * 1000)).hexdigest())
+
+    def test_unknown_link_mode(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """Unknown link modes are rejected before extracting anything."""
+        with pytest.raises(WallpaperError, match="Unknown link mode"):
+            service.extract_wallpapers(temp_dir / "out", link_mode="junction")
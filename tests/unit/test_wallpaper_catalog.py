@@ -0,0 +1,288 @@
+# tests/unit/test_wallpaper_catalog.py
+"""Unit tests for the wallpaper query catalog."""
+import fnmatch
+import random
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.services import wallpaper_archive
+from src.services.wallpaper_archive import ArchiveMember
+from src.services.wallpaper_catalog import (
+    WallpaperCatalog,
+    member_filter,
+    parse_aspect,
+)
+from src.services.wallpaper_index import WallpaperIndex, index_path_for
+from src.services.wallpapers_service import WallpaperError, WallpapersService
+from tests.conftest import png_bytes
+
+
+def member(
+    name: str, width: int = None, height: int = None, size: int = 100
+) -> ArchiveMember:
+    return ArchiveMember(
+        name=name,
+        size=size,
+        mtime=0,
+        segment=0,
+        offset=0,
+        sha256=name,
+        format="png" if width else None,
+        width=width,
+        height=height,
+    )
+
+
+@pytest.fixture
+def catalog() -> WallpaperCatalog:
+    """A small catalog covering common monitor shapes."""
+    return WallpaperCatalog(
+        [
+            member("forest.png", 1920, 1080, size=300),
+            member("ultrawide.png", 3440, 1440, size=900),
+            member("city.png", 3840, 2160, size=800),
+            member("phone.png", 1080, 1920, size=200),
+            member("beach.png", 2560, 1080, size=500),
+            member("notes.png", size=50),
+        ]
+    )
+
+
+def names(members: list) -> list:
+    return [m.name for m in members]
+
+
+class TestParseAspect:
+    """Tests for aspect ratio parsing."""
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [("16:9", 16 / 9), ("16/10", 1.6), ("3440x1440", 3440 / 1440), ("2.39", 2.39)],
+    )
+    def test_formats(self, value: str, expected: float) -> None:
+        """Ratios, resolutions and plain numbers are accepted."""
+        assert parse_aspect(value) == pytest.approx(expected)
+
+    @pytest.mark.parametrize("value", ["wide", "16:0", "0", "-1.5", ""])
+    def test_invalid(self, value: str) -> None:
+        """Anything that isn't a positive ratio is rejected."""
+        with pytest.raises(ValueError, match="Invalid aspect ratio"):
+            parse_aspect(value)
+
+
+class TestCatalogQuery:
+    """Tests for filtering and sorting."""
+
+    def test_no_filters_sorted_by_name(self, catalog: WallpaperCatalog) -> None:
+        """Without filters every member is returned in name order."""
+        assert names(catalog.query()) == [
+            "beach.png",
+            "city.png",
+            "forest.png",
+            "notes.png",
+            "phone.png",
+            "ultrawide.png",
+        ]
+
+    def test_min_width(self, catalog: WallpaperCatalog) -> None:
+        """Members without known dimensions never match size filters."""
+        assert names(catalog.query(min_width=2560)) == [
+            "beach.png",
+            "city.png",
+            "ultrawide.png",
+        ]
+
+    def test_aspect_with_tolerance(self, catalog: WallpaperCatalog) -> None:
+        """Aspect matching allows a relative tolerance."""
+        ultrawide = parse_aspect("21:9")
+        assert names(catalog.query(aspect=ultrawide)) == ["beach.png"]
+        assert names(catalog.query(aspect=ultrawide, aspect_tolerance=0.05)) == [
+            "beach.png",
+            "ultrawide.png",
+        ]
+
+    def test_combined_filters(self, catalog: WallpaperCatalog) -> None:
+        """Every filter must match."""
+        result = catalog.query(min_height=1080, max_size=500, name_glob="*e*")
+        assert names(result) == ["beach.png", "forest.png", "phone.png"]
+
+    def test_glob_with_literal_prefix(self, catalog: WallpaperCatalog) -> None:
+        """Globs match whole names, case-sensitively."""
+        assert names(catalog.query(name_glob="c*.png")) == ["city.png"]
+        assert names(catalog.query(name_glob="C*")) == []
+
+    def test_sort_descending_keeps_unknown_last(
+        self, catalog: WallpaperCatalog
+    ) -> None:
+        """Descending sorts still put members without a value last."""
+        result = catalog.query(sort="-width")
+        assert names(result)[:2] == ["city.png", "ultrawide.png"]
+        assert names(result)[-1] == "notes.png"
+
+    def test_sort_and_limit(self, catalog: WallpaperCatalog) -> None:
+        """The limit applies after sorting."""
+        assert names(catalog.query(sort="-size", limit=2)) == [
+            "ultrawide.png",
+            "city.png",
+        ]
+        assert catalog.query(limit=0) == []
+
+    def test_unknown_sort_key(self, catalog: WallpaperCatalog) -> None:
+        """Unknown sort keys are rejected."""
+        with pytest.raises(ValueError, match="Unknown sort key"):
+            catalog.query(sort="colour")
+
+    def test_matches_brute_force(self) -> None:
+        """Indexed queries agree with filtering and sorting every member."""
+        rng = random.Random(7)
+        shapes = [(1920, 1080), (3440, 1440), (3840, 2160), (1080, 1920), (None, None)]
+        members = []
+        for i in range(2000):
+            width, height = rng.choice(shapes)
+            members.append(member(f"wp{i:05}.png", width, height, rng.randrange(1000)))
+        catalog = WallpaperCatalog(members)
+
+        for _ in range(200):
+            min_width = rng.choice([None, 1920, 3440])
+            min_size = rng.choice([None, 100, 900])
+            glob = rng.choice([None, "wp001*", "*7.png"])
+            sort = rng.choice(["name", "-name", "width", "-width", "size", "-size"])
+            limit = rng.choice([None, 1, 10, 500])
+
+            expected = [
+                m
+                for m in members
+                if (min_width is None or (m.width or 0) >= min_width)
+                and (min_size is None or m.size >= min_size)
+                and (glob is None or fnmatch.fnmatchcase(m.name, glob))
+            ]
+            key = sort.lstrip("-")
+            known = sorted(
+                (m for m in expected if getattr(m, key) is not None),
+                key=lambda m: (getattr(m, key), m.name),
+            )
+            if sort.startswith("-"):
+                known.reverse()
+            unknown = sorted(
+                (m for m in expected if getattr(m, key) is None), key=lambda m: m.name
+            )
+            expected = (known + unknown)[:limit]
+
+            result = catalog.query(
+                min_width=min_width,
+                min_size=min_size,
+                name_glob=glob,
+                sort=sort,
+                limit=limit,
+            )
+            assert names(result) == names(expected)
+
+
+class TestMemberFilter:
+    """Tests for the per-member predicate used when streaming."""
+
+    def test_agrees_with_catalog(self, catalog: WallpaperCatalog) -> None:
+        """The predicate keeps exactly what an unsorted query would."""
+        for filters in [
+            {"min_width": 2560},
+            {"aspect": 16 / 9},
+            {"min_size": 250, "max_size": 850},
+            {"name_glob": "*o*.png", "min_height": 1000},
+            {},
+        ]:
+            match = member_filter(**filters)
+            expected = set(names(catalog.query(**filters)))
+            assert {m.name for m in catalog.members if match(m)} == expected
+
+
+class TestServiceQuery:
+    """Tests for queries through the service."""
+
+    @pytest.fixture
+    def service(self, nonexistent_archive: Path, temp_dir: Path) -> WallpapersService:
+        """A service over an archive with a few sizes of image."""
+        for name, width, height in [
+            ("wide.png", 3440, 1440),
+            ("hd.png", 1920, 1080),
+            ("tall.png", 1080, 1920),
+        ]:
+            (temp_dir / name).write_bytes(png_bytes(name.encode(), width, height))
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers([temp_dir / "*.png"])
+        return service
+
+    def test_query_returns_records(self, service: WallpapersService) -> None:
+        """Results are WallpaperInfo records."""
+        [info] = service.query_wallpapers(aspect="3440x1440")
+        assert (info.name, info.width, info.height) == ("wide.png", 3440, 1440)
+
+    def test_catalog_reused_until_archive_changes(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """The catalog is kept between queries and rebuilt after an add."""
+        service.query_wallpapers()
+        catalog = service._load_catalog()
+        assert service._load_catalog() is catalog
+
+        (temp_dir / "uhd.png").write_bytes(png_bytes(b"uhd", 3840, 2160))
+        service.add_wallpaper(temp_dir / "uhd.png")
+
+        result = service.query_wallpapers(min_width=3000, sort="-width")
+        assert [info.name for info in result] == ["uhd.png", "wide.png"]
+
+    def test_invalid_arguments(self, service: WallpapersService) -> None:
+        """Bad aspect ratios and sort keys raise WallpaperError."""
+        with pytest.raises(WallpaperError, match="Invalid aspect ratio"):
+            service.query_wallpapers(aspect="widescreen")
+        with pytest.raises(WallpaperError, match="Unknown sort key"):
+            service.query_wallpapers(sort="colour")
+
+    def test_iter_streams_in_archive_order(self, service: WallpapersService) -> None:
+        """iter_wallpapers yields lazily, unsorted, with the query filters."""
+        stream = service.iter_wallpapers()
+
+        assert next(stream) == "hd.png"
+        assert list(stream) == ["tall.png", "wide.png"]
+        assert list(service.iter_wallpapers(min_width=1900, limit=1)) == ["hd.png"]
+        [info] = service.iter_wallpapers(details=True, aspect="9:16")
+        assert (info.name, info.width) == ("tall.png", 1080)
+
+    def test_iter_streams_while_rebuilding_index(
+        self,
+        service: WallpapersService,
+        nonexistent_archive: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """A stale index is rebuilt as records are handed out."""
+        index_path_for(nonexistent_archive).unlink()
+        read: List[str] = []
+        iter_scan = wallpaper_archive.iter_scan
+
+        def recording_scan(archive_path: Path):
+            for name, member in iter_scan(archive_path):
+                read.append(name)
+                yield name, member
+
+        monkeypatch.setattr(wallpaper_archive, "iter_scan", recording_scan)
+        stream = service.iter_wallpapers()
+
+        assert next(stream) == "hd.png"
+        assert read == ["hd.png"]
+        assert not index_path_for(nonexistent_archive).exists()
+        with pytest.raises(RuntimeError, match="unfinished iter_wallpapers"):
+            service.remove_wallpapers(["hd.png"])
+        assert list(stream) == ["tall.png", "wide.png"]
+        assert WallpaperIndex.load(nonexistent_archive).is_fresh()
+        service.remove_wallpapers(["hd.png"])
+
+    def test_iter_checks_arguments_eagerly(
+        self, service: WallpapersService, nonexistent_archive: Path
+    ) -> None:
+        """Errors surface when the iterator is created, not on first use."""
+        with pytest.raises(WallpaperError, match="Invalid aspect ratio"):
+            service.iter_wallpapers(aspect="widescreen")
+        nonexistent_archive.unlink()
+        with pytest.raises(WallpaperError, match="Archive not found"):
+            service.iter_wallpapers()
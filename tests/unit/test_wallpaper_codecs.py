@@ -0,0 +1,162 @@
+# tests/unit/test_wallpaper_codecs.py
+"""Unit tests for wallpaper archive compression codecs."""
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from src.services.wallpaper_codecs import CODECS, detect_codec
+from src.services.wallpaper_index import WallpaperIndex
+from src.services.wallpapers_service import WallpaperError, WallpapersService
+from tests.conftest import png_bytes
+
+CODEC_NAMES = [
+    pytest.param(
+        name,
+        marks=pytest.mark.skipif(
+            not CODECS[name].available, reason=f"{name} codec not installed"
+        ),
+    )
+    for name in CODECS
+]
+
+
+@pytest.fixture
+def images(temp_dir: Path) -> list:
+    """Create a few small images with distinct content."""
+    folder = temp_dir / "images"
+    folder.mkdir()
+    paths = []
+    for name in ("one.png", "two.jpg", "three.webp"):
+        path = folder / name
+        path.write_bytes(png_bytes(name.encode() * 500))
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("codec", CODEC_NAMES)
+class TestCodecRoundTrip:
+    """Every codec supports the full set of archive operations."""
+
+    def test_add_list_and_detect(
+        self, codec: str, nonexistent_archive: Path, images: list
+    ) -> None:
+        """Archives are created with the chosen codec and detected on read."""
+        service = WallpapersService(nonexistent_archive, codec=codec)
+        service.add_wallpaper(images[0])
+        service.add_wallpapers(images[1:])
+
+        assert detect_codec(nonexistent_archive).name == codec
+        assert service.list_wallpapers() == ["one.png", "two.jpg", "three.webp"]
+
+    def test_extract_and_open(
+        self, codec: str, nonexistent_archive: Path, images: list, temp_dir: Path
+    ) -> None:
+        """Full extraction and streaming reads return the original bytes."""
+        service = WallpapersService(nonexistent_archive, codec=codec)
+        service.add_wallpapers(images)
+
+        result = service.extract_wallpapers(temp_dir / "out")
+        for image in images:
+            assert (result / image.name).read_bytes() == image.read_bytes()
+            with service.open_wallpaper(image.name) as stream:
+                assert stream.read() == image.read_bytes()
+
+    def test_scan_matches_index(
+        self, codec: str, nonexistent_archive: Path, images: list
+    ) -> None:
+        """A full scan locates members where add recorded them."""
+        service = WallpapersService(nonexistent_archive, codec=codec)
+        service.add_wallpaper(images[0])
+        service.add_wallpapers(images[1:])
+
+        stored = WallpaperIndex.load(nonexistent_archive).members
+        scanned = WallpaperIndex.build(nonexistent_archive).members
+        if CODECS[codec].framed:
+            assert scanned == stored
+        else:
+            # An uncompressed tar scans as a single segment
+            for name, member in scanned.items():
+                expected = stored[name]
+                assert member.sha256 == expected.sha256
+                assert (
+                    member.segment + member.offset
+                    == expected.segment + expected.offset
+                )
+
+    def test_existing_archive_keeps_its_codec(
+        self, codec: str, nonexistent_archive: Path, images: list
+    ) -> None:
+        """Appending with a differently configured service keeps the codec."""
+        WallpapersService(nonexistent_archive, codec=codec).add_wallpaper(images[0])
+        WallpapersService(nonexistent_archive, codec="gzip").add_wallpaper(images[1])
+
+        assert detect_codec(nonexistent_archive).name == codec
+        assert len(WallpapersService(nonexistent_archive).list_wallpapers()) == 2
+
+
+class TestStandardReaders:
+    """Archives stay readable by tarfile for the codecs it supports."""
+
+    @pytest.mark.parametrize("codec", ["gzip", "xz", "store"])
+    def test_tarfile_reads_appended_archive(
+        self, codec: str, nonexistent_archive: Path, images: list
+    ) -> None:
+        """tarfile sees every appended member."""
+        service = WallpapersService(nonexistent_archive, codec=codec)
+        for image in images:
+            service.add_wallpaper(image)
+
+        with tarfile.open(nonexistent_archive, "r:*") as tar:
+            assert tar.getnames() == ["one.png", "two.jpg", "three.webp"]
+
+
+    def test_append_to_record_padded_plain_tar(
+        self, temp_dir: Path, images: list
+    ) -> None:
+        """A plain tar padded to whole records isn't appended after the padding."""
+        archive = temp_dir / "wallpapers.tar"
+        with tarfile.open(archive, "w") as tar:
+            tar.add(images[0], arcname=images[0].name)
+        assert archive.stat().st_size == tarfile.RECORDSIZE
+
+        WallpapersService(archive).add_wallpaper(images[1])
+
+        assert WallpaperIndex.build(archive).names == ["one.png", "two.jpg"]
+        with tarfile.open(archive) as tar:
+            assert tar.getnames() == ["one.png", "two.jpg"]
+
+
+class TestConvertArchive:
+    """Tests for migrating an archive to another codec."""
+
+    def test_convert_plain_gzip_to_store(
+        self, sample_archive: Path, sample_image: Path, temp_dir: Path
+    ) -> None:
+        """Converting rewrites the archive and keeps its contents."""
+        service = WallpapersService(sample_archive)
+        result = service.convert_archive("store")
+
+        assert (result.old_codec, result.new_codec) == ("gzip", "store")
+        assert result.new_size == sample_archive.stat().st_size
+        assert detect_codec(sample_archive).name == "store"
+        with service.open_wallpaper("test_wallpaper.png") as stream:
+            assert stream.read() == sample_image.read_bytes()
+
+    def test_converted_archive_accepts_appends(
+        self, sample_archive: Path, images: list
+    ) -> None:
+        """A converted archive can be appended to in its new codec."""
+        service = WallpapersService(sample_archive)
+        service.convert_archive("xz")
+        service.add_wallpaper(images[0])
+
+        assert detect_codec(sample_archive).name == "xz"
+        assert service.list_wallpapers() == ["test_wallpaper.png", "one.png"]
+
+    def test_unknown_codec_raises(self, sample_archive: Path) -> None:
+        """Unknown codec names are rejected."""
+        with pytest.raises(WallpaperError, match="Unknown codec"):
+            WallpapersService(sample_archive, codec="lz4")
+        with pytest.raises(WallpaperError, match="Unknown codec"):
+            WallpapersService(sample_archive).convert_archive("lz4")
@@ -0,0 +1,162 @@
+# tests/unit/test_wallpaper_index.py
+"""Unit tests for the wallpaper archive sidecar index."""
+import gzip
+import hashlib
+import io
+import json
+import tarfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.services.wallpaper_archive import iter_tar, open_tar
+from src.services.wallpaper_index import WallpaperIndex, index_path_for
+from src.services.wallpapers_service import WallpapersService
+from tests.conftest import png_bytes
+
+
+def _add_images(service: WallpapersService, temp_dir: Path, *names: str) -> None:
+    """Add small distinct images to the service's archive."""
+    for name in names:
+        image = temp_dir / name
+        image.write_bytes(png_bytes(name.encode() * 300))
+        service.add_wallpaper(image)
+
+
+class TestIndexMaintenance:
+    """Tests for keeping the index in sync with the archive."""
+
+    def test_add_writes_index_next_to_archive(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Adding a wallpaper creates the sidecar index."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png", "b.png")
+
+        index = WallpaperIndex.load(nonexistent_archive)
+        assert index_path_for(nonexistent_archive).exists()
+        assert index is not None
+        assert index.is_fresh()
+        assert index.names == ["a.png", "b.png"]
+
+    def test_list_uses_fresh_index_without_scanning(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Listing with a fresh index never opens the archive."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png")
+
+        with patch(
+            "src.services.wallpaper_index.scan_archive",
+            side_effect=AssertionError("archive was scanned"),
+        ):
+            assert service.list_wallpapers() == ["a.png"]
+
+    def test_stale_index_falls_back_to_scan(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """An index that no longer matches the archive is rebuilt."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png")
+
+        # Replace the archive behind the service's back
+        other = temp_dir / "other.png"
+        other.write_bytes(png_bytes(b"other"))
+        with tarfile.open(nonexistent_archive, "w:gz") as tar:
+            tar.add(other, arcname="other.png")
+
+        assert service.list_wallpapers() == ["other.png"]
+        assert WallpaperIndex.load(nonexistent_archive).is_fresh()
+
+    def test_corrupt_index_is_ignored(self, sample_archive: Path) -> None:
+        """An unreadable index file is treated as missing."""
+        index_path_for(sample_archive).write_text("{not json")
+
+        service = WallpapersService(sample_archive)
+        assert service.list_wallpapers() == ["test_wallpaper.png"]
+
+    def test_failed_save_leaves_no_temp_file(self, sample_archive: Path) -> None:
+        """A write that fails removes its temporary file."""
+        index = WallpaperIndex.build(sample_archive)
+
+        def write_text(path: Path, data: str) -> None:
+            path.write_bytes(data[:10].encode())
+            raise OSError("No space left on device")
+
+        with patch("pathlib.Path.write_text", write_text):
+            with pytest.raises(OSError):
+                index.save()
+
+        assert [p.name for p in sample_archive.parent.iterdir() if p.suffix == ".tmp"] == []
+
+
+class TestIndexRecords:
+    """Tests for the member records stored in the index."""
+
+    def test_records_locate_member_data(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Segment and offset point at each member's bytes."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png", "b.png", "c.png")
+
+        raw = nonexistent_archive.read_bytes()
+        for member in WallpaperIndex.load(nonexistent_archive).members.values():
+            segment = gzip.GzipFile(fileobj=io.BytesIO(raw[member.segment:])).read()
+            data = segment[member.offset:member.offset + member.size]
+            assert data == png_bytes(member.name.encode() * 300)
+            assert member.sha256 == hashlib.sha256(data).hexdigest()
+
+    def test_scan_matches_incremental_records(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """A full scan reproduces the records written during add."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png", "b.png")
+
+        stored = WallpaperIndex.load(nonexistent_archive)
+        scanned = WallpaperIndex.build(nonexistent_archive)
+        assert scanned.members == stored.members
+
+    def test_overwrite_replaces_record(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Overwriting a wallpaper updates its record in place."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png", "b.png")
+        (temp_dir / "a.png").write_bytes(png_bytes(b"changed"))
+        service.add_wallpaper(temp_dir / "a.png")
+
+        index = WallpaperIndex.load(nonexistent_archive)
+        assert index.names == ["a.png", "b.png"]
+        assert index.members["a.png"].size == len(png_bytes(b"changed"))
+
+    def test_records_are_compact(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Records have no __dict__ and are stored as rows under one header."""
+        service = WallpapersService(nonexistent_archive)
+        _add_images(service, temp_dir, "a.png")
+
+        [member] = WallpaperIndex.load(nonexistent_archive).members.values()
+        assert not hasattr(member, "__dict__")
+        data = json.loads(index_path_for(nonexistent_archive).read_text())
+        assert data["fields"][0] == "name"
+        assert data["members"][0][0] == "a.png"
+
+    def test_scan_does_not_keep_headers(self, nonexistent_archive: Path) -> None:
+        """Streaming a tar drops each header once it has been read."""
+        with tarfile.open(nonexistent_archive, "w:gz") as tar:
+            for i in range(50):
+                data = png_bytes(str(i).encode())
+                info = tarfile.TarInfo(f"{i}.png")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        with open_tar(nonexistent_archive) as tar:
+            seen = 0
+            for _ in iter_tar(tar):
+                seen += 1
+                assert len(tar.members) <= 1
+        assert seen == 50
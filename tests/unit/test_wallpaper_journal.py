@@ -0,0 +1,270 @@
+# tests/unit/test_wallpaper_journal.py
+"""Unit tests for crash-safe archive writes, locking and verification."""
+import errno
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.services import wallpaper_archive, wallpapers_service
+from src.services.wallpaper_codecs import CODECS
+from src.services.wallpaper_index import WallpaperIndex, index_path_for
+from src.services.wallpaper_journal import archive_lock, journal_path_for, lock_path_for
+from src.services.wallpapers_service import WallpapersService
+from tests.conftest import png_bytes
+
+
+@pytest.fixture
+def images(temp_dir: Path) -> list:
+    """Create a few small images with distinct content."""
+    paths = []
+    for name in ("a.png", "b.png", "c.png"):
+        path = temp_dir / name
+        path.write_bytes(png_bytes(name.encode() * 2000))
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def archive(nonexistent_archive: Path, images: list) -> Path:
+    """Create a segmented archive holding the first two images."""
+    WallpapersService(nonexistent_archive).add_wallpapers(images[:2])
+    return nonexistent_archive
+
+
+def _leftovers(archive: Path) -> list:
+    """Temporary files left next to the archive."""
+    return [p.name for p in archive.parent.glob(f".{archive.name}*")]
+
+
+def _simulate_crash(archive: Path) -> None:
+    """Leave the archive as a process killed halfway through an append would."""
+    trailer = CODECS["gzip"].trailer
+    trailer_offset = archive.stat().st_size - len(trailer)
+    journal_path_for(archive).write_text(
+        json.dumps({"trailer_offset": trailer_offset, "codec": "gzip"})
+    )
+    with open(archive, "r+b") as f:
+        f.truncate(trailer_offset)
+        f.seek(0, os.SEEK_END)
+        f.write(b"\x1f\x8b partial segment")
+
+
+class TestCrashSafety:
+    """Tests for recovering from interrupted writes."""
+
+    def test_failed_append_is_rolled_back(self, archive: Path, images: list) -> None:
+        """An error mid-append restores the archive byte for byte."""
+        before = archive.read_bytes()
+        service = WallpapersService(archive)
+
+        with patch.object(
+            wallpaper_archive, "write_segments", side_effect=OSError("disk full")
+        ):
+            with pytest.raises(OSError):
+                service.add_wallpaper(images[2])
+
+        assert archive.read_bytes() == before
+        assert not journal_path_for(archive).exists()
+
+    def test_crash_mid_append_recovered_on_next_use(
+        self, archive: Path, images: list
+    ) -> None:
+        """A journal left by a killed process triggers a rollback."""
+        before = archive.read_bytes()
+        _simulate_crash(archive)
+
+        service = WallpapersService(archive)
+        assert service.list_wallpapers() == ["a.png", "b.png"]
+        assert archive.read_bytes() == before
+        assert not journal_path_for(archive).exists()
+        service.add_wallpaper(images[2])
+        assert service.verify_archive().ok
+
+    def test_failed_create_leaves_nothing_behind(
+        self, nonexistent_archive: Path, images: list
+    ) -> None:
+        """A new archive only appears once it is completely written."""
+        service = WallpapersService(nonexistent_archive)
+        with patch.object(
+            wallpaper_archive, "write_segments", side_effect=OSError("disk full")
+        ):
+            with pytest.raises(OSError):
+                service.add_wallpaper(images[0])
+
+        assert not nonexistent_archive.exists()
+        assert _leftovers(nonexistent_archive) == []
+
+    def test_convert_keeps_permissions(self, archive: Path) -> None:
+        """Replacing the archive keeps its file mode."""
+        archive.chmod(0o640)
+        WallpapersService(archive).convert_archive("store")
+
+        assert archive.stat().st_mode & 0o777 == 0o640
+        assert not any(name.endswith(".tmp") for name in _leftovers(archive))
+
+
+class TestLocking:
+    """Tests for the advisory archive lock."""
+
+    def test_writer_waits_for_lock(self, archive: Path, images: list) -> None:
+        """An add blocks while another process holds the lock."""
+        service = WallpapersService(archive)
+        writer = threading.Thread(target=service.add_wallpaper, args=(images[2],))
+
+        with archive_lock(archive):
+            writer.start()
+            time.sleep(0.2)
+            assert writer.is_alive()
+            assert WallpaperIndex.load(archive).names == ["a.png", "b.png"]
+
+        writer.join(timeout=5)
+        assert service.list_wallpapers() == ["a.png", "b.png", "c.png"]
+
+    def test_concurrent_adds_are_serialized(
+        self, archive: Path, temp_dir: Path
+    ) -> None:
+        """Parallel adds from separate services all land in the archive."""
+        sources = []
+        for i in range(6):
+            source = temp_dir / f"p{i}.png"
+            source.write_bytes(png_bytes(bytes([i]) * 5000))
+            sources.append(source)
+
+        threads = [
+            threading.Thread(
+                target=WallpapersService(archive, workers=1).add_wallpaper,
+                args=(source,),
+            )
+            for source in sources
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        service = WallpapersService(archive)
+        assert len(service.list_wallpapers()) == 8
+        assert service.verify_archive().ok
+
+
+    def test_readers_recover_under_exclusive_lock(
+        self, archive: Path, temp_dir: Path
+    ) -> None:
+        """A reader rolls back a crashed append before taking its shared lock."""
+        fcntl = pytest.importorskip("fcntl")
+        _simulate_crash(archive)
+        exclusive = []
+        # The writer "crashes" only after the reader first checked
+        checks = []
+
+        def needs_recovery(path: Path) -> bool:
+            checks.append(path)
+            return len(checks) > 1 and real_needs_recovery(path)
+
+        def recover(path: Path) -> bool:
+            with open(lock_path_for(path), "a+b") as f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    exclusive.append(True)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    exclusive.append(False)
+            return real_recover(path)
+
+        real_recover = wallpapers_service.recover
+        real_needs_recovery = wallpapers_service.needs_recovery
+        with patch.object(
+            wallpapers_service, "recover", side_effect=recover
+        ), patch.object(
+            wallpapers_service, "needs_recovery", side_effect=needs_recovery
+        ):
+            out = WallpapersService(archive).extract_wallpapers(temp_dir / "out")
+
+        assert exclusive == [True]
+        assert sorted(p.name for p in out.iterdir()) == ["a.png", "b.png"]
+
+    def test_shared_lock_is_not_upgraded(self, archive: Path) -> None:
+        """The exclusive lock can't be taken while holding the shared one."""
+        service = WallpapersService(archive)
+
+        with service._locked(shared=True):
+            with pytest.raises(RuntimeError, match="held shared"):
+                with service._locked():
+                    pass
+
+
+    def test_read_only_directory(
+        self, archive: Path, images: list, temp_dir: Path
+    ) -> None:
+        """Readers work without the lock where it can't be created; writers fail."""
+        index_path_for(archive).unlink()
+        lock_path_for(archive).unlink(missing_ok=True)
+        real_open = open
+
+        def read_only_open(path, mode="r", *args, **kwargs):
+            if Path(path).parent == archive.parent and mode != "rb":
+                raise OSError(errno.EROFS, "Read-only file system", str(path))
+            return real_open(path, mode, *args, **kwargs)
+
+        service = WallpapersService(archive)
+        with patch("src.services.wallpaper_journal.open", read_only_open, create=True):
+            assert service.list_wallpapers() == ["a.png", "b.png"]
+            out = service.extract_wallpapers(temp_dir / "out")
+            with pytest.raises(OSError, match="Read-only"):
+                service.add_wallpaper(images[2])
+
+        assert sorted(p.name for p in out.iterdir()) == ["a.png", "b.png"]
+
+
+class TestVerify:
+    """Tests for on-demand integrity verification."""
+
+    def test_healthy_archive(self, archive: Path) -> None:
+        """A freshly written archive verifies cleanly."""
+        result = WallpapersService(archive).verify_archive()
+
+        assert result.ok
+        assert result.checked == 2
+
+    def test_detects_corrupt_data(
+        self, nonexistent_archive: Path, images: list
+    ) -> None:
+        """Changed bytes are reported against the index hash."""
+        service = WallpapersService(nonexistent_archive, codec="store")
+        service.add_wallpapers(images)
+        member = WallpaperIndex.load(nonexistent_archive).members["b.png"]
+        stat = nonexistent_archive.stat()
+        with open(nonexistent_archive, "r+b") as f:
+            f.seek(member.segment + member.offset + 10)
+            f.write(b"X")
+        os.utime(nonexistent_archive, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        result = service.verify_archive()
+
+        assert result.problems == ["b.png: content hash mismatch"]
+
+    def test_detects_unreadable_segment(self, archive: Path) -> None:
+        """Damaged compressed data is reported as unreadable."""
+        member = WallpaperIndex.load(archive).members["a.png"]
+        with open(archive, "r+b") as f:
+            f.seek(member.segment + 20)
+            f.write(b"\xff" * 16)
+
+        problems = WallpapersService(archive).verify_archive().problems
+
+        assert any(p.startswith("index: archive size or mtime") for p in problems)
+        assert any(p.startswith("a.png: ") for p in problems)
+
+    def test_missing_index(self, archive: Path) -> None:
+        """Without a stored index there is nothing to verify against."""
+        index_path_for(archive).unlink()
+
+        result = WallpapersService(archive).verify_archive()
+
+        assert result.problems == ["index: missing or unreadable"]
@@ -0,0 +1,164 @@
+# tests/unit/test_wallpaper_palette.py
+"""Unit tests for dominant colour palettes."""
+import io
+from pathlib import Path
+
+import pytest
+
+from src.services import wallpapers_service
+from src.services.wallpaper_index import WallpaperIndex
+from src.services.wallpaper_palette import extract_palettes, sample_colors
+from src.services.wallpapers_service import WallpaperError, WallpapersService
+from tests.conftest import png_bytes
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+
+def striped(colors: list, width: int = 400, height: int = 200, fmt: str = "PNG") -> bytes:
+    """An image split into vertical bands of (colour, share) pairs."""
+    image = Image.new("RGB", (width, height))
+    draw = ImageDraw.Draw(image)
+    left = 0
+    for color, share in colors:
+        right = left + round(width * share)
+        draw.rectangle([left, 0, right, height], fill=color)
+        left = right
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+@pytest.fixture
+def service(nonexistent_archive: Path) -> WallpapersService:
+    return WallpapersService(nonexistent_archive, workers=1)
+
+
+@pytest.fixture
+def images(temp_dir: Path) -> Path:
+    folder = temp_dir / "images"
+    folder.mkdir()
+    (folder / "sunset.png").write_bytes(
+        striped([("#ff8000", 0.6), ("#400080", 0.3), ("#000000", 0.1)])
+    )
+    (folder / "sea.png").write_bytes(striped([("#0050a0", 0.8), ("#f0f0f0", 0.2)]))
+    (folder / "sea_copy.png").write_bytes((folder / "sea.png").read_bytes())
+    return folder
+
+
+class TestExtractPalettes:
+    """Tests for batched k-means."""
+
+    def test_colours_ordered_by_share(self) -> None:
+        """Distinct regions become colours, most common first."""
+        data = striped([("#ff0000", 0.2), ("#00ff00", 0.5), ("#0000ff", 0.3)])
+        [palette] = extract_palettes([sample_colors(data)])
+        # Remaining clusters pick up blended pixels at the band edges
+        assert palette[:3] == ["#00ff00", "#0000ff", "#ff0000"]
+        assert len(extract_palettes([sample_colors(data)], colors=2)[0]) == 2
+
+    def test_flat_image_has_one_colour(self) -> None:
+        """Empty clusters are dropped."""
+        [palette] = extract_palettes([sample_colors(striped([("#123456", 1.0)]))])
+        assert palette == ["#123456"]
+
+    def test_batch_matches_single(self) -> None:
+        """Images in one batch don't influence each other."""
+        samples = [
+            sample_colors(striped([("#ff0000", 0.5), ("#0000ff", 0.5)])),
+            sample_colors(striped([("#202020", 0.7), ("#e0e0e0", 0.3)], fmt="JPEG")),
+        ]
+        assert extract_palettes(samples) == [
+            extract_palettes([sample])[0] for sample in samples
+        ]
+        assert extract_palettes([]) == []
+
+    def test_undecodable(self) -> None:
+        """Corrupt data raises ValueError."""
+        with pytest.raises(ValueError):
+            sample_colors(png_bytes(b"corrupt"))
+
+
+class TestServicePalettes:
+    """Tests for computing and storing palettes."""
+
+    def test_backfill_then_read(self, service: WallpapersService, images: Path) -> None:
+        """Palettes are computed once per content and then read from the index."""
+        service.add_wallpapers([images])
+
+        first = service.make_palettes()
+        second = service.make_palettes()
+
+        assert (first.computed, first.stored) == (2, 0)
+        assert (second.computed, second.stored) == (0, 2)
+        assert first.palettes == second.palettes
+        assert first.palettes["sunset.png"][:3] == ["#ff8000", "#400080", "#000000"]
+        assert first.palettes["sea_copy.png"] == first.palettes["sea.png"]
+
+    def test_add_with_palette(
+        self,
+        service: WallpapersService,
+        images: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """palette=True stores the palette while adding; reading decodes nothing."""
+        service.add_wallpaper(images / "sunset.png", palette=True)
+        service.add_wallpapers([images / "sea.png"], palette=True)
+
+        index = WallpaperIndex.load(service.archive_path)
+        assert len(index.palettes) == 2
+        monkeypatch.setattr(
+            wallpapers_service,
+            "sample_colors",
+            lambda data: pytest.fail("decoded again"),
+        )
+        assert service.palette("sea.png")[0] == "#0050a0"
+
+    def test_palettes_survive_index_rebuild(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """A stale index is rebuilt without losing palettes."""
+        service.add_wallpapers([images], palette=True)
+        index = WallpaperIndex.load(service.archive_path)
+        index.archive_mtime_ns = -1
+        index.save()
+
+        assert service.make_palettes().computed == 0
+
+    def test_undecodable_wallpaper(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """Broken images are reported and not retried."""
+        (images / "broken.png").write_bytes(png_bytes(b"broken", 32, 32))
+        service.add_wallpapers([images])
+
+        result = service.make_palettes()
+
+        assert result.failed == ["broken.png"]
+        assert service.make_palettes().computed == 0
+        with pytest.raises(WallpaperError, match="Cannot decode"):
+            service.palette("broken.png")
+
+    def test_selection_and_process_pool(
+        self, nonexistent_archive: Path, images: Path
+    ) -> None:
+        """Palettes are computed on a process pool; patterns select wallpapers."""
+        service = WallpapersService(nonexistent_archive, workers=2)
+        service.add_wallpapers([images])
+
+        result = service.make_palettes(pattern="s*.png")
+
+        assert sorted(result.palettes) == ["sea.png", "sea_copy.png", "sunset.png"]
+
+    def test_requires_optional_packages(
+        self,
+        service: WallpapersService,
+        images: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Without Pillow or numpy, add --palette fails before writing."""
+        monkeypatch.setattr(wallpapers_service, "similarity_available", lambda: False)
+        with pytest.raises(WallpaperError, match="palette"):
+            service.add_wallpapers([images], palette=True)
+        assert not service.archive_path.exists()
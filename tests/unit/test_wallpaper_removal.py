@@ -0,0 +1,290 @@
+# tests/unit/test_wallpaper_removal.py
+"""Unit tests for removing, renaming and compacting wallpapers."""
+import shutil
+import subprocess
+import tarfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.services import wallpaper_archive
+from src.services.wallpaper_codecs import CODECS, detect_codec
+from src.services.wallpaper_index import WallpaperIndex
+from src.services.wallpapers_service import (
+    WallpaperError,
+    WallpaperNotFoundError,
+    WallpapersService,
+)
+from tests.conftest import png_bytes
+
+SCRIPT = Path(__file__).parents[2] / "assets" / "wallpapers" / "manage_wallpapers.sh"
+
+
+@pytest.fixture
+def images(temp_dir: Path) -> Path:
+    """Three distinct images and a copy of one of them."""
+    folder = temp_dir / "images"
+    folder.mkdir()
+    for name in ("a.png", "b.png", "c.png"):
+        (folder / name).write_bytes(png_bytes(name.encode() * 4000))
+    (folder / "a_copy.png").write_bytes((folder / "a.png").read_bytes())
+    return folder
+
+
+@pytest.fixture(params=[1, 3], ids=["serial", "parallel"])
+def service(
+    request: pytest.FixtureRequest, nonexistent_archive: Path, images: Path
+) -> WallpapersService:
+    """A service over the images, with one or several workers."""
+    service = WallpapersService(nonexistent_archive, workers=request.param)
+    service.add_wallpapers([images])
+    return service
+
+
+def rescanned(service: WallpapersService) -> list:
+    """Names found by scanning the archive, ignoring the index."""
+    return WallpaperIndex.build(service.archive_path).names
+
+
+class TestRemove:
+    """Tests for tombstoned removal."""
+
+    def test_removed_names_are_gone(self, service: WallpapersService) -> None:
+        """list, extract and a rebuilt index all honour the tombstone."""
+        removed = service.remove_wallpapers(["b.png"])
+
+        assert removed == ["b.png"]
+        # Links to stored content are written after the files
+        assert service.list_wallpapers() == ["a.png", "c.png", "a_copy.png"]
+        assert rescanned(service) == ["a.png", "c.png", "a_copy.png"]
+        out = service.extract_wallpapers(service.archive_path.parent / "out")
+        assert sorted(p.name for p in out.iterdir()) == [
+            "a.png",
+            "a_copy.png",
+            "c.png",
+        ]
+
+    def test_appends_without_rewriting(self, service: WallpapersService) -> None:
+        """Existing data is left in place; only a small segment is appended."""
+        before = service.archive_path.read_bytes()
+        trailer = len(service.codec.trailer)
+
+        service.remove_wallpapers(pattern="*.png")
+
+        after = service.archive_path.read_bytes()
+        assert after[: len(before) - trailer] == before[:-trailer]
+        assert len(after) - len(before) < 1024
+        assert service.list_wallpapers() == []
+
+    def test_readding_revives_name(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """A wallpaper added after its removal is listed again."""
+        service.remove_wallpapers(["c.png"])
+        service.add_wallpaper(images / "c.png")
+
+        assert service.list_wallpapers()[-1] == "c.png"
+        assert rescanned(service)[-1] == "c.png"
+
+    def test_link_target_removed(self, service: WallpapersService) -> None:
+        """Removing the stored copy keeps names that link to its data."""
+        service.remove_wallpapers(["a.png"])
+
+        with service.open_wallpaper("a_copy.png") as f:
+            assert f.read().endswith(b"a.png")
+        assert "a_copy.png" in rescanned(service)
+
+    def test_errors(self, service: WallpapersService) -> None:
+        """Unknown names and empty selections are rejected."""
+        with pytest.raises(WallpaperNotFoundError):
+            service.remove_wallpapers(["missing.png"])
+        with pytest.raises(WallpaperError, match="No wallpapers selected"):
+            service.remove_wallpapers()
+
+
+class TestRename:
+    """Tests for renaming via link and tombstone."""
+
+    def test_rename_keeps_data(self, service: WallpapersService) -> None:
+        """The new name serves the old data; the old name is gone."""
+        size = service.archive_path.stat().st_size
+
+        service.rename_wallpaper("b.png", "renamed.png")
+
+        assert "b.png" not in service.list_wallpapers()
+        with service.open_wallpaper("renamed.png") as f:
+            assert f.read().endswith(b"b.png")
+        assert rescanned(service) == service.list_wallpapers()
+        assert service.archive_path.stat().st_size - size < 2048
+
+    def test_rename_onto_existing(self, service: WallpapersService) -> None:
+        """Taking an existing name needs overwrite."""
+        with pytest.raises(WallpaperError, match="already exists"):
+            service.rename_wallpaper("b.png", "c.png")
+
+        service.rename_wallpaper("b.png", "c.png", overwrite=True)
+
+        with service.open_wallpaper("c.png") as f:
+            assert f.read().endswith(b"b.png")
+        assert sorted(rescanned(service)) == ["a.png", "a_copy.png", "c.png"]
+
+    @pytest.mark.parametrize(
+        "name", ["", ".hidden.png", "../up.png", "/abs.png", "b.png"]
+    )
+    def test_invalid_names(self, service: WallpapersService, name: str) -> None:
+        """Hidden, escaping and unchanged names are refused."""
+        with pytest.raises(WallpaperError, match="Invalid new wallpaper name"):
+            service.rename_wallpaper("b.png", name)
+
+    def test_missing_wallpaper(self, service: WallpapersService) -> None:
+        """Renaming an unknown wallpaper raises WallpaperNotFoundError."""
+        with pytest.raises(WallpaperNotFoundError):
+            service.rename_wallpaper("missing.png", "x.png")
+
+
+class TestCompact:
+    """Tests for rewriting the archive without dead data."""
+
+    def test_dry_run_reports_without_changing(
+        self, service: WallpapersService
+    ) -> None:
+        """A dry run measures the saving and leaves the archive alone."""
+        service.remove_wallpapers(["c.png"])
+        before = service.archive_path.read_bytes()
+
+        result = service.compact_archive(dry_run=True)
+
+        assert result.dry_run
+        assert result.freed > 0
+        assert service.archive_path.read_bytes() == before
+        assert not list(service.archive_path.parent.glob(".*.tmp"))
+        assert service.compact_archive().new_size == result.new_size
+
+    def test_compaction_keeps_live_wallpapers(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """Removed, renamed and replaced data is dropped; the rest is intact."""
+        service.remove_wallpapers(["a.png"])
+        service.rename_wallpaper("b.png", "renamed.png")
+        (images / "c.png").write_bytes(png_bytes(b"new c" * 4000))
+        service.add_wallpaper(images / "c.png")
+        expected = {}
+        for name in service.list_wallpapers():
+            with service.open_wallpaper(name) as f:
+                expected[name] = f.read()
+
+        result = service.compact_archive()
+
+        assert result.freed > 0
+        assert result.old_size == result.new_size + result.freed
+        assert sorted(service.list_wallpapers()) == sorted(expected)
+        assert sorted(rescanned(service)) == sorted(expected)
+        for name, data in expected.items():
+            with service.open_wallpaper(name) as f:
+                assert f.read() == data
+        assert service.verify_archive().ok
+        with tarfile.open(service.archive_path) as tar:
+            assert sorted(tar.getnames()) == sorted(expected)
+
+    def test_shared_content_stored_once(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """Names sharing content stay deduplicated after compaction."""
+        service.remove_wallpapers(["a.png"])
+        (images / "a_again.png").write_bytes((images / "a.png").read_bytes())
+        service.add_wallpaper(images / "a_again.png")
+
+        service.compact_archive()
+
+        with tarfile.open(service.archive_path) as tar:
+            files = [m.name for m in tar.getmembers() if m.isfile()]
+            links = [m.name for m in tar.getmembers() if m.islnk()]
+        assert sorted(files) == ["a_copy.png", "b.png", "c.png"]
+        assert links == ["a_again.png"]
+
+    def test_nothing_to_reclaim(self, service: WallpapersService) -> None:
+        """An archive without dead data compacts to (about) the same size."""
+        result = service.compact_archive(dry_run=True)
+        assert abs(result.freed) < 1024
+
+    def test_missing_data_leaves_archive_untouched(
+        self, service: WallpapersService
+    ) -> None:
+        """If compaction fails the original archive stays in place."""
+        before = service.archive_path.read_bytes()
+        with patch.object(
+            wallpaper_archive,
+            "_kept_info",
+            side_effect=ValueError("boom"),
+        ):
+            with pytest.raises(WallpaperError, match="Cannot compact"):
+                service.compact_archive()
+        assert service.archive_path.read_bytes() == before
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash")
+class TestManageScript:
+    """Tests for manage_wallpapers.sh reading archives this module writes."""
+
+    def run_script(self, service: WallpapersService, *args: str) -> str:
+        script = service.archive_path.with_name("manage_wallpapers.sh")
+        shutil.copy(SCRIPT, script)
+        service.archive_path.rename(script.with_name("wallpapers.tar.gz"))
+        try:
+            result = subprocess.run(
+                ["bash", str(script), *args],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        finally:
+            script.with_name("wallpapers.tar.gz").rename(service.archive_path)
+        return result.stdout
+
+    def test_list_and_extract_apply_tombstones(
+        self, service: WallpapersService, images: Path
+    ) -> None:
+        """Removed and renamed names stay hidden; re-added ones come back."""
+        service.remove_wallpapers(["a.png"])
+        service.remove_wallpapers(["b.png"])
+        service.rename_wallpaper("c.png", "d.png")
+        (images / "b.png").write_bytes(png_bytes(b"new" * 4000))
+        service.add_wallpaper(images / "b.png")
+        out = service.archive_path.parent / "out"
+
+        listed = self.run_script(service, "list")
+        self.run_script(service, "extract", str(out))
+
+        names = [line.split("• ")[1] for line in listed.splitlines() if "• " in line]
+        assert names == service.list_wallpapers()
+        assert "Total: 3 wallpaper(s)" in listed
+        assert sorted(p.name for p in out.iterdir()) == ["a_copy.png", "b.png", "d.png"]
+        assert (out / "b.png").read_bytes() == (images / "b.png").read_bytes()
+
+    @pytest.mark.parametrize("codec", ["gzip", "xz", "zstd", "store"])
+    def test_every_codec(
+        self, codec: str, nonexistent_archive: Path, images: Path, temp_dir: Path
+    ) -> None:
+        """list, extract and add work whatever the archive was converted to."""
+        if not CODECS[codec].available or codec in ("xz", "zstd") and not shutil.which(codec):
+            pytest.skip(f"{codec} isn't installed")
+        service = WallpapersService(nonexistent_archive, codec=codec)
+        service.add_wallpapers([images])
+        service.remove_wallpapers(["b.png"])
+        out = temp_dir / "out"
+        new = temp_dir / "new.png"
+        new.write_bytes(png_bytes(b"new" * 4000))
+
+        listed = self.run_script(service, "list")
+        self.run_script(service, "extract", str(out))
+        self.run_script(service, "add", str(new))
+
+        assert "Total: 3 wallpaper(s)" in listed
+        assert sorted(p.name for p in out.iterdir()) == ["a.png", "a_copy.png", "c.png"]
+        assert detect_codec(service.archive_path).name == codec
+        names = subprocess.run(
+            ["tar", "-tf", str(service.archive_path)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        assert sorted(names) == ["./", "./a.png", "./a_copy.png", "./c.png", "./new.png"]
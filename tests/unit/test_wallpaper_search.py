@@ -0,0 +1,172 @@
+# tests/unit/test_wallpaper_search.py
+"""Unit tests for fuzzy and prefix name search."""
+import random
+from pathlib import Path
+
+import pytest
+
+from src.services import wallpapers_service
+from src.services.wallpaper_search import NameSearchIndex, search_path_for
+from src.services.wallpapers_service import (
+    ArchiveNotFoundError,
+    WallpaperError,
+    WallpapersService,
+)
+from tests.conftest import png_bytes
+
+NAMES = [
+    "Sunset_Beach.png",
+    "sunset.jpg",
+    "sunset-2.png",
+    "mountain_sunrise.png",
+    "forest_night.jpg",
+    "city_night_neon.png",
+    "cyberpunk_city.webp",
+    "galaxy.png",
+]
+
+
+@pytest.fixture
+def index() -> NameSearchIndex:
+    return NameSearchIndex(NAMES)
+
+
+class TestNameSearchIndex:
+    """Tests for ranking and persistence of the search index."""
+
+    def test_tiers(self, index: NameSearchIndex) -> None:
+        """Exact names, then name prefixes, word prefixes and fuzzy matches."""
+        # Looser fuzzy matches (sunrise) follow
+        assert index.search("sunset")[:3] == [
+            "sunset.jpg",
+            "sunset-2.png",
+            "Sunset_Beach.png",
+        ]
+        assert index.search("sun") == [
+            "sunset-2.png",
+            "sunset.jpg",
+            "Sunset_Beach.png",
+            "mountain_sunrise.png",
+        ]
+        assert index.search("night")[:2] == [
+            "city_night_neon.png",
+            "forest_night.jpg",
+        ]
+
+    def test_typos(self, index: NameSearchIndex) -> None:
+        """Swapped, missing and wrong letters still find the name."""
+        assert index.search("galxy") == ["galaxy.png"]
+        assert index.search("cyberpnuk")[0] == "cyberpunk_city.webp"
+        assert index.search("sunest")[0] in {"sunset.jpg", "sunset-2.png"}
+
+    def test_several_words(self, index: NameSearchIndex) -> None:
+        """Names matching every word come first, in any order of the words."""
+        assert index.search("neon city")[0] == "city_night_neon.png"
+        assert index.search("city cyber")[0] == "cyberpunk_city.webp"
+        # The last word may still be being typed
+        assert index.search("night for")[0] == "forest_night.jpg"
+
+    def test_limit_and_empty(self, index: NameSearchIndex) -> None:
+        """Results are capped; blank queries and unknown text match nothing."""
+        assert len(index.search("n", limit=2)) == 2
+        assert index.search("   ") == []
+        assert index.search("qqqq") == []
+
+    def test_prefix_matches_are_complete(self) -> None:
+        """Every name with a word starting with the query is found first."""
+        rng = random.Random(7)
+        words = ["red", "reef", "river", "rose", "ruby", "rain", "ridge"]
+        names = [
+            f"{rng.choice(words)}_{rng.choice(words)}_{i}.png" for i in range(2000)
+        ]
+        index = NameSearchIndex(names)
+
+        for prefix in ("r", "re", "ri", "rid", "ruby_"):
+            expected = {
+                name
+                for name in names
+                if name.startswith(prefix)
+                or any(part.startswith(prefix) for part in name.split("_"))
+            }
+            found = index.search(prefix, limit=len(names))
+            assert set(found[: len(expected)]) == expected
+
+    def test_save_and_load(self, index: NameSearchIndex, temp_dir: Path) -> None:
+        """A loaded index answers like the one that was saved."""
+        path = temp_dir / "names.search"
+        index.save(path)
+
+        loaded = NameSearchIndex.load(path)
+
+        assert loaded is not None
+        for query in ("sunset", "sun", "galxy", "neon city", "png"):
+            assert loaded.search(query) == index.search(query)
+
+    def test_unreadable_file(self, temp_dir: Path) -> None:
+        """Missing, corrupt and truncated files load as None."""
+        path = temp_dir / "names.search"
+        assert NameSearchIndex.load(path) is None
+        path.write_bytes(b"not json\n")
+        assert NameSearchIndex.load(path) is None
+        NameSearchIndex(NAMES).save(path)
+        path.write_bytes(path.read_bytes()[:-4])
+        assert NameSearchIndex.load(path) is None
+
+
+class TestServiceSearch:
+    """Tests for WallpapersService.search_wallpapers."""
+
+    @pytest.fixture
+    def service(self, nonexistent_archive: Path, temp_dir: Path) -> WallpapersService:
+        folder = temp_dir / "images"
+        folder.mkdir()
+        for name in NAMES:
+            (folder / name).write_bytes(png_bytes(name.encode()))
+        service = WallpapersService(nonexistent_archive, workers=1)
+        service.add_wallpapers([folder])
+        return service
+
+    def test_search_persists_index(self, service: WallpapersService) -> None:
+        """The index is saved next to the archive and reused by new services."""
+        assert service.search_wallpapers("galxy") == ["galaxy.png"]
+        assert search_path_for(service.archive_path).exists()
+
+        other = WallpapersService(service.archive_path, workers=1)
+        other._load_index = lambda: pytest.fail("index loaded again")
+        assert other.search_wallpapers("sunset", limit=1) == ["sunset.jpg"]
+
+    def test_changes_rebuild_index(
+        self, service: WallpapersService, temp_dir: Path
+    ) -> None:
+        """Added, renamed and removed wallpapers are searchable at once."""
+        service.search_wallpapers("sunset")
+        added = temp_dir / "aurora.png"
+        added.write_bytes(png_bytes(b"aurora"))
+        service.add_wallpaper(added)
+        service.rename_wallpaper("galaxy.png", "nebula.png")
+        service.remove_wallpapers(["sunset.jpg"])
+
+        assert service.search_wallpapers("aurora") == ["aurora.png"]
+        assert service.search_wallpapers("nebula")[0] == "nebula.png"
+        assert "galaxy.png" not in service.search_wallpapers("galaxy")
+        assert "sunset.jpg" not in service.search_wallpapers("sunset")
+
+    def test_unwritable_index_is_not_fatal(
+        self, service: WallpapersService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Searching works when the index can't be saved."""
+
+        def fail(self: NameSearchIndex, path: Path) -> None:
+            raise PermissionError(path)
+
+        monkeypatch.setattr(wallpapers_service.NameSearchIndex, "save", fail)
+        assert service.search_wallpapers("forest") == ["forest_night.jpg"]
+
+    def test_errors(self, service: WallpapersService, temp_dir: Path) -> None:
+        """Blank text, bad limits and missing archives are rejected."""
+        with pytest.raises(WallpaperError, match="must not be empty"):
+            service.search_wallpapers(" ")
+        with pytest.raises(WallpaperError, match="at least 1"):
+            service.search_wallpapers("sun", limit=0)
+        with pytest.raises(ArchiveNotFoundError):
+            WallpapersService(temp_dir / "missing.tar.gz").search_wallpapers("sun")
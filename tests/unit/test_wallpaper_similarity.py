@@ -0,0 +1,284 @@
+# tests/unit/test_wallpaper_similarity.py
+"""Unit tests for perceptual hashing and near-duplicate detection."""
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+from src.services import wallpapers_service
+from src.services.wallpaper_index import WallpaperIndex, index_path_for
+from src.services.wallpaper_similarity import (
+    HammingIndex,
+    group_similar,
+    hamming,
+    perceptual_hashes,
+    sample_pixels,
+)
+from src.services.wallpapers_service import WallpaperError, WallpapersService
+from tests.conftest import png_bytes
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+
+def picture(seed: int, width: int, height: int, fmt: str = "PNG") -> bytes:
+    """A smooth random picture, encoded at the given size."""
+    rng = random.Random(seed)
+    base = Image.new("L", (16, 9))
+    base.putdata([rng.randrange(256) for _ in range(16 * 9)])
+    image = base.resize((width, height), Image.Resampling.BICUBIC).convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def phash(data: bytes) -> int:
+    return perceptual_hashes([sample_pixels(data)])[0]
+
+
+@pytest.fixture
+def service(nonexistent_archive: Path) -> WallpapersService:
+    return WallpapersService(nonexistent_archive, workers=1)
+
+
+@pytest.fixture
+def pictures(temp_dir: Path) -> Path:
+    """One picture at two resolutions, a re-encoded copy and two others."""
+    folder = temp_dir / "pictures"
+    folder.mkdir()
+    (folder / "forest.png").write_bytes(picture(1, 960, 540))
+    (folder / "forest_small.png").write_bytes(picture(1, 320, 180))
+    (folder / "forest.jpg").write_bytes(picture(1, 640, 360, "JPEG"))
+    (folder / "desert.png").write_bytes(picture(2, 960, 540))
+    (folder / "ocean.png").write_bytes(picture(3, 960, 540))
+    return folder
+
+
+class TestPerceptualHash:
+    """Tests for the batched pHash."""
+
+    def test_rescaled_and_reencoded_copies_are_close(self) -> None:
+        """Resolution and format changes move the hash by a few bits at most."""
+        original = phash(picture(1, 1920, 1080))
+        assert hamming(original, phash(picture(1, 480, 270))) <= 4
+        assert hamming(original, phash(picture(1, 1280, 720, "JPEG"))) <= 4
+
+    def test_different_pictures_are_far(self) -> None:
+        """Unrelated pictures differ in many bits."""
+        assert hamming(phash(picture(1, 800, 450)), phash(picture(2, 800, 450))) > 16
+
+    def test_batch_matches_single(self) -> None:
+        """Hashing a batch gives the same values as one at a time."""
+        samples = [sample_pixels(picture(seed, 320, 180)) for seed in range(5)]
+        assert perceptual_hashes(samples) == [
+            perceptual_hashes([sample])[0] for sample in samples
+        ]
+        assert perceptual_hashes([]) == []
+
+    def test_undecodable(self) -> None:
+        """Corrupt data raises ValueError."""
+        with pytest.raises(ValueError):
+            sample_pixels(png_bytes(b"corrupt"))
+
+
+class TestHammingIndex:
+    """Tests for the multi-index Hamming search."""
+
+    @pytest.mark.parametrize("radius", [0, 3, 8, 14])
+    def test_matches_brute_force(self, radius: int) -> None:
+        """Every stored hash within the radius is found, and nothing else."""
+        rng = random.Random(radius)
+        hashes = [rng.getrandbits(64) for _ in range(500)]
+        # Plant near neighbours at various distances
+        for i in range(0, 500, 5):
+            flipped = hashes[i]
+            for bit in rng.sample(range(64), rng.randrange(16)):
+                flipped ^= 1 << bit
+            hashes[i + 1] = flipped
+        index = HammingIndex(hashes)
+
+        for query in hashes[:100]:
+            expected = {
+                (position, hamming(query, value))
+                for position, value in enumerate(hashes)
+                if hamming(query, value) <= radius
+            }
+            assert set(index.near(query, radius)) == expected
+
+    def test_group_similar_is_transitive(self) -> None:
+        """Chains of neighbours form one group; loners are left out."""
+        hashes = {"a": 0, "b": 0b111, "c": 0b111111, "far": (1 << 64) - 1}
+        assert group_similar(hashes, 3) == [["a", "b", "c"]]
+
+
+class TestFindDuplicates:
+    """Tests for WallpapersService.find_duplicates."""
+
+    def test_groups_near_and_exact_duplicates(
+        self, service: WallpapersService, pictures: Path
+    ) -> None:
+        """Copies at other sizes, re-encodes and identical files are grouped."""
+        (pictures / "ocean_copy.png").write_bytes((pictures / "ocean.png").read_bytes())
+        service.add_wallpapers([pictures])
+
+        assert service.find_duplicates() == [
+            ["forest.jpg", "forest.png", "forest_small.png"],
+            ["ocean.png", "ocean_copy.png"],
+        ]
+        assert ["ocean.png", "ocean_copy.png"] in service.find_duplicates(
+            threshold=0
+        )
+
+    def test_hashes_persist_in_index(
+        self,
+        service: WallpapersService,
+        pictures: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Hashes are stored once and survive an index rebuild."""
+        service.add_wallpapers([pictures])
+        service.find_duplicates()
+        index = WallpaperIndex.load(service.archive_path)
+        assert len([h for h in index.phashes.values() if h]) == 5
+
+        # A rebuilt index keeps them; nothing is decoded again
+        index.archive_size = -1
+        index.save()
+        monkeypatch.setattr(
+            wallpapers_service,
+            "sample_pixels",
+            lambda data: pytest.fail("decoded again"),
+        )
+        assert len(service.find_duplicates()) == 1
+        assert WallpaperIndex.load(service.archive_path).is_fresh()
+
+    def test_undecodable_content_is_skipped(
+        self, service: WallpapersService, pictures: Path
+    ) -> None:
+        """Broken images get no hash and are not grouped."""
+        (pictures / "broken.png").write_bytes(png_bytes(b"broken", 64, 64))
+        service.add_wallpapers([pictures])
+
+        groups = service.find_duplicates()
+
+        assert all("broken.png" not in group for group in groups)
+        data = index_path_for(service.archive_path).read_text()
+        assert '""' in data
+
+    def test_threshold_range(self, service: WallpapersService) -> None:
+        """Thresholds outside 0..64 are rejected."""
+        with pytest.raises(WallpaperError, match="threshold"):
+            service.find_duplicates(threshold=65)
+
+    def test_requires_optional_packages(
+        self, service: WallpapersService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A clear error is raised without Pillow or numpy."""
+        monkeypatch.setattr(wallpapers_service, "similarity_available", lambda: False)
+        with pytest.raises(WallpaperError, match="numpy"):
+            service.find_duplicates()
+
+
+class TestAddNearDuplicates:
+    """Tests for checking near-duplicates while adding."""
+
+    @pytest.fixture
+    def stored(self, service: WallpapersService, pictures: Path) -> WallpapersService:
+        service.add_wallpaper(pictures / "forest.png")
+        return service
+
+    def test_warn_reports_and_adds(
+        self, stored: WallpapersService, pictures: Path
+    ) -> None:
+        """Warned files are still added."""
+        results = stored.add_wallpapers(
+            [pictures / "forest_small.png", pictures / "desert.png"],
+            near_duplicates="warn",
+        )
+
+        assert [(r.name, r.status, r.similar_to) for r in results] == [
+            ("forest_small.png", "added", "forest.png"),
+            ("desert.png", "added", None),
+        ]
+        assert "forest_small.png" in stored.list_wallpapers()
+
+    def test_reject_leaves_out_near_duplicates(
+        self, stored: WallpapersService, pictures: Path
+    ) -> None:
+        """Rejected files are not written; files in the batch are compared too."""
+        results = stored.add_wallpapers([pictures], near_duplicates="reject")
+
+        statuses = {r.name: (r.status, r.similar_to) for r in results}
+        assert statuses["forest.jpg"] == ("rejected", "forest.png")
+        assert statuses["forest_small.png"] == ("rejected", "forest.png")
+        assert statuses["ocean.png"] == ("added", None)
+        assert sorted(stored.list_wallpapers()) == [
+            "desert.png",
+            "forest.png",
+            "ocean.png",
+        ]
+
+    def test_reject_within_batch(
+        self, service: WallpapersService, pictures: Path
+    ) -> None:
+        """A later file similar to an earlier one of the batch is rejected."""
+        results = service.add_wallpapers(
+            [pictures / "forest.png", pictures / "forest.jpg"],
+            near_duplicates="reject",
+        )
+
+        assert [(r.status, r.similar_to) for r in results] == [
+            ("added", None),
+            ("rejected", "forest.png"),
+        ]
+
+    def test_exact_duplicates_are_linked_not_rejected(
+        self, stored: WallpapersService, pictures: Path, temp_dir: Path
+    ) -> None:
+        """Identical content keeps being stored as a link."""
+        copy = temp_dir / "copy.png"
+        copy.write_bytes((pictures / "forest.png").read_bytes())
+
+        [result] = stored.add_wallpapers([copy], near_duplicates="reject")
+
+        assert (result.status, result.duplicate_of) == ("added", "forest.png")
+
+    def test_overwriting_same_name_is_not_a_near_duplicate(
+        self, stored: WallpapersService, temp_dir: Path
+    ) -> None:
+        """A replacement is not compared with the wallpaper it replaces."""
+        replacement = temp_dir / "forest.png"
+        replacement.write_bytes(picture(1, 800, 450))
+
+        assert stored.add_wallpaper(replacement, near_duplicates="reject") is None
+
+    def test_single_add(self, stored: WallpapersService, pictures: Path) -> None:
+        """add_wallpaper returns the match when warning and raises when rejecting."""
+        with pytest.raises(WallpaperError, match="looks like 'forest.png'"):
+            stored.add_wallpaper(pictures / "forest.jpg", near_duplicates="reject")
+        assert "forest.jpg" not in stored.list_wallpapers()
+
+        assert (
+            stored.add_wallpaper(pictures / "forest.jpg", near_duplicates="warn")
+            == "forest.png"
+        )
+        assert stored.add_wallpaper(pictures / "ocean.png", near_duplicates="warn") is None
+
+    def test_unknown_mode(self, service: WallpapersService, pictures: Path) -> None:
+        """Unknown modes fail before the archive is created."""
+        with pytest.raises(WallpaperError, match="near-duplicate mode"):
+            service.add_wallpapers([pictures], near_duplicates="ignore")
+        assert not service.archive_path.exists()
+
+    def test_process_pool(
+        self, nonexistent_archive: Path, pictures: Path
+    ) -> None:
+        """Several workers give the same result."""
+        service = WallpapersService(nonexistent_archive, workers=3)
+        service.add_wallpaper(pictures / "forest.png")
+
+        results = service.add_wallpapers([pictures], near_duplicates="warn")
+
+        similar = {r.name: r.similar_to for r in results if r.similar_to}
+        assert similar == {"forest.jpg": "forest.png", "forest_small.png": "forest.png"}
@@ -0,0 +1,196 @@
+# tests/unit/test_wallpaper_thumbnails.py
+"""Unit tests for the wallpaper thumbnail cache."""
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from src.services import wallpapers_service
+from src.services.wallpaper_thumbnails import (
+    ThumbnailCache,
+    default_thumbnail_dir,
+    render_thumbnail,
+)
+from src.services.wallpapers_service import (
+    WallpaperError,
+    WallpaperNotFoundError,
+    WallpapersService,
+)
+from tests.conftest import png_bytes
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def encoded(width: int, height: int, fmt: str = "PNG", color: str = "red") -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, format=fmt)
+    return out.getvalue()
+
+
+@pytest.fixture
+def gallery(temp_dir: Path) -> Path:
+    """A folder of decodable images, one duplicate and one broken file."""
+    folder = temp_dir / "gallery"
+    folder.mkdir()
+    (folder / "wide.png").write_bytes(encoded(800, 400))
+    (folder / "photo.jpg").write_bytes(encoded(600, 900, "JPEG", "blue"))
+    (folder / "square.gif").write_bytes(encoded(300, 300, "GIF", "green"))
+    (folder / "wide_copy.png").write_bytes(encoded(800, 400))
+    # Valid header, undecodable data
+    (folder / "broken.png").write_bytes(png_bytes(b"garbage", 64, 64))
+    return folder
+
+
+@pytest.fixture
+def service(nonexistent_archive: Path, temp_dir: Path, gallery: Path) -> WallpapersService:
+    """A single-worker service over the gallery, with a private cache."""
+    service = WallpapersService(
+        nonexistent_archive, workers=1, thumbnail_dir=temp_dir / "thumbs"
+    )
+    service.add_wallpapers([gallery])
+    return service
+
+
+class TestRenderThumbnail:
+    """Tests for downscaling."""
+
+    def test_fits_box_and_keeps_aspect(self) -> None:
+        """The longest edge becomes ``size``."""
+        with Image.open(io.BytesIO(render_thumbnail(encoded(800, 400), 128))) as image:
+            assert image.format == "PNG"
+            assert image.size == (128, 64)
+
+    def test_jpeg(self) -> None:
+        """JPEGs are scaled through draft mode."""
+        data = render_thumbnail(encoded(1200, 1800, "JPEG"), 100)
+        with Image.open(io.BytesIO(data)) as image:
+            assert max(image.size) == 100
+
+    def test_small_image_not_enlarged(self) -> None:
+        """Images already inside the box keep their size."""
+        with Image.open(io.BytesIO(render_thumbnail(encoded(50, 20), 256))) as image:
+            assert image.size == (50, 20)
+
+    def test_undecodable(self) -> None:
+        """Corrupt data raises ValueError."""
+        with pytest.raises(ValueError, match="Cannot decode image"):
+            render_thumbnail(png_bytes(b"garbage"), 64)
+
+
+class TestThumbnailCache:
+    """Tests for storage and LRU eviction."""
+
+    def test_default_dir_uses_xdg_cache_home(
+        self, monkeypatch: pytest.MonkeyPatch, temp_dir: Path
+    ) -> None:
+        """The cache lives below $XDG_CACHE_HOME."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(temp_dir))
+        assert default_thumbnail_dir() == (
+            temp_dir / "dotfiles-config" / "wallpapers" / "thumbnails"
+        )
+
+    def test_keyed_by_hash_and_size(self, temp_dir: Path) -> None:
+        """Each size of each content has its own file."""
+        cache = ThumbnailCache(temp_dir)
+        small = cache.store("ab" * 32, 64, b"small")
+        large = cache.store("ab" * 32, 256, b"large")
+
+        assert small != large
+        assert cache.get("ab" * 32, 64) == small
+        assert cache.get("cd" * 32, 64) is None
+
+    def test_evicts_least_recently_used(self, temp_dir: Path) -> None:
+        """Oldest entries go first until the cache fits its budget."""
+        cache = ThumbnailCache(temp_dir, max_bytes=250)
+        paths = [cache.store(f"{i:02}" * 32, 64, b"x" * 100) for i in range(4)]
+        for age, path in enumerate(reversed(paths)):
+            os.utime(path, (1000 - age, 1000 - age))
+        # Reading the oldest entry makes it the most recent
+        cache.get("00" * 32, 64)
+
+        freed = cache.evict()
+
+        assert freed == 200
+        assert [p.exists() for p in paths] == [True, False, False, True]
+
+    def test_evict_keeps_requested(self, temp_dir: Path) -> None:
+        """Entries in ``keep`` survive even if the budget is exceeded."""
+        cache = ThumbnailCache(temp_dir, max_bytes=0)
+        kept = cache.store("aa" * 32, 64, b"x" * 10)
+        dropped = cache.store("bb" * 32, 64, b"x" * 10)
+
+        cache.evict(keep={kept})
+
+        assert kept.exists() and not dropped.exists()
+
+
+class TestServiceThumbnails:
+    """Tests for building thumbnails from the archive."""
+
+    def test_first_run_generates_then_caches(
+        self, service: WallpapersService
+    ) -> None:
+        """Distinct contents are rendered once and reused afterwards."""
+        first = service.make_thumbnails(64)
+        second = service.make_thumbnails(64)
+
+        assert (first.generated, first.cached) == (3, 0)
+        assert (second.generated, second.cached) == (0, 3)
+        assert first.paths == second.paths
+        assert first.failed == ["broken.png"]
+        assert first.paths["wide.png"] == first.paths["wide_copy.png"]
+        with Image.open(first.paths["photo.jpg"]) as image:
+            assert max(image.size) == 64
+
+    def test_selection(self, service: WallpapersService) -> None:
+        """Names and patterns limit the work."""
+        result = service.make_thumbnails(32, pattern="*.gif")
+
+        assert list(result.paths) == ["square.gif"]
+        with pytest.raises(WallpaperNotFoundError):
+            service.make_thumbnails(32, names=["missing.png"])
+
+    def test_single_thumbnail(self, service: WallpapersService) -> None:
+        """thumbnail() returns one path and raises for undecodable data."""
+        path = service.thumbnail("wide.png", 100)
+
+        with Image.open(path) as image:
+            assert image.size == (100, 50)
+        with pytest.raises(WallpaperError, match="Cannot decode"):
+            service.thumbnail("broken.png", 100)
+
+    def test_process_pool(
+        self, nonexistent_archive: Path, gallery: Path, temp_dir: Path
+    ) -> None:
+        """Several workers render in separate processes with the same result."""
+        service = WallpapersService(
+            nonexistent_archive, workers=3, thumbnail_dir=temp_dir / "thumbs"
+        )
+        service.add_wallpapers([gallery])
+
+        result = service.make_thumbnails(48)
+
+        assert result.generated == 3
+        assert sorted(result.paths) == [
+            "photo.jpg",
+            "square.gif",
+            "wide.png",
+            "wide_copy.png",
+        ]
+
+    def test_cache_budget(self, service: WallpapersService) -> None:
+        """Thumbnails of earlier sizes are evicted first; current ones stay."""
+        old = service.make_thumbnails(40).paths
+        new = service.make_thumbnails(50, max_cache_bytes=0).paths
+
+        assert not any(path.exists() for path in old.values())
+        assert all(path.exists() for path in new.values())
+
+    def test_requires_pillow(
+        self, service: WallpapersService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A clear error is raised without Pillow."""
+        monkeypatch.setattr(wallpapers_service, "pillow_available", lambda: False)
+        with pytest.raises(WallpaperError, match="Pillow"):
+            service.make_thumbnails()
@@ -1,10 +1,12 @@
 # tests/unit/test_wallpapers_service.py
 """Unit tests for wallpapers service layer."""
+import json
 import tarfile
 from pathlib import Path
 
 import pytest
 
+from src.services.wallpaper_index import WallpaperIndex, index_path_for
 from src.services.wallpapers_service import (
     WallpapersService,
     WallpaperError,
@@ -12,6 +14,7 @@ from src.services.wallpapers_service import (
     ArchiveNotFoundError,
     InvalidImageError,
 )
+from tests.conftest import png_bytes
 
 
 class TestWallpapersServiceInit:
@@ -59,7 +62,8 @@ class TestWallpapersServiceAdd:
         """Add new wallpaper to existing archive."""
         # Create a new image to add
         new_image = temp_dir / "new_wallpaper.jpg"
-        new_image.write_bytes(b"fake jpg content")  # Content doesn't matter for test
+        # Only the header is validated
+        new_image.write_bytes(png_bytes(b"fake jpg content"))
 
         service = WallpapersService(sample_archive)
         service.add_wallpaper(new_image)
@@ -93,7 +97,7 @@ class TestWallpapersServiceAdd:
         # Create file with same name but different content
         duplicate = temp_dir / "subfolder" / "test_wallpaper.png"
         duplicate.parent.mkdir()
-        duplicate.write_bytes(b"new content")
+        duplicate.write_bytes(png_bytes(b"new content"))
 
         service = WallpapersService(sample_archive)
         service.add_wallpaper(duplicate, overwrite=True)
@@ -139,7 +143,7 @@ class TestWallpapersServiceAdd:
     ) -> None:
         """Add works with relative paths."""
         new_image = temp_dir / "relative_test.png"
-        new_image.write_bytes(b"content")
+        new_image.write_bytes(png_bytes(b"content"))
 
         monkeypatch.chdir(temp_dir)
 
@@ -258,3 +262,513 @@ class TestWallpapersServiceValidation:
     def test_invalid_image_extensions(self, filename: str) -> None:
         """Non-image extensions are invalid."""
         assert WallpapersService.is_valid_image_extension(filename) is False
+
+
+class TestWallpapersServiceAddMany:
+    """Tests for adding many wallpapers in one update."""
+
+    @pytest.fixture
+    def image_folder(self, temp_dir: Path) -> Path:
+        """Create a folder of images with a nested subfolder and a non-image."""
+        folder = temp_dir / "import"
+        (folder / "nested").mkdir(parents=True)
+        (folder / "one.png").write_bytes(png_bytes(b"one"))
+        (folder / "two.jpg").write_bytes(png_bytes(b"two"))
+        (folder / "notes.txt").write_text("not an image")
+        (folder / ".hidden.png").write_bytes(png_bytes(b"hidden"))
+        (folder / "nested" / "three.webp").write_bytes(png_bytes(b"three"))
+        return folder
+
+    def test_add_directory(
+        self, nonexistent_archive: Path, image_folder: Path
+    ) -> None:
+        """A directory adds its images, skipping hidden and non-image files."""
+        service = WallpapersService(nonexistent_archive)
+        results = service.add_wallpapers([image_folder])
+
+        assert [r.name for r in results] == ["one.png", "two.jpg"]
+        assert all(r.status == "added" for r in results)
+        assert sorted(service.list_wallpapers()) == ["one.png", "two.jpg"]
+
+    def test_add_directory_recursive(
+        self, nonexistent_archive: Path, image_folder: Path
+    ) -> None:
+        """recursive=True descends into subdirectories."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers([image_folder], recursive=True)
+
+        assert sorted(service.list_wallpapers()) == [
+            "one.png", "three.webp", "two.jpg"
+        ]
+
+    def test_add_glob_pattern(
+        self, nonexistent_archive: Path, image_folder: Path
+    ) -> None:
+        """Glob patterns, including '**', are expanded."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers([image_folder / "**" / "*.webp"])
+
+        assert service.list_wallpapers() == ["three.webp"]
+
+    def test_unmatched_glob_raises(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """A pattern that matches nothing is an error."""
+        service = WallpapersService(nonexistent_archive)
+        with pytest.raises(WallpaperNotFoundError, match="No files match"):
+            service.add_wallpapers([temp_dir / "*.png"])
+
+    def test_duplicates_skipped_without_overwrite(
+        self, sample_archive: Path, sample_image: Path, image_folder: Path
+    ) -> None:
+        """Existing names are reported as skipped when overwrite=False."""
+        service = WallpapersService(sample_archive)
+        results = service.add_wallpapers(
+            [sample_image, image_folder / "one.png"], overwrite=False
+        )
+
+        assert [(r.name, r.status) for r in results] == [
+            ("test_wallpaper.png", "skipped"),
+            ("one.png", "added"),
+        ]
+
+    def test_duplicates_overwritten_by_default(
+        self, sample_archive: Path, sample_image: Path
+    ) -> None:
+        """Existing names are reported as overwritten by default."""
+        service = WallpapersService(sample_archive)
+        sample_image.write_bytes(png_bytes(b"new content"))
+        results = service.add_wallpapers([sample_image])
+
+        assert results[0].status == "overwritten"
+        assert service.list_wallpapers() == ["test_wallpaper.png"]
+
+    def test_invalid_input_leaves_archive_untouched(
+        self, sample_archive: Path, image_folder: Path
+    ) -> None:
+        """Validation happens before the archive is modified."""
+        before = sample_archive.read_bytes()
+        service = WallpapersService(sample_archive)
+
+        with pytest.raises(InvalidImageError):
+            service.add_wallpapers(
+                [image_folder / "one.png", image_folder / "notes.txt"]
+            )
+
+        assert sample_archive.read_bytes() == before
+
+    def test_batch_is_written_in_one_update(
+        self, sample_archive: Path, image_folder: Path
+    ) -> None:
+        """All files in a batch are appended with a single archive write."""
+        from unittest.mock import patch
+
+        from src.services import wallpaper_archive
+
+        service = WallpapersService(sample_archive)
+        service.add_wallpaper(image_folder / "one.png")
+        with patch.object(
+            wallpaper_archive,
+            "append_files",
+            wraps=wallpaper_archive.append_files,
+        ) as append:
+            service.add_wallpapers([image_folder], recursive=True)
+
+        assert append.call_count == 1
+        assert len(service.list_wallpapers()) == 4
+
+
+class TestWallpapersServiceSelectiveExtract:
+    """Tests for selective extraction and streaming reads."""
+
+    @pytest.fixture
+    def multi_archive(self, nonexistent_archive: Path, temp_dir: Path) -> Path:
+        """Create an archive with several wallpapers across segments."""
+        service = WallpapersService(nonexistent_archive)
+        sources = temp_dir / "sources"
+        sources.mkdir()
+        for name in ("forest.png", "ocean.jpg", "desert.png"):
+            (sources / name).write_bytes(png_bytes(name.encode() * 1000))
+        service.add_wallpaper(sources / "forest.png")
+        service.add_wallpapers([sources / "ocean.jpg", sources / "desert.png"])
+        return nonexistent_archive
+
+    def test_extract_only_named(self, multi_archive: Path, temp_dir: Path) -> None:
+        """Only the named wallpapers are written."""
+        service = WallpapersService(multi_archive)
+        result = service.extract_wallpapers(temp_dir / "out", names=["ocean.jpg"])
+
+        assert [p.name for p in result.iterdir()] == ["ocean.jpg"]
+        assert (result / "ocean.jpg").read_bytes() == png_bytes(b"ocean.jpg" * 1000)
+
+    def test_extract_by_pattern(self, multi_archive: Path, temp_dir: Path) -> None:
+        """A glob pattern selects wallpapers by name."""
+        service = WallpapersService(multi_archive)
+        result = service.extract_wallpapers(temp_dir / "out", pattern="*.png")
+
+        assert sorted(p.name for p in result.iterdir()) == [
+            "desert.png", "forest.png"
+        ]
+
+    def test_extract_unknown_name_raises(
+        self, multi_archive: Path, temp_dir: Path
+    ) -> None:
+        """Requesting a missing wallpaper is an error."""
+        service = WallpapersService(multi_archive)
+        with pytest.raises(WallpaperNotFoundError, match="missing.png"):
+            service.extract_wallpapers(temp_dir / "out", names=["missing.png"])
+
+    def test_open_streams_single_wallpaper(self, multi_archive: Path) -> None:
+        """open_wallpaper returns the member's bytes and nothing else."""
+        service = WallpapersService(multi_archive)
+        with service.open_wallpaper("desert.png") as stream:
+            assert stream.read() == png_bytes(b"desert.png" * 1000)
+
+    def test_open_plain_archive(self, sample_archive: Path, sample_image: Path) -> None:
+        """Streaming also works for archives written by other tools."""
+        service = WallpapersService(sample_archive)
+        with service.open_wallpaper("test_wallpaper.png") as stream:
+            assert stream.read() == sample_image.read_bytes()
+
+    def test_open_unknown_raises(self, multi_archive: Path) -> None:
+        """Opening a missing wallpaper raises WallpaperNotFoundError."""
+        service = WallpapersService(multi_archive)
+        with pytest.raises(WallpaperNotFoundError):
+            service.open_wallpaper("missing.png")
+
+
+class TestWallpapersServiceSync:
+    """Tests for incremental (sync) extraction."""
+
+    def test_first_sync_copies_everything(
+        self, sample_archive: Path, temp_dir: Path
+    ) -> None:
+        """A sync into an empty directory copies every wallpaper."""
+        service = WallpapersService(sample_archive)
+        result = service.sync_wallpapers(temp_dir / "out")
+
+        assert result.copied == ["test_wallpaper.png"]
+        assert result.skipped == []
+        assert (result.path / "test_wallpaper.png").exists()
+
+    def test_second_sync_skips_unchanged(
+        self, sample_archive: Path, temp_dir: Path
+    ) -> None:
+        """Files matching size and mtime are not rewritten."""
+        from unittest.mock import patch
+
+        service = WallpapersService(sample_archive)
+        service.sync_wallpapers(temp_dir / "out")
+        with patch.object(
+            WallpapersService, "_write_member", side_effect=AssertionError
+        ):
+            result = service.sync_wallpapers(temp_dir / "out")
+
+        assert result.copied == []
+        assert result.skipped == ["test_wallpaper.png"]
+
+    def test_sync_rewrites_modified_file(
+        self, sample_archive: Path, sample_image: Path, temp_dir: Path
+    ) -> None:
+        """A locally modified file is restored from the archive."""
+        service = WallpapersService(sample_archive)
+        result = service.sync_wallpapers(temp_dir / "out")
+        (result.path / "test_wallpaper.png").write_bytes(b"local edit")
+
+        result = service.sync_wallpapers(temp_dir / "out")
+
+        assert result.copied == ["test_wallpaper.png"]
+        assert (result.path / "test_wallpaper.png").read_bytes() == sample_image.read_bytes()
+
+    def test_checksum_detects_same_size_change(
+        self, sample_archive: Path, temp_dir: Path
+    ) -> None:
+        """checksum=True catches edits that keep size and mtime."""
+        import os
+
+        service = WallpapersService(sample_archive)
+        result = service.sync_wallpapers(temp_dir / "out")
+        target = result.path / "test_wallpaper.png"
+        stat = target.stat()
+        target.write_bytes(b"x" * stat.st_size)
+        os.utime(target, (stat.st_atime, stat.st_mtime))
+
+        assert service.sync_wallpapers(temp_dir / "out").skipped == ["test_wallpaper.png"]
+        assert service.sync_wallpapers(temp_dir / "out", checksum=True).copied == [
+            "test_wallpaper.png"
+        ]
+
+    def test_delete_removes_files_not_in_archive(
+        self, sample_archive: Path, temp_dir: Path
+    ) -> None:
+        """delete=True removes stale files but keeps hidden ones."""
+        wallpapers_dir = temp_dir / "out" / "wallpapers"
+        wallpapers_dir.mkdir(parents=True)
+        (wallpapers_dir / "old.png").write_bytes(b"old")
+        (wallpapers_dir / ".keep").write_bytes(b"")
+
+        service = WallpapersService(sample_archive)
+        kept = service.sync_wallpapers(temp_dir / "out")
+        result = service.sync_wallpapers(temp_dir / "out", delete=True)
+
+        assert kept.removed == []
+        assert result.removed == ["old.png"]
+        assert not (wallpapers_dir / "old.png").exists()
+        assert (wallpapers_dir / ".keep").exists()
+
+
+class TestWallpapersServiceDeduplication:
+    """Tests for storing identical content once."""
+
+    @pytest.fixture
+    def copies(self, temp_dir: Path) -> list:
+        """Create three files, two of them with identical content."""
+        folder = temp_dir / "copies"
+        folder.mkdir()
+        content = bytes(range(256)) * 40
+        (folder / "a.png").write_bytes(png_bytes(content))
+        (folder / "b.png").write_bytes(png_bytes(content))
+        (folder / "c.png").write_bytes(png_bytes(content[::-1]))
+        return [folder / "a.png", folder / "b.png", folder / "c.png"]
+
+    def test_identical_content_stored_once(
+        self, nonexistent_archive: Path, copies: list
+    ) -> None:
+        """A second name for stored content only adds a link header."""
+        service = WallpapersService(nonexistent_archive, codec="store")
+        service.add_wallpaper(copies[0])
+        before = nonexistent_archive.stat().st_size
+        results = service.add_wallpapers([copies[1]])
+
+        assert results[0].duplicate_of == "a.png"
+        assert nonexistent_archive.stat().st_size - before == 512
+        with service.open_wallpaper("b.png") as stream:
+            assert stream.read() == copies[0].read_bytes()
+
+    def test_duplicates_within_batch(
+        self, nonexistent_archive: Path, copies: list
+    ) -> None:
+        """Identical files in one batch link to the first of them."""
+        service = WallpapersService(nonexistent_archive)
+        results = service.add_wallpapers(copies)
+
+        assert [r.duplicate_of for r in results] == [None, "a.png", None]
+        with tarfile.open(nonexistent_archive, "r:gz") as tar:
+            link = tar.getmember("b.png")
+            assert link.islnk() and link.linkname == "a.png"
+            assert tar.extractfile("b.png").read() == copies[0].read_bytes()
+
+    def test_identical_readd_is_unchanged(
+        self, nonexistent_archive: Path, copies: list
+    ) -> None:
+        """Re-adding identical content under the same name writes nothing."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers(copies)
+        before = nonexistent_archive.read_bytes()
+
+        results = service.add_wallpapers([copies[0]])
+
+        assert results[0].status == "unchanged"
+        assert nonexistent_archive.read_bytes() == before
+
+    def test_overwriting_link_target_keeps_link_content(
+        self, nonexistent_archive: Path, copies: list, temp_dir: Path
+    ) -> None:
+        """Replacing a.png doesn't change the content stored for b.png."""
+        service = WallpapersService(nonexistent_archive)
+        original = copies[0].read_bytes()
+        service.add_wallpapers(copies[:2])
+        copies[0].write_bytes(png_bytes(b"replacement"))
+        service.add_wallpaper(copies[0])
+
+        result = service.extract_wallpapers(temp_dir / "out")
+
+        assert (result / "a.png").read_bytes() == png_bytes(b"replacement")
+        assert (result / "b.png").read_bytes() == original
+        index_path_for(nonexistent_archive).unlink()
+        with service.open_wallpaper("b.png") as stream:
+            assert stream.read() == original
+
+    def test_extracted_duplicates_are_independent_files(
+        self, nonexistent_archive: Path, copies: list, temp_dir: Path
+    ) -> None:
+        """Extraction writes separate files for names sharing content."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers(copies)
+
+        result = service.extract_wallpapers(temp_dir / "out")
+
+        assert (result / "b.png").read_bytes() == copies[1].read_bytes()
+        assert (result / "b.png").stat().st_nlink == 1
+
+    def test_convert_keeps_links(
+        self, nonexistent_archive: Path, copies: list
+    ) -> None:
+        """Converting to another codec preserves the deduplicated layout."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers(copies)
+        service.convert_archive("store")
+
+        with tarfile.open(nonexistent_archive) as tar:
+            assert tar.getmember("b.png").islnk()
+        with service.open_wallpaper("b.png") as stream:
+            assert stream.read() == copies[1].read_bytes()
+
+
+class TestWallpapersServiceParallel:
+    """Tests for multi-threaded compression and extraction."""
+
+    @pytest.fixture
+    def many_images(self, temp_dir: Path) -> Path:
+        """Create a folder of distinct images plus one duplicate."""
+        folder = temp_dir / "many"
+        folder.mkdir()
+        for i in range(12):
+            content = png_bytes(bytes([i]) * (3000 + i))
+            (folder / f"img{i:02}.png").write_bytes(content)
+        (folder / "zz_copy.png").write_bytes(png_bytes(bytes([3]) * 3003))
+        return folder
+
+    def test_parallel_add_writes_one_segment_per_file(
+        self, nonexistent_archive: Path, many_images: Path
+    ) -> None:
+        """Each file gets its own segment; the duplicate stays a link."""
+        service = WallpapersService(nonexistent_archive, workers=4)
+        results = service.add_wallpapers([many_images])
+
+        index = WallpaperIndex.load(nonexistent_archive)
+        segments = {member.segment for member in index.members.values()}
+        assert len(segments) == 12
+        assert results[-1].duplicate_of == "img03.png"
+        assert WallpaperIndex.build(nonexistent_archive).members == index.members
+
+    def test_parallel_archive_readable_by_tarfile(
+        self, nonexistent_archive: Path, many_images: Path
+    ) -> None:
+        """Block-parallel output is still one ordinary tar.gz stream."""
+        WallpapersService(nonexistent_archive, workers=4).add_wallpapers(
+            [many_images]
+        )
+
+        with tarfile.open(nonexistent_archive, "r:gz") as tar:
+            assert len(tar.getnames()) == 13
+            data = tar.extractfile("img07.png").read()
+            assert data == png_bytes(bytes([7]) * 3007)
+
+    def test_parallel_extract_matches_sources(
+        self, nonexistent_archive: Path, many_images: Path, temp_dir: Path
+    ) -> None:
+        """Segments extracted on several threads hold the right content."""
+        WallpapersService(nonexistent_archive, workers=4).add_wallpapers(
+            [many_images]
+        )
+
+        service = WallpapersService(nonexistent_archive, workers=4)
+        result = service.extract_wallpapers(temp_dir / "out")
+
+        for source in many_images.iterdir():
+            assert (result / source.name).read_bytes() == source.read_bytes()
+
+    def test_parallel_convert_splits_segments(
+        self, nonexistent_archive: Path, many_images: Path
+    ) -> None:
+        """Converting with several workers stores one member per segment."""
+        WallpapersService(nonexistent_archive, workers=1).add_wallpapers(
+            [many_images]
+        )
+        service = WallpapersService(nonexistent_archive, workers=3)
+        service.convert_archive("xz")
+
+        index = WallpaperIndex.load(nonexistent_archive)
+        assert len({member.segment for member in index.members.values()}) == 12
+        with service.open_wallpaper("zz_copy.png") as stream:
+            assert stream.read() == png_bytes(bytes([3]) * 3003)
+
+    def test_invalid_worker_count(self, sample_archive: Path) -> None:
+        """A worker count below one is rejected."""
+        with pytest.raises(WallpaperError, match="at least 1"):
+            WallpapersService(sample_archive, workers=0)
+
+
+class TestWallpapersServiceImageMetadata:
+    """Tests for header validation and stored image metadata."""
+
+    def test_add_rejects_unreadable_image(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """A file with an image extension but no image header is rejected."""
+        fake = temp_dir / "fake.png"
+        fake.write_bytes(b"not really a png")
+        service = WallpapersService(nonexistent_archive)
+
+        with pytest.raises(InvalidImageError, match="not a readable image"):
+            service.add_wallpaper(fake)
+        with pytest.raises(InvalidImageError, match="not a readable image"):
+            service.add_wallpapers([fake])
+        assert not nonexistent_archive.exists()
+
+    def test_directory_skips_unreadable_images(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Files found in a directory are filtered by their header."""
+        folder = temp_dir / "images"
+        folder.mkdir()
+        (folder / "good.png").write_bytes(png_bytes(width=4, height=3))
+        (folder / "broken.jpg").write_bytes(b"truncated")
+
+        results = WallpapersService(nonexistent_archive).add_wallpapers([folder])
+
+        assert [r.name for r in results] == ["good.png"]
+
+    def test_no_validation_stores_unknown_format(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Content added without validation has no format or dimensions."""
+        text = temp_dir / "notes.png"
+        text.write_text("plain text")
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpaper(text, validate_extension=False)
+
+        [info] = service.list_wallpaper_details()
+        assert (info.format, info.width, info.height) == (None, None, None)
+
+    def test_details_come_from_index(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Format and dimensions are recorded on add and survive a rescan."""
+        wide = temp_dir / "wide.png"
+        wide.write_bytes(png_bytes(b"wide", width=3840, height=1600))
+        tall = temp_dir / "tall.png"
+        tall.write_bytes(png_bytes(b"tall", width=1080, height=1920))
+        copy = temp_dir / "copy.png"
+        copy.write_bytes(wide.read_bytes())
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpapers([wide, tall, copy])
+
+        details = service.list_wallpaper_details()
+        assert [(i.name, i.format, i.width, i.height) for i in details] == [
+            ("wide.png", "png", 3840, 1600),
+            ("tall.png", "png", 1080, 1920),
+            ("copy.png", "png", 3840, 1600),
+        ]
+        assert details[0].size == wide.stat().st_size
+        stored = WallpaperIndex.load(nonexistent_archive).members
+        assert WallpaperIndex.build(nonexistent_archive).members == stored
+
+    def test_old_index_version_is_rebuilt(
+        self, nonexistent_archive: Path, sample_image: Path
+    ) -> None:
+        """An index written before metadata existed is rebuilt on load."""
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpaper(sample_image)
+        path = index_path_for(nonexistent_archive)
+        data = json.loads(path.read_text())
+        data["version"] = 1
+        data["members"] = [
+            dict(zip(data.pop("fields"), row[:-3])) for row in data["members"]
+        ]
+        path.write_text(json.dumps(data))
+
+        [info] = service.list_wallpaper_details()
+
+        assert (info.format, info.width, info.height) == ("png", 1, 1)
@@ -8,6 +8,7 @@ import pytest
 from src.services.wallpapers_service import (
     WallpapersService,
 )
+from tests.conftest import png_bytes
 
 
 class TestHiddenFilesAndDirectories:
@@ -21,12 +22,12 @@ class TestHiddenFilesAndDirectories:
         with tarfile.open(archive_path, "w:gz") as tar:
             # Add normal file
             normal = temp_dir / "visible.png"
-            normal.write_bytes(b"content")
+            normal.write_bytes(png_bytes(b"content"))
             tar.add(normal, arcname="visible.png")
 
             # Add hidden file
             hidden = temp_dir / ".hidden.png"
-            hidden.write_bytes(b"content")
+            hidden.write_bytes(png_bytes(b"content"))
             tar.add(hidden, arcname=".hidden.png")
 
         service = WallpapersService(archive_path)
@@ -43,7 +44,7 @@ class TestHiddenFilesAndDirectories:
         with tarfile.open(archive_path, "w:gz") as tar:
             # Add a file
             file_path = temp_dir / "image.png"
-            file_path.write_bytes(b"content")
+            file_path.write_bytes(png_bytes(b"content"))
             tar.add(file_path, arcname="image.png")
 
             # Add directory info (common in tar archives)
@@ -72,7 +73,7 @@ class TestMultipleImageFormats:
         formats = ["jpg", "jpeg", "png", "gif", "webp", "bmp"]
         for fmt in formats:
             image = temp_dir / f"wallpaper.{fmt}"
-            image.write_bytes(b"content")
+            image.write_bytes(png_bytes(b"content"))
             service.add_wallpaper(image)
 
         wallpapers = service.list_wallpapers()
@@ -96,7 +97,7 @@ class TestArchivePreservation:
 
         # Add new wallpaper
         new_image = temp_dir / "additional.png"
-        new_image.write_bytes(b"new content")
+        new_image.write_bytes(png_bytes(b"new content"))
         service.add_wallpaper(new_image)
 
         # Verify all original wallpapers still exist
@@ -115,7 +116,7 @@ class TestServiceDefaultBehavior:
         """Add with default parameters (no args) overwrites duplicates."""
         # Create file with same name as existing wallpaper
         duplicate = temp_dir / "test_wallpaper.png"
-        duplicate.write_bytes(b"different content")
+        duplicate.write_bytes(png_bytes(b"different content"))
 
         service = WallpapersService(sample_archive)
 
@@ -198,7 +199,7 @@ class TestFilenameHandling:
         """Add preserves the original filename from the source path."""
         # Create file with specific name
         source = temp_dir / "my-custom-wallpaper-2024.png"
-        source.write_bytes(b"content")
+        source.write_bytes(png_bytes(b"content"))
 
         service = WallpapersService(nonexistent_archive)
         service.add_wallpaper(source)
@@ -214,7 +215,7 @@ class TestFilenameHandling:
         nested = temp_dir / "deep" / "nested" / "path"
         nested.mkdir(parents=True)
         image = nested / "wallpaper.png"
-        image.write_bytes(b"content")
+        image.write_bytes(png_bytes(b"content"))
 
         service = WallpapersService(nonexistent_archive)
         service.add_wallpaper(image)
@@ -250,3 +251,74 @@ class TestArchiveFormatBehavior:
 
         assert archive_path.exists()
         assert archive_path.parent.exists()
+
+
+class TestAppendOnlyAdd:
+    """Tests for incremental (append-only) archive updates."""
+
+    def test_add_keeps_existing_segments_byte_identical(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Adding to a segmented archive only replaces the trailer."""
+        from src.services.wallpaper_codecs import CODECS
+
+        trailer = CODECS["gzip"].trailer
+        first = temp_dir / "first.png"
+        first.write_bytes(png_bytes(b"first"))
+        second = temp_dir / "second.png"
+        second.write_bytes(png_bytes(b"second"))
+
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpaper(first)
+        before = nonexistent_archive.read_bytes()
+        service.add_wallpaper(second)
+        after = nonexistent_archive.read_bytes()
+
+        assert after.startswith(before[: -len(trailer)])
+        assert after.endswith(trailer)
+
+    def test_add_converts_plain_archive(
+        self, sample_archive: Path, temp_dir: Path
+    ) -> None:
+        """A tarball written by other tools is converted on first add."""
+        from src.services.wallpaper_archive import has_trailer
+        from src.services.wallpaper_codecs import CODECS
+
+        gzip_codec = CODECS["gzip"]
+        new_image = temp_dir / "new.png"
+        new_image.write_bytes(png_bytes(b"new"))
+
+        service = WallpapersService(sample_archive)
+        assert not has_trailer(sample_archive, gzip_codec)
+        service.add_wallpaper(new_image)
+
+        assert has_trailer(sample_archive, gzip_codec)
+        assert sorted(service.list_wallpapers()) == ["new.png", "test_wallpaper.png"]
+
+    def test_overwrite_extracts_latest_content(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """An overwritten wallpaper extracts with its newest content."""
+        image = temp_dir / "image.png"
+        image.write_bytes(png_bytes(b"old"))
+        service = WallpapersService(nonexistent_archive)
+        service.add_wallpaper(image)
+        image.write_bytes(png_bytes(b"new content"))
+        service.add_wallpaper(image, overwrite=True)
+
+        result = service.extract_wallpapers(temp_dir / "out")
+
+        assert service.list_wallpapers() == ["image.png"]
+        assert (result / "image.png").read_bytes() == png_bytes(b"new content")
+
+    def test_appended_archive_is_single_tar_stream(
+        self, nonexistent_archive: Path, temp_dir: Path
+    ) -> None:
+        """Appended segments decompress as one tar stream for standard readers."""
+        for name in ("a.png", "b.png", "c.png"):
+            image = temp_dir / name
+            image.write_bytes(png_bytes(name.encode()))
+            WallpapersService(nonexistent_archive).add_wallpaper(image)
+
+        with tarfile.open(nonexistent_archive, "r:gz") as tar:
+            assert tar.getnames() == ["a.png", "b.png", "c.png"]
@@ -0,0 +1,179 @@
+# tests/unit/test_zero_copy.py
+"""Unit tests for kernel-side copies and mapped reads of file ranges."""
+import errno
+import hashlib
+import io
+import os
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from src.services import zero_copy
+from src.services.wallpapers_service import WallpapersService
+from src.services.zero_copy import FileRange, copy_range, copy_stream, file_range
+from tests.conftest import png_bytes
+
+DATA = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def source(temp_dir: Path) -> Path:
+    path = temp_dir / "source.bin"
+    path.write_bytes(DATA)
+    return path
+
+
+def refuse(*args) -> int:
+    raise OSError(errno.EXDEV, "cross-device")
+
+
+class TestFileRange:
+    """Tests for reading and hashing a range of a file."""
+
+    @pytest.mark.parametrize("mapped", [True, False], ids=["mmap", "pread"])
+    def test_read_seek_and_hash(self, source: Path, mapped: bool) -> None:
+        """Reads stay inside the range; hashing doesn't move the position."""
+        with open(source, "rb") as f:
+            mapping = zero_copy.map_file(f) if mapped else None
+            view = FileRange(f, 1000, 5000, mapping)
+
+            assert view.read(10) == DATA[1000:1010]
+            digest = hashlib.sha256()
+            view.update_digest(digest)
+            assert digest.hexdigest() == hashlib.sha256(DATA[1010:6000]).hexdigest()
+            assert view.read() == DATA[1010:6000]
+            assert view.read(1) == b""
+            view.seek(-4, os.SEEK_END)
+            assert view.read() == DATA[5996:6000]
+            view.close()
+            if mapping is not None:
+                mapping.close()
+
+    def test_file_range_of_streams(self, source: Path) -> None:
+        """Files and ranges can be viewed; other streams can't."""
+        assert file_range(io.BytesIO(DATA)) is None
+        with open(source, "rb") as f:
+            f.seek(100)
+            with file_range(f) as view:
+                assert (view.offset, view.size) == (100, len(DATA) - 100)
+                view.seek(50)
+                with file_range(view, 10) as inner:
+                    assert inner.read() == DATA[150:160]
+            assert f.tell() == 100
+
+    def test_truncated_file(self, source: Path) -> None:
+        """A range past the end of the file raises EOFError."""
+        with open(source, "rb") as f:
+            with pytest.raises(EOFError):
+                FileRange(f, len(DATA) - 10, 100).read()
+
+
+class TestCopy:
+    """Tests for copies between files."""
+
+    def test_copy_stream_between_files(self, source: Path, temp_dir: Path) -> None:
+        """Both positions advance; the copy lands where out was."""
+        target = temp_dir / "target.bin"
+        with open(source, "rb") as data, open(target, "wb") as out:
+            data.seek(10)
+            out.write(b"head")
+            copy_stream(data, out, 1000)
+            out.write(b"tail")
+            assert data.tell() == 1010
+        assert target.read_bytes() == b"head" + DATA[10:1010] + b"tail"
+
+    def test_copy_stream_falls_back_to_buffers(self, source: Path) -> None:
+        """Streams that aren't files are copied through Python."""
+        out = io.BytesIO()
+        with open(source, "rb") as data:
+            copy_stream(data, out, 300)
+        assert out.getvalue() == DATA[:300]
+        with pytest.raises(EOFError):
+            copy_stream(io.BytesIO(b"short"), io.BytesIO(), 10)
+
+    @pytest.mark.parametrize("refused", [1, 2], ids=["sendfile", "pread"])
+    def test_fallbacks(
+        self,
+        source: Path,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        refused: int,
+    ) -> None:
+        """Unsupported kernel copies fall back to the next method."""
+        monkeypatch.setattr(zero_copy, "_copy_file_range", refuse)
+        if refused > 1:
+            monkeypatch.setattr(zero_copy, "_sendfile", refuse)
+        target = temp_dir / "target.bin"
+        target.write_bytes(b"x" * 8)
+        with open(source, "rb") as src, open(target, "r+b") as dst:
+            copy_range(src.fileno(), 5, dst.fileno(), 8, len(DATA) - 5)
+        assert target.read_bytes() == b"x" * 8 + DATA[5:]
+
+    def test_real_errors_propagate(
+        self, source: Path, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Errors other than "unsupported" are not retried another way."""
+
+        def full(*args) -> int:
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        monkeypatch.setattr(zero_copy, "_copy_file_range", full)
+        with open(source, "rb") as src, open(temp_dir / "t.bin", "wb") as dst:
+            with pytest.raises(OSError, match="No space"):
+                copy_range(src.fileno(), 0, dst.fileno(), 0, 10)
+
+
+class TestStoreArchive:
+    """Uncompressed archives move data without Python buffers."""
+
+    @pytest.fixture
+    def service(
+        self,
+        nonexistent_archive: Path,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> WallpapersService:
+        folder = temp_dir / "images"
+        folder.mkdir()
+        for index in range(3):
+            (folder / f"{index}.png").write_bytes(png_bytes(DATA[index:] * 3, 64, 32))
+        (folder / "copy.png").write_bytes((folder / "0.png").read_bytes())
+        # Any copy through Python buffers fails the test
+        monkeypatch.setattr(
+            zero_copy,
+            "_copy_buffered",
+            lambda *args: pytest.fail("copied through Python"),
+        )
+        service = WallpapersService(
+            nonexistent_archive,
+            codec="store",
+            workers=3,
+            cache_dir=temp_dir / "blobs",
+        )
+        service.add_wallpapers([folder])
+        return service
+
+    def test_add_and_extract(self, service: WallpapersService, temp_dir: Path) -> None:
+        """Added files are byte-identical in tar and after extraction."""
+        images = temp_dir / "images"
+        with tarfile.open(service.archive_path) as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    data = tar.extractfile(member).read()
+                    assert data == (images / member.name).read_bytes()
+
+        out = service.extract_wallpapers(temp_dir / "out")
+
+        for path in images.iterdir():
+            assert (out / path.name).read_bytes() == path.read_bytes()
+        assert service.list_wallpaper_details()[0].width == 64
+        assert service.verify_archive().ok
+
+    def test_cache_and_open(self, service: WallpapersService, temp_dir: Path) -> None:
+        """Blobs are copied into the cache; open() reads from a mapping."""
+        out = service.extract_wallpapers(temp_dir / "out", link_mode="hardlink")
+        with service.open_wallpaper("1.png") as f:
+            assert f.read() == (out / "1.png").read_bytes()
+            f.seek(1)
+            assert f.read(3) == b"PNG"